@@ -0,0 +1,174 @@
+"""
+Compare decoding the full model with reading only the metadata of a response.
+
+Run with python -m benchmarks.decode_response from the old_lambda directory.
+"""
+
+import json
+import timeit
+import tracemalloc
+import typing
+
+from kubernetes import client
+
+from lambda_function import helpers
+
+# The number of times each decode is run
+NUMBER = 200
+
+
+class _Response:
+    """Raw response with the interface of urllib3.HTTPResponse that is used."""
+
+    def __init__(self, *, data: bytes) -> None:
+        """Construct."""
+        self.data = data
+
+    def release_conn(self) -> None:
+        """Nothing to release."""
+
+
+def build_config_map(*, keys: int, value_size: int) -> bytes:
+    """
+    Build the response for a large ConfigMap.
+
+    Args:
+        keys: The number of keys in the data.
+        value_size: The length of each value in the data.
+
+    Returns:
+        The ConfigMap as JSON.
+
+    """
+    return json.dumps(
+        {
+            "apiVersion": "v1",
+            "kind": "ConfigMap",
+            "metadata": {
+                "name": "config-map-1",
+                "namespace": "default",
+                "labels": {f"label-{idx}": "value" for idx in range(20)},
+                "annotations": {f"annotation-{idx}": "value" for idx in range(20)},
+            },
+            "data": {f"key-{idx}": "v" * value_size for idx in range(keys)},
+        }
+    ).encode("utf-8")
+
+
+def build_deployment(*, containers: int) -> bytes:
+    """
+    Build the response for a Deployment with many containers.
+
+    Args:
+        containers: The number of containers in the pod template.
+
+    Returns:
+        The Deployment as JSON.
+
+    """
+    container = {
+        "name": "container",
+        "image": "nginx:1.17",
+        "env": [{"name": f"ENV_{idx}", "value": "value"} for idx in range(30)],
+        "ports": [{"containerPort": 80 + idx} for idx in range(5)],
+        "resources": {"limits": {"cpu": "1", "memory": "1Gi"}},
+    }
+    return json.dumps(
+        {
+            "apiVersion": "apps/v1",
+            "kind": "Deployment",
+            "metadata": {"name": "deployment-1", "namespace": "default"},
+            "spec": {
+                "replicas": 3,
+                "selector": {"matchLabels": {"app": "app-1"}},
+                "template": {
+                    "metadata": {"labels": {"app": "app-1"}},
+                    "spec": {
+                        "containers": [
+                            {**container, "name": f"container-{idx}"}
+                            for idx in range(containers)
+                        ]
+                    },
+                },
+            },
+        }
+    ).encode("utf-8")
+
+
+def decode_model(
+    *, api_client: client.ApiClient, data: bytes, response_type: str
+) -> typing.Any:
+    """
+    Decode a response into the generated model classes like the client does.
+
+    Calls the same private function as ApiClient.deserialize, whose signature differs
+    between client versions.
+
+    Args:
+        api_client: The client with the model classes.
+        data: The body of the response.
+        response_type: The name of the model class.
+
+    Returns:
+        The model.
+
+    """
+    deserialize = getattr(api_client, "_ApiClient__deserialize")
+    return deserialize(json.loads(data), response_type)
+
+
+def measure(*, function: typing.Callable[[], typing.Any]) -> typing.Dict[str, float]:
+    """
+    Measure the time and peak memory of a function.
+
+    Args:
+        function: The function to measure.
+
+    Returns:
+        The mean milliseconds per call and the peak kilobytes of one call.
+
+    """
+    seconds = timeit.timeit(function, number=NUMBER)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": seconds / NUMBER * 1000, "peak_kb": peak / 1024}
+
+
+def main() -> None:
+    """Print the comparison for each response."""
+    api_client = client.ApiClient()
+    cases = (
+        ("V1ConfigMap", build_config_map(keys=500, value_size=200)),
+        ("V1Deployment", build_deployment(containers=20)),
+    )
+    for response_type, data in cases:
+        response = _Response(data=data)
+        model = measure(
+            function=lambda: decode_model(
+                api_client=api_client,
+                data=data,  # pylint: disable=cell-var-from-loop
+                response_type=response_type,  # pylint: disable=cell-var-from-loop
+            )
+        )
+        metadata = measure(
+            function=lambda: helpers.read_metadata(
+                response=response  # pylint: disable=cell-var-from-loop
+            )
+        )
+        print(
+            json.dumps(
+                {
+                    "type": response_type,
+                    "bytes": len(data),
+                    "model": model,
+                    "metadata": metadata,
+                    "speedup": model["ms"] / metadata["ms"],
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
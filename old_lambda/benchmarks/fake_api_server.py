@@ -0,0 +1,974 @@
+"""
+Local fake Kubernetes API server for the benchmarks.
+
+It serves create, replace, patch, delete, get, list and watch for every resource of
+an OpenAPI document. Run with python -m benchmarks.fake_api_server from the old_lambda
+directory to serve on its own.
+"""
+
+import argparse
+import collections
+import copy
+import gzip
+import http.server
+import json
+import random
+import re
+import threading
+import time
+import typing
+import urllib.parse
+import uuid
+
+from lambda_function import protobuf
+
+# The resources served by the fake API server by api version
+RESOURCES = {
+    "v1": [
+        {"name": "configmaps", "kind": "ConfigMap", "namespaced": True},
+        {"name": "namespaces", "kind": "Namespace", "namespaced": False},
+    ],
+    "apps/v1": [{"name": "deployments", "kind": "Deployment", "namespaced": True}],
+}
+# The fields that are maps from string to string in the protobuf encoding
+_MAPS = ("labels", "annotations", "data", "matchLabels", "limits", "requests")
+# The paths of objects in an OpenAPI document, without their subresources
+_SPEC_PATH = re.compile(
+    r"^/apis?/[^{}]+?(?P<namespaced>/namespaces/\{namespace\})?"
+    r"/(?P<plural>[^/{}]+)/\{name\}$"
+)
+_GROUP_VERSION_KIND_KEY = "x-kubernetes-group-version-kind"
+_DISCOVERY_PATH = re.compile(r"^/apis?/(?P<api_version>[^/]+(/v[^/]+)?)$")
+# The number of changes kept for watches
+HISTORY_SIZE = 10000
+# The seconds a watch stays open when the request has no timeoutSeconds
+DEFAULT_WATCH_TIMEOUT = 5.0
+# The number of encoded responses that are cached
+CACHE_SIZE = 256
+
+# The resources of every api version
+Resources = typing.Dict[str, typing.List[typing.Dict[str, typing.Any]]]
+# The api version, plural, namespace and name of an object
+Key = typing.Tuple[str, str, str, str]
+
+
+def _varint(value: int) -> bytes:
+    """Encode a varint."""
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if not value:
+            encoded.append(byte)
+            return bytes(encoded)
+        encoded.append(byte | 0x80)
+
+
+def _field(number: int, value: bytes) -> bytes:
+    """Encode a length delimited field."""
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def _encode_value(*, number: int, key: str, value: typing.Any) -> bytes:
+    """Encode a field of any JSON value."""
+    if isinstance(value, (bool, int)):
+        return _varint(number << 3) + _varint(int(value))
+    if isinstance(value, str):
+        return _field(number, value.encode("utf-8"))
+    if isinstance(value, list):
+        return b"".join(
+            _encode_value(number=number, key=key, value=item) for item in value
+        )
+    if key in _MAPS:
+        return b"".join(
+            _field(number, _field(1, str(k).encode()) + _field(2, str(v).encode()))
+            for k, v in value.items()
+        )
+    return _field(number, encode_message(message=value))
+
+
+def encode_message(*, message: typing.Dict[str, typing.Any]) -> bytes:
+    """
+    Encode a JSON object like the protobuf encoding of a built-in kind.
+
+    The field numbers follow the order of the keys with metadata as field 1 and the
+    name and namespace at their ObjectMeta numbers, which gives the size of the real
+    encoding closely enough for a benchmark.
+
+    Args:
+        message: The JSON object.
+
+    Returns:
+        The encoded message.
+
+    """
+    numbers = {"metadata": 1, "name": 1, "namespace": 3}
+    encoded = bytearray()
+    next_number = 4
+    for key, value in message.items():
+        if key in ("apiVersion", "kind"):
+            continue
+        number = numbers.get(key)
+        if number is None:
+            number = next_number
+            next_number += 1
+        encoded += _encode_value(number=number, key=key, value=value)
+    return bytes(encoded)
+
+
+def encode_object(*, obj: typing.Dict[str, typing.Any]) -> bytes:
+    """
+    Encode an object in the runtime.Unknown envelope with the magic prefix.
+
+    Args:
+        obj: The object as JSON.
+
+    Returns:
+        The encoded object.
+
+    """
+    type_meta = _field(1, obj.get("apiVersion", "").encode()) + _field(
+        2, obj.get("kind", "").encode()
+    )
+    return (
+        protobuf.MAGIC + _field(1, type_meta) + _field(2, encode_message(message=obj))
+    )
+
+
+def calculate_resources(*, spec: typing.Dict[str, typing.Any]) -> Resources:
+    """
+    Calculate the resources of every api version from an OpenAPI document.
+
+    Args:
+        spec: The OpenAPI document of the API server.
+
+    Returns:
+        The resources by api version, like the discovery documents list them.
+
+    """
+    resources: Resources = {}
+    seen = set()
+    for path, path_item in spec.get("paths", {}).items():
+        match = _SPEC_PATH.match(path)
+        if match is None:
+            continue
+        group_version_kind = next(
+            (
+                operation[_GROUP_VERSION_KIND_KEY]
+                for operation in path_item.values()
+                if isinstance(operation, dict) and _GROUP_VERSION_KIND_KEY in operation
+            ),
+            None,
+        )
+        if group_version_kind is None:
+            continue
+        api_version = "/".join(
+            filter(None, (group_version_kind["group"], group_version_kind["version"]))
+        )
+        plural = match.group("plural")
+        if (api_version, plural) in seen:
+            continue
+        seen.add((api_version, plural))
+        resources.setdefault(api_version, []).append(
+            {
+                "name": plural,
+                "kind": group_version_kind["kind"],
+                "namespaced": match.group("namespaced") is not None,
+            }
+        )
+    return resources
+
+
+def load_resources(*, path: str) -> Resources:
+    """
+    Load the resources of every api version from an OpenAPI document.
+
+    Args:
+        path: The path of the document.
+
+    Returns:
+        The resources by api version.
+
+    """
+    with open(path, "rb") as in_file:
+        return calculate_resources(spec=json.load(in_file))
+
+
+class StatusError(Exception):
+    """The request failed with a Status."""
+
+    def __init__(self, code: int, reason: str, message: str) -> None:
+        """Construct."""
+        super().__init__(message)
+        self.code = code
+        self.reason = reason
+
+    def calculate_status(self) -> typing.Dict[str, typing.Any]:
+        """
+        Calculate the Status object of the failure.
+
+        Returns:
+            The Status.
+
+        """
+        return {
+            "apiVersion": "v1",
+            "kind": "Status",
+            "status": "Failure",
+            "message": str(self),
+            "reason": self.reason,
+            "code": self.code,
+        }
+
+
+class Target(typing.NamedTuple):
+    """
+    Structure of what a request is about.
+
+    Attrs:
+        api_version: The api version of the resource.
+        resource: The resource as the discovery document lists it.
+        namespace: The namespace of the path, None if there is none.
+        name: The name of the object, None for the collection.
+        query: The query parameters.
+
+    """
+
+    api_version: str
+    resource: typing.Dict[str, typing.Any]
+    namespace: typing.Optional[str]
+    name: typing.Optional[str]
+    query: typing.Dict[str, str]
+
+
+def parse_path(*, path: str, resources: Resources) -> Target:
+    """
+    Parse the path of a request for an object or a collection.
+
+    Raise StatusError if the path is not of a resource that is served.
+
+    Args:
+        path: The path with the query.
+        resources: The resources by api version.
+
+    Returns:
+        What the request is about.
+
+    """
+    url = urllib.parse.urlsplit(path)
+    not_found = StatusError(404, "NotFound", f"the server could not find {url.path}")
+    parts = url.path.strip("/").split("/")
+    if parts[0] == "api" and len(parts) > 2:
+        api_version, rest = parts[1], parts[2:]
+    elif parts[0] == "apis" and len(parts) > 3:
+        api_version, rest = "/".join(parts[1:3]), parts[3:]
+    else:
+        raise not_found
+    namespace = None
+    if len(rest) > 2 and rest[0] == "namespaces":
+        namespace, rest = rest[1], rest[2:]
+    resource = next(
+        (item for item in resources.get(api_version, []) if item["name"] == rest[0]),
+        None,
+    )
+    if resource is None or len(rest) > 2:
+        raise not_found
+    name = rest[1] if len(rest) == 2 else None
+    # Cluster scoped objects have no namespace and namespaced objects need one
+    if namespace is not None and not resource["namespaced"]:
+        raise not_found
+    if namespace is None and resource["namespaced"] and name is not None:
+        raise not_found
+    return Target(
+        api_version, resource, namespace, name, dict(urllib.parse.parse_qsl(url.query))
+    )
+
+
+def merge_patch(*, target: typing.Any, patch: typing.Any) -> typing.Any:
+    """
+    Apply a JSON merge patch.
+
+    Args:
+        target: The object to patch.
+        patch: The patch.
+
+    Returns:
+        The patched object, the target is not modified.
+
+    """
+    if not isinstance(patch, dict):
+        return patch
+    patched = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            patched.pop(key, None)
+        else:
+            patched[key] = merge_patch(target=patched.get(key), patch=value)
+    return patched
+
+
+def json_patch(
+    *, target: typing.Dict[str, typing.Any], operations: typing.List[typing.Any]
+) -> typing.Dict[str, typing.Any]:
+    """
+    Apply the add, replace, remove and test operations of a JSON patch.
+
+    Raise StatusError if an operation cannot be applied.
+
+    Args:
+        target: The object to patch, it is modified.
+        operations: The operations of the patch.
+
+    Returns:
+        The patched object.
+
+    """
+    for operation in operations:
+        keys = [
+            key.replace("~1", "/").replace("~0", "~")
+            for key in operation["path"].split("/")[1:]
+        ]
+        parent: typing.Any = target
+        try:
+            for key in keys[:-1]:
+                parent = parent[int(key) if isinstance(parent, list) else key]
+            last: typing.Any = keys[-1]
+            if isinstance(parent, list):
+                last = len(parent) if last == "-" else int(last)
+            if operation["op"] == "test":
+                if parent[last] != operation["value"]:
+                    raise StatusError(
+                        422, "Invalid", f"test failed at {operation['path']}"
+                    )
+            elif operation["op"] == "remove":
+                del parent[last]
+            elif operation["op"] == "add" and isinstance(parent, list):
+                parent.insert(last, operation["value"])
+            elif operation["op"] in ("add", "replace"):
+                if operation["op"] == "replace":
+                    parent[last]  # pylint: disable=pointless-statement
+                parent[last] = operation["value"]
+            else:
+                raise StatusError(422, "Invalid", f"unsupported op {operation['op']}")
+        except (KeyError, IndexError, TypeError, ValueError) as exc:
+            raise StatusError(
+                422, "Invalid", f"cannot apply {operation['op']} at {operation['path']}"
+            ) from exc
+    return target
+
+
+class Store:
+    """The objects of the fake API server and the history of their changes."""
+
+    def __init__(self) -> None:
+        """Construct."""
+        self.resource_version = 0
+        self._objects: typing.Dict[Key, typing.Dict[str, typing.Any]] = {}
+        # The changes as resource version, key, event type and object
+        self._events: typing.Deque[
+            typing.Tuple[int, Key, str, typing.Dict[str, typing.Any]]
+        ] = collections.deque(maxlen=HISTORY_SIZE)
+        # Notifies the watches of every change
+        self.changed = threading.Condition()
+
+    @staticmethod
+    def calculate_key(*, target: Target, name: typing.Optional[str] = None) -> Key:
+        """
+        Calculate the key of an object.
+
+        Args:
+            target: What the request is about.
+            name: The name of the object, the one of the target by default.
+
+        Returns:
+            The key.
+
+        """
+        return (
+            target.api_version,
+            target.resource["name"],
+            target.namespace or "",
+            name or target.name or "",
+        )
+
+    def _commit(
+        self, *, key: Key, event_type: str, obj: typing.Dict[str, typing.Any]
+    ) -> typing.Dict[str, typing.Any]:
+        """Record a change with the next resource version, holding the lock."""
+        self.resource_version += 1
+        obj["metadata"]["resourceVersion"] = str(self.resource_version)
+        if event_type == "DELETED":
+            self._objects.pop(key)
+        else:
+            self._objects[key] = obj
+        self._events.append((self.resource_version, key, event_type, obj))
+        self.changed.notify_all()
+        return copy.deepcopy(obj)
+
+    def _find(self, *, key: Key) -> typing.Dict[str, typing.Any]:
+        """Find an object, holding the lock."""
+        obj = self._objects.get(key)
+        if obj is None:
+            raise StatusError(404, "NotFound", f"{key[1]} {key[3]} not found")
+        return obj
+
+    def create(
+        self, *, target: Target, body: typing.Dict[str, typing.Any]
+    ) -> typing.Dict[str, typing.Any]:
+        """
+        Create an object.
+
+        Args:
+            target: The collection.
+            body: The object.
+
+        Returns:
+            The created object.
+
+        """
+        obj = copy.deepcopy(body)
+        metadata = obj.setdefault("metadata", {})
+        if not metadata.get("name"):
+            raise StatusError(422, "Invalid", "metadata.name is required")
+        if target.resource["namespaced"]:
+            if target.namespace is None:
+                raise StatusError(404, "NotFound", "the namespace is required")
+            metadata["namespace"] = target.namespace
+        key = self.calculate_key(target=target, name=metadata["name"])
+        metadata.update(
+            uid=str(uuid.uuid4()),
+            generation=1,
+            creationTimestamp=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        )
+        with self.changed:
+            if key in self._objects:
+                raise StatusError(
+                    409, "AlreadyExists", f"{key[1]} {key[3]} already exists"
+                )
+            return self._commit(key=key, event_type="ADDED", obj=obj)
+
+    def replace(
+        self, *, target: Target, body: typing.Dict[str, typing.Any]
+    ) -> typing.Dict[str, typing.Any]:
+        """
+        Replace an object, only if it is unchanged if the body has a resource version.
+
+        Args:
+            target: The object.
+            body: The new object.
+
+        Returns:
+            The replaced object.
+
+        """
+        obj = copy.deepcopy(body)
+        metadata = obj.setdefault("metadata", {})
+        if metadata.get("name", target.name) != target.name:
+            raise StatusError(400, "BadRequest", "the name does not match the path")
+        key = self.calculate_key(target=target)
+        with self.changed:
+            current = self._find(key=key)["metadata"]
+            expected = metadata.get("resourceVersion")
+            if expected and expected != current["resourceVersion"]:
+                raise StatusError(
+                    409, "Conflict", f"{key[1]} {key[3]} has been modified"
+                )
+            metadata.update(
+                name=target.name,
+                uid=current["uid"],
+                generation=current["generation"] + 1,
+                creationTimestamp=current["creationTimestamp"],
+            )
+            if target.namespace is not None:
+                metadata["namespace"] = target.namespace
+            return self._commit(key=key, event_type="MODIFIED", obj=obj)
+
+    def patch(
+        self, *, target: Target, body: typing.Any, content_type: str
+    ) -> typing.Dict[str, typing.Any]:
+        """
+        Patch an object.
+
+        Args:
+            target: The object.
+            body: The patch.
+            content_type: The type of patch, a JSON patch or otherwise a merge patch.
+
+        Returns:
+            The patched object.
+
+        """
+        key = self.calculate_key(target=target)
+        with self.changed:
+            current = self._find(key=key)
+            if content_type.startswith("application/json-patch+json"):
+                obj = json_patch(target=copy.deepcopy(current), operations=body)
+            else:
+                obj = merge_patch(target=copy.deepcopy(current), patch=body)
+            # The identity of the object is not patched
+            obj["metadata"] = {
+                **obj.get("metadata", {}),
+                **{
+                    name: current["metadata"][name]
+                    for name in ("name", "namespace", "uid", "creationTimestamp")
+                    if name in current["metadata"]
+                },
+                "generation": current["metadata"]["generation"] + 1,
+            }
+            return self._commit(key=key, event_type="MODIFIED", obj=obj)
+
+    def delete(self, *, target: Target) -> typing.Dict[str, typing.Any]:
+        """
+        Delete an object.
+
+        Args:
+            target: The object.
+
+        Returns:
+            The deleted object.
+
+        """
+        key = self.calculate_key(target=target)
+        with self.changed:
+            obj = copy.deepcopy(self._find(key=key))
+            return self._commit(key=key, event_type="DELETED", obj=obj)
+
+    def get(self, *, target: Target) -> typing.Dict[str, typing.Any]:
+        """
+        Get an object.
+
+        Args:
+            target: The object.
+
+        Returns:
+            The object.
+
+        """
+        with self.changed:
+            return copy.deepcopy(self._find(key=self.calculate_key(target=target)))
+
+    @staticmethod
+    def _matches(*, key: Key, target: Target) -> bool:
+        """Check whether a key is in the collection, across namespaces without one."""
+        return key[:2] == (target.api_version, target.resource["name"]) and (
+            target.namespace is None or key[2] == target.namespace
+        )
+
+    def list(
+        self, *, target: Target
+    ) -> typing.Tuple[int, typing.List[typing.Dict[str, typing.Any]]]:
+        """
+        List the objects of a collection.
+
+        Args:
+            target: The collection.
+
+        Returns:
+            The resource version of the list and the objects sorted by key.
+
+        """
+        with self.changed:
+            return self.resource_version, [
+                copy.deepcopy(obj)
+                for key, obj in sorted(self._objects.items())
+                if self._matches(key=key, target=target)
+            ]
+
+    def find_events(
+        self, *, target: Target, since: int
+    ) -> typing.List[typing.Tuple[int, str, typing.Dict[str, typing.Any]]]:
+        """
+        Find the changes of a collection, the caller holds the changed condition.
+
+        Raise StatusError if the history no longer goes back to the resource version.
+
+        Args:
+            target: The collection.
+            since: The resource version after which the changes are returned.
+
+        Returns:
+            The resource version, event type and object of every change.
+
+        """
+        if self._events and since < self._events[0][0] - 1:
+            raise StatusError(410, "Expired", f"too old resource version: {since}")
+        return [
+            (resource_version, event_type, obj)
+            for resource_version, key, event_type, obj in self._events
+            if resource_version > since and self._matches(key=key, target=target)
+        ]
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Serves discovery and the objects of every resource."""
+
+    protocol_version = "HTTP/1.1"
+    # Sending the headers and body together, otherwise delayed acks dominate
+    wbufsize = 1 << 16
+    disable_nagle_algorithm = True
+    server: "FakeApiServer"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Stay quiet."""
+
+    def _send(
+        self,
+        *,
+        status: int,
+        obj: typing.Dict[str, typing.Any],
+        headers: typing.Optional[typing.Dict[str, str]] = None,
+    ) -> None:
+        """Send an object in the encoding the client accepts."""
+        content_type, data = self.server.encode(
+            obj=obj, accept=self.headers.get("Accept", "")
+        )
+        self.server.record(size=len(data), status=status)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> typing.Any:
+        """Read the JSON body of the request."""
+        length = int(self.headers.get("Content-Length", 0))
+        data = self.rfile.read(length)
+        if self.headers.get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        return json.loads(data) if data else {}
+
+    def _serve(
+        self, *, function: typing.Callable[[Target, typing.Any], typing.Any]
+    ) -> None:
+        """Read the body, inject faults and send what the function returns."""
+        body = self._read_body() if self.command != "GET" else None
+        try:
+            self.server.inject_fault()
+            target = parse_path(path=self.path, resources=self.server.resources)
+            result = function(target, body)
+        except StatusError as exc:
+            headers = {}
+            if exc.code == 429:
+                headers["Retry-After"] = str(self.server.faults.retry_after)
+            self._send(status=exc.code, obj=exc.calculate_status(), headers=headers)
+            return
+        if result is not None:
+            status, obj = result
+            self._send(status=status, obj=obj)
+
+    def _discover(self) -> bool:
+        """Serve the discovery document if the path is of an api version."""
+        match = _DISCOVERY_PATH.match(self.path)
+        if match is None:
+            return False
+        api_version = match.group("api_version")
+        resources = self.server.resources.get(api_version)
+        if resources is None:
+            error = StatusError(404, "NotFound", f"{api_version} is not served")
+            self._send(status=404, obj=error.calculate_status())
+        else:
+            self._send(
+                status=200,
+                obj={
+                    "kind": "APIResourceList",
+                    "groupVersion": api_version,
+                    "resources": resources,
+                },
+            )
+        return True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve discovery, get or list objects or watch their changes."""
+        if not self._discover():
+            self._serve(function=self._get)
+
+    def _get(self, target: Target, _body: typing.Any) -> typing.Any:
+        """Get an object, list or watch a collection."""
+        store = self.server.store
+        if target.name is not None:
+            return 200, store.get(target=target)
+        if target.query.get("watch", "").lower() in ("true", "1"):
+            self._watch(target=target)
+            return None
+        resource_version, items = store.list(target=target)
+        return 200, {
+            "apiVersion": target.api_version,
+            "kind": f"{target.resource['kind']}List",
+            "metadata": {"resourceVersion": str(resource_version)},
+            "items": items,
+        }
+
+    def _write_chunk(self, data: bytes) -> None:
+        """Write a chunk of a chunked response."""
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _watch(self, *, target: Target) -> None:
+        """Stream the changes of a collection as lines of JSON until the timeout."""
+        store = self.server.store
+        timeout = float(target.query.get("timeoutSeconds", self.server.watch_timeout))
+        deadline = time.monotonic() + timeout
+        with store.changed:
+            since = int(target.query.get("resourceVersion") or store.resource_version)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        while True:
+            with store.changed:
+                try:
+                    events = store.find_events(target=target, since=since)
+                except StatusError as exc:
+                    events = [(since, "ERROR", exc.calculate_status())]
+                remaining = deadline - time.monotonic()
+                if not events and remaining > 0:
+                    store.changed.wait(remaining)
+                    continue
+            for resource_version, event_type, obj in events:
+                line = json.dumps({"type": event_type, "object": obj}) + "\n"
+                self._write_chunk(line.encode("utf-8"))
+                since = resource_version
+            if remaining <= 0 or any(event[1] == "ERROR" for event in events):
+                break
+        self._write_chunk(b"")
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Create an object."""
+        self._serve(function=self._create)
+
+    def _create(self, target: Target, body: typing.Any) -> typing.Any:
+        """Create an object or echo it if the server is not stateful."""
+        if not self.server.stateful:
+            return 201, _echo(target=target, body=body)
+        return 201, self.server.store.create(target=target, body=body)
+
+    def do_PUT(self):  # pylint: disable=invalid-name
+        """Replace an object."""
+        self._serve(function=self._replace)
+
+    def _replace(self, target: Target, body: typing.Any) -> typing.Any:
+        """Replace an object or echo it if the server is not stateful."""
+        if not self.server.stateful:
+            return 200, _echo(target=target, body=body)
+        return 200, self.server.store.replace(target=target, body=body)
+
+    def do_PATCH(self):  # pylint: disable=invalid-name
+        """Patch an object."""
+        self._serve(function=self._patch)
+
+    def _patch(self, target: Target, body: typing.Any) -> typing.Any:
+        """Patch an object."""
+        return 200, self.server.store.patch(
+            target=target,
+            body=body,
+            content_type=self.headers.get("Content-Type", ""),
+        )
+
+    def do_DELETE(self):  # pylint: disable=invalid-name
+        """Delete an object."""
+        self._serve(function=self._delete)
+
+    def _delete(self, target: Target, _body: typing.Any) -> typing.Any:
+        """Delete an object, if the server is stateful."""
+        details = {"name": target.name, "kind": target.resource["name"]}
+        if self.server.stateful:
+            obj = self.server.store.delete(target=target)
+            details["uid"] = obj["metadata"]["uid"]
+        return 200, {
+            "apiVersion": "v1",
+            "kind": "Status",
+            "status": "Success",
+            "details": details,
+        }
+
+
+def _echo(*, target: Target, body: typing.Any) -> typing.Dict[str, typing.Any]:
+    """Echo the body with the namespace of the path."""
+    if target.namespace is not None:
+        body.setdefault("metadata", {})["namespace"] = target.namespace
+    return body
+
+
+class Faults(typing.NamedTuple):
+    """
+    Structure of the faults injected into every request that is not for discovery.
+
+    Attrs:
+        latency: The seconds every request is delayed by.
+        jitter: The maximum random seconds added to the latency.
+        error_rate: The fraction of requests that fail with a 500.
+        throttle_rate: The fraction of requests that fail with a 429.
+        retry_after: The seconds after which throttled requests may be retried.
+
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: int = 1
+
+
+class FakeApiServer(  # pylint: disable=too-many-instance-attributes
+    http.server.ThreadingHTTPServer
+):
+    """
+    Fake API server on a local port, served on a background thread.
+
+    The objects are kept in memory with resource versions like the API server does.
+    Every request that is not for discovery can be delayed and fail at random with a
+    429 asking the client to retry after a while or with a 500.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        *,
+        resources: typing.Optional[Resources] = None,
+        stateful: bool = True,
+        faults: Faults = Faults(),
+        watch_timeout: float = DEFAULT_WATCH_TIMEOUT,
+        seed: typing.Optional[int] = None,
+        port: int = 0,
+    ) -> None:
+        """
+        Construct.
+
+        Args:
+            resources: The resources served by api version, RESOURCES by default.
+            stateful: Whether objects are stored, otherwise creates and replaces
+                echo the body so that the responses are cached, which keeps the
+                slow encoder of the fake server out of the latency of the client.
+            faults: The faults injected into the requests, none by default.
+            watch_timeout: The seconds a watch without timeoutSeconds stays open.
+            seed: The seed of the random faults.
+            port: The port, a free one by default.
+
+        """
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.resources = RESOURCES if resources is None else resources
+        self.stateful = stateful
+        self.faults = faults
+        self.watch_timeout = watch_timeout
+        self.store = Store()
+        self.sizes: typing.List[int] = []
+        self.statuses: typing.Counter[int] = collections.Counter()
+        self._random = random.Random(seed)
+        self._encoded: typing.Dict[
+            typing.Tuple[bool, str], typing.Tuple[str, bytes]
+        ] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def host(self) -> str:
+        """The URL of the server."""
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def inject_fault(self) -> None:
+        """
+        Delay the request and fail it at random.
+
+        Raise StatusError if the request is throttled or fails.
+
+        """
+        faults = self.faults
+        with self._lock:
+            delay = faults.latency + self._random.uniform(0, faults.jitter)
+            draw = self._random.random()
+        if delay > 0:
+            time.sleep(delay)
+        if draw < faults.throttle_rate:
+            raise StatusError(429, "TooManyRequests", "too many requests")
+        if draw < faults.throttle_rate + faults.error_rate:
+            raise StatusError(500, "InternalError", "injected failure")
+
+    def encode(
+        self, *, obj: typing.Dict[str, typing.Any], accept: str
+    ) -> typing.Tuple[str, bytes]:
+        """
+        Encode an object in the encoding the client accepts.
+
+        The last encodings are cached so that the slow encoder of the fake server does
+        not count towards the latency of either encoding.
+
+        Args:
+            obj: The object to send.
+            accept: The Accept header of the request.
+
+        Returns:
+            The content type and the encoded object.
+
+        """
+        use_protobuf = protobuf.CONTENT_TYPE in accept and protobuf.is_enabled(
+            api_version=obj.get("apiVersion", "v1")
+        )
+        key = (use_protobuf, json.dumps(obj, sort_keys=True))
+        with self._lock:
+            cached = self._encoded.get(key)
+        if cached is not None:
+            return cached
+        if use_protobuf:
+            encoded = (protobuf.CONTENT_TYPE, encode_object(obj=obj))
+        else:
+            encoded = ("application/json", json.dumps(obj).encode())
+        with self._lock:
+            self._encoded[key] = encoded
+            if len(self._encoded) > CACHE_SIZE:
+                self._encoded.pop(next(iter(self._encoded)))
+        return encoded
+
+    def record(self, *, size: int, status: int = 200) -> None:
+        """Record the size and status of a response."""
+        with self._lock:
+            self.sizes.append(size)
+            self.statuses[status] += 1
+
+    def __enter__(self) -> "FakeApiServer":
+        """Start serving."""
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        """Stop serving."""
+        self.shutdown()
+        self.server_close()
+
+
+def main() -> None:
+    """Serve every resource of an OpenAPI document until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--spec", help="the OpenAPI document, RESOURCES without it")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = FakeApiServer(
+        resources=None if args.spec is None else load_resources(path=args.spec),
+        faults=Faults(
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            throttle_rate=args.throttle_rate,
+        ),
+        seed=args.seed,
+        port=args.port,
+    )
+    print(json.dumps({"host": server.host, "api_versions": sorted(server.resources)}))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Invoke the handler like Lambda does, against local fake endpoints."""
+
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import typing
+import urllib.error
+import urllib.request
+
+# The LogicalResourceId of every event
+LOGICAL_RESOURCE_ID = "Resource"
+# The ServiceToken CloudFormation adds to the ResourceProperties of every event
+SERVICE_TOKEN = "arn:aws:lambda:us-east-1:123456789012:function:bench"
+
+
+def build_event(
+    *,
+    request_type: str,
+    properties: typing.Dict[str, typing.Any],
+    response_url: str,
+    request_id: str,
+    physical_resource_id: typing.Optional[str] = None,
+) -> typing.Dict[str, typing.Any]:
+    """
+    Build the event CloudFormation sends for a custom resource.
+
+    Args:
+        request_type: Create, Update or Delete.
+        properties: The ResourceProperties, without the ServiceToken.
+        response_url: The ResponseURL.
+        request_id: The RequestId.
+        physical_resource_id: The PhysicalResourceId of updates and deletes.
+
+    Returns:
+        The event.
+
+    """
+    event = {
+        "RequestType": request_type,
+        "ResourceProperties": {"ServiceToken": SERVICE_TOKEN, **properties},
+        "ResponseURL": response_url,
+        "StackId": "arn:aws:cloudformation:us-east-1:123456789012:stack/bench/1",
+        "RequestId": request_id,
+        "LogicalResourceId": LOGICAL_RESOURCE_ID,
+    }
+    if physical_resource_id is not None:
+        event["PhysicalResourceId"] = physical_resource_id
+    return event
+
+
+def build_kubeconfig(*, host: str) -> typing.Dict[str, typing.Any]:
+    """
+    Build the kubeconfig of an API server.
+
+    Args:
+        host: The URL of the API server.
+
+    Returns:
+        The kubeconfig with a token.
+
+    """
+    return {
+        "apiVersion": "v1",
+        "kind": "Config",
+        "clusters": [{"name": "fake", "cluster": {"server": host}}],
+        "users": [{"name": "fake", "user": {"token": "token"}}],
+        "contexts": [{"name": "fake", "context": {"cluster": "fake", "user": "fake"}}],
+        "current-context": "fake",
+    }
+
+
+@contextlib.contextmanager
+def configure(*, host: str) -> typing.Iterator[None]:
+    """
+    Point the handler at an API server and silence what it logs.
+
+    The phase metrics and latency histograms are disabled so that only the handler
+    itself is measured. The environment and standard output are restored on exit.
+
+    Args:
+        host: The URL of the API server.
+
+    """
+    with tempfile.TemporaryDirectory() as directory, open(
+        os.devnull, "w", encoding="utf-8"
+    ) as devnull:
+        kubeconfig = os.path.join(directory, "kubeconfig")
+        with open(kubeconfig, "w", encoding="utf-8") as out_file:
+            json.dump(build_kubeconfig(host=host), out_file)
+        environ = {
+            "KUBECONFIG": kubeconfig,
+            "PHASE_METRICS": "false",
+            "LATENCY_HISTOGRAMS": "false",
+        }
+        previous = {key: os.environ.get(key) for key in environ}
+        os.environ.update(environ)
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            yield
+        finally:
+            sys.stdout = stdout
+            for key, value in previous.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+
+def fetch_response(*, url: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+    """
+    Fetch the response the handler sent from the response server.
+
+    Args:
+        url: The ResponseURL of the event.
+
+    Returns:
+        The body of the response or None if none was sent.
+
+    """
+    try:
+        with urllib.request.urlopen(url) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as exc:
+        if exc.code == 404:
+            return None
+        raise
@@ -0,0 +1,135 @@
+"""
+Report the peak memory of serializing large ConfigMaps for each serialization path.
+
+Run with python -m benchmarks.large_objects from the old_lambda directory.
+"""
+
+import json
+import os
+import tracemalloc
+import typing
+
+from kubernetes import client
+
+from lambda_function import helpers
+from lambda_function import rest
+
+from . import fake_api_server
+
+# The sizes of the data of the ConfigMaps in megabytes
+SIZES = (1, 4, 16)
+
+
+def build_config_map(*, size: int) -> typing.Dict[str, typing.Any]:
+    """
+    Build a ConfigMap whose data has the size.
+
+    Args:
+        size: The size of the data in megabytes.
+
+    Returns:
+        The ConfigMap.
+
+    """
+    value = "0123456789abcdef" * 4096
+    return {
+        "apiVersion": "v1",
+        "kind": "ConfigMap",
+        "metadata": {"name": "config-map-1"},
+        "data": {f"key-{idx}": value for idx in range(size * 16)},
+    }
+
+
+def _client(*, body: typing.Dict[str, typing.Any]) -> typing.Any:
+    """Serialize like the generated client does."""
+    sanitized = client.ApiClient().sanitize_for_serialization(body)
+    return json.dumps(sanitized).encode("utf-8")
+
+
+def _one_shot(*, body: typing.Dict[str, typing.Any]) -> typing.Any:
+    """Serialize the whole body in one go."""
+    os.environ["LARGE_OBJECT_THRESHOLD"] = str(1 << 62)
+    os.environ["KUBERNETES_REQUEST_GZIP"] = "false"
+    return rest.serialize(body=body)
+
+
+def _buffered(*, body: typing.Dict[str, typing.Any]) -> typing.Any:
+    """Serialize the body in chunks into a buffer."""
+    os.environ["LARGE_OBJECT_THRESHOLD"] = "0"
+    os.environ["KUBERNETES_REQUEST_GZIP"] = "false"
+    return rest.serialize(body=body)
+
+
+def _gzip(*, body: typing.Dict[str, typing.Any]) -> typing.Any:
+    """Serialize and compress the body in chunks into a buffer."""
+    os.environ["KUBERNETES_REQUEST_GZIP"] = "true"
+    return rest.serialize(body=body)
+
+
+def measure(
+    *,
+    function: typing.Callable[..., typing.Any],
+    body: typing.Dict[str, typing.Any],
+) -> float:
+    """
+    Measure the peak memory of serializing a body, excluding the body itself.
+
+    Args:
+        function: The serialization path.
+        body: The body to serialize.
+
+    Returns:
+        The peak megabytes.
+
+    """
+    tracemalloc.start()
+    function(body=body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (1 << 20)
+
+
+def send(*, body: typing.Dict[str, typing.Any]) -> None:
+    """Create the body on a fake API server with the buffered and gzip paths."""
+    with fake_api_server.FakeApiServer(stateful=False) as server:
+        configuration = client.Configuration()
+        configuration.host = server.host
+        backend = rest.Backend(api_client=client.ApiClient(configuration=configuration))
+        function, _ = backend.get_function(
+            api_version="v1", kind="ConfigMap", operation="create"
+        )
+        os.environ["LARGE_OBJECT_THRESHOLD"] = "0"
+        for compress in ("false", "true"):
+            os.environ["KUBERNETES_REQUEST_GZIP"] = compress
+            metadata = helpers.read_metadata(
+                response=function(body=body, namespace="default")
+            )
+            assert metadata == helpers.MetadataReturn("config-map-1", "default")
+
+
+def main() -> None:
+    """Print the peak memory of each path for each size."""
+    paths = (
+        ("client", _client),
+        ("one_shot", _one_shot),
+        ("buffered", _buffered),
+        ("gzip", _gzip),
+    )
+    for size in SIZES:
+        body = build_config_map(size=size)
+        print(
+            json.dumps(
+                {
+                    "data_mb": size,
+                    **{
+                        f"{name}_peak_mb": measure(function=function, body=body)
+                        for name, function in paths
+                    },
+                }
+            )
+        )
+    send(body=build_config_map(size=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+Generate manifests of every kind for the benchmarks and load generators.
+
+The kinds are the groups, versions and kinds of the fixtures derived from the
+OpenAPI document, and whether they are namespaced comes from the same document. The
+number of labels, annotations and containers and the size of the data of every
+manifest can be tuned, and the namespaced ones are spread over a number of
+namespaces.
+
+Run with python -m benchmarks.manifests from the old_lambda directory to write the
+manifests as files into a directory or print them, or the Create events for them,
+as lines.
+"""
+
+import argparse
+import base64
+import itertools
+import json
+import os
+import typing
+
+from tests.lambda_function import fixtures
+
+from . import fake_api_server
+from . import invoke
+
+# The OpenAPI document the fixtures are derived from
+OPENAPI_PATH = os.path.join("tests", "lambda_function", "kubernetes_openapi.json")
+# The value of every kilobyte of data
+_KILOBYTE = "0123456789abcdef" * 64
+# The kinds whose pods are described by a template in their spec
+_WORKLOAD_KINDS = ("DaemonSet", "Deployment", "ReplicaSet", "StatefulSet")
+
+
+class Kind(typing.NamedTuple):
+    """
+    Structure of a kind manifests are generated for.
+
+    Attrs:
+        api_version: The api version, like apps/v1.
+        kind: The kind, like Deployment.
+        namespaced: Whether its objects are in a namespace.
+
+    """
+
+    api_version: str
+    kind: str
+    namespaced: bool
+
+
+class Sizes(typing.NamedTuple):
+    """
+    Structure of the size of the generated manifests.
+
+    Attrs:
+        labels: The number of labels besides the app label.
+        annotations: The number of annotations.
+        containers: The number of containers of the kinds that run pods.
+        data: The kilobytes of data of ConfigMaps and Secrets.
+
+    """
+
+    labels: int = 2
+    annotations: int = 2
+    containers: int = 1
+    data: int = 1
+
+
+def load_resources() -> fake_api_server.Resources:
+    """
+    Load the resources of the OpenAPI document the fixtures are derived from.
+
+    Returns:
+        The resources by api version, to serve from the fake API server.
+
+    """
+    return fake_api_server.load_resources(path=OPENAPI_PATH)
+
+
+def calculate_kinds(*, resources: fake_api_server.Resources) -> typing.List[Kind]:
+    """
+    Calculate the kinds of the fixtures.
+
+    Args:
+        resources: The resources by api version, which tell the namespaced kinds.
+
+    Returns:
+        The kinds in the order of the fixtures.
+
+    """
+    kinds = []
+    for group_version_kind in fixtures.GROUP_VERSION_KINDS:
+        api_version = "/".join(
+            filter(None, (group_version_kind["group"], group_version_kind["version"]))
+        )
+        namespaced = next(
+            (
+                resource["namespaced"]
+                for resource in resources.get(api_version, [])
+                if resource["kind"] == group_version_kind["kind"]
+            ),
+            True,
+        )
+        kinds.append(Kind(api_version, group_version_kind["kind"], namespaced))
+    return kinds
+
+
+def _build_pod_spec(
+    *, sizes: Sizes, restart_policy: str
+) -> typing.Dict[str, typing.Any]:
+    """Build the spec of a pod with the containers of the sizes."""
+    return {
+        "restartPolicy": restart_policy,
+        "containers": [
+            {
+                "name": f"container-{idx}",
+                "image": "nginx:latest",
+                "ports": [{"containerPort": 8000 + idx}],
+                "resources": {"requests": {"cpu": "10m", "memory": "16Mi"}},
+            }
+            for idx in range(sizes.containers)
+        ],
+    }
+
+
+def _build_template(
+    *, labels: typing.Dict[str, str], sizes: Sizes, restart_policy: str = "Always"
+) -> typing.Dict[str, typing.Any]:
+    """Build a pod template."""
+    return {
+        "metadata": {"labels": labels},
+        "spec": _build_pod_spec(sizes=sizes, restart_policy=restart_policy),
+    }
+
+
+def _build_fields(  # pylint: disable=too-many-return-statements
+    *, kind: Kind, name: str, labels: typing.Dict[str, str], sizes: Sizes
+) -> typing.Dict[str, typing.Any]:
+    """Build the fields besides the metadata that the kind requires."""
+    selector = {"app": labels["app"]}
+    if kind.kind in _WORKLOAD_KINDS:
+        spec: typing.Dict[str, typing.Any] = {
+            "selector": {"matchLabels": selector},
+            "template": _build_template(labels=labels, sizes=sizes),
+        }
+        if kind.kind == "StatefulSet":
+            spec["serviceName"] = name
+        return {"spec": spec}
+    if kind.kind == "Job":
+        return {
+            "spec": {
+                "template": _build_template(
+                    labels=labels, sizes=sizes, restart_policy="Never"
+                )
+            }
+        }
+    if kind.kind == "CronJob":
+        job_template = _build_template(
+            labels=labels, sizes=sizes, restart_policy="Never"
+        )
+        return {
+            "spec": {
+                "schedule": "*/5 * * * *",
+                "jobTemplate": {"spec": {"template": job_template}},
+            }
+        }
+    if kind.kind == "ReplicationController":
+        return {
+            "spec": {
+                "selector": selector,
+                "template": _build_template(labels=labels, sizes=sizes),
+            }
+        }
+    if kind.kind == "PodTemplate":
+        return {"template": _build_template(labels=labels, sizes=sizes)}
+    if kind.kind == "Pod":
+        return {"spec": _build_pod_spec(sizes=sizes, restart_policy="Always")}
+    if kind.kind == "ConfigMap":
+        return {"data": {f"key-{idx}": _KILOBYTE for idx in range(sizes.data)}}
+    if kind.kind == "Secret":
+        value = base64.b64encode(_KILOBYTE.encode("ascii")).decode("ascii")
+        return {
+            "type": "Opaque",
+            "data": {f"key-{idx}": value for idx in range(sizes.data)},
+        }
+    if kind.kind == "Service":
+        return {
+            "spec": {
+                "selector": selector,
+                "ports": [{"name": "http", "port": 80, "targetPort": 8000}],
+            }
+        }
+    if kind.kind == "NetworkPolicy":
+        return {
+            "spec": {
+                "podSelector": {"matchLabels": selector},
+                "policyTypes": ["Ingress"],
+            }
+        }
+    if kind.kind in ("ClusterRole", "Role"):
+        return {
+            "rules": [
+                {"apiGroups": [""], "resources": ["configmaps"], "verbs": ["get"]}
+            ]
+        }
+    return {}
+
+
+def build_manifest(
+    *, kind: Kind, name: str, namespace: str, sizes: Sizes
+) -> typing.Dict[str, typing.Any]:
+    """
+    Build the manifest of an object.
+
+    The kinds that run pods, carry data, select pods or hold rules get the fields the
+    API server requires of them and every other kind only gets metadata.
+
+    Args:
+        kind: The kind.
+        name: The name of the object.
+        namespace: The namespace, left out for kinds that are not namespaced.
+        sizes: The size of the manifest.
+
+    Returns:
+        The manifest.
+
+    """
+    labels = {"app": name, **{f"label-{idx}": "value" for idx in range(sizes.labels)}}
+    metadata: typing.Dict[str, typing.Any] = {"name": name, "labels": labels}
+    if kind.namespaced:
+        metadata["namespace"] = namespace
+    if sizes.annotations:
+        metadata["annotations"] = {
+            f"example.com/annotation-{idx}": "value" for idx in range(sizes.annotations)
+        }
+    return {
+        "apiVersion": kind.api_version,
+        "kind": kind.kind,
+        "metadata": metadata,
+        **_build_fields(kind=kind, name=name, labels=labels, sizes=sizes),
+    }
+
+
+def generate(
+    *,
+    kinds: typing.Sequence[Kind],
+    count: int,
+    namespaces: int,
+    sizes: Sizes,
+    prefix: str = "object",
+) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    """
+    Generate manifests, taking the kinds and namespaces in turn.
+
+    Args:
+        kinds: The kinds.
+        count: The number of manifests.
+        namespaces: The number of namespaces the namespaced objects are spread over.
+        sizes: The size of every manifest.
+        prefix: The start of the name of every object.
+
+    Returns:
+        The manifests, one at a time.
+
+    """
+    for idx, kind in zip(range(count), itertools.cycle(kinds)):
+        yield build_manifest(
+            kind=kind,
+            name=f"{prefix}-{idx}",
+            namespace=f"namespace-{idx % namespaces}",
+            sizes=sizes,
+        )
+
+
+def write_files(
+    *, manifests: typing.Iterable[typing.Dict[str, typing.Any]], directory: str
+) -> typing.List[str]:
+    """
+    Write every manifest into a file of its own.
+
+    Args:
+        manifests: The manifests.
+        directory: The directory, created if it does not exist.
+
+    Returns:
+        The paths of the files in the order of the manifests.
+
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for idx, manifest in enumerate(manifests):
+        name = f"{idx:05d}-{manifest['kind'].lower()}-{manifest['metadata']['name']}"
+        path = os.path.join(directory, f"{name}.json")
+        with open(path, "w", encoding="utf-8") as out_file:
+            json.dump(manifest, out_file, indent=2)
+            out_file.write("\n")
+        paths.append(path)
+    return paths
+
+
+def build_events(
+    *, manifests: typing.Iterable[typing.Dict[str, typing.Any]], response_base: str
+) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    """
+    Build the Create events of the manifests.
+
+    Args:
+        manifests: The manifests.
+        response_base: The URL the ResponseURL of every event starts with.
+
+    Returns:
+        The events, one at a time.
+
+    """
+    for idx, manifest in enumerate(manifests):
+        yield invoke.build_event(
+            request_type="Create",
+            properties=manifest,
+            response_url=f"{response_base}/{idx}",
+            request_id=f"request-{idx}",
+        )
+
+
+def main() -> None:
+    """Write the manifests into a directory or print them or their events as lines."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, help="one of every kind by default")
+    parser.add_argument("--kind", action="append", help="only generate this kind")
+    parser.add_argument("--namespaces", type=int, default=1)
+    parser.add_argument("--labels", type=int, default=Sizes().labels)
+    parser.add_argument("--annotations", type=int, default=Sizes().annotations)
+    parser.add_argument("--containers", type=int, default=Sizes().containers)
+    parser.add_argument("--data", type=int, default=Sizes().data, help="kilobytes")
+    parser.add_argument("--directory", help="write files instead of printing")
+    parser.add_argument("--events", action="store_true", help="print Create events")
+    parser.add_argument("--response-base", default="http://127.0.0.1:8080")
+    args = parser.parse_args()
+
+    kinds = [
+        kind
+        for kind in calculate_kinds(resources=load_resources())
+        if args.kind is None or kind.kind in args.kind
+    ]
+    manifests = generate(
+        kinds=kinds,
+        count=len(kinds) if args.count is None else args.count,
+        namespaces=args.namespaces,
+        sizes=Sizes(args.labels, args.annotations, args.containers, args.data),
+    )
+    if args.directory is not None:
+        for path in write_files(manifests=manifests, directory=args.directory):
+            print(path)
+        return
+    if args.events:
+        manifests = build_events(manifests=manifests, response_base=args.response_base)
+    for manifest in manifests:
+        print(json.dumps(manifest))
+
+
+if __name__ == "__main__":
+    main()
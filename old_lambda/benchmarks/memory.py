@@ -0,0 +1,365 @@
+"""
+Measure the memory of the handler for each workload and recommend a MemorySize.
+
+Every workload runs in a fresh process so that its peak RSS is its own. The handler
+creates, updates and deletes the manifest of the workload repeatedly against the
+fake API server, like a warm container does, while tracemalloc records where the
+memory held at the peak was allocated. Lambda allocates CPU in proportion to the
+MemorySize, so the milliseconds per invocation show what a larger setting buys.
+
+Run with python -m benchmarks.memory from the old_lambda directory.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import math
+import multiprocessing
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import typing
+
+from lambda_function import index
+
+from . import fake_api_server
+from . import invoke
+from . import manifests
+from . import response_server
+
+# The MemorySize of the function in cloudformation/lambda_function/resources.py
+CURRENT_MEMORY_SIZE = 128
+# The limits and the granularity of the recommended MemorySize in megabytes
+MINIMUM_MEMORY_SIZE = 128
+MAXIMUM_MEMORY_SIZE = 10240
+MEMORY_SIZE_STEP = 64
+# The factor of the peak RSS to allow for, Lambda stops the invocation at the limit
+DEFAULT_HEADROOM = 1.5
+# The create, update and delete cycles of each workload
+DEFAULT_CYCLES = 10
+# The number of allocation sites reported for each workload
+DEFAULT_TOP = 10
+# The frames of the stack recorded for every allocation
+FRAMES = 8
+# The seconds between checks of the traced memory for a new peak
+SAMPLE_INTERVAL = 0.001
+
+
+class Workload(typing.NamedTuple):
+    """
+    Structure of a workload profile.
+
+    Attrs:
+        name: The name of the profile.
+        properties: The ResourceProperties of the events of the profile.
+
+    """
+
+    name: str
+    properties: typing.Dict[str, typing.Any]
+
+
+def build_config_map(*, name: str, size: int) -> typing.Dict[str, typing.Any]:
+    """
+    Build a ConfigMap.
+
+    Args:
+        name: The name of the ConfigMap.
+        size: The size of its data in kilobytes.
+
+    Returns:
+        The ConfigMap.
+
+    """
+    value = "0123456789abcdef" * 64
+    return {
+        "apiVersion": "v1",
+        "kind": "ConfigMap",
+        "metadata": {"name": name, "namespace": "default"},
+        "data": {f"key-{idx}": value for idx in range(size)},
+    }
+
+
+def build_deployment(*, containers: int) -> typing.Dict[str, typing.Any]:
+    """
+    Build a Deployment.
+
+    Args:
+        containers: The number of containers of its pods.
+
+    Returns:
+        The Deployment.
+
+    """
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": {"name": "deployment-1", "namespace": "default"},
+        "spec": {
+            "replicas": 1,
+            "selector": {"matchLabels": {"app": "web"}},
+            "template": {
+                "metadata": {"labels": {"app": "web"}},
+                "spec": {
+                    "containers": [
+                        {
+                            "name": f"container-{idx}",
+                            "image": "nginx:latest",
+                            "ports": [{"containerPort": 8000 + idx}],
+                            "env": [
+                                {"name": f"VARIABLE_{env}", "value": "value"}
+                                for env in range(10)
+                            ],
+                        }
+                        for idx in range(containers)
+                    ]
+                },
+            },
+        },
+    }
+
+
+def build_workloads(*, kinds: typing.List[manifests.Kind]) -> typing.List[Workload]:
+    """
+    Build the workload profiles in increasing size.
+
+    Args:
+        kinds: The kinds of the bundle with an object of every kind.
+
+    Returns:
+        The profiles, from a Namespace to large ConfigMaps and bundles.
+
+    """
+    bundle = [build_config_map(name=f"config-map-{idx}", size=4) for idx in range(50)]
+    every_kind = manifests.generate(
+        kinds=kinds, count=len(kinds), namespaces=1, sizes=manifests.Sizes()
+    )
+    return [
+        Workload(
+            "namespace",
+            {"apiVersion": "v1", "kind": "Namespace", "metadata": {"name": "ns-1"}},
+        ),
+        Workload("config_map_1kb", build_config_map(name="config-map-1", size=1)),
+        Workload("deployment_1", build_deployment(containers=1)),
+        Workload("deployment_50", build_deployment(containers=50)),
+        Workload("config_map_256kb", build_config_map(name="config-map-1", size=256)),
+        Workload("config_map_1mb", build_config_map(name="config-map-1", size=1024)),
+        Workload(
+            "bundle_50",
+            {
+                index.YAML_MANIFEST_PROPERTY: json.dumps(
+                    {"apiVersion": "v1", "kind": "List", "items": bundle}
+                )
+            },
+        ),
+        Workload(
+            "every_kind",
+            {
+                index.YAML_MANIFEST_PROPERTY: json.dumps(
+                    {"apiVersion": "v1", "kind": "List", "items": list(every_kind)}
+                )
+            },
+        ),
+    ]
+
+
+def get_peak_rss() -> float:
+    """
+    Get the peak RSS of the process.
+
+    Returns:
+        The peak in megabytes.
+
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS bytes
+    return peak / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+
+
+class _PeakSampler(threading.Thread):
+    """Snapshots the traced memory every time it reaches a new peak."""
+
+    def __init__(self, *, interval: float) -> None:
+        """
+        Construct.
+
+        Args:
+            interval: The seconds between checks of the traced memory.
+
+        """
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.size = 0
+        self.snapshot: typing.Optional[tracemalloc.Snapshot] = None
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        """Check the traced memory until stopped."""
+        while not self._stopped.wait(self.interval):
+            current, _ = tracemalloc.get_traced_memory()
+            if current > self.size:
+                self.snapshot = tracemalloc.take_snapshot()
+                self.size = current
+
+    def stop(self) -> None:
+        """Stop checking."""
+        self._stopped.set()
+        self.join()
+
+
+def _cycle(*, workload: Workload, response_base: str, prefix: str) -> None:
+    """Create, update and delete the manifest of a workload."""
+    physical_resource_id = None
+    for request_type in ("Create", "Update", "Delete"):
+        response_url = f"{response_base}/{workload.name}/{prefix}-{request_type}"
+        index.lambda_handler(
+            invoke.build_event(
+                request_type=request_type,
+                properties=workload.properties,
+                response_url=response_url,
+                request_id=f"{prefix}-{request_type}",
+                physical_resource_id=physical_resource_id,
+            ),
+            None,
+        )
+        recorded = invoke.fetch_response(url=response_url) or {}
+        physical_resource_id = recorded.get("PhysicalResourceId")
+
+
+def run_workload(
+    *, workload: Workload, host: str, response_base: str, cycles: int, top: int
+) -> typing.Dict[str, typing.Any]:
+    """
+    Run the handler over a workload and measure its memory.
+
+    The first cycle runs untraced and counts as the cold start, the timed cycles as
+    warm invocations and the traced cycles find where the memory is allocated.
+
+    Args:
+        workload: The workload.
+        host: The URL of the fake API server.
+        response_base: The URL of the response server.
+        cycles: The number of timed and of traced cycles.
+        top: The number of allocation sites to report.
+
+    Returns:
+        The peak RSS before the invocations, after the untraced ones and after the
+        traced ones, which includes the overhead of tracemalloc, the peak traced
+        memory, the milliseconds per invocation and the sites that held the most
+        memory at the sampled traced peak.
+
+    """
+    with invoke.configure(host=host):
+        baseline_rss = get_peak_rss()
+        _cycle(workload=workload, response_base=response_base, prefix="cold")
+        start = time.perf_counter()
+        for idx in range(cycles):
+            _cycle(workload=workload, response_base=response_base, prefix=f"warm{idx}")
+        seconds = time.perf_counter() - start
+        # Before tracing, which keeps a traceback for every allocation
+        peak_rss = get_peak_rss()
+        tracemalloc.start(FRAMES)
+        sampler = _PeakSampler(interval=SAMPLE_INTERVAL)
+        sampler.start()
+        for idx in range(cycles):
+            _cycle(workload=workload, response_base=response_base, prefix=f"trace{idx}")
+        sampler.stop()
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    statistics = []
+    if sampler.snapshot is not None:
+        statistics = sampler.snapshot.filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        ).statistics("lineno")
+    return {
+        "workload": workload.name,
+        "baseline_rss_mb": baseline_rss,
+        "peak_rss_mb": peak_rss,
+        "traced_peak_rss_mb": get_peak_rss(),
+        "traced_peak_mb": traced_peak / (1 << 20),
+        "ms_per_invocation": seconds * 1000 / (cycles * 3),
+        "hotspots": [
+            {
+                "location": str(statistic.traceback[0]),
+                "size_kb": statistic.size / 1024,
+                "count": statistic.count,
+            }
+            for statistic in statistics[:top]
+        ],
+    }
+
+
+def calculate_memory_size(*, peak_rss: float, headroom: float) -> int:
+    """
+    Calculate the MemorySize to configure for a peak RSS.
+
+    Args:
+        peak_rss: The peak RSS in megabytes.
+        headroom: The factor of the peak to allow for.
+
+    Returns:
+        The smallest multiple of the step that fits the peak with the headroom,
+        within the limits of Lambda.
+
+    """
+    size = math.ceil(peak_rss * headroom / MEMORY_SIZE_STEP) * MEMORY_SIZE_STEP
+    return max(MINIMUM_MEMORY_SIZE, min(MAXIMUM_MEMORY_SIZE, size))
+
+
+def main() -> None:
+    """Print the measurements and recommendation of each workload as a line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workload", action="append", help="only run this profile")
+    parser.add_argument("--cycles", type=int, default=DEFAULT_CYCLES)
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP)
+    parser.add_argument("--headroom", type=float, default=DEFAULT_HEADROOM)
+    args = parser.parse_args()
+
+    resources = manifests.load_resources()
+    workloads = [
+        workload
+        for workload in build_workloads(
+            kinds=manifests.calculate_kinds(resources=resources)
+        )
+        if args.workload is None or workload.name in args.workload
+    ]
+    recommendations = {}
+    # The servers run in this process so that only the handler counts towards the RSS
+    with fake_api_server.FakeApiServer(resources=resources) as server:
+        with response_server.ResponseServer() as responses:
+            for workload in workloads:
+                # A fresh process per workload as the peak RSS never goes down
+                with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context("spawn")
+                ) as executor:
+                    result = executor.submit(
+                        run_workload,
+                        workload=workload,
+                        host=server.host,
+                        response_base=responses.calculate_url(path=""),
+                        cycles=args.cycles,
+                        top=args.top,
+                    ).result()
+                result["statuses"] = responses.count_statuses(
+                    prefix=f"/{workload.name}/"
+                )
+                result["recommended_memory_size"] = calculate_memory_size(
+                    peak_rss=result["peak_rss_mb"], headroom=args.headroom
+                )
+                recommendations[workload.name] = result["recommended_memory_size"]
+                print(json.dumps(result))
+    print(
+        json.dumps(
+            {
+                "current_memory_size": CURRENT_MEMORY_SIZE,
+                "recommended_memory_size": max(recommendations.values(), default=0),
+                "recommendations": recommendations,
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
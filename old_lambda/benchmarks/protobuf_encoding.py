@@ -0,0 +1,74 @@
+"""
+Compare the JSON and protobuf encoding of responses against a local fake API server.
+
+Run with python -m benchmarks.protobuf_encoding from the old_lambda directory.
+"""
+
+import json
+import os
+import statistics
+import time
+
+from kubernetes import client
+
+from lambda_function import helpers
+from lambda_function import rest
+
+from . import decode_response
+from . import fake_api_server
+
+# The number of creates for each encoding
+NUMBER = 200
+
+
+def run(*, host: str, encoding: str) -> float:
+    """
+    Create a Deployment repeatedly and read its metadata.
+
+    Args:
+        host: The URL of the API server.
+        encoding: The value of the KUBERNETES_ENCODING environment variable.
+
+    Returns:
+        The median milliseconds per create.
+
+    """
+    os.environ["KUBERNETES_ENCODING"] = encoding
+    configuration = client.Configuration()
+    configuration.host = host
+    backend = rest.Backend(api_client=client.ApiClient(configuration=configuration))
+    function, _ = backend.get_function(
+        api_version="apps/v1", kind="Deployment", operation="create"
+    )
+    body = json.loads(decode_response.build_deployment(containers=20))
+
+    timings = []
+    for _ in range(NUMBER):
+        start = time.perf_counter()
+        metadata = helpers.read_metadata(
+            response=function(body=body, namespace="default")
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+        assert metadata == helpers.MetadataReturn("deployment-1", "default")
+    return statistics.median(timings)
+
+
+def main() -> None:
+    """Print the response size and latency of each encoding."""
+    for encoding in ("json", "protobuf"):
+        with fake_api_server.FakeApiServer(stateful=False) as server:
+            median_ms = run(host=server.host, encoding=encoding)
+            # The last response is a create, the first is the discovery
+            print(
+                json.dumps(
+                    {
+                        "encoding": encoding,
+                        "response_bytes": server.sizes[-1],
+                        "median_ms": median_ms,
+                    }
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Time resolving and answering events for every kind and compare with a baseline.
+
+Each benchmark runs over every group, version and kind of the fixtures derived from
+the OpenAPI document. The results are compared with the JSON baseline and the
+benchmarks that got slower by more than the threshold are reported as regressions,
+which makes the command exit with 1.
+
+Run with python -m benchmarks.resolution from the old_lambda directory, with --save
+to record the results as the new baseline.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import timeit
+import typing
+from unittest import mock
+
+from lambda_function import helpers
+from lambda_function import index
+from lambda_function import operations
+from tests.lambda_function import fixtures
+
+from . import invoke
+
+# The baseline the results are compared with and saved to by default
+DEFAULT_BASELINE = os.path.join(
+    os.path.dirname(__file__), "baselines", "resolution.json"
+)
+# The fraction by which a benchmark may get slower before it is a regression
+DEFAULT_THRESHOLD = 0.1
+# The number of timings of each benchmark, the fastest is compared
+REPEAT = 5
+_OPERATIONS = ("create", "update", "delete")
+
+
+class Kind(typing.NamedTuple):
+    """
+    Structure of a kind the benchmarks run over.
+
+    Attrs:
+        api_version: The api version, like apps/v1.
+        kind: The kind, like Deployment.
+        module_name: The name of the client module of the api version.
+
+    """
+
+    api_version: str
+    kind: str
+    module_name: str
+
+
+def calculate_kinds() -> typing.List[Kind]:
+    """
+    Calculate the kinds of the fixtures derived from the OpenAPI document.
+
+    Returns:
+        The kinds.
+
+    """
+    kinds = []
+    for group_version_kind in fixtures.GROUP_VERSION_KINDS:
+        if group_version_kind["group"]:
+            api_version = (
+                f"{group_version_kind['group']}/{group_version_kind['version']}"
+            )
+        else:
+            api_version = group_version_kind["version"]
+        kinds.append(
+            Kind(
+                api_version,
+                group_version_kind["kind"],
+                helpers.calculate_client(api_version=api_version),
+            )
+        )
+    return kinds
+
+
+def _build_event(*, kind: Kind) -> typing.Dict[str, typing.Any]:
+    """Build a create event for a kind."""
+    return invoke.build_event(
+        request_type="Create",
+        properties={
+            "apiVersion": kind.api_version,
+            "kind": kind.kind,
+            "metadata": {"name": "name-1", "namespace": "namespace-1"},
+        },
+        response_url="https://response.example.com/request-1",
+        request_id="request-1",
+    )
+
+
+class Benchmark(typing.NamedTuple):
+    """
+    Structure of a benchmark.
+
+    Attrs:
+        function: Calls the function being measured for every kind.
+        calls: The number of calls of the function being measured per call.
+
+    """
+
+    function: typing.Callable[[], typing.Any]
+    calls: int
+
+
+def build_benchmarks(*, kinds: typing.List[Kind]) -> typing.Dict[str, Benchmark]:
+    """
+    Build the benchmarks, each calls its function for every kind.
+
+    Args:
+        kinds: The kinds.
+
+    Returns:
+        The benchmarks by name.
+
+    """
+    bodies = [
+        {"apiVersion": kind.api_version, "kind": kind.kind, "metadata": metadata}
+        for kind in kinds
+        for metadata in ({"name": "name-1", "namespace": "namespace-1"}, {})
+    ]
+    events = [_build_event(kind=kind) for kind in kinds]
+    parameters = [index.parameters_from_event(event=event) for event in events]
+    result = operations.CreateReturn("SUCCESS", None, "namespace-1/name-1")
+
+    def calculate_client() -> None:
+        for kind in kinds:
+            helpers.calculate_client(api_version=kind.api_version)
+
+    def calculate_function_name() -> None:
+        for kind in kinds:
+            for operation in _OPERATIONS:
+                helpers.calculate_function_name(
+                    kind=kind.kind, operation=operation, module_name=kind.module_name
+                )
+
+    def get_function() -> None:
+        for kind in kinds:
+            for operation in _OPERATIONS:
+                helpers.get_function(
+                    api_version=kind.api_version, kind=kind.kind, operation=operation
+                )
+
+    def calculate_namespace() -> None:
+        for body in bodies:
+            helpers.calculate_namespace(body=body)
+
+    def parameters_from_event() -> None:
+        for event in events:
+            index.parameters_from_event(event=event)
+
+    def response_body() -> None:
+        # Everything the handler does for a create apart from the API call and PUT
+        with mock.patch.object(operations, "create", return_value=result):
+            for event_parameters in parameters:
+                body = {
+                    "StackId": event_parameters.stack_id,
+                    "RequestId": event_parameters.request_id,
+                    "LogicalResourceId": event_parameters.logical_resource_id,
+                }
+                index._handle_create(  # pylint: disable=protected-access
+                    parameters=event_parameters, response_body=body
+                )
+                json.dumps(body).encode("utf-8")
+
+    return {
+        "calculate_client": Benchmark(calculate_client, len(kinds)),
+        "calculate_function_name": Benchmark(
+            calculate_function_name, len(kinds) * len(_OPERATIONS)
+        ),
+        "get_function": Benchmark(get_function, len(kinds) * len(_OPERATIONS)),
+        "calculate_namespace": Benchmark(calculate_namespace, len(bodies)),
+        "parameters_from_event": Benchmark(parameters_from_event, len(events)),
+        "response_body": Benchmark(response_body, len(parameters)),
+    }
+
+
+def measure(*, benchmark: Benchmark) -> typing.Dict[str, float]:
+    """
+    Time a benchmark.
+
+    Args:
+        benchmark: The benchmark.
+
+    Returns:
+        The fastest and the median microseconds of a call of the function being
+        measured, which do not depend on the number of kinds.
+
+    """
+    timer = timeit.Timer(benchmark.function)
+    # Enough calls for each timing to take at least 0.2 seconds
+    number, _ = timer.autorange()
+    calls = number * benchmark.calls
+    timings = [seconds / calls * 1e6 for seconds in timer.repeat(REPEAT, number)]
+    return {"best_us": min(timings), "median_us": statistics.median(timings)}
+
+
+def compare(
+    *,
+    results: typing.Dict[str, typing.Dict[str, float]],
+    baseline: typing.Dict[str, typing.Dict[str, float]],
+    threshold: float,
+) -> typing.List[str]:
+    """
+    Find the benchmarks that got slower than the baseline.
+
+    Args:
+        results: The results by benchmark.
+        baseline: The results of the baseline by benchmark.
+        threshold: The fraction by which a benchmark may get slower.
+
+    Returns:
+        The names of the benchmarks whose fastest time exceeds that of the baseline by
+        more than the threshold.
+
+    """
+    return [
+        name
+        for name, result in results.items()
+        if name in baseline
+        and result["best_us"] > baseline[name]["best_us"] * (1 + threshold)
+    ]
+
+
+def main() -> None:
+    """Print the result of each benchmark as a line and exit with 1 on regressions."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--save", action="store_true", help="save as the baseline")
+    parser.add_argument("--benchmark", action="append", help="only run this one")
+    args = parser.parse_args()
+
+    kinds = calculate_kinds()
+    baseline: typing.Dict[str, typing.Dict[str, float]] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as in_file:
+            baseline = json.load(in_file)["benchmarks"]
+    results = {}
+    for name, benchmark in build_benchmarks(kinds=kinds).items():
+        if args.benchmark is not None and name not in args.benchmark:
+            continue
+        results[name] = measure(benchmark=benchmark)
+        previous = baseline.get(name)
+        change = None
+        if previous is not None:
+            change = results[name]["best_us"] / previous["best_us"] - 1
+        print(json.dumps({"benchmark": name, **results[name], "change": change}))
+    regressions = compare(results=results, baseline=baseline, threshold=args.threshold)
+    print(json.dumps({"kinds": len(kinds), "regressions": regressions}))
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as out_file:
+            json.dump(
+                {
+                    "python": sys.version.split()[0],
+                    "benchmarks": {**baseline, **results},
+                },
+                out_file,
+                indent=2,
+                sort_keys=True,
+            )
+            out_file.write("\n")
+    elif regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Local endpoint that records the responses the handler PUTs to the ResponseURL."""
+
+import http.server
+import json
+import threading
+import typing
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Records the body of every PUT."""
+
+    protocol_version = "HTTP/1.1"
+    server: "ResponseServer"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Stay quiet."""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Send the last response recorded for the path."""
+        body = self.server.find(path=self.path)
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200 if body is not None else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_PUT(self):  # pylint: disable=invalid-name
+        """Record the response."""
+        length = int(self.headers.get("Content-Length", 0))
+        self.server.record(path=self.path, body=json.loads(self.rfile.read(length)))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class ResponseServer(http.server.ThreadingHTTPServer):
+    """Response endpoint on a free local port, served on a background thread."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        """Construct."""
+        super().__init__(("127.0.0.1", 0), _Handler)
+        # The path and body of every response in the order they arrived
+        self.responses: typing.List[typing.Tuple[str, typing.Dict[str, typing.Any]]] = (
+            []
+        )
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def calculate_url(self, *, path: str) -> str:
+        """
+        Calculate the ResponseURL of an event.
+
+        Args:
+            path: The path identifying the event, like /request-1.
+
+        Returns:
+            The URL on the server.
+
+        """
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+    def record(self, *, path: str, body: typing.Dict[str, typing.Any]) -> None:
+        """Record a response."""
+        with self._lock:
+            self.responses.append((path, body))
+
+    def find(self, *, path: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """
+        Find the last response for a path.
+
+        Args:
+            path: The path of the ResponseURL.
+
+        Returns:
+            The body of the response or None if there is none.
+
+        """
+        with self._lock:
+            return next(
+                (body for other, body in reversed(self.responses) if other == path),
+                None,
+            )
+
+    def count_statuses(self, *, prefix: str = "") -> typing.Dict[str, int]:
+        """
+        Count the responses by status.
+
+        Args:
+            prefix: Only count the responses whose path starts with the prefix.
+
+        Returns:
+            The number of responses of each Status, like SUCCESS or FAILURE.
+
+        """
+        with self._lock:
+            statuses = [
+                body.get("Status", "")
+                for path, body in self.responses
+                if path.startswith(prefix)
+            ]
+        return {status: statuses.count(status) for status in sorted(set(statuses))}
+
+    def __enter__(self) -> "ResponseServer":
+        """Start serving."""
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: typing.Any) -> None:
+        """Stop serving."""
+        self.shutdown()
+        self.server_close()
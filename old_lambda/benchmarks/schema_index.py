@@ -0,0 +1,128 @@
+"""
+Compare loading the OpenAPI document with memory mapping the schema index.
+
+Run with python -m benchmarks.schema_index from the old_lambda directory.
+"""
+
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import typing
+
+from kubernetes import client
+
+from lambda_function import schema_index
+from lambda_function import schemas
+
+# The length of the description of every property, the real document is mostly them
+DESCRIPTION_SIZE = 300
+
+
+def _calculate_schema(*, type_name: str) -> typing.Dict[str, typing.Any]:
+    """Calculate the property schema of a type of the client models."""
+    primitives = {
+        "str": {"type": "string"},
+        "int": {"type": "integer"},
+        "float": {"type": "number"},
+        "bool": {"type": "boolean"},
+        "datetime": {"type": "string", "format": "date-time"},
+    }
+    if type_name in primitives:
+        return dict(primitives[type_name])
+    container, name = schemas.split_type(type_name=type_name)
+    if container == "list":
+        return {"type": "array", "items": _calculate_schema(type_name=name)}
+    if container == "dict":
+        return {
+            "type": "object",
+            "additionalProperties": _calculate_schema(type_name=name),
+        }
+    if schemas.get_model(type_name=type_name) is not None:
+        return {"$ref": f"#/definitions/{type_name}"}
+    return {}
+
+
+def build_spec() -> typing.Dict[str, typing.Any]:
+    """
+    Build an OpenAPI document of the size of the real one from the client models.
+
+    Returns:
+        The document with a definition per model and a kind per V1 model.
+
+    """
+    definitions: typing.Dict[str, typing.Any] = {}
+    for name in dir(client):
+        model = schemas.get_model(type_name=name)
+        if model is None:
+            continue
+        properties = {}
+        for attribute, type_name in model.openapi_types.items():
+            schema = _calculate_schema(type_name=type_name)
+            schema["description"] = "d" * DESCRIPTION_SIZE
+            properties[model.attribute_map[attribute]] = schema
+        definitions[name] = {"properties": properties}
+        if name.startswith("V1") and "kind" in properties:
+            definitions[name]["x-kubernetes-group-version-kind"] = [
+                {"group": "", "version": "v1", "kind": name[len("V1") :]}
+            ]
+    return {"definitions": definitions}
+
+
+def measure(*, function: typing.Callable[[], typing.Any]) -> typing.Dict[str, float]:
+    """
+    Measure the time and peak memory of one cold call of a function.
+
+    Args:
+        function: The function to measure.
+
+    Returns:
+        The milliseconds and the peak kilobytes of the call.
+
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": seconds * 1000, "peak_kb": peak / 1024}
+
+
+def main() -> None:
+    """Print the cost of finding the fields of Pod with each approach."""
+    spec = build_spec()
+    with tempfile.TemporaryDirectory() as directory:
+        spec_path = os.path.join(directory, "openapi.json")
+        with open(spec_path, "w", encoding="utf-8") as out_file:
+            json.dump(spec, out_file)
+        index_path = os.path.join(directory, "schema.idx")
+        with open(index_path, "wb") as index_file:
+            index_file.write(schema_index.build(spec=spec))
+
+        def load_document() -> typing.Any:
+            with open(spec_path, "rb") as in_file:
+                return json.load(in_file)["definitions"]["V1Pod"]["properties"]
+
+        def map_index() -> typing.Any:
+            index = schema_index.SchemaIndex(path=index_path)
+            definition = index.find_kind(api_version="v1", kind="Pod")
+            fields = index.get_fields(definition=typing.cast(int, definition))
+            index.close()
+            return fields
+
+        print(
+            json.dumps(
+                {
+                    "document_kb": os.path.getsize(spec_path) / 1024,
+                    "index_kb": os.path.getsize(index_path) / 1024,
+                    "json": measure(function=load_document),
+                    "index": measure(function=map_index),
+                }
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Measure the throughput of the handler under a steady stream of events.
+
+Every worker process stands in for a warm Lambda container that handles one event at
+a time. It creates, updates and deletes its own resources through lambda_handler
+against the fake API server, at its share of the rate, and the responses are PUT to
+a local endpoint that records them. The resources are generated manifests of the
+chosen kinds, ConfigMaps by default. The events per second, the latency percentiles
+and the error rate are printed as one line.
+
+Run with python -m benchmarks.throughput from the old_lambda directory.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import time
+import typing
+
+from lambda_function import index
+
+from . import fake_api_server
+from . import invoke
+from . import manifests
+from . import response_server
+
+# The events sent by every worker, a multiple of 3 is whole lifecycles
+DEFAULT_EVENTS = 300
+DEFAULT_CONCURRENCY = 4
+# The lifecycles of every worker that are not measured, the first one is cold
+DEFAULT_WARM_UP = 1
+# The percentiles of the latencies
+PERCENTILES = (50, 90, 99)
+_REQUEST_TYPES = ("Create", "Update", "Delete")
+
+
+class WorkerReturn(typing.NamedTuple):
+    """
+    Structure of what a worker measured.
+
+    Attrs:
+        latencies: The milliseconds of every measured event.
+        exceptions: The number of measured events the handler raised for.
+        missing: The number of measured events no response was sent for.
+        skipped: The number of updates not sent because their create failed.
+        start: When the measured events started, in seconds since the epoch.
+        end: When the measured events ended, in seconds since the epoch.
+
+    """
+
+    latencies: typing.List[float]
+    exceptions: int
+    missing: int
+    skipped: int
+    start: float
+    end: float
+
+
+def run_worker(  # pylint: disable=too-many-locals
+    *,
+    worker: int,
+    host: str,
+    response_base: str,
+    events: int,
+    rate: float,
+    warm_up: int,
+    kinds: typing.List[manifests.Kind],
+    namespaces: int,
+    sizes: manifests.Sizes,
+) -> WorkerReturn:
+    """
+    Send the events of a worker to the handler.
+
+    Args:
+        worker: The index of the worker.
+        host: The URL of the fake API server.
+        response_base: The URL of the response server.
+        events: The number of measured events.
+        rate: The events per second, as fast as possible if 0.
+        warm_up: The number of lifecycles before the measured events.
+        kinds: The kinds of the resources, taken in turn by the lifecycles.
+        namespaces: The number of namespaces the resources are spread over.
+        sizes: The size of the manifests.
+
+    Returns:
+        What the worker measured.
+
+    """
+    latencies: typing.List[float] = []
+    exceptions = missing = skipped = 0
+    total = warm_up * len(_REQUEST_TYPES) + events
+    bodies = list(
+        manifests.generate(
+            kinds=kinds,
+            count=-(-total // len(_REQUEST_TYPES)),
+            namespaces=namespaces,
+            sizes=sizes,
+            prefix=f"load-{worker}",
+        )
+    )
+    start = end = time.time()
+    start_counter = time.perf_counter()
+    with invoke.configure(host=host):
+        physical_resource_id = None
+        create_failed = False
+        for idx in range(total):
+            if idx == warm_up * len(_REQUEST_TYPES):
+                start = time.time()
+                start_counter = time.perf_counter()
+            measured = idx >= warm_up * len(_REQUEST_TYPES)
+            lifecycle, step = divmod(idx, len(_REQUEST_TYPES))
+            request_type = _REQUEST_TYPES[step]
+            # CloudFormation rolls a failed create back with a delete, never updates it
+            if request_type == "Update" and create_failed:
+                skipped += measured
+                continue
+            if measured and rate > 0:
+                # Keeping to the schedule rather than pausing between events
+                delay = start_counter + len(latencies) / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            response_url = f"{response_base}/{worker}/{lifecycle}/{request_type}"
+            event = invoke.build_event(
+                request_type=request_type,
+                properties=bodies[lifecycle],
+                response_url=response_url,
+                request_id=f"{worker}-{lifecycle}-{request_type}",
+                physical_resource_id=physical_resource_id if step else None,
+            )
+            event_start = time.perf_counter()
+            try:
+                index.lambda_handler(event, None)
+            except Exception:  # pylint: disable=broad-except
+                exceptions += measured
+            if measured:
+                latencies.append((time.perf_counter() - event_start) * 1000)
+            response = invoke.fetch_response(url=response_url)
+            if response is None:
+                missing += measured
+            if request_type == "Create":
+                response = response or {}
+                create_failed = response.get("Status") != "SUCCESS"
+                # Without a response the create is treated as failed like the
+                # handler does, so that the delete does not touch the cluster
+                physical_resource_id = response.get(
+                    "PhysicalResourceId",
+                    index.FAIL_PHYSICAL_NAME_PREFIX + invoke.LOGICAL_RESOURCE_ID,
+                )
+        end = time.time()
+    return WorkerReturn(latencies, exceptions, missing, skipped, start, end)
+
+
+def calculate_percentile(*, values: typing.List[float], percentile: float) -> float:
+    """
+    Calculate a percentile with the nearest rank method.
+
+    Args:
+        values: The sorted values.
+        percentile: The percentile between 0 and 100.
+
+    Returns:
+        The percentile, 0 without values.
+
+    """
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * percentile // 100))
+    return values[int(rank) - 1]
+
+
+def summarize(
+    *,
+    results: typing.List[WorkerReturn],
+    statuses: typing.Dict[str, int],
+) -> typing.Dict[str, typing.Any]:
+    """
+    Summarize what the workers measured.
+
+    Args:
+        results: What every worker measured.
+        statuses: The number of measured responses of each Status.
+
+    Returns:
+        The events per second over the time the workers were measuring, the
+        latency percentiles and the fraction of events that failed or were not
+        answered.
+
+    """
+    latencies = sorted(latency for result in results for latency in result.latencies)
+    seconds = max(result.end for result in results) - min(
+        result.start for result in results
+    )
+    # The handler does not answer the events it raises for
+    failures = statuses.get("FAILURE", 0) + sum(result.missing for result in results)
+    return {
+        "events": len(latencies),
+        "seconds": seconds,
+        "events_per_second": len(latencies) / seconds if seconds > 0 else 0.0,
+        "latency_ms": {
+            **{
+                f"p{percentile}": calculate_percentile(
+                    values=latencies, percentile=percentile
+                )
+                for percentile in PERCENTILES
+            },
+            "max": latencies[-1] if latencies else 0.0,
+        },
+        "statuses": statuses,
+        "exceptions": sum(result.exceptions for result in results),
+        "missing": sum(result.missing for result in results),
+        "skipped": sum(result.skipped for result in results),
+        "error_rate": failures / len(latencies) if latencies else 0.0,
+    }
+
+
+def main() -> None:
+    """Print the throughput, latencies and errors of the handler as a line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=DEFAULT_EVENTS)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=0.0, help="0 is unlimited")
+    parser.add_argument("--warm-up", type=int, default=DEFAULT_WARM_UP)
+    parser.add_argument("--kind", action="append", help="ConfigMap by default")
+    parser.add_argument("--namespaces", type=int, default=1)
+    parser.add_argument("--labels", type=int, default=manifests.Sizes().labels)
+    parser.add_argument(
+        "--annotations", type=int, default=manifests.Sizes().annotations
+    )
+    parser.add_argument("--containers", type=int, default=manifests.Sizes().containers)
+    parser.add_argument("--data", type=int, default=manifests.Sizes().data)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    resources = manifests.load_resources()
+    kinds = [
+        kind
+        for kind in manifests.calculate_kinds(resources=resources)
+        if kind.kind in (args.kind or ["ConfigMap"])
+    ]
+    faults = fake_api_server.Faults(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+    )
+    with fake_api_server.FakeApiServer(
+        resources=resources, faults=faults, seed=args.seed
+    ) as server:
+        with response_server.ResponseServer() as responses:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=args.concurrency,
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        run_worker,
+                        worker=worker,
+                        host=server.host,
+                        response_base=responses.calculate_url(path=""),
+                        events=len(range(worker, args.events, args.concurrency)),
+                        rate=args.rate / args.concurrency,
+                        warm_up=args.warm_up,
+                        kinds=kinds,
+                        namespaces=args.namespaces,
+                        sizes=manifests.Sizes(
+                            args.labels, args.annotations, args.containers, args.data
+                        ),
+                    )
+                    for worker in range(args.concurrency)
+                ]
+                results = [future.result() for future in futures]
+            statuses = _count_measured(responses=responses, warm_up=args.warm_up)
+    print(
+        json.dumps(
+            {
+                "concurrency": args.concurrency,
+                "rate": args.rate,
+                "kinds": [kind.kind for kind in kinds],
+                **summarize(results=results, statuses=statuses),
+                "api_statuses": dict(server.statuses),
+            }
+        )
+    )
+
+
+def _count_measured(
+    *, responses: response_server.ResponseServer, warm_up: int
+) -> typing.Dict[str, int]:
+    """Count the statuses of the responses to measured events."""
+    statuses: typing.Dict[str, int] = {}
+    for path, body in responses.responses:
+        _, _, lifecycle, _ = path.split("/")
+        if int(lifecycle) >= warm_up:
+            status = body.get("Status", "")
+            statuses[status] = statuses.get(status, 0) + 1
+    return statuses
+
+
+if __name__ == "__main__":
+    main()
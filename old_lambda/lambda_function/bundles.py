@@ -0,0 +1,158 @@
+"""Apply a bundle of bodies to a cluster in order."""
+
+import typing
+
+from . import clusters
+from . import operations
+from . import physical_names as physical_names_module
+
+
+def create(
+    *, bodies: typing.Sequence[typing.Dict[str, typing.Any]], cluster: typing.Any = None
+) -> operations.CreateReturn:
+    """
+    Create the bodies one after the other in the order of the bundle.
+
+    If an item fails, or the physical name recording every item is longer than
+    CloudFormation accepts, the items created are rolled back in reverse order.
+
+    Args:
+        bodies: The bodies in the bundle.
+        cluster: The value of the cluster property, if None the default cluster is
+            used.
+
+    Returns:
+        Information about the outcome of the operation.
+
+    """
+    if not bodies:
+        return operations.CreateReturn("FAILURE", "a bundle must not be empty.", None)
+
+    physical_names: typing.List[typing.Any] = []
+    reason = None
+    for idx, body in enumerate(bodies):
+        result = operations.create(body=body, cluster=cluster)
+        if result.status == "FAILURE":
+            reason = physical_names_module.calculate_reason(
+                results=[(f"item {idx}", result)]
+            )
+            break
+        physical_names.append(result.physical_name)
+    else:
+        physical_name = physical_names_module.calculate(physical_names=physical_names)
+        # The physical resource id records the cluster as well
+        reason = physical_names_module.check(
+            physical_name=clusters.calculate_physical_name(
+                cluster=cluster, physical_name=physical_name
+            ),
+            recorded="item",
+        )
+        if reason is None:
+            return operations.CreateReturn("SUCCESS", None, physical_name)
+
+    # Rolling back the items that were created, dependents first
+    rollback_results = [
+        (
+            f"item {rollback_idx}",
+            operations.delete(
+                body=bodies[rollback_idx],
+                physical_name=physical_names[rollback_idx],
+                cluster=cluster,
+            ),
+        )
+        for rollback_idx in reversed(range(len(physical_names)))
+    ]
+    rollback_reason = physical_names_module.calculate_reason(results=rollback_results)
+    if rollback_reason:
+        reason = f"{reason}; rollback failed for {rollback_reason}"
+    return operations.CreateReturn("FAILURE", reason, None)
+
+
+def _calculate_targets(
+    *, bodies: typing.Sequence[typing.Dict[str, typing.Any]], physical_name: str
+) -> typing.Tuple[typing.Optional[str], typing.List[typing.Tuple[int, str]]]:
+    """Match the bodies to the physical name of each item."""
+    physical_names = physical_names_module.parse(
+        physical_name=physical_name, container=list
+    )
+    if physical_names is None:
+        return "the physical name does not record a bundle.", []
+    if len(physical_names) != len(bodies):
+        return (
+            "the items of a bundle can not be added or removed, replace the resource "
+            "instead.",
+            [],
+        )
+    return None, list(enumerate(physical_names))
+
+
+def update(
+    *,
+    bodies: typing.Sequence[typing.Dict[str, typing.Any]],
+    physical_name: str,
+    cluster: typing.Any = None,
+) -> operations.ExistsReturn:
+    """
+    Update the bodies one after the other in the order of the bundle.
+
+    Args:
+        bodies: The bodies in the bundle.
+        physical_name: The bundle physical name.
+        cluster: The value of the cluster property, if None the default cluster is
+            used.
+
+    Returns:
+        Information about the outcome of the operation.
+
+    """
+    reason, targets = _calculate_targets(bodies=bodies, physical_name=physical_name)
+    if reason is not None:
+        return operations.ExistsReturn("FAILURE", reason)
+    results = [
+        (
+            f"item {idx}",
+            operations.update(body=bodies[idx], physical_name=name, cluster=cluster),
+        )
+        for idx, name in targets
+    ]
+    reason = physical_names_module.calculate_reason(results=results)
+    if reason:
+        return operations.ExistsReturn("FAILURE", reason)
+    return operations.ExistsReturn("SUCCESS", None)
+
+
+def delete(
+    *,
+    bodies: typing.Sequence[typing.Dict[str, typing.Any]],
+    physical_name: str,
+    cluster: typing.Any = None,
+) -> operations.ExistsReturn:
+    """
+    Delete the bodies in the reverse order of the bundle.
+
+    Every item is attempted even if an earlier one fails.
+
+    Args:
+        bodies: The bodies in the bundle.
+        physical_name: The bundle physical name.
+        cluster: The value of the cluster property, if None the default cluster is
+            used.
+
+    Returns:
+        Information about the outcome of the operation.
+
+    """
+    reason, targets = _calculate_targets(bodies=bodies, physical_name=physical_name)
+    if reason is not None:
+        return operations.ExistsReturn("FAILURE", reason)
+    results = [
+        (
+            f"item {idx}",
+            operations.delete(body=bodies[idx], physical_name=name, cluster=cluster),
+        )
+        for idx, name in reversed(targets)
+    ]
+    reason = physical_names_module.calculate_reason(results=results)
+    if reason:
+        return operations.ExistsReturn("FAILURE", reason)
+    return operations.ExistsReturn("SUCCESS", None)
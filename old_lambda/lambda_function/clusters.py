@@ -0,0 +1,275 @@
+"""Registry of the API clients for the clusters selected by the cluster property."""
+
+import collections
+import json
+import os
+import threading
+import typing
+import urllib.parse
+
+from kubernetes import client
+
+from . import connections
+from . import credentials
+
+# The number of clusters kept when CLUSTER_REGISTRY_SIZE is not set
+DEFAULT_MAX_SIZE = 32
+# The start of the physical names that record the cluster of the object
+PHYSICAL_NAME_PREFIX = "cluster://"
+
+
+class Entry(typing.NamedTuple):
+    """
+    Structure of a registry entry.
+
+    Attrs:
+        name: The name of the cluster.
+        chain: The credentials of the cluster.
+        api_client: The API client, which holds the connection pool, of the cluster.
+
+    """
+
+    name: str
+    chain: credentials.Chain
+    api_client: client.ApiClient
+
+
+class Stats:
+    """The hit, miss and eviction counts of a cluster."""
+
+    def __init__(self) -> None:
+        """Construct."""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self) -> typing.Dict[str, int]:
+        """Get the counts as a dictionary."""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+def calculate_key(*, cluster: typing.Any) -> str:
+    """
+    Calculate the key of a cluster in the registry.
+
+    Args:
+        cluster: The value of the cluster property.
+
+    Returns:
+        The name for a name and otherwise the mapping as canonical JSON.
+
+    """
+    if isinstance(cluster, str):
+        return cluster
+    return json.dumps(cluster, sort_keys=True, separators=(",", ":"))
+
+
+def calculate_name(*, cluster: typing.Any) -> str:
+    """
+    Calculate the name of a cluster used for the metrics.
+
+    Args:
+        cluster: The value of the cluster property.
+
+    Returns:
+        The name of the cluster.
+
+    """
+    if isinstance(cluster, dict):
+        return str(cluster.get("name"))
+    return str(cluster)
+
+
+class PhysicalName(typing.NamedTuple):
+    """
+    Structure of a physical name that records the cluster.
+
+    Attrs:
+        cluster: The name of the cluster or None for the default cluster.
+        physical_name: The physical name of the object on the cluster.
+
+    """
+
+    cluster: typing.Optional[str]
+    physical_name: str
+
+
+def calculate_physical_name(*, cluster: typing.Any, physical_name: str) -> str:
+    """
+    Calculate the physical name that records the cluster of the object.
+
+    The cluster is part of the physical name so that changing it replaces the
+    resource, CloudFormation then deletes the object from the old cluster.
+
+    Args:
+        cluster: The value of the cluster property, if None the default cluster is
+            used.
+        physical_name: The physical name of the object on the cluster.
+
+    Returns:
+        The physical name on the cluster, prefixed by the name of the cluster unless
+        it is the default cluster.
+
+    """
+    if cluster is None:
+        return physical_name
+    name = urllib.parse.quote(calculate_name(cluster=cluster), safe="")
+    return f"{PHYSICAL_NAME_PREFIX}{name}/{physical_name}"
+
+
+def parse_physical_name(*, physical_name: str) -> PhysicalName:
+    """
+    Get the cluster and the physical name on it back from a physical name.
+
+    Args:
+        physical_name: The physical name of the resource.
+
+    Returns:
+        The name of the cluster and the physical name on it.
+
+    """
+    if not physical_name.startswith(PHYSICAL_NAME_PREFIX):
+        return PhysicalName(None, physical_name)
+    name, _, physical_name = physical_name[len(PHYSICAL_NAME_PREFIX) :].partition("/")
+    return PhysicalName(urllib.parse.unquote(name), physical_name)
+
+
+class Registry:
+    """Least recently used cache of the API client of each cluster."""
+
+    def __init__(self, *, max_size: int) -> None:
+        """
+        Construct.
+
+        Args:
+            max_size: The maximum number of clusters to keep.
+
+        """
+        self._max_size = max_size
+        self._entries: "collections.OrderedDict[str, Entry]" = collections.OrderedDict()
+        self._stats: typing.Dict[str, Stats] = collections.defaultdict(Stats)
+        self._lock = threading.Lock()
+
+    def get(self, *, cluster: typing.Any) -> Entry:
+        """
+        Get the entry of a cluster, creating it if required.
+
+        Creating an entry evicts the least recently used entries beyond the maximum
+        size.
+
+        Args:
+            cluster: The value of the cluster property.
+
+        Returns:
+            The entry of the cluster.
+
+        """
+        key = calculate_key(cluster=cluster)
+        name = calculate_name(cluster=cluster)
+        with self._lock:
+            stats = self._stats[name]
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                stats.hits += 1
+                return entry
+            stats.misses += 1
+
+        # Creating outside the lock since loading credentials calls the network
+        chain = credentials.Chain(
+            providers=credentials.providers_for_cluster(
+                cluster=cluster, environ=os.environ
+            )
+        )
+        entry = Entry(
+            name,
+            chain,
+            connections.create_api_client(configuration=chain.get_configuration()),
+        )
+
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                # Another thread created the entry first
+                _close(entry=entry)
+                self._entries.move_to_end(key)
+                return existing
+            self._entries[key] = entry
+            while len(self._entries) > self._max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self._stats[evicted.name].evictions += 1
+                _close(entry=evicted)
+        return entry
+
+    def get_api_client(self, *, cluster: typing.Any) -> client.ApiClient:
+        """
+        Get the API client of a cluster with fresh credentials.
+
+        Args:
+            cluster: The value of the cluster property.
+
+        Returns:
+            The API client of the cluster.
+
+        """
+        entry = self.get(cluster=cluster)
+        entry.chain.get_configuration()
+        return entry.api_client
+
+    def metrics(self) -> typing.Dict[str, typing.Dict[str, int]]:
+        """
+        Get the hit, miss and eviction counts of each cluster.
+
+        Returns:
+            The counts by cluster name.
+
+        """
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def __len__(self) -> int:
+        """Get the number of clusters in the registry."""
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Close and remove every entry."""
+        with self._lock:
+            for entry in self._entries.values():
+                _close(entry=entry)
+            self._entries.clear()
+
+
+def _close(*, entry: Entry) -> None:
+    """Stop the credentials refresh and close the pooled connections of an entry."""
+    entry.chain.close()
+    entry.api_client.rest_client.pool_manager.clear()
+
+
+# The registry shared across invocations
+_REGISTRY: typing.Optional[Registry] = None
+
+
+def get_registry() -> Registry:
+    """
+    Get the shared registry, creating it if required.
+
+    The size is read from the CLUSTER_REGISTRY_SIZE environment variable.
+
+    Returns:
+        The shared registry.
+
+    """
+    global _REGISTRY  # pylint: disable=global-statement
+    if _REGISTRY is None:
+        _REGISTRY = Registry(
+            max_size=int(os.environ.get("CLUSTER_REGISTRY_SIZE", DEFAULT_MAX_SIZE))
+        )
+    return _REGISTRY
+
+
+def reset() -> None:
+    """Close and discard the shared registry."""
+    global _REGISTRY  # pylint: disable=global-statement
+    if _REGISTRY is not None:
+        _REGISTRY.clear()
+    _REGISTRY = None
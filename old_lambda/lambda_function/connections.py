@@ -0,0 +1,173 @@
+"""Count the connections, handshakes, waits and bytes of the HTTP connection pools."""
+
+import functools
+import http.client
+import time
+import typing
+
+from kubernetes import client
+
+from . import metrics
+
+
+class _CountingReader:
+    """Reader of the socket of a response that counts the bytes read through it."""
+
+    def __init__(self, *, reader: typing.Any, name: str) -> None:
+        """
+        Construct.
+
+        Args:
+            reader: The buffered reader of the socket.
+            name: The name of the metric of the bytes.
+
+        """
+        self._reader = reader
+        self._name = name
+
+    def _count(self, size: int) -> None:
+        """Add the bytes read to the metric."""
+        if size:
+            metrics.count(name=self._name, value=size, unit="Bytes")
+
+    def read(self, *args: typing.Any) -> bytes:
+        """Read and count."""
+        data = self._reader.read(*args)
+        self._count(len(data))
+        return data
+
+    def read1(self, *args: typing.Any) -> bytes:
+        """Read at most one buffer and count."""
+        data = self._reader.read1(*args)
+        self._count(len(data))
+        return data
+
+    def readline(self, *args: typing.Any) -> bytes:
+        """Read a line and count."""
+        data = self._reader.readline(*args)
+        self._count(len(data))
+        return data
+
+    def readinto(self, buffer: typing.Any) -> int:
+        """Read into a buffer and count."""
+        size = self._reader.readinto(buffer)
+        self._count(size or 0)
+        return size
+
+    def __getattr__(self, name: str) -> typing.Any:
+        """Delegate everything else, like peek and close, to the reader."""
+        return getattr(self._reader, name)
+
+
+@functools.lru_cache(maxsize=None)
+def _response_class(*, prefix: str) -> type:
+    """Create the http.client response class that counts the bytes received."""
+
+    class CountingResponse(http.client.HTTPResponse):
+        """Response that counts the bytes of its status line, headers and body."""
+
+        def __init__(self, sock: typing.Any, *args: typing.Any, **kwargs: typing.Any):
+            """Construct."""
+            super().__init__(sock, *args, **kwargs)
+            self.fp = _CountingReader(  # type: ignore
+                reader=self.fp, name=f"{prefix}BytesReceived"
+            )
+
+    return CountingResponse
+
+
+@functools.lru_cache(maxsize=None)
+def _connection_class(*, base: type, prefix: str) -> type:
+    """Create the connection class that records its metrics."""
+
+    class InstrumentedConnection(base):  # type: ignore
+        """Connection that records its handshakes, reuse, waits and bytes sent."""
+
+        response_class = _response_class(prefix=prefix)
+        # Whether the connection was opened since its last response, the client may
+        # only open it once the request is being sent
+        _instrumented_opened = False
+
+        def connect(self) -> None:
+            """Open the connection, timing the DNS lookup, TCP and TLS handshakes."""
+            start = time.perf_counter()
+            try:
+                super().connect()
+            finally:
+                metrics.count(
+                    name=f"{prefix}HandshakeDuration",
+                    value=(time.perf_counter() - start) * 1000,
+                    unit="Milliseconds",
+                )
+            metrics.count(name=f"{prefix}NewConnections", value=1)
+            self._instrumented_opened = True
+
+        def send(self, data: typing.Any) -> None:
+            """Send the headers or a part of the body, counting the bytes."""
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                metrics.count(name=f"{prefix}BytesSent", value=len(data), unit="Bytes")
+            super().send(data)
+
+        def getresponse(self, *args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+            """Wait for the response, timing the wait until the headers arrive."""
+            if not self._instrumented_opened:
+                metrics.count(name=f"{prefix}ReusedConnections", value=1)
+            self._instrumented_opened = False
+            start = time.perf_counter()
+            try:
+                return super().getresponse(*args, **kwargs)
+            finally:
+                metrics.count(
+                    name=f"{prefix}TimeToFirstByte",
+                    value=(time.perf_counter() - start) * 1000,
+                    unit="Milliseconds",
+                )
+
+    return InstrumentedConnection
+
+
+@functools.lru_cache(maxsize=None)
+def _pool_class(*, base: typing.Any, prefix: str) -> type:
+    """Create the connection pool class that makes instrumented connections."""
+    return type(
+        base.__name__,
+        (base,),
+        {"ConnectionCls": _connection_class(base=base.ConnectionCls, prefix=prefix)},
+    )
+
+
+def instrument(*, pool_manager: typing.Any, target: str) -> None:
+    """
+    Make the pools of a pool manager record their connection metrics.
+
+    The metrics are added to those of the invocation being recorded, prefixed by the
+    target, like KubernetesNewConnections or ResponseBytesSent.
+
+    Args:
+        pool_manager: The urllib3 pool manager, before any pool is created.
+        target: What the pools connect to, like kubernetes or response.
+
+    """
+    prefix = target.capitalize()
+    pool_manager.pool_classes_by_scheme = {
+        scheme: _pool_class(base=pool_class, prefix=prefix)
+        for scheme, pool_class in pool_manager.pool_classes_by_scheme.items()
+    }
+
+
+def create_api_client(
+    *, configuration: typing.Optional[client.Configuration]
+) -> client.ApiClient:
+    """
+    Create an API client whose connections to the API server are instrumented.
+
+    Args:
+        configuration: The configuration of the client, the default if None.
+
+    Returns:
+        The API client.
+
+    """
+    api_client = client.ApiClient(configuration=configuration)
+    instrument(pool_manager=api_client.rest_client.pool_manager, target="kubernetes")
+    return api_client
@@ -0,0 +1,562 @@
+"""Load cluster configuration from a chain of credential providers."""
+
+import base64
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import typing
+
+import yaml
+from kubernetes import client
+from kubernetes.config import kube_config
+
+from . import exceptions
+
+# Seconds before expiry that credentials are refreshed
+REFRESH_MARGIN = 60.0
+# EKS tokens are accepted for 15 minutes after they are presigned
+EKS_TOKEN_LIFETIME = 15 * 60.0
+# How long credentials that can change without notice, such as a rotated service
+# account token or an edited kubeconfig, are used before they are loaded again
+RELOAD_INTERVAL = 5 * 60.0
+# The header that binds an EKS token to a cluster
+_EKS_CLUSTER_HEADER = "x-k8s-aws-id"
+_EKS_TOKEN_PREFIX = "k8s-aws-v1."
+_SERVICE_ACCOUNT_PATH = "/var/run/secrets/kubernetes.io/serviceaccount"
+
+
+class LoadReturn(typing.NamedTuple):
+    """
+    Structure of the provider load return value.
+
+    Attrs:
+        configuration: The configuration for the cluster.
+        expiry: The time since the epoch after which the credentials are no longer
+            valid or None if they do not expire.
+
+    """
+
+    configuration: client.Configuration
+    expiry: typing.Optional[float]
+
+
+def _set_token(*, configuration: client.Configuration, token: str) -> None:
+    """Set the bearer token on the configuration."""
+    configuration.api_key = {"authorization": token}
+    configuration.api_key_prefix = {"authorization": "Bearer"}
+
+
+def write_ca(*, data: bytes) -> str:
+    """
+    Write certificate authority data to a file since the client requires a path.
+
+    The file is named by the hash of the data so that it is only written once per
+    container.
+
+    Args:
+        data: The certificate authority data.
+
+    Returns:
+        The path to the file.
+
+    """
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    path = os.path.join(
+        tempfile.gettempdir(), f"cloudformation-kubernetes-{digest}.crt"
+    )
+    if not os.path.exists(path):
+        with open(path, "wb") as out_file:
+            out_file.write(data)
+    return path
+
+
+class InClusterProvider:
+    """Load the configuration of the cluster the code is running in."""
+
+    def __init__(
+        self, *, host: str, port: str, path: str = _SERVICE_ACCOUNT_PATH
+    ) -> None:
+        """
+        Construct.
+
+        Args:
+            host: The host of the kubernetes service.
+            port: The port of the kubernetes service.
+            path: The directory with the service account token and ca certificate.
+
+        """
+        self._host = host
+        self._port = port
+        self._path = path
+
+    def load(self) -> LoadReturn:
+        """Load the configuration, the token is re-read since it is rotated."""
+        configuration = client.Configuration()
+        configuration.host = f"https://{self._host}:{self._port}"
+        configuration.ssl_ca_cert = os.path.join(self._path, "ca.crt")
+        with open(os.path.join(self._path, "token")) as in_file:
+            _set_token(configuration=configuration, token=in_file.read().strip())
+        return LoadReturn(configuration, time.time() + RELOAD_INTERVAL)
+
+
+class KubeconfigFileProvider:
+    """Load the configuration from a kubeconfig file."""
+
+    def __init__(self, *, path: str) -> None:
+        """
+        Construct.
+
+        Args:
+            path: The path to the kubeconfig file.
+
+        """
+        self._path = path
+
+    def load(self) -> LoadReturn:
+        """Load the configuration using the current context of the file."""
+        configuration = client.Configuration()
+        with open(self._path) as in_file:
+            config_dict = yaml.safe_load(in_file)
+        kube_config.KubeConfigLoader(
+            config_dict=config_dict,
+            config_base_path=os.path.abspath(os.path.dirname(self._path)),
+        ).load_and_set(configuration)
+        return LoadReturn(configuration, time.time() + RELOAD_INTERVAL)
+
+
+def _create_session(**kwargs):
+    """Create a boto3 session, importing boto3 only once it is needed."""
+    import boto3  # pylint: disable=import-outside-toplevel
+
+    return boto3.Session(**kwargs)
+
+
+class _AwsProvider:
+    """Shared behaviour of the providers that call AWS."""
+
+    def __init__(
+        self,
+        *,
+        region: typing.Optional[str],
+        endpoint_url: typing.Optional[str],
+        session: typing.Any,
+    ) -> None:
+        """
+        Construct.
+
+        Args:
+            region: The AWS region.
+            endpoint_url: Override for the AWS endpoints, such as a local stand-in.
+            session: The boto3 session to use, one is created if it is None.
+
+        """
+        self._region = region
+        self._endpoint_url = endpoint_url
+        self._session = session
+
+    def _client(self, *, service_name: str, session: typing.Any = None):
+        """Create a client for an AWS service."""
+        if session is None:
+            if self._session is None:
+                self._session = _create_session(region_name=self._region)
+            session = self._session
+        return session.client(
+            service_name, region_name=self._region, endpoint_url=self._endpoint_url
+        )
+
+
+def _retrieve_cluster_name(params, context, **_kwargs):
+    """Move the cluster name from the parameters to the context of the request."""
+    if _EKS_CLUSTER_HEADER in params:
+        context[_EKS_CLUSTER_HEADER] = params.pop(_EKS_CLUSTER_HEADER)
+
+
+def _inject_cluster_name(request, **_kwargs):
+    """Add the cluster name header before the request is signed."""
+    if _EKS_CLUSTER_HEADER in request.context:
+        request.headers[_EKS_CLUSTER_HEADER] = request.context[_EKS_CLUSTER_HEADER]
+
+
+class EksTokenProvider(_AwsProvider):
+    """Load the configuration of an EKS cluster using a token from an IAM identity."""
+
+    def __init__(
+        self,
+        *,
+        cluster_name: str,
+        region: typing.Optional[str] = None,
+        role_arn: typing.Optional[str] = None,
+        endpoint: typing.Optional[str] = None,
+        ca_data: typing.Optional[str] = None,
+        endpoint_url: typing.Optional[str] = None,
+        session: typing.Any = None,
+    ) -> None:
+        """
+        Construct.
+
+        Args:
+            cluster_name: The name of the EKS cluster.
+            region: The AWS region of the cluster.
+            role_arn: The ARN of a role to assume for the token, if not given the
+                identity of the session is used.
+            endpoint: The API server endpoint, looked up if not given.
+            ca_data: The base64 encoded certificate authority, looked up if not
+                given.
+            endpoint_url: Override for the AWS endpoints, such as a local stand-in.
+            session: The boto3 session to use, one is created if it is None.
+
+        """
+        super().__init__(region=region, endpoint_url=endpoint_url, session=session)
+        self._cluster_name = cluster_name
+        self._role_arn = role_arn
+        self._endpoint = endpoint
+        self._ca_data = ca_data
+
+    def _describe_cluster(self) -> None:
+        """Look up the endpoint and certificate authority of the cluster."""
+        eks = self._client(service_name="eks")
+        cluster = eks.describe_cluster(name=self._cluster_name)["cluster"]
+        self._endpoint = cluster["endpoint"]
+        self._ca_data = cluster["certificateAuthority"]["data"]
+
+    def _token_session(self):
+        """Get the session whose identity the token is for."""
+        if self._role_arn is None:
+            return None
+        sts = self._client(service_name="sts")
+        credentials = sts.assume_role(
+            RoleArn=self._role_arn, RoleSessionName="cloudformation-kubernetes"
+        )["Credentials"]
+        return _create_session(
+            aws_access_key_id=credentials["AccessKeyId"],
+            aws_secret_access_key=credentials["SecretAccessKey"],
+            aws_session_token=credentials["SessionToken"],
+            region_name=self._region,
+        )
+
+    def get_token(self) -> str:
+        """
+        Create a token by presigning a GetCallerIdentity request for the cluster.
+
+        Returns:
+            The token.
+
+        """
+        sts = self._client(service_name="sts", session=self._token_session())
+        sts.meta.events.register(
+            "provide-client-params.sts.GetCallerIdentity", _retrieve_cluster_name
+        )
+        sts.meta.events.register(
+            "before-sign.sts.GetCallerIdentity", _inject_cluster_name
+        )
+        url = sts.generate_presigned_url(
+            "get_caller_identity",
+            Params={_EKS_CLUSTER_HEADER: self._cluster_name},
+            ExpiresIn=60,
+            HttpMethod="GET",
+        )
+        encoded = base64.urlsafe_b64encode(url.encode("utf-8")).decode("utf-8")
+        return f"{_EKS_TOKEN_PREFIX}{encoded.rstrip('=')}"
+
+    def load(self) -> LoadReturn:
+        """Load the configuration with a new token."""
+        if self._endpoint is None or self._ca_data is None:
+            self._describe_cluster()
+        configuration = client.Configuration()
+        configuration.host = typing.cast(str, self._endpoint)
+        configuration.ssl_ca_cert = write_ca(
+            data=base64.b64decode(typing.cast(str, self._ca_data))
+        )
+        expiry = time.time() + EKS_TOKEN_LIFETIME
+        _set_token(configuration=configuration, token=self.get_token())
+        return LoadReturn(configuration, expiry)
+
+
+class ParameterStoreProvider(_AwsProvider):
+    """Load the configuration from a kubeconfig stored in a parameter."""
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        region: typing.Optional[str] = None,
+        endpoint_url: typing.Optional[str] = None,
+        session: typing.Any = None,
+    ) -> None:
+        """
+        Construct.
+
+        Args:
+            name: The name of the parameter with the kubeconfig.
+            region: The AWS region of the parameter.
+            endpoint_url: Override for the AWS endpoints, such as a local stand-in.
+            session: The boto3 session to use, one is created if it is None.
+
+        """
+        super().__init__(region=region, endpoint_url=endpoint_url, session=session)
+        self._name = name
+
+    def load(self) -> LoadReturn:
+        """Load the configuration using the current context of the kubeconfig."""
+        ssm = self._client(service_name="ssm")
+        parameter = ssm.get_parameter(Name=self._name, WithDecryption=True)
+        configuration = client.Configuration()
+        kube_config.KubeConfigLoader(
+            config_dict=yaml.safe_load(parameter["Parameter"]["Value"]),
+            temp_file_path=tempfile.gettempdir(),
+        ).load_and_set(configuration)
+        return LoadReturn(configuration, time.time() + RELOAD_INTERVAL)
+
+
+class Chain:
+    """
+    Use the first provider that loads and keep its credentials fresh.
+
+    The configuration is cached and its token is refreshed in place shortly before
+    it expires, both in the background and, in case the background refresh did not
+    run while the container was frozen, on access.
+    """
+
+    def __init__(self, *, providers: typing.Sequence[typing.Any]) -> None:
+        """
+        Construct.
+
+        Args:
+            providers: The providers to try in order.
+
+        """
+        self._providers = providers
+        self._lock = threading.RLock()
+        self._provider: typing.Any = None
+        self._configuration: typing.Optional[client.Configuration] = None
+        self._expiry: typing.Optional[float] = None
+        self._timer: typing.Optional[threading.Timer] = None
+
+    def get_configuration(self) -> typing.Optional[client.Configuration]:
+        """
+        Get the configuration, loading or refreshing it if required.
+
+        A failed refresh keeps the cached token while it has not expired.
+
+        Raises CredentialsError if no provider could load or the refresh of an
+        expired token failed.
+
+        Returns:
+            The configuration or None if there are no providers.
+
+        """
+        with self._lock:
+            if self._configuration is None:
+                self._load()
+            elif self._expiry is not None and time.time() >= (
+                self._expiry - REFRESH_MARGIN
+            ):
+                try:
+                    self.refresh()
+                except exceptions.CredentialsError:
+                    if time.time() >= self._expiry:
+                        raise
+            return self._configuration
+
+    def _load(self) -> None:
+        """Load the configuration from the first provider that succeeds."""
+        failures = []
+        for provider in self._providers:
+            try:
+                configuration, self._expiry = provider.load()
+            except Exception as exc:  # pylint: disable=broad-except
+                failures.append(f"{type(provider).__name__}: {exc}")
+                continue
+            self._provider = provider
+            self._configuration = configuration
+            self._schedule()
+            return
+        if failures:
+            raise exceptions.CredentialsError(failures)
+
+    def refresh(self) -> None:
+        """
+        Reload the credentials and update the cached configuration in place.
+
+        Raises CredentialsError if the provider could not load.
+        """
+        with self._lock:
+            if self._configuration is None:
+                return
+            try:
+                configuration, self._expiry = self._provider.load()
+            except Exception as exc:  # pylint: disable=broad-except
+                raise exceptions.CredentialsError(
+                    [f"{type(self._provider).__name__}: {exc}"]
+                ) from exc
+            # The api clients hold on to the configuration so it is updated in place
+            self._configuration.api_key = configuration.api_key
+            self._configuration.api_key_prefix = configuration.api_key_prefix
+            self._schedule()
+
+    def _background_refresh(self) -> None:
+        """Refresh from the timer, a failure is retried on the next access."""
+        try:
+            self.refresh()
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def _schedule(self) -> None:
+        """Schedule the background refresh for shortly before the expiry."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._expiry is None:
+            return
+        delay = max(self._expiry - REFRESH_MARGIN - time.time(), 0.0)
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def close(self) -> None:
+        """Stop the background refresh."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+def providers_from_environ(
+    *, environ: typing.Mapping[str, str]
+) -> typing.List[typing.Any]:
+    """
+    Create the providers that are configured by environment variables.
+
+    In order: in-cluster if KUBERNETES_SERVICE_HOST is set, the kubeconfig file in
+    KUBECONFIG or ~/.kube/config if it exists, EKS if EKS_CLUSTER_NAME is set
+    (optionally with EKS_ROLE_ARN, EKS_CLUSTER_ENDPOINT and EKS_CLUSTER_CA) and the
+    parameter store if KUBECONFIG_PARAMETER is set. AWS_ENDPOINT_URL overrides the
+    AWS endpoints.
+
+    Args:
+        environ: The environment variables.
+
+    Returns:
+        The providers.
+
+    """
+    providers: typing.List[typing.Any] = []
+    region = environ.get("AWS_REGION")
+    endpoint_url = environ.get("AWS_ENDPOINT_URL")
+
+    if "KUBERNETES_SERVICE_HOST" in environ:
+        providers.append(
+            InClusterProvider(
+                host=environ["KUBERNETES_SERVICE_HOST"],
+                port=environ.get("KUBERNETES_SERVICE_PORT", "443"),
+            )
+        )
+    kubeconfig = environ.get("KUBECONFIG", os.path.expanduser("~/.kube/config"))
+    if os.path.exists(kubeconfig):
+        providers.append(KubeconfigFileProvider(path=kubeconfig))
+    if "EKS_CLUSTER_NAME" in environ:
+        providers.append(
+            EksTokenProvider(
+                cluster_name=environ["EKS_CLUSTER_NAME"],
+                region=region,
+                role_arn=environ.get("EKS_ROLE_ARN"),
+                endpoint=environ.get("EKS_CLUSTER_ENDPOINT"),
+                ca_data=environ.get("EKS_CLUSTER_CA"),
+                endpoint_url=endpoint_url,
+            )
+        )
+    if "KUBECONFIG_PARAMETER" in environ:
+        providers.append(
+            ParameterStoreProvider(
+                name=environ["KUBECONFIG_PARAMETER"],
+                region=region,
+                endpoint_url=endpoint_url,
+            )
+        )
+    return providers
+
+
+def providers_for_cluster(
+    *, cluster: typing.Any, environ: typing.Mapping[str, str]
+) -> typing.List[typing.Any]:
+    """
+    Create the providers for a cluster selected by the cluster property.
+
+    The cluster is the name of an EKS cluster or a mapping with the name and
+    optionally region, roleArn, endpoint and certificateAuthority for EKS or
+    kubeconfigParameter to load a kubeconfig from the parameter store instead.
+
+    Raises ClusterMalformedError if the cluster is neither.
+
+    Args:
+        cluster: The value of the cluster property.
+        environ: The environment variables.
+
+    Returns:
+        The providers.
+
+    """
+    if isinstance(cluster, str):
+        cluster = {"name": cluster}
+    if not isinstance(cluster, dict) or not isinstance(cluster.get("name"), str):
+        raise exceptions.ClusterMalformedError
+    region = cluster.get("region", environ.get("AWS_REGION"))
+    endpoint_url = environ.get("AWS_ENDPOINT_URL")
+
+    if "kubeconfigParameter" in cluster:
+        return [
+            ParameterStoreProvider(
+                name=cluster["kubeconfigParameter"],
+                region=region,
+                endpoint_url=endpoint_url,
+            )
+        ]
+    return [
+        EksTokenProvider(
+            cluster_name=cluster["name"],
+            region=region,
+            role_arn=cluster.get("roleArn"),
+            endpoint=cluster.get("endpoint"),
+            ca_data=cluster.get("certificateAuthority"),
+            endpoint_url=endpoint_url,
+        )
+    ]
+
+
+# The chain shared across invocations
+_CHAIN: typing.Optional[Chain] = None
+
+
+def get_chain() -> Chain:
+    """
+    Get the shared chain, creating it from the environment if required.
+
+    Returns:
+        The shared chain.
+
+    """
+    global _CHAIN  # pylint: disable=global-statement
+    if _CHAIN is None:
+        _CHAIN = Chain(providers=providers_from_environ(environ=os.environ))
+    return _CHAIN
+
+
+def get_configuration() -> typing.Optional[client.Configuration]:
+    """
+    Get the configuration from the shared chain.
+
+    Returns:
+        The configuration or None if no provider is configured.
+
+    """
+    return get_chain().get_configuration()
+
+
+def reset() -> None:
+    """Discard the shared chain so that the next access reads the environment."""
+    global _CHAIN  # pylint: disable=global-statement
+    if _CHAIN is not None:
+        _CHAIN.close()
+    _CHAIN = None
@@ -23,3 +23,136 @@ class KindMissingError(ParentError):
     def __init__(self):
         """Construct."""
         super().__init__("kind is required.")
+
+
+class CredentialsError(ParentError):
+    """None of the credential providers could load the cluster configuration."""
+
+    def __init__(self, failures):
+        """Construct."""
+        super().__init__(f"could not load credentials: {'; '.join(failures)}")
+
+
+class ClusterMalformedError(ParentError):
+    """The cluster property is not a name or a mapping with a name."""
+
+    def __init__(self):
+        """Construct."""
+        super().__init__(
+            "cluster must be the name of an EKS cluster or a mapping with a name."
+        )
+
+
+class BackendUnknownError(ParentError):
+    """The KUBERNETES_BACKEND environment variable is not a known backend."""
+
+    def __init__(self, backend):
+        """Construct."""
+        super().__init__(f"unknown backend {backend}, expected client or rest.")
+
+
+class DiscoveryError(ParentError):
+    """The resources of an api version could not be discovered."""
+
+    def __init__(self, api_version, reason):
+        """Construct."""
+        super().__init__(f"could not discover the resources of {api_version}: {reason}")
+
+
+class KindUnknownError(ParentError):
+    """The api version does not serve the kind."""
+
+    def __init__(self, api_version, kind):
+        """Construct."""
+        super().__init__(f"{api_version} does not serve the kind {kind}.")
+
+
+class ProtobufDecodeError(ParentError):
+    """A protobuf encoded response could not be decoded."""
+
+    def __init__(self, reason):
+        """Construct."""
+        super().__init__(f"could not decode the protobuf response: {reason}")
+
+
+class ResponseDecodeError(ParentError):
+    """A successful response is not the JSON encoded object that was expected."""
+
+    def __init__(self, reason):
+        """Construct."""
+        super().__init__(f"could not decode the response: {reason}")
+
+
+class ManifestMalformedError(ParentError):
+    """The manifest property or the manifest it references is not valid."""
+
+    def __init__(self):
+        """Construct."""
+        super().__init__(
+            "manifest must be an s3://<bucket>/<key> URL or a mapping with a bucket "
+            "and key that references a JSON or YAML mapping."
+        )
+
+
+class ManifestFetchError(ParentError):
+    """The manifest could not be downloaded."""
+
+    def __init__(self, reference, reason):
+        """Construct."""
+        super().__init__(
+            f"could not fetch the manifest s3://{reference.bucket}/{reference.key}: "
+            f"{reason}"
+        )
+
+
+class ManifestDecodeError(ParentError):
+    """The compressed manifest property could not be decompressed."""
+
+    def __init__(self, reason):
+        """Construct."""
+        super().__init__(f"could not decode the compressed manifest: {reason}")
+
+
+class ManifestConflictError(ParentError):
+    """More than one of the properties that define the body are set."""
+
+    def __init__(self):
+        """Construct."""
+        super().__init__(
+            "only one of manifest, compressedManifest and yamlManifest can be set."
+        )
+
+
+class BundleClustersError(ParentError):
+    """A manifest bundle was combined with the clusters property."""
+
+    def __init__(self):
+        """Construct."""
+        super().__init__("a manifest bundle can not be applied to clusters.")
+
+
+class YamlManifestMalformedError(ParentError):
+    """The yamlManifest property is not a stream of YAML manifests."""
+
+    def __init__(self):
+        """Construct."""
+        super().__init__(
+            "yamlManifest must be a string of one or more YAML documents that are "
+            "mappings or lists of mappings."
+        )
+
+
+class BodyInvalidError(ParentError):
+    """The body does not match the schema of its kind."""
+
+    def __init__(self, errors):
+        """Construct."""
+        super().__init__(f"the body is invalid: {'; '.join(errors)}")
+
+
+class SchemaIndexError(ParentError):
+    """The schema index could not be opened."""
+
+    def __init__(self, path, reason):
+        """Construct."""
+        super().__init__(f"could not open the schema index {path}: {reason}")
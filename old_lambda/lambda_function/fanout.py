@@ -0,0 +1,193 @@
+"""Apply one body to many clusters in parallel."""
+
+import os
+import typing
+from concurrent import futures
+
+from . import clusters as clusters_module
+from . import operations
+from . import physical_names as physical_names_module
+
+# The number of clusters called at once when FANOUT_CONCURRENCY is not set
+DEFAULT_CONCURRENCY = 10
+
+
+def _map(
+    *, function: typing.Callable, items: typing.Sequence[typing.Any]
+) -> typing.List[typing.Any]:
+    """Call the function with each item in parallel, keeping the order."""
+    concurrency = int(os.environ.get("FANOUT_CONCURRENCY", DEFAULT_CONCURRENCY))
+    with futures.ThreadPoolExecutor(
+        max_workers=max(min(concurrency, len(items)), 1)
+    ) as executor:
+        return list(executor.map(function, items))
+
+
+def _check_clusters(*, clusters: typing.Any) -> typing.Optional[str]:
+    """Calculate the reason the clusters property is invalid, if it is."""
+    if not isinstance(clusters, list) or not clusters:
+        return "clusters must be a non-empty list."
+    names = [clusters_module.calculate_name(cluster=cluster) for cluster in clusters]
+    if len(set(names)) != len(names):
+        return "clusters must have unique names."
+    return None
+
+
+def create(
+    *, body: typing.Dict[str, typing.Any], clusters: typing.Any
+) -> operations.CreateReturn:
+    """
+    Create the body on every cluster in parallel.
+
+    If any cluster fails, or the physical name recording every cluster is longer than
+    CloudFormation accepts, the clusters that succeeded are rolled back in parallel.
+
+    Args:
+        body: The body to create.
+        clusters: The value of the clusters property.
+
+    Returns:
+        Information about the outcome of the operation.
+
+    """
+    reason = _check_clusters(clusters=clusters)
+    if reason is not None:
+        return operations.CreateReturn("FAILURE", reason, None)
+    names = [clusters_module.calculate_name(cluster=cluster) for cluster in clusters]
+
+    results = _map(
+        function=lambda cluster: operations.create(body=body, cluster=cluster),
+        items=clusters,
+    )
+    if all(result.status == "SUCCESS" for result in results):
+        physical_name = physical_names_module.calculate(
+            physical_names={
+                name: result.physical_name for name, result in zip(names, results)
+            }
+        )
+        reason = physical_names_module.check(
+            physical_name=physical_name, recorded="cluster"
+        )
+        if reason is None:
+            return operations.CreateReturn("SUCCESS", None, physical_name)
+    else:
+        reason = physical_names_module.calculate_reason(results=zip(names, results))
+
+    # Rolling back the clusters that succeeded
+    succeeded = [
+        (name, cluster, result.physical_name)
+        for name, cluster, result in zip(names, clusters, results)
+        if result.status == "SUCCESS"
+    ]
+    rollback_results = _map(
+        function=lambda item: operations.delete(
+            body=body, physical_name=item[2], cluster=item[1]
+        ),
+        items=succeeded,
+    )
+    rollback_reason = physical_names_module.calculate_reason(
+        results=zip([name for name, _, _ in succeeded], rollback_results)
+    )
+    if rollback_reason:
+        reason = f"{reason}; rollback failed for {rollback_reason}"
+    return operations.CreateReturn("FAILURE", reason, None)
+
+
+def _calculate_targets(
+    *, clusters: typing.Any, physical_name: str
+) -> typing.Tuple[
+    typing.Optional[str], typing.List[typing.Tuple[str, typing.Any, str]]
+]:
+    """Match the clusters to the physical name on each cluster."""
+    reason = _check_clusters(clusters=clusters)
+    if reason is not None:
+        return reason, []
+    physical_names = physical_names_module.parse(
+        physical_name=physical_name, container=dict
+    )
+    if physical_names is None:
+        return "the physical name does not record the clusters.", []
+    by_name = {
+        clusters_module.calculate_name(cluster=cluster): cluster for cluster in clusters
+    }
+    if set(by_name) != set(physical_names):
+        return (
+            "the clusters of a fan-out resource can not be changed, replace the "
+            "resource instead.",
+            [],
+        )
+    return (
+        None,
+        [(name, by_name[name], physical_names[name]) for name in physical_names],
+    )
+
+
+def _apply(
+    *,
+    operation: typing.Callable,
+    body: typing.Dict[str, typing.Any],
+    physical_name: str,
+    clusters: typing.Any,
+) -> operations.ExistsReturn:
+    """Apply an operation on an existing resource to every cluster in parallel."""
+    reason, targets = _calculate_targets(clusters=clusters, physical_name=physical_name)
+    if reason is not None:
+        return operations.ExistsReturn("FAILURE", reason)
+    results = _map(
+        function=lambda target: operation(
+            body=body, physical_name=target[2], cluster=target[1]
+        ),
+        items=targets,
+    )
+    reason = physical_names_module.calculate_reason(
+        results=zip([name for name, _, _ in targets], results)
+    )
+    if reason:
+        return operations.ExistsReturn("FAILURE", reason)
+    return operations.ExistsReturn("SUCCESS", None)
+
+
+def update(
+    *, body: typing.Dict[str, typing.Any], physical_name: str, clusters: typing.Any
+) -> operations.ExistsReturn:
+    """
+    Update the body on every cluster in parallel.
+
+    Args:
+        body: The body to update.
+        physical_name: The fan-out physical name.
+        clusters: The value of the clusters property.
+
+    Returns:
+        Information about the outcome of the operation.
+
+    """
+    return _apply(
+        operation=operations.update,
+        body=body,
+        physical_name=physical_name,
+        clusters=clusters,
+    )
+
+
+def delete(
+    *, body: typing.Dict[str, typing.Any], physical_name: str, clusters: typing.Any
+) -> operations.ExistsReturn:
+    """
+    Delete the body from every cluster in parallel.
+
+    Args:
+        body: The body to delete.
+        physical_name: The fan-out physical name.
+        clusters: The value of the clusters property.
+
+    Returns:
+        Information about the outcome of the operation.
+
+    """
+    return _apply(
+        operation=operations.delete,
+        body=body,
+        physical_name=physical_name,
+        clusters=clusters,
+    )
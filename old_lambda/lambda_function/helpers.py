@@ -1,11 +1,20 @@
 """Helpers for lambda function."""
 
+import functools
+import json
+import os
 import re
 import typing
 
 from kubernetes import client
 
+from . import clusters
+from . import connections
+from . import credentials
 from . import exceptions
+from . import protobuf
+from . import rest
+from . import tracing
 
 
 def calculate_client(*, api_version: str) -> str:
@@ -67,25 +76,162 @@ class GetFunctionReturn(typing.NamedTuple):
     namespaced: bool
 
 
-def get_function(*, api_version: str, kind: str, operation: str) -> GetFunctionReturn:
+# The API client and API instances shared across invocations so that they share one
+# connection pool, the API instances are keyed by the client module name
+_API_CLIENT: typing.Optional[client.ApiClient] = None
+_APIS: typing.Dict[str, typing.Any] = {}
+
+
+def get_api_client() -> client.ApiClient:
+    """
+    Get the shared API client, creating it if required.
+
+    The credentials are checked on every call so that a token which expired while
+    the container was frozen is refreshed before it is used.
+
+    Returns:
+        The shared API client.
+
+    """
+    global _API_CLIENT  # pylint: disable=global-statement
+    configuration = credentials.get_configuration()
+    if _API_CLIENT is None:
+        _API_CLIENT = connections.create_api_client(configuration=configuration)
+    return _API_CLIENT
+
+
+def get_api(*, module_name: str) -> typing.Any:
+    """
+    Get the shared instance of a client API, creating it if required.
+
+    Args:
+        module_name: The name of the kubernetes client module.
+
+    Returns:
+        The instance of the client API.
+
+    """
+    api_client = get_api_client()
+    api = _APIS.get(module_name)
+    if api is None:
+        api = getattr(client, module_name)(api_client=api_client)
+        _APIS[module_name] = api
+    return api
+
+
+def clear_apis() -> None:
+    """Remove the shared API client and instances, for example after loading config."""
+    global _API_CLIENT  # pylint: disable=global-statement
+    _API_CLIENT = None
+    _APIS.clear()
+
+
+class ResolveFunctionReturn(typing.NamedTuple):
+    """Structure of resolve function return value."""
+
+    module_name: str
+    function_name: str
+
+
+@functools.lru_cache(maxsize=None)
+def resolve_function(
+    *, api_version: str, kind: str, operation: str
+) -> ResolveFunctionReturn:
+    """
+    Resolve the client module and function names, memoized as the dispatch table.
+
+    Args:
+        api_version: The version of the api.
+        kind: The kind of resource.
+        operation: The operation to perform.
+
+    Returns:
+        The name of the client module and the name of the function on it.
+
+    """
+    module_name = calculate_client(api_version=api_version)
+    function_name = calculate_function_name(
+        kind=kind, operation=operation, module_name=module_name
+    )
+    return ResolveFunctionReturn(module_name, function_name)
+
+
+def build_dispatch_table(
+    *, group_version_kinds: typing.Iterable[typing.Tuple[str, str]]
+) -> None:
+    """
+    Resolve the functions and create the client APIs ahead of any request.
+
+    Args:
+        group_version_kinds: The api version and kind combinations to resolve.
+
+    """
+    for api_version, kind in group_version_kinds:
+        for operation in ["create", "update", "delete"]:
+            module_name, _ = resolve_function(
+                api_version=api_version, kind=kind, operation=operation
+            )
+        get_api(module_name=module_name)
+
+
+# The backends that can be selected with the KUBERNETES_BACKEND environment variable
+BACKENDS = ("client", "rest")
+
+
+def get_backend_name() -> str:
+    """
+    Get the name of the selected backend.
+
+    Returns:
+        The value of the KUBERNETES_BACKEND environment variable, client by default.
+
+    """
+    backend = os.environ.get("KUBERNETES_BACKEND", "client")
+    if backend not in BACKENDS:
+        raise exceptions.BackendUnknownError(backend)
+    return backend
+
+
+@tracing.traced(name="helpers.get_function")
+def get_function(
+    *, api_version: str, kind: str, operation: str, cluster: typing.Any = None
+) -> GetFunctionReturn:
     """
     Get the function to return and whether it is namespaced.
 
+    The function comes from the generated client or, if the rest backend is
+    selected, calls the REST API directly with the same arguments.
+
     Args:
         api_version: The version of the api.
         kind: The kind of resource to create.
         operation: The operation to perform.
+        cluster: The value of the cluster property, if None the default cluster is
+            used.
 
     Returns:
         The function to execute and whether it is namespaced.
 
     """
-    client_module_name = calculate_client(api_version=api_version)
-    function_name = calculate_function_name(
-        kind=kind, operation=operation, module_name=client_module_name
+    if get_backend_name() == "rest":
+        if cluster is None:
+            api_client = get_api_client()
+        else:
+            api_client = clusters.get_registry().get_api_client(cluster=cluster)
+        client_function, namespaced = rest.get_backend(
+            api_client=api_client
+        ).get_function(api_version=api_version, kind=kind, operation=operation)
+        return GetFunctionReturn(client_function, namespaced)
+
+    module_name, function_name = resolve_function(
+        api_version=api_version, kind=kind, operation=operation
     )
-    client_module = getattr(client, client_module_name)
-    client_function = getattr(client_module(), function_name)
+    if cluster is None:
+        api = get_api(module_name=module_name)
+    else:
+        api_client = clusters.get_registry().get_api_client(cluster=cluster)
+        api = getattr(client, module_name)(api_client=api_client)
+    client_function = getattr(api, function_name)
     return GetFunctionReturn(client_function, "namespaced" in function_name)
 
 
@@ -139,3 +285,53 @@ def get_kind(*, body: typing.Dict[str, typing.Any]) -> str:
     if kind is None:
         raise exceptions.KindMissingError
     return kind
+
+
+class MetadataReturn(typing.NamedTuple):
+    """
+    Structure of the read_metadata return value.
+
+    Attrs:
+        name: The name of the object.
+        namespace: The namespace of the object, None if it is not namespaced.
+
+    """
+
+    name: typing.Optional[str]
+    namespace: typing.Optional[str]
+
+
+# The rest backend reads its responses the same way and can not import helpers
+read = rest.read
+
+
+def read_metadata(*, response: typing.Any) -> MetadataReturn:
+    """
+    Read only the metadata from a raw response.
+
+    Skips deserializing the whole object into the generated model classes. Both
+    JSON and protobuf encoded responses are read.
+
+    Raise ResponseDecodeError if a JSON response is not an object, like the HTML
+    page of a proxy, and ProtobufDecodeError if a protobuf response can not be
+    decoded.
+
+    Args:
+        response: The response of a client function called with
+            _preload_content=False.
+
+    Returns:
+        The name and namespace of the object.
+
+    """
+    data = read(response=response)
+    if protobuf.is_protobuf(content_type=response.headers.get("Content-Type")):
+        return MetadataReturn(*protobuf.decode_metadata(data=data))
+    try:
+        body = json.loads(data)
+    except ValueError as exc:
+        raise exceptions.ResponseDecodeError(exc) from exc
+    if not isinstance(body, dict):
+        raise exceptions.ResponseDecodeError("the body is not an object")
+    metadata = body.get("metadata") or {}
+    return MetadataReturn(metadata.get("name"), metadata.get("namespace"))
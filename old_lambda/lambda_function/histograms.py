@@ -0,0 +1,294 @@
+"""Aggregate latencies and retries across warm invocations into log-scale histograms."""
+
+import array
+import functools
+import json
+import math
+import os
+import threading
+import time
+import typing
+
+# The number of buckets, bucket 0 holds 0 and bucket i holds values up to 2 ** (i - 1)
+# except for the last one that holds everything larger
+BUCKET_COUNT = 20
+# The quantiles of each histogram in the summary
+QUANTILES = (0.5, 0.9, 0.99)
+# The seconds between summaries when HISTOGRAM_FLUSH_INTERVAL is not set
+DEFAULT_FLUSH_INTERVAL = 60.0
+
+
+def is_enabled() -> bool:
+    """
+    Check whether latencies are aggregated.
+
+    Returns:
+        Whether the LATENCY_HISTOGRAMS environment variable is not false.
+
+    """
+    return os.environ.get("LATENCY_HISTOGRAMS", "true").lower() != "false"
+
+
+def get_flush_interval() -> float:
+    """
+    Get the seconds between summaries.
+
+    Returns:
+        The value of the HISTOGRAM_FLUSH_INTERVAL environment variable.
+
+    """
+    return float(os.environ.get("HISTOGRAM_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL))
+
+
+def calculate_bucket(*, value: float) -> int:
+    """
+    Calculate the bucket of a value.
+
+    Args:
+        value: The value, like milliseconds or a number of retries.
+
+    Returns:
+        The index of the smallest bucket whose upper bound is at least the value.
+
+    """
+    if value <= 0:
+        return 0
+    return min(BUCKET_COUNT - 1, 1 + max(0, math.ceil(math.log2(value))))
+
+
+def calculate_upper_bound(*, bucket: int) -> float:
+    """
+    Calculate the upper bound of a bucket.
+
+    Args:
+        bucket: The index of the bucket.
+
+    Returns:
+        The largest value in the bucket, infinity for the last bucket.
+
+    """
+    if bucket == 0:
+        return 0.0
+    if bucket == BUCKET_COUNT - 1:
+        return math.inf
+    return float(2 ** (bucket - 1))
+
+
+class Histogram:
+    """Counts of values in fixed log-scale buckets."""
+
+    def __init__(self) -> None:
+        """Construct."""
+        self.counts = array.array("Q", bytes(8 * BUCKET_COUNT))
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, *, value: float) -> None:
+        """
+        Add a value.
+
+        Args:
+            value: The value.
+
+        """
+        self.counts[calculate_bucket(value=value)] += 1
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    def calculate_quantile(self, *, quantile: float) -> float:
+        """
+        Estimate a quantile as the upper bound of the bucket it falls in.
+
+        Args:
+            quantile: The quantile between 0 and 1.
+
+        Returns:
+            The estimate, at most the largest value that was added.
+
+        """
+        rank = quantile * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(calculate_upper_bound(bucket=bucket), self.maximum)
+        return self.maximum
+
+    def summarize(self) -> typing.Dict[str, typing.Any]:
+        """
+        Summarize the histogram.
+
+        Returns:
+            The count, sum, maximum, quantiles and the counts of every bucket up to
+            the last one that is not empty.
+
+        """
+        last = max((idx for idx, count in enumerate(self.counts) if count), default=0)
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.maximum,
+            **{
+                f"p{round(quantile * 100)}": self.calculate_quantile(quantile=quantile)
+                for quantile in QUANTILES
+            },
+            "buckets": self.counts[: last + 1].tolist(),
+        }
+
+
+class Labels(typing.NamedTuple):
+    """
+    Structure of what a histogram aggregates.
+
+    Attrs:
+        name: What is measured, like kubernetes_ms or response_retries.
+        api_version: The Kubernetes API version of the body.
+        kind: The kind of the body.
+        operation: The operation, create, update or delete.
+
+    """
+
+    name: str
+    api_version: str
+    kind: str
+    operation: str
+
+
+class Registry:
+    """The histograms of every label combination since the last summary."""
+
+    def __init__(self) -> None:
+        """Construct."""
+        self._histograms: typing.Dict[Labels, Histogram] = {}
+        self._lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    def record(self, *, labels: Labels, value: float) -> None:
+        """
+        Record a value.
+
+        Args:
+            labels: What the value measures.
+            value: The value.
+
+        """
+        with self._lock:
+            histogram = self._histograms.get(labels)
+            if histogram is None:
+                histogram = self._histograms[labels] = Histogram()
+            histogram.add(value=value)
+
+    def flush(self, *, now: float) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """
+        Take the summary of every histogram and start over.
+
+        Args:
+            now: The monotonic time.
+
+        Returns:
+            The summary record or None if nothing was recorded.
+
+        """
+        with self._lock:
+            histograms, self._histograms = self._histograms, {}
+            interval, self.last_flush = now - self.last_flush, now
+        if not histograms:
+            return None
+        return {
+            "histograms": [
+                {
+                    "name": labels.name,
+                    "apiVersion": labels.api_version,
+                    "kind": labels.kind,
+                    "operation": labels.operation,
+                    **histogram.summarize(),
+                }
+                for labels, histogram in histograms.items()
+            ],
+            "interval": interval,
+        }
+
+
+# The registry lives as long as the container so that warm invocations add to it
+_REGISTRY = Registry()
+
+
+def get_registry() -> Registry:
+    """
+    Get the registry shared by every invocation.
+
+    Returns:
+        The registry.
+
+    """
+    return _REGISTRY
+
+
+def count_retries(*, response: typing.Any) -> int:
+    """
+    Count the retries urllib3 made before a response.
+
+    Args:
+        response: The urllib3 response.
+
+    Returns:
+        The number of retries, 0 if the response does not record them.
+
+    """
+    history = getattr(getattr(response, "retries", None), "history", None)
+    return len(history) if isinstance(history, tuple) else 0
+
+
+def instrument(
+    *,
+    function: typing.Callable[..., typing.Any],
+    name: str,
+    api_version: str,
+    kind: str,
+    operation: str,
+) -> typing.Callable[..., typing.Any]:
+    """
+    Wrap a function that sends a request to record its latency and retries.
+
+    Args:
+        function: The function returning the urllib3 response.
+        name: The prefix of the names of the histograms.
+        api_version: The Kubernetes API version of the body.
+        kind: The kind of the body.
+        operation: The operation.
+
+    Returns:
+        The wrapped function or the function itself if histograms are disabled.
+
+    """
+    if not is_enabled():
+        return function
+    latency = Labels(f"{name}_ms", api_version, kind, operation)
+    retries = Labels(f"{name}_retries", api_version, kind, operation)
+
+    @functools.wraps(function)
+    def instrumented(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        start = time.perf_counter()
+        response = None
+        try:
+            response = function(*args, **kwargs)
+            return response
+        finally:
+            registry = get_registry()
+            registry.record(labels=latency, value=(time.perf_counter() - start) * 1000)
+            registry.record(labels=retries, value=count_retries(response=response))
+
+    return instrumented
+
+
+def flush_if_due() -> None:
+    """Print the summary as one line if the flush interval has passed since the last."""
+    registry = get_registry()
+    now = time.monotonic()
+    if now - registry.last_flush < get_flush_interval():
+        return
+    record = registry.flush(now=now)
+    if record is not None:
+        print(json.dumps(record))
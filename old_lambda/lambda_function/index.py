@@ -1,20 +1,41 @@
 """Handle CloudFormation requests."""
 
 import dataclasses
-import json
 import typing
 
-import urllib3
-
+from . import bundles
+from . import clusters as clusters_module
 from . import exceptions
+from . import fanout
+from . import histograms
+from . import manifests
+from . import metrics
 from . import operations
+from . import physical_names
+from . import prewarm
+from . import profiler
+from . import response
+from . import schemas
+from . import tracing
+from . import validation
 
 # A physical name used for when failures occur
 FAIL_PHYSICAL_NAME_PREFIX = "[FAIL]"
+# The property CloudFormation adds with the ARN of the function, not part of the body
+SERVICE_TOKEN_PROPERTY = "ServiceToken"
+# The properties that select the cluster or clusters, they are not part of the body
+CLUSTER_PROPERTY = "cluster"
+CLUSTERS_PROPERTY = "clusters"
+# The property that references a manifest in S3 to use as the body
+MANIFEST_PROPERTY = "manifest"
+# The property with a gzip compressed and base64 encoded manifest or bundle
+COMPRESSED_MANIFEST_PROPERTY = "compressedManifest"
+# The property with one or more YAML manifests as a string
+YAML_MANIFEST_PROPERTY = "yamlManifest"
 
 
 @dataclasses.dataclass
-class Parameters:
+class Parameters:  # pylint: disable=too-many-instance-attributes
     """Expected parameters for the lambda function."""
 
     request_type: str
@@ -24,6 +45,11 @@ class Parameters:
     request_id: str
     logical_resource_id: str
     physical_resource_id: typing.Optional[str]
+    cluster: typing.Any = None
+    clusters: typing.Any = None
+    manifest: typing.Any = None
+    compressed_manifest: typing.Any = None
+    yaml_manifest: typing.Any = None
 
 
 def parameters_from_event(*, event: typing.Dict[str, typing.Any]) -> Parameters:
@@ -70,6 +96,14 @@ def parameters_from_event(*, event: typing.Dict[str, typing.Any]) -> Parameters:
             "LogicalResourceId is a required property in the event."
         )
     physical_resource_id = event.get("PhysicalResourceId")
+    # Separating the service token, cluster or clusters from the body
+    resource_properties = dict(resource_properties)
+    resource_properties.pop(SERVICE_TOKEN_PROPERTY, None)
+    cluster = resource_properties.pop(CLUSTER_PROPERTY, None)
+    clusters = resource_properties.pop(CLUSTERS_PROPERTY, None)
+    manifest = resource_properties.pop(MANIFEST_PROPERTY, None)
+    compressed_manifest = resource_properties.pop(COMPRESSED_MANIFEST_PROPERTY, None)
+    yaml_manifest = resource_properties.pop(YAML_MANIFEST_PROPERTY, None)
 
     return Parameters(
         request_type,
@@ -79,13 +113,43 @@ def parameters_from_event(*, event: typing.Dict[str, typing.Any]) -> Parameters:
         request_id,
         logical_resource_id,
         physical_resource_id,
+        cluster,
+        clusters,
+        manifest,
+        compressed_manifest,
+        yaml_manifest,
     )
 
 
 def lambda_handler(event, _context):
     """Handle CLoudFormation custom resource requests."""
+    # Answering warm-up pings before anything else
+    if prewarm.is_warm_up_event(event=event):
+        return prewarm.handle_warm_up(event=event)
+
+    with profiler.profile(request_id=event.get("RequestId")), tracing.trace(
+        event=event
+    ):
+        metrics.start(request_type=event.get("RequestType"))
+        try:
+            _handle(event=event)
+        finally:
+            metrics.emit()
+            histograms.flush_if_due()
+    return None
+
+
+def _handle(*, event: typing.Dict[str, typing.Any]) -> None:
+    """
+    Handle a CloudFormation request and send the response.
+
+    Args:
+        event: The details for the lambda event.
+
+    """
     # Checking that required keys are in the event
-    parameters = parameters_from_event(event=event)
+    with metrics.phase(name="parse"):
+        parameters = parameters_from_event(event=event)
     response_body: typing.Dict[str, str] = {
         "StackId": parameters.stack_id,
         "RequestId": parameters.request_id,
@@ -104,10 +168,154 @@ def lambda_handler(event, _context):
         )
 
     # Sending response
-    pool = urllib3.PoolManager(cert_reqs="CERT_REQUIRED")
-    pool.request(
-        "PUT", parameters.response_url, body=json.dumps(response_body).encode("utf-8")
+    dimensions = metrics.get_dimensions()
+    send = histograms.instrument(
+        function=response.send,
+        name="response",
+        api_version=dimensions["ApiVersion"],
+        kind=dimensions["Kind"],
+        operation=parameters.request_type.lower(),
     )
+    with metrics.phase(name="response"):
+        send(url=parameters.response_url, body=response_body)
+
+
+def _calculate_body(*, parameters: Parameters) -> manifests.BodyOrBundle:
+    """
+    Calculate the body from the properties or the manifest they reference or contain.
+
+    The strings CloudFormation makes of numbers and booleans are coerced back using
+    the schema of the kind.
+
+    Raise ManifestConflictError if more than one manifest property is set and
+    BundleClustersError if a bundle is combined with the clusters property.
+
+    Args:
+        parameters: Event parameters.
+
+    Returns:
+        The manifest if the manifest property is set, the manifest or the bodies of
+        the bundle if the compressedManifest or yamlManifest property is set and
+        otherwise the properties.
+
+    """
+    sources = (
+        parameters.manifest,
+        parameters.compressed_manifest,
+        parameters.yaml_manifest,
+    )
+    if sum(source is not None for source in sources) > 1:
+        raise exceptions.ManifestConflictError
+    body: manifests.BodyOrBundle
+    if parameters.manifest is not None:
+        body = manifests.fetch(value=parameters.manifest)
+    elif parameters.compressed_manifest is not None:
+        body = manifests.parse_bundle(
+            data=manifests.decompress(value=parameters.compressed_manifest)
+        )
+    elif parameters.yaml_manifest is not None:
+        body = manifests.parse_yaml(value=parameters.yaml_manifest)
+    else:
+        body = parameters.resource_properties
+    metrics.set_kind(body=body)
+    if not isinstance(body, list):
+        return schemas.coerce(body=body)
+    if parameters.clusters is not None:
+        raise exceptions.BundleClustersError
+    return [schemas.coerce(body=item) for item in body]
+
+
+def _validate(*, body: manifests.BodyOrBundle) -> None:
+    """
+    Validate the body or every body of a bundle if validation is enabled.
+
+    Args:
+        body: The body or bodies about to be created or updated.
+
+    """
+    if not validation.is_enabled():
+        return
+    for item in body if isinstance(body, list) else [body]:
+        validation.validate(body=item)
+
+
+def _calculate_physical_name(*, parameters: Parameters, physical_name: str) -> str:
+    """
+    Calculate the physical resource id, which records the cluster of the object.
+
+    Args:
+        parameters: Event parameters.
+        physical_name: The physical name of the object, or the fan-out physical name
+            that records the clusters.
+
+    Returns:
+        The physical resource id.
+
+    """
+    if parameters.clusters is not None:
+        return physical_name
+    return clusters_module.calculate_physical_name(
+        cluster=parameters.cluster, physical_name=physical_name
+    )
+
+
+def _is_moved(
+    *, parameters: Parameters, recorded: clusters_module.PhysicalName
+) -> bool:
+    """Calculate whether the cluster property no longer selects the recorded one."""
+    if parameters.clusters is not None:
+        return False
+    cluster = (
+        None
+        if parameters.cluster is None
+        else clusters_module.calculate_name(cluster=parameters.cluster)
+    )
+    return cluster != recorded.cluster
+
+
+def _replace(
+    *, parameters: Parameters, body: manifests.BodyOrBundle, physical_name: str
+) -> operations.CreateReturn:
+    """
+    Create the body on the cluster the resource moved to.
+
+    A rollback moves the resource back to a cluster its object is still on, since
+    CloudFormation only deletes it on cleanup, so if the create fails the object
+    there is updated instead.
+
+    Args:
+        parameters: Event parameters.
+        body: The body or bodies of the bundle.
+        physical_name: The physical name of the object on the cluster it moved from.
+
+    Returns:
+        Information about the outcome of the operation.
+
+    """
+    if isinstance(body, list):
+        result = bundles.create(bodies=body, cluster=parameters.cluster)
+    else:
+        result = operations.create(body=body, cluster=parameters.cluster)
+    if result.status == "SUCCESS":
+        return result
+    # Only an object the body could have been created as is taken over
+    recorded_fanout = physical_names.parse(physical_name=physical_name, container=dict)
+    recorded_bundle = physical_names.parse(physical_name=physical_name, container=list)
+    if recorded_fanout is not None or isinstance(body, list) != (
+        recorded_bundle is not None
+    ):
+        return result
+    if isinstance(body, list):
+        exists_result = bundles.update(
+            bodies=body, physical_name=physical_name, cluster=parameters.cluster
+        )
+    else:
+        exists_result = operations.update(
+            body=body, physical_name=physical_name, cluster=parameters.cluster
+        )
+    if exists_result.status == "SUCCESS":
+        return operations.CreateReturn("SUCCESS", None, physical_name)
+    return result
 
 
 def _handle_create(
@@ -121,14 +329,27 @@ def _handle_create(
         response_body: The body being assembled for the response.
 
     """
-    result = operations.create(body=parameters.resource_properties)
+    try:
+        with metrics.phase(name="parse"):
+            body = _calculate_body(parameters=parameters)
+            _validate(body=body)
+        if isinstance(body, list):
+            result = bundles.create(bodies=body, cluster=parameters.cluster)
+        elif parameters.clusters is not None:
+            result = fanout.create(body=body, clusters=parameters.clusters)
+        else:
+            result = operations.create(body=body, cluster=parameters.cluster)
+    except exceptions.ParentError as exc:
+        result = operations.CreateReturn("FAILURE", str(exc), None)
     response_body["Status"] = result.status
     if result.physical_name is not None:
-        response_body["PhysicalResourceId"] = result.physical_name
+        response_body["PhysicalResourceId"] = _calculate_physical_name(
+            parameters=parameters, physical_name=result.physical_name
+        )
     if result.status == "FAILURE":
-        response_body[
-            "PhysicalResourceId"
-        ] = f"{FAIL_PHYSICAL_NAME_PREFIX}{parameters.logical_resource_id}"
+        response_body["PhysicalResourceId"] = (
+            f"{FAIL_PHYSICAL_NAME_PREFIX}{parameters.logical_resource_id}"
+        )
     if result.reason is not None:
         response_body["Reason"] = result.reason
 
@@ -149,12 +370,45 @@ def _handle_update(
         raise exceptions.MalformedEventError(
             "PhysicalResourceId is required for Update event."
         )
-    result = operations.update(
-        body=parameters.resource_properties,
-        physical_name=parameters.physical_resource_id,
-    )
+    physical_resource_id = parameters.physical_resource_id
+    recorded = clusters_module.parse_physical_name(physical_name=physical_resource_id)
+    try:
+        with metrics.phase(name="parse"):
+            body = _calculate_body(parameters=parameters)
+            _validate(body=body)
+        # Changing the cluster replaces the resource so CloudFormation deletes the
+        # object from the old cluster
+        if _is_moved(parameters=parameters, recorded=recorded):
+            create_result = _replace(
+                parameters=parameters, body=body, physical_name=recorded.physical_name
+            )
+            result = operations.ExistsReturn(create_result.status, create_result.reason)
+            if create_result.physical_name is not None:
+                physical_resource_id = _calculate_physical_name(
+                    parameters=parameters, physical_name=create_result.physical_name
+                )
+        elif isinstance(body, list):
+            result = bundles.update(
+                bodies=body,
+                physical_name=recorded.physical_name,
+                cluster=parameters.cluster,
+            )
+        elif parameters.clusters is not None:
+            result = fanout.update(
+                body=body,
+                physical_name=physical_resource_id,
+                clusters=parameters.clusters,
+            )
+        else:
+            result = operations.update(
+                body=body,
+                physical_name=recorded.physical_name,
+                cluster=parameters.cluster,
+            )
+    except exceptions.ParentError as exc:
+        result = operations.ExistsReturn("FAILURE", str(exc))
     response_body["Status"] = result.status
-    response_body["PhysicalResourceId"] = parameters.physical_resource_id
+    response_body["PhysicalResourceId"] = physical_resource_id
     if result.reason is not None:
         response_body["Reason"] = result.reason
 
@@ -179,11 +433,38 @@ def _handle_delete(
     # Checking for delete due to failed create
     if parameters.physical_resource_id.startswith(FAIL_PHYSICAL_NAME_PREFIX):
         response_body["Status"] = "SUCCESS"
-    else:
-        result = operations.delete(
-            body=parameters.resource_properties,
-            physical_name=parameters.physical_resource_id,
-        )
-        response_body["Status"] = result.status
-        if result.reason is not None:
-            response_body["Reason"] = result.reason
+        return
+    recorded = clusters_module.parse_physical_name(
+        physical_name=parameters.physical_resource_id
+    )
+    try:
+        with metrics.phase(name="parse"):
+            body = _calculate_body(parameters=parameters)
+        if isinstance(body, list):
+            result = bundles.delete(
+                bodies=body,
+                physical_name=recorded.physical_name,
+                cluster=parameters.cluster,
+            )
+        elif parameters.clusters is not None:
+            result = fanout.delete(
+                body=body,
+                physical_name=parameters.physical_resource_id,
+                clusters=parameters.clusters,
+            )
+        else:
+            result = operations.delete(
+                body=body,
+                physical_name=recorded.physical_name,
+                cluster=parameters.cluster,
+            )
+    except exceptions.ParentError as exc:
+        result = operations.ExistsReturn("FAILURE", str(exc))
+    response_body["Status"] = result.status
+    if result.reason is not None:
+        response_body["Reason"] = result.reason
+
+
+# Doing the set up on import since Lambda gives the init phase boosted CPU
+if prewarm.is_enabled():
+    prewarm.prewarm()
@@ -0,0 +1,509 @@
+"""Load manifests inlined in the properties or referenced from S3 with a cache."""
+
+import base64
+import binascii
+import collections
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import typing
+import urllib.parse
+import zlib
+
+import yaml
+
+from . import exceptions
+
+# The directory manifests are cached in when MANIFEST_CACHE_DIRECTORY is not set
+DEFAULT_CACHE_DIRECTORY = os.path.join(tempfile.gettempdir(), "manifests")
+# The most bytes a compressed manifest may expand to when MAX_MANIFEST_SIZE is not set
+DEFAULT_MAX_MANIFEST_SIZE = 16 << 20
+# The number of base64 characters decoded at a time, a multiple of 4
+_DECODE_CHUNK_SIZE = 1 << 16
+# The number of parsed YAML manifests kept when YAML_CACHE_SIZE is not set
+DEFAULT_YAML_CACHE_SIZE = 32
+# The libyaml loader is many times faster than the pure Python one when it is built
+LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+Body = typing.Dict[str, typing.Any]
+BodyOrBundle = typing.Union[Body, typing.List[Body]]
+
+
+class Reference(typing.NamedTuple):
+    """
+    Structure of a reference to a manifest.
+
+    Attrs:
+        bucket: The name of the bucket.
+        key: The key of the manifest in the bucket.
+        version_id: The version of the manifest, None for the latest version.
+
+    """
+
+    bucket: str
+    key: str
+    version_id: typing.Optional[str]
+
+
+def reference_from_property(*, value: typing.Any) -> Reference:
+    """
+    Construct the reference from the value of the manifest property.
+
+    Raise ManifestMalformedError if the value is not a reference.
+
+    Args:
+        value: An s3://<bucket>/<key> URL or a mapping with a bucket, key and
+            optionally a versionId.
+
+    Returns:
+        The reference to the manifest.
+
+    """
+    if isinstance(value, str) and value.startswith("s3://"):
+        bucket, _, key = value[len("s3://") :].partition("/")
+        if bucket and key:
+            return Reference(bucket, key, None)
+    if (
+        isinstance(value, dict)
+        and isinstance(value.get("bucket"), str)
+        and isinstance(value.get("key"), str)
+    ):
+        return Reference(value["bucket"], value["key"], value.get("versionId"))
+    raise exceptions.ManifestMalformedError
+
+
+def calculate_cache_key(*, reference: Reference) -> str:
+    """
+    Calculate the key of a manifest in the cache.
+
+    Args:
+        reference: The reference to the manifest.
+
+    Returns:
+        A hash of the reference that is safe to use as a file name.
+
+    """
+    return hashlib.sha256(json.dumps(list(reference)).encode("utf-8")).hexdigest()
+
+
+def _load(*, data: bytes) -> typing.Any:
+    """Load a JSON or YAML document."""
+    try:
+        return json.loads(data)
+    except ValueError:
+        try:
+            return yaml.load(data, Loader=LOADER)
+        except yaml.YAMLError as exc:
+            raise exceptions.ManifestMalformedError from exc
+
+
+def parse(*, data: bytes) -> typing.Dict[str, typing.Any]:
+    """
+    Parse a JSON or YAML manifest.
+
+    Raise ManifestMalformedError if the manifest is not a mapping.
+
+    Args:
+        data: The content of the manifest.
+
+    Returns:
+        The body defined by the manifest.
+
+    """
+    body = _load(data=data)
+    if not isinstance(body, dict):
+        raise exceptions.ManifestMalformedError
+    return body
+
+
+def _expand(*, loaded: typing.Any) -> typing.Optional[typing.List[typing.Any]]:
+    """Get the items of a bundle, None if the document is not a bundle."""
+    if isinstance(loaded, dict) and loaded.get("kind") == "List":
+        items = loaded.get("items")
+        return items if isinstance(items, list) else [items]
+    if isinstance(loaded, list):
+        return loaded
+    return None
+
+
+def _check_bodies(*, bodies: typing.List[typing.Any]) -> typing.List[Body]:
+    """Check that every item of a bundle is a mapping."""
+    if not all(isinstance(body, dict) for body in bodies):
+        raise exceptions.ManifestMalformedError
+    return bodies
+
+
+def parse_bundle(*, data: bytes) -> BodyOrBundle:
+    """
+    Parse a JSON or YAML manifest or manifest bundle.
+
+    A bundle is a list of mappings or a mapping of the kind List with the mappings as
+    its items, like kubectl accepts.
+
+    Raise ManifestMalformedError if the manifest is neither.
+
+    Args:
+        data: The content of the manifest or bundle.
+
+    Returns:
+        The body defined by a manifest or the bodies in the order of a bundle.
+
+    """
+    loaded = _load(data=data)
+    bodies = _expand(loaded=loaded)
+    if bodies is not None:
+        return _check_bodies(bodies=bodies)
+    if not isinstance(loaded, dict):
+        raise exceptions.ManifestMalformedError
+    return loaded
+
+
+def _load_documents(*, value: str) -> BodyOrBundle:
+    """Load the documents of a YAML stream one at a time into a body or bundle."""
+    bodies: typing.List[Body] = []
+    is_bundle = False
+    try:
+        # Each document is checked as soon as it is loaded to fail early
+        for loaded in yaml.load_all(value, Loader=LOADER):
+            if loaded is None:
+                continue
+            expanded = _expand(loaded=loaded)
+            is_bundle = is_bundle or expanded is not None or bool(bodies)
+            bodies.extend(
+                _check_bodies(bodies=[loaded] if expanded is None else expanded)
+            )
+    except yaml.YAMLError as exc:
+        raise exceptions.ManifestMalformedError from exc
+    if not bodies:
+        raise exceptions.ManifestMalformedError
+    return bodies if is_bundle else bodies[0]
+
+
+class _ParsedCache:
+    """Least recently used cache of parsed YAML manifests by content hash."""
+
+    def __init__(self) -> None:
+        """Construct."""
+        self._entries: "collections.OrderedDict[str, BodyOrBundle]" = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, *, key: str) -> typing.Optional[BodyOrBundle]:
+        """Get a parsed manifest, None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, *, key: str, entry: BodyOrBundle) -> None:
+        """Store a parsed manifest, evicting the least recently used ones."""
+        max_size = int(os.environ.get("YAML_CACHE_SIZE", DEFAULT_YAML_CACHE_SIZE))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+_PARSED = _ParsedCache()
+
+
+def parse_yaml(*, value: typing.Any) -> BodyOrBundle:
+    """
+    Parse the value of the yamlManifest property.
+
+    The value is a YAML stream like kubectl accepts. A single document that is not of
+    the kind List defines a body, anything else a bundle in the order of the
+    documents. The result is cached by the hash of the value across invocations, so it
+    must not be modified.
+
+    Raise YamlManifestMalformedError if the value is not such a stream.
+
+    Args:
+        value: The value of the yamlManifest property.
+
+    Returns:
+        The body defined by a single manifest or the bodies in the order of a bundle.
+
+    """
+    if not isinstance(value, str):
+        raise exceptions.YamlManifestMalformedError
+    key = hashlib.sha256(value.encode("utf-8")).hexdigest()
+    parsed = _PARSED.get(key=key)
+    if parsed is None:
+        try:
+            parsed = _load_documents(value=value)
+        except exceptions.ManifestMalformedError as exc:
+            raise exceptions.YamlManifestMalformedError from exc
+        _PARSED.put(key=key, entry=parsed)
+    return parsed
+
+
+def compress(*, data: bytes) -> str:
+    """
+    Compress a manifest or bundle into the value of the compressedManifest property.
+
+    Args:
+        data: The content of the manifest or bundle.
+
+    Returns:
+        The gzip compressed content encoded with base64.
+
+    """
+    buffer = io.BytesIO()
+    # A fixed mtime keeps the value, and so the template, stable across runs
+    with gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) as gzip_file:
+        gzip_file.write(data)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def decompress(*, value: typing.Any) -> bytes:
+    """
+    Decompress the value of the compressedManifest property.
+
+    The value is decoded and decompressed a chunk at a time so that only the
+    decompressed content is held in full. MAX_MANIFEST_SIZE limits its size.
+
+    Raise ManifestDecodeError if the value is not gzip compressed content encoded with
+    base64 or if it expands to more than the limit.
+
+    Args:
+        value: The value of the compressedManifest property.
+
+    Returns:
+        The content of the manifest or bundle.
+
+    """
+    if not isinstance(value, str):
+        raise exceptions.ManifestDecodeError("it must be a base64 string")
+    max_size = int(os.environ.get("MAX_MANIFEST_SIZE", DEFAULT_MAX_MANIFEST_SIZE))
+    # Line breaks would shift the chunks off the 4 character boundaries
+    value = "".join(value.split())
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    buffer = io.BytesIO()
+    try:
+        for start in range(0, len(value), _DECODE_CHUNK_SIZE):
+            chunk = base64.b64decode(
+                value[start : start + _DECODE_CHUNK_SIZE], validate=True
+            )
+            # Asking for one byte more than allowed shows whether the limit is passed
+            buffer.write(decompressor.decompress(chunk, max_size + 1 - buffer.tell()))
+            if buffer.tell() > max_size:
+                raise exceptions.ManifestDecodeError(
+                    f"it expands to more than {max_size} bytes"
+                )
+    except (binascii.Error, zlib.error) as exc:
+        raise exceptions.ManifestDecodeError(exc) from exc
+    if not decompressor.eof:
+        raise exceptions.ManifestDecodeError("the gzip stream is incomplete")
+    return buffer.getvalue()
+
+
+class CacheEntry(typing.NamedTuple):
+    """
+    Structure of a cached manifest.
+
+    Attrs:
+        etag: The ETag of the manifest when it was downloaded.
+        body: The parsed manifest.
+
+    """
+
+    etag: str
+    body: typing.Dict[str, typing.Any]
+
+
+class Cache:
+    """Parsed manifests in memory backed by the downloads on disk keyed by ETag."""
+
+    def __init__(self, *, directory: str) -> None:
+        """
+        Construct.
+
+        Args:
+            directory: The directory to store the downloads in.
+
+        """
+        self._directory = directory
+        self._entries: typing.Dict[str, CacheEntry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, *, key: str) -> typing.Optional[CacheEntry]:
+        """
+        Get a manifest from memory or, after a restart, from disk.
+
+        Args:
+            key: The key of the manifest in the cache.
+
+        Returns:
+            The cached manifest or None if it is not cached.
+
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+
+        directory = os.path.join(self._directory, key)
+        try:
+            # Skipping temporary files left behind by an interrupted download
+            file_names = [
+                name for name in os.listdir(directory) if not name.startswith(".")
+            ]
+        except OSError:
+            return None
+        if len(file_names) != 1:
+            return None
+        with open(os.path.join(directory, file_names[0]), "rb") as in_file:
+            data = in_file.read()
+        try:
+            body = parse(data=data)
+        except exceptions.ManifestMalformedError:
+            return None
+        entry = CacheEntry(urllib.parse.unquote(file_names[0]), body)
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def put(self, *, key: str, etag: str, data: bytes) -> CacheEntry:
+        """
+        Parse a downloaded manifest and store it in memory and on disk.
+
+        Args:
+            key: The key of the manifest in the cache.
+            etag: The ETag of the download.
+            data: The content of the download.
+
+        Returns:
+            The cached manifest.
+
+        """
+        entry = CacheEntry(etag, parse(data=data))
+
+        directory = os.path.join(self._directory, key)
+        os.makedirs(directory, exist_ok=True)
+        file_name = urllib.parse.quote(etag, safe="")
+        # Writing to a temporary file first so that a partial download is never read
+        temp_path = os.path.join(directory, f".{file_name}.tmp")
+        with open(temp_path, "wb") as out_file:
+            out_file.write(data)
+        os.replace(temp_path, os.path.join(directory, file_name))
+        for stale_name in os.listdir(directory):
+            if stale_name != file_name:
+                os.remove(os.path.join(directory, stale_name))
+
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+
+def _create_client():
+    """Create an S3 client, importing boto3 only once it is needed."""
+    import boto3  # pylint: disable=import-outside-toplevel
+    from botocore import config  # pylint: disable=import-outside-toplevel
+
+    endpoint_url = os.environ.get("AWS_ENDPOINT_URL")
+    return boto3.client(
+        "s3",
+        region_name=os.environ.get("AWS_REGION"),
+        endpoint_url=endpoint_url,
+        # Stand-ins for S3 usually only support path style addressing
+        config=config.Config(
+            s3={"addressing_style": "path" if endpoint_url else "auto"}
+        ),
+    )
+
+
+# The S3 client and cache shared across invocations
+_CLIENT: typing.Any = None
+_CACHE: typing.Optional[Cache] = None
+
+
+def _get_client() -> typing.Any:
+    """Get the shared S3 client, creating it if required."""
+    global _CLIENT  # pylint: disable=global-statement
+    if _CLIENT is None:
+        _CLIENT = _create_client()
+    return _CLIENT
+
+
+def get_cache() -> Cache:
+    """
+    Get the shared cache, creating it if required.
+
+    The directory is read from the MANIFEST_CACHE_DIRECTORY environment variable.
+
+    Returns:
+        The shared cache.
+
+    """
+    global _CACHE  # pylint: disable=global-statement
+    if _CACHE is None:
+        _CACHE = Cache(
+            directory=os.environ.get(
+                "MANIFEST_CACHE_DIRECTORY", DEFAULT_CACHE_DIRECTORY
+            )
+        )
+    return _CACHE
+
+
+def reset() -> None:
+    """Discard the shared S3 client and the in memory caches."""
+    global _CLIENT, _CACHE  # pylint: disable=global-statement
+    _CLIENT = None
+    _CACHE = None
+    _PARSED.clear()
+
+
+def fetch(*, value: typing.Any) -> typing.Dict[str, typing.Any]:
+    """
+    Get the body defined by the manifest a manifest property references.
+
+    A cached manifest is revalidated with a conditional GET and reused if it has not
+    changed, a cached manifest with a version is reused without a request.
+
+    Args:
+        value: The value of the manifest property.
+
+    Returns:
+        The body defined by the manifest.
+
+    """
+    # pylint: disable=import-outside-toplevel
+    from botocore import exceptions as botocore_exceptions
+
+    reference = reference_from_property(value=value)
+    key = calculate_cache_key(reference=reference)
+    cache = get_cache()
+    cached = cache.get(key=key)
+    # Versions never change so there is nothing to revalidate
+    if cached is not None and reference.version_id is not None:
+        return cached.body
+
+    kwargs = {"Bucket": reference.bucket, "Key": reference.key}
+    if reference.version_id is not None:
+        kwargs["VersionId"] = reference.version_id
+    if cached is not None:
+        kwargs["IfNoneMatch"] = cached.etag
+    try:
+        response = _get_client().get_object(**kwargs)
+    except botocore_exceptions.ClientError as exc:
+        status = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if cached is not None and status == 304:
+            return cached.body
+        raise exceptions.ManifestFetchError(reference, exc) from exc
+    except botocore_exceptions.BotoCoreError as exc:
+        raise exceptions.ManifestFetchError(reference, exc) from exc
+    return cache.put(key=key, etag=response["ETag"], data=response["Body"].read()).body
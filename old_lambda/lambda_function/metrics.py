@@ -0,0 +1,257 @@
+"""Time the phases of each invocation and emit them as CloudWatch embedded metrics."""
+
+import contextlib
+import json
+import os
+import threading
+import time
+import typing
+
+# The phases of an invocation in the order they happen
+PHASES = ("parse", "resolve", "kubernetes", "response")
+# The value of the dimensions that could not be calculated
+UNKNOWN = "unknown"
+
+
+def is_enabled() -> bool:
+    """
+    Check whether the phase metrics are emitted.
+
+    Returns:
+        Whether the PHASE_METRICS environment variable is not false.
+
+    """
+    return os.environ.get("PHASE_METRICS", "true").lower() != "false"
+
+
+def get_namespace() -> str:
+    """
+    Get the CloudWatch namespace of the metrics.
+
+    Returns:
+        The value of the METRICS_NAMESPACE environment variable.
+
+    """
+    return os.environ.get("METRICS_NAMESPACE", "CloudFormationKubernetes")
+
+
+class Recorder:
+    """Accumulates the durations of the phases of one invocation."""
+
+    def __init__(self, *, request_type: str, enabled: bool = True) -> None:
+        """
+        Construct.
+
+        Args:
+            request_type: The RequestType of the event.
+            enabled: Whether the phases are timed and emitted.
+
+        """
+        self.enabled = enabled
+        self.dimensions = {
+            "RequestType": request_type,
+            "ApiVersion": UNKNOWN,
+            "Kind": UNKNOWN,
+        }
+        self.durations: typing.Dict[str, float] = {}
+        # The totals of other metrics and their units, keyed by the metric name
+        self.counters: typing.Dict[str, typing.Tuple[float, str]] = {}
+        # Fan out records the phases of every cluster from its own thread, the
+        # threads in each phase and when the first of them entered it
+        self._active: typing.Dict[str, typing.Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, *, name: str, seconds: float) -> None:
+        """
+        Add time spent in a phase.
+
+        Args:
+            name: The name of the phase.
+            seconds: The time spent.
+
+        """
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def enter(self, *, name: str, now: float) -> None:
+        """
+        Enter a phase, possibly while other threads are in it.
+
+        Args:
+            name: The name of the phase.
+            now: The time in seconds of the performance counter.
+
+        """
+        with self._lock:
+            threads, started = self._active.get(name, (0, now))
+            self._active[name] = (threads + 1, started)
+
+    def leave(self, *, name: str, now: float) -> None:
+        """
+        Leave a phase, adding the wall time it was entered for once the last leaves.
+
+        Concurrent threads in a phase count once, so a phase never takes longer than
+        the invocation.
+
+        Args:
+            name: The name of the phase.
+            now: The time in seconds of the performance counter.
+
+        """
+        with self._lock:
+            threads, started = self._active.pop(name)
+            if threads > 1:
+                self._active[name] = (threads - 1, started)
+                return
+            self.durations[name] = self.durations.get(name, 0.0) + now - started
+
+    def count(self, *, name: str, value: float, unit: str) -> None:
+        """
+        Add to the total of a metric.
+
+        Args:
+            name: The name of the metric.
+            value: The amount to add.
+            unit: The CloudWatch unit of the metric, like Count or Bytes.
+
+        """
+        with self._lock:
+            total, _ = self.counters.get(name, (0.0, unit))
+            self.counters[name] = (total + value, unit)
+
+    def calculate_record(self, *, timestamp: float) -> typing.Dict[str, typing.Any]:
+        """
+        Calculate the embedded metric format record of the durations.
+
+        Args:
+            timestamp: The time of the invocation in seconds since the epoch.
+
+        Returns:
+            The record with a millisecond metric per phase that was entered followed
+            by the other metrics.
+
+        """
+        values = {
+            _metric_name(name=name): (self.durations[name] * 1000, "Milliseconds")
+            for name in PHASES
+            if name in self.durations
+        }
+        values.update(sorted(self.counters.items()))
+        return {
+            "_aws": {
+                "Timestamp": int(timestamp * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": get_namespace(),
+                        "Dimensions": [list(self.dimensions)],
+                        "Metrics": [
+                            {"Name": name, "Unit": unit}
+                            for name, (_, unit) in values.items()
+                        ],
+                    }
+                ],
+            },
+            **self.dimensions,
+            **{name: value for name, (value, _) in values.items()},
+        }
+
+
+def _metric_name(*, name: str) -> str:
+    """Calculate the metric name of a phase."""
+    return f"{name.capitalize()}Duration"
+
+
+_RECORDER: typing.Optional[Recorder] = None
+
+
+def start(*, request_type: typing.Any) -> None:
+    """
+    Start recording an invocation, its phases are only timed if metrics are enabled.
+
+    Args:
+        request_type: The RequestType of the event, which may be missing.
+
+    """
+    global _RECORDER  # pylint: disable=global-statement
+
+    _RECORDER = Recorder(request_type=str(request_type), enabled=is_enabled())
+
+
+@contextlib.contextmanager
+def phase(*, name: str) -> typing.Iterator[None]:
+    """
+    Time a phase of the invocation, doing nothing when nothing is being recorded.
+
+    Args:
+        name: The name of the phase.
+
+    """
+    recorder = _RECORDER
+    if recorder is None or not recorder.enabled:
+        yield
+        return
+    recorder.enter(name=name, now=time.perf_counter())
+    try:
+        yield
+    finally:
+        recorder.leave(name=name, now=time.perf_counter())
+
+
+def count(*, name: str, value: float, unit: str = "Count") -> None:
+    """
+    Add to the total of a metric of the invocation if it is being recorded.
+
+    Args:
+        name: The name of the metric.
+        value: The amount to add.
+        unit: The CloudWatch unit of the metric.
+
+    """
+    recorder = _RECORDER
+    if recorder is None or not recorder.enabled:
+        return
+    recorder.count(name=name, value=value, unit=unit)
+
+
+def set_kind(*, body: typing.Any) -> None:
+    """
+    Tag the invocation with the api version and kind of the body.
+
+    Args:
+        body: The body or the bodies of a bundle, which are tagged as a v1 List.
+
+    """
+    recorder = _RECORDER
+    if recorder is None:
+        return
+    if isinstance(body, list):
+        api_version, kind = "v1", "List"
+    else:
+        api_version, kind = body.get("apiVersion"), body.get("kind")
+    recorder.dimensions["ApiVersion"] = str(api_version or UNKNOWN)
+    recorder.dimensions["Kind"] = str(kind or UNKNOWN)
+
+
+def get_dimensions() -> typing.Dict[str, str]:
+    """
+    Get the request type, api version and kind of the invocation being recorded.
+
+    Returns:
+        The dimensions, unknown outside of an invocation.
+
+    """
+    recorder = _RECORDER
+    if recorder is None:
+        return {"RequestType": UNKNOWN, "ApiVersion": UNKNOWN, "Kind": UNKNOWN}
+    return dict(recorder.dimensions)
+
+
+def emit() -> None:
+    """Print the record of the invocation as one line and stop recording."""
+    global _RECORDER  # pylint: disable=global-statement
+
+    recorder = _RECORDER
+    _RECORDER = None
+    if recorder is None or not recorder.enabled:
+        return
+    print(json.dumps(recorder.calculate_record(timestamp=time.time())))
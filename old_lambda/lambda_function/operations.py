@@ -6,6 +6,9 @@ import kubernetes
 
 from . import exceptions
 from . import helpers
+from . import histograms
+from . import metrics
+from . import tracing
 
 
 class CreateReturn(typing.NamedTuple):
@@ -26,14 +29,20 @@ class CreateReturn(typing.NamedTuple):
     physical_name: typing.Optional[str]
 
 
-def create(*, body: typing.Dict[str, typing.Any]) -> CreateReturn:
+@tracing.traced(name="operations.create")
+def create(
+    *, body: typing.Dict[str, typing.Any], cluster: typing.Any = None
+) -> CreateReturn:
     """
     Execute create command.
 
-    Assume body has at least metadata with a name.
+    Assume body has at least metadata with a name. Only the metadata is read from the
+    response.
 
     Args:
         body: The body to create.
+        cluster: The value of the cluster property, if None the default cluster is
+            used.
 
     Returns:
         Information about the outcome of the operation.
@@ -42,28 +51,46 @@ def create(*, body: typing.Dict[str, typing.Any]) -> CreateReturn:
     try:
         api_version = helpers.get_api_version(body=body)
         kind = helpers.get_kind(body=body)
+        with metrics.phase(name="resolve"):
+            client_function, namespaced = helpers.get_function(
+                api_version=api_version, kind=kind, operation="create", cluster=cluster
+            )
+        client_function = histograms.instrument(
+            function=client_function,
+            name="kubernetes",
+            api_version=api_version,
+            kind=kind,
+            operation="create",
+        )
+        client_function = tracing.traced(
+            name="kubernetes.create",
+            attributes={"apiVersion": api_version, "kind": kind},
+        )(client_function)
     except exceptions.ParentError as exc:
         return CreateReturn("FAILURE", str(exc), None)
-    client_function, namespaced = helpers.get_function(
-        api_version=api_version, kind=kind, operation="create"
-    )
 
     # Handling non-namespaced cases
     if not namespaced:
         try:
-            response = client_function(body=body)
-            return CreateReturn("SUCCESS", None, response.metadata.name)
-        except kubernetes.client.rest.ApiException as exc:
+            with metrics.phase(name="kubernetes"):
+                metadata = helpers.read_metadata(
+                    response=client_function(body=body, _preload_content=False)
+                )
+            return CreateReturn("SUCCESS", None, metadata.name)
+        except (kubernetes.client.rest.ApiException, exceptions.ParentError) as exc:
             return CreateReturn("FAILURE", str(exc), None)
 
     # Handling namespaced
     namespace = helpers.calculate_namespace(body=body)
     try:
-        response = client_function(body=body, namespace=namespace)
-        return CreateReturn(
-            "SUCCESS", None, f"{response.metadata.namespace}/{response.metadata.name}"
-        )
-    except kubernetes.client.rest.ApiException as exc:
+        with metrics.phase(name="kubernetes"):
+            metadata = helpers.read_metadata(
+                response=client_function(
+                    body=body, namespace=namespace, _preload_content=False
+                )
+            )
+        return CreateReturn("SUCCESS", None, f"{metadata.namespace}/{metadata.name}")
+    except (kubernetes.client.rest.ApiException, exceptions.ParentError) as exc:
         return CreateReturn("FAILURE", str(exc), None)
 
 
@@ -81,7 +108,13 @@ class ExistsReturn(typing.NamedTuple):
     reason: typing.Optional[str]
 
 
-def update(*, body: typing.Dict[str, typing.Any], physical_name: str) -> ExistsReturn:
+@tracing.traced(name="operations.update")
+def update(
+    *,
+    body: typing.Dict[str, typing.Any],
+    physical_name: str,
+    cluster: typing.Any = None,
+) -> ExistsReturn:
     """
     Execute update command.
 
@@ -90,6 +123,8 @@ def update(*, body: typing.Dict[str, typing.Any], physical_name: str) -> ExistsR
     Args:
         body: The body to update.
         physical_name: The namespace (if namespaced) and name of the resource.
+        cluster: The value of the cluster property, if None the default cluster is
+            used.
 
     Returns:
         Information about the outcome of the operation.
@@ -98,30 +133,58 @@ def update(*, body: typing.Dict[str, typing.Any], physical_name: str) -> ExistsR
     try:
         api_version = helpers.get_api_version(body=body)
         kind = helpers.get_kind(body=body)
+        with metrics.phase(name="resolve"):
+            client_function, namespaced = helpers.get_function(
+                api_version=api_version, kind=kind, operation="update", cluster=cluster
+            )
+        client_function = histograms.instrument(
+            function=client_function,
+            name="kubernetes",
+            api_version=api_version,
+            kind=kind,
+            operation="update",
+        )
+        client_function = tracing.traced(
+            name="kubernetes.update",
+            attributes={"apiVersion": api_version, "kind": kind},
+        )(client_function)
     except exceptions.ParentError as exc:
         return ExistsReturn("FAILURE", str(exc))
-    client_function, namespaced = helpers.get_function(
-        api_version=api_version, kind=kind, operation="update"
-    )
 
     # Handling non-namespaced cases
     if not namespaced:
         try:
-            client_function(body=body, name=physical_name)
+            with metrics.phase(name="kubernetes"):
+                helpers.read(
+                    response=client_function(
+                        body=body, name=physical_name, _preload_content=False
+                    )
+                )
             return ExistsReturn("SUCCESS", None)
-        except kubernetes.client.rest.ApiException as exc:
+        except (kubernetes.client.rest.ApiException, exceptions.ParentError) as exc:
             return ExistsReturn("FAILURE", str(exc))
 
     # Handling namespaced
     namespace, name = physical_name.split("/")
     try:
-        client_function(body=body, namespace=namespace, name=name)
+        with metrics.phase(name="kubernetes"):
+            helpers.read(
+                response=client_function(
+                    body=body, namespace=namespace, name=name, _preload_content=False
+                )
+            )
         return ExistsReturn("SUCCESS", None)
-    except kubernetes.client.rest.ApiException as exc:
+    except (kubernetes.client.rest.ApiException, exceptions.ParentError) as exc:
         return ExistsReturn("FAILURE", str(exc))
 
 
-def delete(*, body: typing.Dict[str, typing.Any], physical_name: str) -> ExistsReturn:
+@tracing.traced(name="operations.delete")
+def delete(
+    *,
+    body: typing.Dict[str, typing.Any],
+    physical_name: str,
+    cluster: typing.Any = None,
+) -> ExistsReturn:
     """
     Execute delete command.
 
@@ -130,6 +193,8 @@ def delete(*, body: typing.Dict[str, typing.Any], physical_name: str) -> ExistsR
     Args:
         body: The body to delete.
         physical_name: The namespace (if namespaced) and name of the resource.
+        cluster: The value of the cluster property, if None the default cluster is
+            used.
 
     Returns:
         Information about the outcome of the operation.
@@ -138,24 +203,44 @@ def delete(*, body: typing.Dict[str, typing.Any], physical_name: str) -> ExistsR
     try:
         api_version = helpers.get_api_version(body=body)
         kind = helpers.get_kind(body=body)
+        with metrics.phase(name="resolve"):
+            client_function, namespaced = helpers.get_function(
+                api_version=api_version, kind=kind, operation="delete", cluster=cluster
+            )
+        client_function = histograms.instrument(
+            function=client_function,
+            name="kubernetes",
+            api_version=api_version,
+            kind=kind,
+            operation="delete",
+        )
+        client_function = tracing.traced(
+            name="kubernetes.delete",
+            attributes={"apiVersion": api_version, "kind": kind},
+        )(client_function)
     except exceptions.ParentError as exc:
         return ExistsReturn("FAILURE", str(exc))
-    client_function, namespaced = helpers.get_function(
-        api_version=api_version, kind=kind, operation="delete"
-    )
 
     # Handling non-namespaced cases
     if not namespaced:
         try:
-            client_function(name=physical_name)
+            with metrics.phase(name="kubernetes"):
+                helpers.read(
+                    response=client_function(name=physical_name, _preload_content=False)
+                )
             return ExistsReturn("SUCCESS", None)
-        except kubernetes.client.rest.ApiException as exc:
+        except (kubernetes.client.rest.ApiException, exceptions.ParentError) as exc:
             return ExistsReturn("FAILURE", str(exc))
 
     # Handling namespaced
     namespace, name = physical_name.split("/")
     try:
-        client_function(namespace=namespace, name=name)
+        with metrics.phase(name="kubernetes"):
+            helpers.read(
+                response=client_function(
+                    namespace=namespace, name=name, _preload_content=False
+                )
+            )
         return ExistsReturn("SUCCESS", None)
-    except kubernetes.client.rest.ApiException as exc:
+    except (kubernetes.client.rest.ApiException, exceptions.ParentError) as exc:
         return ExistsReturn("FAILURE", str(exc))
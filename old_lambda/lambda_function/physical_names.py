@@ -0,0 +1,87 @@
+"""Physical names that record the objects of a fan-out or of a bundle."""
+
+import json
+import typing
+
+# The longest physical resource id CloudFormation accepts
+MAX_LENGTH = 1024
+
+
+def calculate(
+    *, physical_names: typing.Union[typing.Dict[str, str], typing.Sequence[str]]
+) -> str:
+    """
+    Calculate the physical name that records the physical name of every object.
+
+    Args:
+        physical_names: The physical name of each object by cluster name or in the
+            order of the bundle.
+
+    Returns:
+        The physical names as compact JSON.
+
+    """
+    if not isinstance(physical_names, dict):
+        physical_names = list(physical_names)
+    return json.dumps(physical_names, separators=(",", ":"))
+
+
+def parse(*, physical_name: str, container: type) -> typing.Any:
+    """
+    Get the physical name of every object back from the physical name.
+
+    Args:
+        physical_name: The physical name of the resource.
+        container: dict for the physical name of a fan-out and list for a bundle.
+
+    Returns:
+        The physical name of each object or None if the physical name does not
+        record them in the container.
+
+    """
+    try:
+        physical_names = json.loads(physical_name)
+    except ValueError:
+        return None
+    if not isinstance(physical_names, container):
+        return None
+    return physical_names
+
+
+def check(*, physical_name: str, recorded: str) -> typing.Optional[str]:
+    """
+    Calculate the reason the physical name is too long for CloudFormation, if it is.
+
+    Args:
+        physical_name: The physical resource id.
+        recorded: What the physical name records one of each of, like cluster.
+
+    Returns:
+        The reason or None if CloudFormation accepts the physical name.
+
+    """
+    if len(physical_name) <= MAX_LENGTH:
+        return None
+    return (
+        f"the physical name recording every {recorded} is {len(physical_name)} "
+        f"characters long, CloudFormation accepts at most {MAX_LENGTH}; use fewer "
+        f"{recorded}s or shorter names."
+    )
+
+
+def calculate_reason(*, results: typing.Iterable[typing.Tuple[str, typing.Any]]) -> str:
+    """
+    Combine the reasons of the objects that failed.
+
+    Args:
+        results: The result of each object with what it is labelled by in the reason.
+
+    Returns:
+        The reason of each failure prefixed by its label.
+
+    """
+    return "; ".join(
+        f"{label}: {result.reason}"
+        for label, result in results
+        if result.status == "FAILURE"
+    )
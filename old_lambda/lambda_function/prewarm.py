@@ -0,0 +1,172 @@
+"""Work done during the init phase so that the first event only pays request latency."""
+
+import os
+import typing
+
+from . import credentials
+from . import helpers
+from . import response
+
+# The api version and kind combinations resolved ahead of the first event
+GROUP_VERSION_KINDS = (
+    ("v1", "Namespace"),
+    ("v1", "ConfigMap"),
+    ("v1", "Secret"),
+    ("v1", "Service"),
+    ("v1", "ServiceAccount"),
+    ("apps/v1", "Deployment"),
+    ("apps/v1", "StatefulSet"),
+    ("apps/v1", "DaemonSet"),
+    ("batch/v1", "Job"),
+    ("networking.k8s.io/v1", "NetworkPolicy"),
+    ("rbac.authorization.k8s.io/v1", "Role"),
+    ("rbac.authorization.k8s.io/v1", "RoleBinding"),
+    ("rbac.authorization.k8s.io/v1", "ClusterRole"),
+    ("rbac.authorization.k8s.io/v1", "ClusterRoleBinding"),
+)
+# The maximum time in seconds to spend on opening each connection
+CONNECT_TIMEOUT = 2.0
+# The key in the event that identifies a warm-up ping
+WARM_UP_KEY = "WarmUp"
+
+
+def is_enabled() -> bool:
+    """
+    Calculate whether the init phase work should be done on import.
+
+    Only runs inside Lambda and can be switched off using the PREWARM environment
+    variable.
+
+    Returns:
+        Whether to pre-warm.
+
+    """
+    if "AWS_LAMBDA_FUNCTION_NAME" not in os.environ:
+        return False
+    return os.environ.get("PREWARM", "true").lower() != "false"
+
+
+def load_configuration() -> None:
+    """Load the configuration from the credential provider chain."""
+    credentials.reset()
+    credentials.get_configuration()
+    # Any clients created before now would use the old configuration
+    helpers.clear_apis()
+
+
+def connect_api_server(*, timeout: float) -> None:
+    """
+    Open a keep-alive connection to the API server on the shared connection pool.
+
+    Args:
+        timeout: The maximum time in seconds to spend on the request.
+
+    """
+    version_api = helpers.get_api(module_name="VersionApi")
+    api_response = version_api.get_code(
+        _preload_content=False, _request_timeout=timeout
+    )
+    api_response.release_conn()
+
+
+def calculate_response_endpoint() -> typing.Optional[str]:
+    """
+    Calculate the url of the CloudFormation response endpoint.
+
+    Uses the RESPONSE_ENDPOINT environment variable if it is set and otherwise the
+    endpoint of the last ResponseURL, so that the connection is opened on the pool
+    that response.send uses.
+
+    Returns:
+        The url or None if it is not known, like before the first event.
+
+    """
+    endpoint = os.environ.get("RESPONSE_ENDPOINT")
+    if endpoint is not None:
+        return endpoint
+    return response.get_endpoint()
+
+
+class PrewarmReturn(typing.NamedTuple):
+    """
+    Structure of the prewarm return value.
+
+    Attrs:
+        failures: Description of each step that failed.
+
+    """
+
+    failures: typing.List[str]
+
+
+def prewarm() -> PrewarmReturn:
+    """
+    Load configuration, build the dispatch table and open connections.
+
+    A failing step never raises since the event can still be handled without it.
+
+    Returns:
+        Information about the steps that failed.
+
+    """
+    failures = []
+
+    # pylint: disable=broad-except
+    try:
+        load_configuration()
+    except Exception as exc:
+        failures.append(f"load configuration: {exc}")
+    try:
+        helpers.build_dispatch_table(group_version_kinds=GROUP_VERSION_KINDS)
+    except Exception as exc:
+        failures.append(f"build dispatch table: {exc}")
+    try:
+        connect_api_server(timeout=CONNECT_TIMEOUT)
+    except Exception as exc:
+        failures.append(f"connect api server: {exc}")
+    response_endpoint = calculate_response_endpoint()
+    if response_endpoint is not None:
+        try:
+            response.connect(url=response_endpoint, timeout=CONNECT_TIMEOUT)
+        except Exception as exc:
+            failures.append(f"connect response endpoint: {exc}")
+
+    if failures:
+        print({"prewarm_failures": failures})
+    return PrewarmReturn(failures)
+
+
+def is_warm_up_event(*, event: typing.Dict[str, typing.Any]) -> bool:
+    """
+    Calculate whether the event is a warm-up ping rather than a CloudFormation event.
+
+    Args:
+        event: The details for the lambda event.
+
+    Returns:
+        Whether the event is a warm-up ping.
+
+    """
+    return WARM_UP_KEY in event
+
+
+def handle_warm_up(
+    *, event: typing.Dict[str, typing.Any]
+) -> typing.Dict[str, typing.Any]:
+    """
+    Handle a warm-up ping without touching the cluster unless a refresh is requested.
+
+    The event is {"WarmUp": true} with an optional "Refresh": true which re-loads the
+    configuration, re-builds the dispatch table and re-opens the connections.
+
+    Args:
+        event: The details for the warm-up event.
+
+    Returns:
+        The result of the warm-up.
+
+    """
+    if not event.get("Refresh"):
+        return {WARM_UP_KEY: "OK"}
+    result = prewarm()
+    return {WARM_UP_KEY: "OK", "Failures": result.failures}
@@ -0,0 +1,117 @@
+"""Profile selected invocations with cProfile."""
+
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import typing
+
+# The characters of request ids that are kept in the name of the profile file
+_UNSAFE = re.compile(r"[^A-Za-z0-9_-]")
+# The number of functions in the summary printed when PROFILE_TOP is not set
+DEFAULT_TOP = 20
+
+
+def is_selected(*, request_id: typing.Any) -> bool:
+    """
+    Check whether an invocation is profiled.
+
+    Args:
+        request_id: The RequestId of the event, which may be missing.
+
+    Returns:
+        Whether the request id is one of the comma separated PROFILE_REQUEST_IDS or
+        the invocation is sampled at the PROFILE_SAMPLE_RATE between 0 and 1.
+
+    """
+    request_ids = os.environ.get("PROFILE_REQUEST_IDS")
+    if request_ids and request_id in {
+        value.strip() for value in request_ids.split(",")
+    }:
+        return True
+    sample_rate = float(os.environ.get("PROFILE_SAMPLE_RATE") or 0)
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def calculate_path(*, request_id: typing.Any) -> str:
+    """
+    Calculate the path of the profile of an invocation.
+
+    Args:
+        request_id: The RequestId of the event.
+
+    Returns:
+        The path in the PROFILE_DIRECTORY, /tmp by default.
+
+    """
+    directory = os.environ.get("PROFILE_DIRECTORY", "/tmp")
+    name = _UNSAFE.sub("_", str(request_id))
+    return os.path.join(directory, f"profile-{name}.pstats")
+
+
+def summarize(
+    *, profiler: cProfile.Profile, top: int
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """
+    Summarize the functions that took the most time.
+
+    Args:
+        profiler: The profiler that has been disabled.
+        top: The number of functions.
+
+    Returns:
+        The functions sorted by cumulative time with their call count and their own
+        and cumulative milliseconds.
+
+    """
+    # The raw table is not in the type stubs but is what print_stats formats
+    stats = getattr(pstats.Stats(profiler), "stats")
+    entries = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        {
+            "function": f"{filename}:{line}({function})",
+            "calls": calls,
+            "own_ms": own * 1000,
+            "cumulative_ms": cumulative * 1000,
+        }
+        for (filename, line, function), (_, calls, own, cumulative, _) in entries[:top]
+    ]
+
+
+@contextlib.contextmanager
+def profile(*, request_id: typing.Any) -> typing.Iterator[None]:
+    """
+    Profile the invocation if it is selected, otherwise do nothing.
+
+    The profile is written to a pstats file and the functions that took the most
+    time are printed as one line. If the file can not be written the error is
+    printed instead of its path, the invocation goes on either way.
+
+    Args:
+        request_id: The RequestId of the event.
+
+    """
+    if not is_selected(request_id=request_id):
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        record: typing.Dict[str, typing.Any] = {
+            "profile": calculate_path(request_id=request_id),
+            "requestId": request_id,
+        }
+        try:
+            profiler.dump_stats(record["profile"])
+        except OSError as exc:
+            record["profile"] = None
+            record["error"] = f"could not write the profile: {exc}"
+        top = int(os.environ.get("PROFILE_TOP", DEFAULT_TOP))
+        record["top"] = summarize(profiler=profiler, top=top)
+        print(json.dumps(record))
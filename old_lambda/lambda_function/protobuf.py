@@ -0,0 +1,163 @@
+"""Minimal decoder of the Kubernetes protobuf encoding for the fields that are read."""
+
+import os
+import typing
+
+from . import exceptions
+
+# The content type of the protobuf encoding
+CONTENT_TYPE = "application/vnd.kubernetes.protobuf"
+# The prefix of every protobuf encoded object
+MAGIC = b"k8s\x00"
+# The groups of the api versions whose kinds the API server can encode as protobuf,
+# the core group is the empty string
+GROUPS = ("", "apps")
+
+# The wire types
+_VARINT = 0
+_FIXED64 = 1
+_LENGTH_DELIMITED = 2
+_FIXED32 = 5
+
+
+def is_enabled(*, api_version: str) -> bool:
+    """
+    Check whether responses for the api version are requested as protobuf.
+
+    Args:
+        api_version: The Kubernetes API version from a yaml template.
+
+    Returns:
+        Whether the KUBERNETES_ENCODING environment variable is protobuf and the
+        group of the api version is built in.
+
+    """
+    if os.environ.get("KUBERNETES_ENCODING", "json") != "protobuf":
+        return False
+    group, _, _ = api_version.rpartition("/")
+    return group in GROUPS
+
+
+def is_protobuf(*, content_type: typing.Optional[str]) -> bool:
+    """
+    Check whether a response is protobuf encoded.
+
+    Args:
+        content_type: The value of the Content-Type header.
+
+    Returns:
+        Whether the content type is the protobuf encoding.
+
+    """
+    return content_type is not None and content_type.startswith(CONTENT_TYPE)
+
+
+def _read_varint(*, data: bytes, offset: int) -> typing.Tuple[int, int]:
+    """Read a varint, returning its value and the offset after it."""
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise exceptions.ProtobufDecodeError("truncated varint")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def iterate_fields(*, data: bytes) -> typing.Iterator[typing.Tuple[int, typing.Any]]:
+    """
+    Iterate over the fields of a message.
+
+    Args:
+        data: The encoded message.
+
+    Yields:
+        The field number and value of each field, length delimited values are bytes.
+
+    """
+    offset = 0
+    while offset < len(data):
+        key, offset = _read_varint(data=data, offset=offset)
+        field_number, wire_type = key >> 3, key & 0x7
+        value: typing.Any
+        if wire_type == _VARINT:
+            value, offset = _read_varint(data=data, offset=offset)
+        elif wire_type == _LENGTH_DELIMITED:
+            length, offset = _read_varint(data=data, offset=offset)
+            value, offset = data[offset : offset + length], offset + length
+        elif wire_type == _FIXED64:
+            value, offset = data[offset : offset + 8], offset + 8
+        elif wire_type == _FIXED32:
+            value, offset = data[offset : offset + 4], offset + 4
+        else:
+            raise exceptions.ProtobufDecodeError(f"unsupported wire type {wire_type}")
+        if offset > len(data):
+            raise exceptions.ProtobufDecodeError("truncated field")
+        yield field_number, value
+
+
+def _find(*, data: bytes, field_number: int) -> typing.Optional[bytes]:
+    """Find the last value of a field, which wins in protobuf."""
+    found = None
+    for number, value in iterate_fields(data=data):
+        if number == field_number:
+            found = value
+    return found
+
+
+def _unwrap(*, data: bytes) -> bytes:
+    """Get the encoded object from the runtime.Unknown envelope."""
+    if not data.startswith(MAGIC):
+        raise exceptions.ProtobufDecodeError("missing magic prefix")
+    # The raw field of runtime.Unknown holds the object
+    raw = _find(data=data[len(MAGIC) :], field_number=2)
+    return raw if raw is not None else b""
+
+
+def _decode_string(*, value: typing.Optional[bytes]) -> typing.Optional[str]:
+    """Decode a string field that may be absent."""
+    if value is None:
+        return None
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        raise exceptions.ProtobufDecodeError(exc) from exc
+
+
+def decode_metadata(
+    *, data: bytes
+) -> typing.Tuple[typing.Optional[str], typing.Optional[str]]:
+    """
+    Decode the name and namespace of an object without decoding the rest of it.
+
+    Args:
+        data: The protobuf encoded object.
+
+    Returns:
+        The name and namespace of the object.
+
+    """
+    # Every built-in object has ObjectMeta as field 1, which has the name as field 1
+    # and the namespace as field 3
+    metadata = _find(data=_unwrap(data=data), field_number=1) or b""
+    return (
+        _decode_string(value=_find(data=metadata, field_number=1)),
+        _decode_string(value=_find(data=metadata, field_number=3)),
+    )
+
+
+def decode_status_message(*, data: bytes) -> str:
+    """
+    Decode the message of a Status returned for a failed request.
+
+    Args:
+        data: The protobuf encoded Status.
+
+    Returns:
+        The message of the Status.
+
+    """
+    return _decode_string(value=_find(data=_unwrap(data=data), field_number=3)) or ""
@@ -0,0 +1,79 @@
+"""Send responses to the CloudFormation response endpoint."""
+
+import json
+import typing
+import urllib.parse
+
+import urllib3
+
+from . import connections
+from . import tracing
+
+# The pool is shared across invocations so that warm containers reuse connections
+_POOL: typing.Optional[urllib3.PoolManager] = None
+# The scheme, host and port of the last ResponseURL, to pre-connect to on a refresh
+_ENDPOINT: typing.Optional[str] = None
+
+
+def get_pool() -> urllib3.PoolManager:
+    """
+    Get the pool used to send responses, creating it if required.
+
+    Returns:
+        The shared pool manager.
+
+    """
+    global _POOL  # pylint: disable=global-statement
+    if _POOL is None:
+        _POOL = urllib3.PoolManager(cert_reqs="CERT_REQUIRED")
+        connections.instrument(pool_manager=_POOL, target="response")
+    return _POOL
+
+
+def connect(*, url: str, timeout: float) -> None:
+    """
+    Open a keep-alive connection to the host of the url without sending a request.
+
+    Args:
+        url: Any url on the host to connect to.
+        timeout: The maximum time in seconds to spend connecting.
+
+    """
+    connection_pool = get_pool().connection_from_url(url)
+    # pylint: disable=protected-access
+    connection = connection_pool._get_conn(timeout=timeout)
+    connection.timeout = timeout
+    connection.connect()
+    connection_pool._put_conn(connection)
+
+
+def get_endpoint() -> typing.Optional[str]:
+    """
+    Get the endpoint responses were last sent to.
+
+    Returns:
+        The scheme, host and port of the last ResponseURL or None if no response was
+        sent by this container.
+
+    """
+    return _ENDPOINT
+
+
+@tracing.traced(name="response.send")
+def send(*, url: str, body: typing.Dict[str, str]) -> typing.Any:
+    """
+    Send the response for a CloudFormation request.
+
+    Args:
+        url: The ResponseURL from the request.
+        body: The body of the response.
+
+    Returns:
+        The urllib3 response of the endpoint.
+
+    """
+    global _ENDPOINT  # pylint: disable=global-statement
+    parts = urllib.parse.urlsplit(url)
+    if parts.netloc:
+        _ENDPOINT = f"{parts.scheme}://{parts.netloc}"
+    return get_pool().request("PUT", url, body=json.dumps(body).encode("utf-8"))
@@ -0,0 +1,383 @@
+"""Lightweight backend that calls the Kubernetes REST API directly."""
+
+import gzip
+import io
+import json
+import os
+import threading
+import typing
+import weakref
+
+import urllib3
+from kubernetes import client
+
+from . import exceptions
+from . import protobuf
+
+# The HTTP method of each operation
+METHODS = {"create": "POST", "update": "PUT", "delete": "DELETE"}
+# The Accept header for kinds that can be encoded as protobuf, falling back to JSON
+PROTOBUF_ACCEPT = f"{protobuf.CONTENT_TYPE}, application/json"
+# The size of the data of a ConfigMap or Secret from which the body is encoded into a
+# buffer in chunks, used when LARGE_OBJECT_THRESHOLD is not set
+DEFAULT_LARGE_OBJECT_THRESHOLD = 1024 * 1024
+# The compression level of bodies sent with gzip
+GZIP_LEVEL = 6
+# The headers sent with every request
+HEADERS = {
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip",
+    "Content-Type": "application/json",
+}
+
+
+class Resource(typing.NamedTuple):
+    """
+    Structure of an entry in the index of resources.
+
+    Attrs:
+        plural: The name of the resource in the URL.
+        namespaced: Whether the resource is namespaced.
+
+    """
+
+    plural: str
+    namespaced: bool
+
+
+def calculate_prefix(*, api_version: str) -> str:
+    """
+    Calculate the URL path of an api version.
+
+    Args:
+        api_version: The Kubernetes API version from a yaml template.
+
+    Returns:
+        /api/v1 for the core group and /apis/<group>/<version> otherwise.
+
+    """
+    if "/" not in api_version:
+        return f"/api/{api_version}"
+    return f"/apis/{api_version}"
+
+
+def calculate_path(
+    *,
+    prefix: str,
+    plural: str,
+    namespace: typing.Optional[str] = None,
+    name: typing.Optional[str] = None,
+) -> str:
+    """
+    Calculate the URL path of a collection or an object.
+
+    Args:
+        prefix: The URL path of the api version.
+        plural: The name of the resource in the URL.
+        namespace: The namespace of a namespaced resource.
+        name: The name of the object, None for the collection.
+
+    Returns:
+        The URL path.
+
+    """
+    path = prefix
+    if namespace is not None:
+        path = f"{path}/namespaces/{namespace}"
+    path = f"{path}/{plural}"
+    if name is not None:
+        path = f"{path}/{name}"
+    return path
+
+
+class Body(typing.NamedTuple):
+    """
+    Structure of a serialized body.
+
+    Attrs:
+        content: The bytes or, for large and compressed bodies, a buffer positioned at
+            the start that can be rewound if the request is retried.
+        length: The number of bytes of the content.
+        encoding: The value of the Content-Encoding header, None if not compressed.
+
+    """
+
+    content: typing.Union[bytes, io.BytesIO]
+    length: int
+    encoding: typing.Optional[str]
+
+
+# The encoder of bodies, compact like the JSON the API server writes
+_ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+
+def calculate_data_size(*, body: typing.Dict[str, typing.Any]) -> int:
+    """
+    Calculate the size of the data of a ConfigMap or Secret.
+
+    Args:
+        body: The body of the request.
+
+    Returns:
+        The total length of the values, 0 for other kinds.
+
+    """
+    return sum(
+        len(value)
+        for key in ("data", "binaryData", "stringData")
+        for value in (body.get(key) or {}).values()
+        if isinstance(value, str)
+    )
+
+
+def serialize(*, body: typing.Dict[str, typing.Any]) -> Body:
+    """
+    Serialize the body once for the request.
+
+    Bodies with data of at least LARGE_OBJECT_THRESHOLD bytes and compressed bodies
+    are encoded in chunks straight into one buffer, without the intermediate string
+    and bytes copies of the whole body. Compression is enabled by setting
+    KUBERNETES_REQUEST_GZIP to true.
+
+    Args:
+        body: The body of the request.
+
+    Returns:
+        The body as compact JSON.
+
+    """
+    compress = os.environ.get("KUBERNETES_REQUEST_GZIP", "false").lower() == "true"
+    threshold = int(
+        os.environ.get("LARGE_OBJECT_THRESHOLD", DEFAULT_LARGE_OBJECT_THRESHOLD)
+    )
+    if not compress and calculate_data_size(body=body) < threshold:
+        content = _ENCODER.encode(body).encode("utf-8")
+        return Body(content, len(content), None)
+
+    buffer = io.BytesIO()
+    writer: typing.BinaryIO = buffer
+    if compress:
+        writer = typing.cast(
+            typing.BinaryIO,
+            gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=GZIP_LEVEL, mtime=0),
+        )
+    for chunk in _ENCODER.iterencode(body):
+        writer.write(chunk.encode("utf-8"))
+    if compress:
+        writer.close()
+    length = buffer.tell()
+    buffer.seek(0)
+    return Body(buffer, length, "gzip" if compress else None)
+
+
+def read(*, response: typing.Any) -> bytes:
+    """
+    Read a raw response and return its connection to the pool.
+
+    Args:
+        response: The response of a client function called with
+            _preload_content=False, or of the backend.
+
+    Returns:
+        The body of the response.
+
+    """
+    try:
+        return response.data
+    finally:
+        response.release_conn()
+
+
+def _raise_for_status(*, response: typing.Any) -> None:
+    """Raise ApiException like the generated client if the request failed."""
+    if 200 <= response.status <= 299:
+        return
+    data = read(response=response)
+    exc = client.rest.ApiException(status=response.status, reason=response.reason)
+    exc.body = data.decode("utf-8", "replace") or response.reason
+    if protobuf.is_protobuf(content_type=response.headers.get("Content-Type")):
+        # A Status that cannot be decoded still fails with its raw body
+        try:
+            exc.body = protobuf.decode_status_message(data=data)
+        except exceptions.ProtobufDecodeError:
+            pass
+    exc.headers = dict(response.headers)
+    raise exc
+
+
+class Backend:
+    """Calls the API of one cluster over the connection pool of its API client."""
+
+    def __init__(self, *, api_client: client.ApiClient) -> None:
+        """
+        Construct.
+
+        Args:
+            api_client: The API client with the configuration and connection pool of
+                the cluster.
+
+        """
+        self._configuration = api_client.configuration
+        self._pool_manager = api_client.rest_client.pool_manager
+        self._resources: typing.Dict[str, typing.Dict[str, Resource]] = {}
+        self._lock = threading.Lock()
+
+    def _headers(self, *, accept: typing.Optional[str]) -> typing.Dict[str, str]:
+        """Calculate the headers with the current credentials."""
+        headers = dict(HEADERS)
+        if accept is not None:
+            headers["Accept"] = accept
+        for setting in self._configuration.auth_settings().values():
+            if setting["in"] == "header" and setting["value"]:
+                headers[setting["key"]] = setting["value"]
+        return headers
+
+    def request(
+        self,
+        *,
+        method: str,
+        path: str,
+        body: typing.Optional[Body] = None,
+        accept: typing.Optional[str] = None,
+    ) -> typing.Any:
+        """
+        Send a request to the API server.
+
+        Args:
+            method: The HTTP method.
+            path: The URL path.
+            body: The serialized body, if any.
+            accept: The Accept header, if None JSON is accepted.
+
+        Returns:
+            The raw response, the caller reads it and releases the connection.
+
+        """
+        headers = self._headers(accept=accept)
+        content = None
+        if body is not None:
+            content = body.content
+            headers["Content-Length"] = str(body.length)
+            if body.encoding is not None:
+                headers["Content-Encoding"] = body.encoding
+        response = self._pool_manager.request(
+            method,
+            f"{self._configuration.host}{path}",
+            body=content,
+            headers=headers,
+            preload_content=False,
+        )
+        _raise_for_status(response=response)
+        return response
+
+    def _discover(self, *, api_version: str) -> typing.Dict[str, Resource]:
+        """Build the index of the resources of an api version by kind."""
+        try:
+            response = self.request(
+                method="GET", path=calculate_prefix(api_version=api_version)
+            )
+            resource_list = json.loads(read(response=response))
+        except client.rest.ApiException as exc:
+            raise exceptions.DiscoveryError(api_version, exc.status) from exc
+        except (urllib3.exceptions.HTTPError, ValueError) as exc:
+            raise exceptions.DiscoveryError(api_version, exc) from exc
+
+        # Skipping subresources such as deployments/status
+        return {
+            resource["kind"]: Resource(resource["name"], resource["namespaced"])
+            for resource in resource_list.get("resources", [])
+            if "/" not in resource["name"]
+        }
+
+    def get_resource(self, *, api_version: str, kind: str) -> Resource:
+        """
+        Get the plural and whether a kind is namespaced, discovering it if required.
+
+        Args:
+            api_version: The version of the api.
+            kind: The kind of resource.
+
+        Returns:
+            The entry of the kind in the index.
+
+        """
+        with self._lock:
+            resources = self._resources.get(api_version)
+        if resources is None:
+            resources = self._discover(api_version=api_version)
+            with self._lock:
+                self._resources[api_version] = resources
+        resource = resources.get(kind)
+        if resource is None:
+            raise exceptions.KindUnknownError(api_version, kind)
+        return resource
+
+    def get_function(
+        self, *, api_version: str, kind: str, operation: str
+    ) -> typing.Tuple[typing.Callable, bool]:
+        """
+        Get a function with the signature of the client function for an operation.
+
+        Responses are requested as protobuf if it is enabled for the api version.
+
+        Args:
+            api_version: The version of the api.
+            kind: The kind of resource.
+            operation: The operation to perform.
+
+        Returns:
+            The function to execute and whether it is namespaced.
+
+        """
+        method = METHODS[operation]
+        prefix = calculate_prefix(api_version=api_version)
+        plural, namespaced = self.get_resource(api_version=api_version, kind=kind)
+        accept = (
+            PROTOBUF_ACCEPT if protobuf.is_enabled(api_version=api_version) else None
+        )
+
+        def function(
+            *,
+            body: typing.Optional[typing.Dict[str, typing.Any]] = None,
+            namespace: typing.Optional[str] = None,
+            name: typing.Optional[str] = None,
+            _preload_content: bool = False,
+        ) -> typing.Any:
+            """Send the request, the response is always raw."""
+            # pylint: disable=invalid-name,unused-argument
+            return self.request(
+                method=method,
+                path=calculate_path(
+                    prefix=prefix, plural=plural, namespace=namespace, name=name
+                ),
+                body=None if body is None else serialize(body=body),
+                accept=accept,
+            )
+
+        return function, namespaced
+
+
+# The backend of each API client, dropped with the API client
+_BACKENDS: "weakref.WeakKeyDictionary[client.ApiClient, Backend]" = (
+    weakref.WeakKeyDictionary()
+)
+_BACKENDS_LOCK = threading.Lock()
+
+
+def get_backend(*, api_client: client.ApiClient) -> Backend:
+    """
+    Get the backend of an API client, creating it if required.
+
+    Args:
+        api_client: The API client of the cluster.
+
+    Returns:
+        The backend that shares the connection pool of the API client.
+
+    """
+    with _BACKENDS_LOCK:
+        backend = _BACKENDS.get(api_client)
+        if backend is None:
+            backend = Backend(api_client=api_client)
+            _BACKENDS[api_client] = backend
+        return backend
@@ -0,0 +1,427 @@
+"""
+Compile the Kubernetes OpenAPI document into a binary index and query it in place.
+
+The index is built ahead of time with
+
+    python -m lambda_function.schema_index <openapi.json> <index>
+
+from the document served by a cluster at /openapi/v2, and the Lambda memory maps it
+so that only the definitions a body refers to are ever read.
+
+Layout, all integers little endian:
+    header: magic, definition count, definition offset, field offset, kind count,
+        kind offset and string offset as 32 bit integers
+    definitions: name, first field and field count, sorted by name
+    fields: name, type name and flags of every field, sorted by name per definition
+    kinds: <api version>/<kind> and definition, sorted by the former
+    strings: every name once, each prefixed by its 16 bit length
+"""
+
+import json
+import mmap
+import struct
+import sys
+import typing
+
+from . import exceptions
+
+MAGIC = b"K8SIDX01"
+_HEADER = struct.Struct("<8s6I")
+_DEFINITION = struct.Struct("<3I")
+_FIELD = struct.Struct("<3I")
+_KIND = struct.Struct("<2I")
+_LENGTH = struct.Struct("<H")
+# The flag of required fields
+REQUIRED = 1
+_REF_PREFIX = "#/definitions/"
+_PRIMITIVES = {"integer": "int", "number": "float", "boolean": "bool"}
+_STRING_FORMATS = {"byte": "bytes", "date-time": "datetime", "date": "date"}
+# The definitions without properties that have a type of their own
+_REF_FORMATS = {"int-or-string": "int-or-string"}
+
+
+class Field(typing.NamedTuple):
+    """
+    Structure of a field of a definition.
+
+    Attrs:
+        name: The name of the field in the body.
+        type_name: The type in the spelling of the openapi_types of the client models,
+            with definition names in place of model names.
+        required: Whether the field is required.
+
+    """
+
+    name: str
+    type_name: str
+    required: bool
+
+
+def _calculate_type(
+    *, schema: typing.Dict[str, typing.Any], definitions: typing.Dict[str, typing.Any]
+) -> str:
+    """Calculate the type name of a property schema."""
+    ref = schema.get("$ref")
+    if ref is not None:
+        name = ref[len(_REF_PREFIX) :]
+        definition = definitions.get(name, {})
+        # Definitions without properties, like IntOrString, Quantity and Time, have
+        # their own JSON encoding that accepts more than their declared type
+        if not definition.get("properties"):
+            name = _REF_FORMATS.get(definition.get("format", ""), "object")
+        return name
+    schema_type = schema.get("type")
+    if schema_type == "string":
+        return _STRING_FORMATS.get(schema.get("format", ""), "str")
+    if schema_type in _PRIMITIVES:
+        return _PRIMITIVES[schema_type]
+    if schema_type == "array" and isinstance(schema.get("items"), dict):
+        item_type = _calculate_type(schema=schema["items"], definitions=definitions)
+        return f"List[{item_type}]"
+    if isinstance(schema.get("additionalProperties"), dict):
+        value_type = _calculate_type(
+            schema=schema["additionalProperties"], definitions=definitions
+        )
+        return f"Dict[str, {value_type}]"
+    return "object"
+
+
+def _calculate_api_version(*, group_version_kind: typing.Dict[str, str]) -> str:
+    """Calculate the api version of a group, version and kind."""
+    if group_version_kind.get("group"):
+        return f"{group_version_kind['group']}/{group_version_kind['version']}"
+    return group_version_kind["version"]
+
+
+def build(*, spec: typing.Dict[str, typing.Any]) -> bytes:
+    """
+    Compile an OpenAPI v2 document into the index.
+
+    Args:
+        spec: The OpenAPI document.
+
+    Returns:
+        The index.
+
+    """
+    definitions = spec.get("definitions", {})
+    strings = bytearray()
+    string_offsets: typing.Dict[str, int] = {}
+
+    def add_string(value: str) -> int:
+        offset = string_offsets.get(value)
+        if offset is None:
+            encoded = value.encode("utf-8")
+            offset = string_offsets[value] = len(strings)
+            strings.extend(_LENGTH.pack(len(encoded)) + encoded)
+        return offset
+
+    # Sorting by the encoded names since that is what the binary search compares
+    names = sorted(definitions, key=lambda name: name.encode("utf-8"))
+    definition_records = bytearray()
+    field_records = bytearray()
+    field_count = 0
+    kinds: typing.Dict[str, int] = {}
+    for idx, name in enumerate(names):
+        definition = definitions[name]
+        properties = definition.get("properties", {})
+        required = set(definition.get("required", []))
+        field_names = sorted(properties, key=lambda field: field.encode("utf-8"))
+        definition_records += _DEFINITION.pack(
+            add_string(name), field_count, len(field_names)
+        )
+        for field_name in field_names:
+            type_name = _calculate_type(
+                schema=properties[field_name], definitions=definitions
+            )
+            field_records += _FIELD.pack(
+                add_string(field_name),
+                add_string(type_name),
+                REQUIRED if field_name in required else 0,
+            )
+            field_count += 1
+        for group_version_kind in definition.get("x-kubernetes-group-version-kind", []):
+            api_version = _calculate_api_version(group_version_kind=group_version_kind)
+            kinds.setdefault(f"{api_version}/{group_version_kind['kind']}", idx)
+
+    kind_records = bytearray()
+    for key in sorted(kinds, key=lambda key: key.encode("utf-8")):
+        kind_records += _KIND.pack(add_string(key), kinds[key])
+
+    definition_offset = _HEADER.size
+    field_offset = definition_offset + len(definition_records)
+    kind_offset = field_offset + len(field_records)
+    string_offset = kind_offset + len(kind_records)
+    header = _HEADER.pack(
+        MAGIC,
+        len(names),
+        definition_offset,
+        field_offset,
+        len(kinds),
+        kind_offset,
+        string_offset,
+    )
+    return b"".join(
+        (header, definition_records, field_records, kind_records, bytes(strings))
+    )
+
+
+class IndexModel:
+    """A definition of the index in the shape of a client model."""
+
+    def __init__(self, *, name: str, fields: typing.Sequence[Field]) -> None:
+        """
+        Construct.
+
+        Args:
+            name: The name of the definition.
+            fields: The fields of the definition.
+
+        """
+        self.__name__ = name
+        self.openapi_types = {field.name: field.type_name for field in fields}
+        self.attribute_map = {field.name: field.name for field in fields}
+        self.required = tuple(field.name for field in fields if field.required)
+
+
+class SchemaIndex:
+    """A memory mapped index, read in place without loading the document."""
+
+    def __init__(self, *, path: str) -> None:
+        """
+        Construct.
+
+        Raise SchemaIndexError if the file is not an index.
+
+        Args:
+            path: The path of the index.
+
+        """
+        try:
+            with open(path, "rb") as in_file:
+                self._map = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as exc:
+            raise exceptions.SchemaIndexError(path, exc) from exc
+        if len(self._map) < _HEADER.size:
+            self._map.close()
+            raise exceptions.SchemaIndexError(path, "the file is too short")
+        (
+            magic,
+            self._definition_count,
+            self._definition_offset,
+            self._field_offset,
+            self._kind_count,
+            self._kind_offset,
+            self._string_offset,
+        ) = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise exceptions.SchemaIndexError(path, "the file is not a schema index")
+        self._models: typing.Dict[int, IndexModel] = {}
+
+    def close(self) -> None:
+        """Unmap the index."""
+        self._map.close()
+
+    def _string(self, offset: int) -> bytes:
+        """Read a string without decoding it."""
+        start = self._string_offset + offset
+        (length,) = _LENGTH.unpack_from(self._map, start)
+        start += _LENGTH.size
+        return self._map[start : start + length]
+
+    def _search(
+        self, *, key: bytes, offset: int, count: int, record: struct.Struct
+    ) -> typing.Optional[typing.Tuple[int, typing.Tuple[int, ...]]]:
+        """Binary search records sorted by the string their first integer points to."""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            values = record.unpack_from(self._map, offset + middle * record.size)
+            middle_key = self._string(values[0])
+            if middle_key == key:
+                return middle, values
+            if middle_key < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def _field(self, *, position: int) -> Field:
+        """Read a field record."""
+        name, type_name, flags = _FIELD.unpack_from(
+            self._map, self._field_offset + position * _FIELD.size
+        )
+        return Field(
+            self._string(name).decode("utf-8"),
+            self._string(type_name).decode("utf-8"),
+            bool(flags & REQUIRED),
+        )
+
+    def _definition(self, *, definition: int) -> typing.Tuple[int, ...]:
+        """Read a definition record."""
+        return _DEFINITION.unpack_from(
+            self._map, self._definition_offset + definition * _DEFINITION.size
+        )
+
+    def find_definition(self, *, name: str) -> typing.Optional[int]:
+        """
+        Find a definition by name.
+
+        Args:
+            name: The name of the definition, like io.k8s.api.apps.v1.Deployment.
+
+        Returns:
+            The position of the definition or None if there is no such definition.
+
+        """
+        found = self._search(
+            key=name.encode("utf-8"),
+            offset=self._definition_offset,
+            count=self._definition_count,
+            record=_DEFINITION,
+        )
+        return None if found is None else found[0]
+
+    def find_kind(self, *, api_version: str, kind: str) -> typing.Optional[int]:
+        """
+        Find the definition of a kind.
+
+        Args:
+            api_version: The Kubernetes API version.
+            kind: The kind of the object.
+
+        Returns:
+            The position of the definition or None if the document has no such kind.
+
+        """
+        found = self._search(
+            key=f"{api_version}/{kind}".encode("utf-8"),
+            offset=self._kind_offset,
+            count=self._kind_count,
+            record=_KIND,
+        )
+        return None if found is None else found[1][1]
+
+    def get_name(self, *, definition: int) -> str:
+        """
+        Get the name of a definition.
+
+        Args:
+            definition: The position of the definition.
+
+        Returns:
+            The name.
+
+        """
+        return self._string(self._definition(definition=definition)[0]).decode("utf-8")
+
+    def get_fields(self, *, definition: int) -> typing.List[Field]:
+        """
+        Get every field of a definition.
+
+        Args:
+            definition: The position of the definition.
+
+        Returns:
+            The fields sorted by name.
+
+        """
+        _, first, count = self._definition(definition=definition)
+        return [self._field(position=first + idx) for idx in range(count)]
+
+    def find_field(self, *, definition: int, name: str) -> typing.Optional[Field]:
+        """
+        Find a field of a definition without reading the others.
+
+        Args:
+            definition: The position of the definition.
+            name: The name of the field.
+
+        Returns:
+            The field or None if the definition has no such field.
+
+        """
+        _, first, count = self._definition(definition=definition)
+        found = self._search(
+            key=name.encode("utf-8"),
+            offset=self._field_offset + first * _FIELD.size,
+            count=count,
+            record=_FIELD,
+        )
+        return None if found is None else self._field(position=first + found[0])
+
+    def resolve(
+        self, *, api_version: str, kind: str, path: typing.Sequence[str]
+    ) -> typing.Optional[Field]:
+        """
+        Find the field at a path of a kind.
+
+        Args:
+            api_version: The Kubernetes API version.
+            kind: The kind of the object.
+            path: The field names from the root of the body, list indices and map
+                keys are given as any string, like ["spec", "containers", "0", "name"].
+
+        Returns:
+            The field or None if the path does not lead to a field.
+
+        """
+        definition = self.find_kind(api_version=api_version, kind=kind)
+        field: typing.Optional[Field] = None
+        type_name = ""
+        for name in path:
+            container, contents = _split_container(type_name=type_name)
+            if container is not None:
+                type_name = contents
+                continue
+            if field is not None:
+                definition = self.find_definition(name=type_name)
+            if definition is None:
+                return None
+            field = self.find_field(definition=definition, name=name)
+            if field is None:
+                return None
+            type_name = field.type_name
+        return field
+
+    def get_model(self, *, definition: int) -> IndexModel:
+        """
+        Get a definition in the shape of a client model.
+
+        Args:
+            definition: The position of the definition.
+
+        Returns:
+            The model, read from the index on first use.
+
+        """
+        model = self._models.get(definition)
+        if model is None:
+            model = self._models[definition] = IndexModel(
+                name=self.get_name(definition=definition),
+                fields=self.get_fields(definition=definition),
+            )
+        return model
+
+
+def _split_container(*, type_name: str) -> typing.Tuple[typing.Optional[str], str]:
+    """Split a list or map type name into the container and its contents."""
+    if type_name.startswith("List[") and type_name.endswith("]"):
+        return "list", type_name[len("List[") : -1]
+    if type_name.startswith("Dict[str, ") and type_name.endswith("]"):
+        return "dict", type_name[len("Dict[str, ") : -1]
+    return None, type_name
+
+
+def main() -> None:
+    """Build the index from the document given on the command line."""
+    spec_path, index_path = sys.argv[1:3]
+    with open(spec_path, "rb") as in_file:
+        spec = json.load(in_file)
+    with open(index_path, "wb") as out_file:
+        out_file.write(build(spec=spec))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""Coerce bodies to the types of the schema of their kind."""
+
+import functools
+import os
+import re
+import threading
+import typing
+
+from kubernetes import client
+
+from . import schema_index
+
+# The type names of list and map fields, both the old and the new client spell them
+_LIST_TYPE = re.compile(r"^[lL]ist\[(?P<item>.+)\]$")
+_DICT_TYPE = re.compile(r"^(?:dict\(str, (?P<old>.+)\)|Dict\[str, (?P<new>.+)\])$")
+_INTEGER = re.compile(r"^[-+]?[0-9]+$")
+# A port name contains a letter and a percentage a %, so only digits are an integer
+_INT_OR_STRING_INTEGER = re.compile(r"^[0-9]+$")
+_BOOLEANS = {"true": True, "false": False}
+
+# Coerces a value, returning the value itself when it is unchanged
+Coercer = typing.Callable[[typing.Any], typing.Any]
+
+
+def _coerce_int(value: typing.Any) -> typing.Any:
+    """Coerce a string holding an integer."""
+    if isinstance(value, str) and _INTEGER.match(value.strip()):
+        return int(value)
+    return value
+
+
+def _coerce_int_or_string(value: typing.Any) -> typing.Any:
+    """Coerce a string holding only digits, other strings are names or percentages."""
+    if isinstance(value, str) and _INT_OR_STRING_INTEGER.match(value):
+        return int(value)
+    return value
+
+
+def _coerce_float(value: typing.Any) -> typing.Any:
+    """Coerce a string holding a number."""
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _coerce_bool(value: typing.Any) -> typing.Any:
+    """Coerce a string holding true or false."""
+    if isinstance(value, str):
+        return _BOOLEANS.get(value.strip().lower(), value)
+    return value
+
+
+_PRIMITIVES: typing.Dict[str, Coercer] = {
+    "int": _coerce_int,
+    "int-or-string": _coerce_int_or_string,
+    "float": _coerce_float,
+    "bool": _coerce_bool,
+}
+
+
+# The IntOrString fields of each model, which the client models type as object while
+# the schema index spells them int-or-string, like targetPort: "8080" of a Service
+_INT_OR_STRINGS: typing.Dict[str, typing.Tuple[str, ...]] = {
+    "V1ServicePort": ("targetPort",),
+    "V1HTTPGetAction": ("port",),
+    "V1TCPSocketAction": ("port",),
+    "V1NetworkPolicyPort": ("port",),
+    "V1beta1NetworkPolicyPort": ("port",),
+    "ExtensionsV1beta1NetworkPolicyPort": ("port",),
+    "ExtensionsV1beta1IngressBackend": ("servicePort",),
+    "NetworkingV1beta1IngressBackend": ("servicePort",),
+    "V1RollingUpdateDeployment": ("maxSurge", "maxUnavailable"),
+    "V1beta2RollingUpdateDeployment": ("maxSurge", "maxUnavailable"),
+    "AppsV1beta1RollingUpdateDeployment": ("maxSurge", "maxUnavailable"),
+    "ExtensionsV1beta1RollingUpdateDeployment": ("maxSurge", "maxUnavailable"),
+    "V1RollingUpdateDaemonSet": ("maxSurge", "maxUnavailable"),
+    "V1beta2RollingUpdateDaemonSet": ("maxUnavailable",),
+    "ExtensionsV1beta1RollingUpdateDaemonSet": ("maxUnavailable",),
+    "V1RollingUpdateStatefulSetStrategy": ("maxUnavailable",),
+    "V1PodDisruptionBudgetSpec": ("maxUnavailable", "minAvailable"),
+    "V1beta1PodDisruptionBudgetSpec": ("maxUnavailable", "minAvailable"),
+}
+
+
+def _list_coercer(item_coercer: Coercer) -> Coercer:
+    """Create a coercer for a list field from the coercer of its items."""
+
+    def coerce_list(value: typing.Any) -> typing.Any:
+        if not isinstance(value, list):
+            return value
+        coerced = [item_coercer(item) for item in value]
+        if all(new is old for new, old in zip(coerced, value)):
+            return value
+        return coerced
+
+    return coerce_list
+
+
+def _dict_coercer(value_coercer: Coercer) -> Coercer:
+    """Create a coercer for a map field from the coercer of its values."""
+
+    def coerce_dict(value: typing.Any) -> typing.Any:
+        if not isinstance(value, dict):
+            return value
+        coerced = None
+        for key, old in value.items():
+            new = value_coercer(old)
+            if new is not old:
+                if coerced is None:
+                    coerced = dict(value)
+                coerced[key] = new
+        return value if coerced is None else coerced
+
+    return coerce_dict
+
+
+def _model_coercer(fields: typing.List[typing.Tuple[str, Coercer]]) -> Coercer:
+    """Create a coercer for an object from the coercers of its fields."""
+
+    def coerce_model(value: typing.Any) -> typing.Any:
+        if not isinstance(value, dict):
+            return value
+        coerced = None
+        for key, field_coercer in fields:
+            old = value.get(key)
+            if old is None:
+                continue
+            new = field_coercer(old)
+            if new is not old:
+                if coerced is None:
+                    coerced = dict(value)
+                coerced[key] = new
+        return value if coerced is None else coerced
+
+    return coerce_model
+
+
+class TypeReturn(typing.NamedTuple):
+    """
+    Structure of a type name split into its container and contents.
+
+    Attrs:
+        container: list or dict for list and map fields, otherwise None.
+        name: The type of the items or values of a container, otherwise the type.
+
+    """
+
+    container: typing.Optional[str]
+    name: str
+
+
+def split_type(*, type_name: str) -> TypeReturn:
+    """
+    Split a type name from the openapi_types of a model.
+
+    Args:
+        type_name: The type name.
+
+    Returns:
+        The container and the type it contains.
+
+    """
+    match = _LIST_TYPE.match(type_name)
+    if match is not None:
+        return TypeReturn("list", match.group("item"))
+    match = _DICT_TYPE.match(type_name)
+    if match is not None:
+        return TypeReturn("dict", match.group("old") or match.group("new"))
+    return TypeReturn(None, type_name)
+
+
+_SCHEMA_INDEX: typing.Optional[schema_index.SchemaIndex] = None
+
+
+def get_schema_index() -> typing.Optional[schema_index.SchemaIndex]:
+    """
+    Get the schema index, opening it on first use.
+
+    Returns:
+        The index at the SCHEMA_INDEX_PATH environment variable or None if it is not
+        set, in which case the client models are used.
+
+    """
+    global _SCHEMA_INDEX  # pylint: disable=global-statement
+
+    path = os.environ.get("SCHEMA_INDEX_PATH")
+    if not path:
+        return None
+    if _SCHEMA_INDEX is None:
+        _SCHEMA_INDEX = schema_index.SchemaIndex(path=path)
+    return _SCHEMA_INDEX
+
+
+def get_model(*, type_name: str) -> typing.Any:
+    """
+    Get a model by name.
+
+    Args:
+        type_name: The name of the model, or of the definition when there is a schema
+            index.
+
+    Returns:
+        The model or None if there is no such model.
+
+    """
+    index = get_schema_index()
+    if index is not None:
+        definition = index.find_definition(name=type_name)
+        if definition is None:
+            return None
+        return index.get_model(definition=definition)
+    model = getattr(client, type_name, None)
+    if model is None or not hasattr(model, "openapi_types"):
+        return None
+    return model
+
+
+class _Compiler:
+    """Compiles the coercer of each model once, shared by every kind using it."""
+
+    def __init__(self) -> None:
+        """Construct."""
+        self._coercers: typing.Dict[str, typing.Optional[Coercer]] = {}
+        self._compiling: typing.Set[str] = set()
+        self._lock = threading.RLock()
+
+    def compile_type(self, *, type_name: str) -> typing.Optional[Coercer]:
+        """
+        Compile the coercer of a type from the client models.
+
+        Args:
+            type_name: The name of the type in the openapi_types of a model.
+
+        Returns:
+            The coercer or None if values of the type never need coercing.
+
+        """
+        if type_name in _PRIMITIVES:
+            return _PRIMITIVES[type_name]
+        container, name = split_type(type_name=type_name)
+        if container is not None:
+            contents_coercer = self.compile_type(type_name=name)
+            if contents_coercer is None:
+                return None
+            if container == "list":
+                return _list_coercer(contents_coercer)
+            return _dict_coercer(contents_coercer)
+        model = get_model(type_name=type_name)
+        if model is None:
+            return None
+        return self.compile_model(model=model)
+
+    def compile_model(self, *, model: typing.Any) -> typing.Optional[Coercer]:
+        """
+        Compile the coercer of a model.
+
+        Only the fields that lead to an integer, number or boolean are kept, so most
+        of a body is skipped.
+
+        Args:
+            model: The client model class.
+
+        Returns:
+            The coercer or None if no field of the model ever needs coercing.
+
+        """
+        name = model.__name__
+        with self._lock:
+            if name in self._coercers:
+                return self._coercers[name]
+            if name in self._compiling:
+                # Recursive models refer to their own coercer once it is compiled, it
+                # is never None since the field referring back is kept
+                def coerce_recursive(value: typing.Any) -> typing.Any:
+                    return typing.cast(Coercer, self._coercers[name])(value)
+
+                return coerce_recursive
+
+            self._compiling.add(name)
+            fields = []
+            int_or_strings = _INT_OR_STRINGS.get(name, ())
+            for attribute, type_name in model.openapi_types.items():
+                key = model.attribute_map[attribute]
+                if key in int_or_strings:
+                    type_name = "int-or-string"
+                field_coercer = self.compile_type(type_name=type_name)
+                if field_coercer is not None:
+                    fields.append((key, field_coercer))
+            self._compiling.discard(name)
+            coercer = _model_coercer(fields) if fields else None
+            self._coercers[name] = coercer
+            return coercer
+
+
+_COMPILER = _Compiler()
+
+
+def calculate_model_names(*, api_version: str, kind: str) -> typing.List[str]:
+    """
+    Calculate the names the client may give the model of a kind.
+
+    Args:
+        api_version: The Kubernetes API version.
+        kind: The kind of the object.
+
+    Returns:
+        The names with the group prefix, used when the kind is in several groups,
+        followed by the name without it. No names for groups the client has no API of,
+        like those of custom resources, even if the kind has a built-in name.
+
+    """
+    group, _, version = api_version.partition("/")
+    if version == "":
+        return [f"{group.capitalize()}{kind}"]
+    group = "".join(group.rsplit(".k8s.io", 1))
+    group = "".join(word.capitalize() for word in group.split("."))
+    # The same name as helpers.calculate_client gives the API of the group
+    if not hasattr(client, f"{group}{version.capitalize()}Api"):
+        return []
+    return [f"{group}{version.capitalize()}{kind}", f"{version.capitalize()}{kind}"]
+
+
+def get_kind_model(*, api_version: str, kind: str) -> typing.Any:
+    """
+    Get the model of a kind.
+
+    Args:
+        api_version: The Kubernetes API version.
+        kind: The kind of the object.
+
+    Returns:
+        The model or None if there is no model of the kind, like for custom
+        resources.
+
+    """
+    index = get_schema_index()
+    if index is not None:
+        definition = index.find_kind(api_version=api_version, kind=kind)
+        if definition is None:
+            return None
+        return index.get_model(definition=definition)
+    for name in calculate_model_names(api_version=api_version, kind=kind):
+        model = get_model(type_name=name)
+        if model is not None:
+            return model
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_coercer(*, api_version: str, kind: str) -> typing.Optional[Coercer]:
+    """
+    Get the coercer of a kind, compiling it on first use.
+
+    Args:
+        api_version: The Kubernetes API version.
+        kind: The kind of the object.
+
+    Returns:
+        The coercer or None if the client has no model of the kind, like for custom
+        resources, or if nothing in the kind ever needs coercing.
+
+    """
+    model = get_kind_model(api_version=api_version, kind=kind)
+    if model is None:
+        return None
+    return _COMPILER.compile_model(model=model)
+
+
+def coerce(*, body: typing.Dict[str, typing.Any]) -> typing.Dict[str, typing.Any]:
+    """
+    Coerce the strings CloudFormation makes of numbers and booleans back.
+
+    Only strings in fields that are integers, numbers or booleans in the schema of
+    the kind are coerced, the body is copied where it changes and is otherwise left
+    as is.
+
+    Args:
+        body: The body to coerce.
+
+    Returns:
+        The coerced body.
+
+    """
+    api_version = body.get("apiVersion")
+    kind = body.get("kind")
+    if not isinstance(api_version, str) or not isinstance(kind, str):
+        return body
+    coercer = get_coercer(api_version=api_version, kind=kind)
+    if coercer is None:
+        return body
+    return coercer(body)
+
+
+def reset() -> None:
+    """Close the schema index and forget every compiled coercer."""
+    global _SCHEMA_INDEX, _COMPILER  # pylint: disable=global-statement
+
+    if _SCHEMA_INDEX is not None:
+        _SCHEMA_INDEX.close()
+        _SCHEMA_INDEX = None
+    _COMPILER = _Compiler()
+    get_coercer.cache_clear()
@@ -0,0 +1,291 @@
+"""Record spans of each invocation and export them to a pluggable exporter."""
+
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+import typing
+
+# Exports the finished spans of an invocation
+Exporter = typing.Callable[[typing.List["Span"]], None]
+
+
+class Span(typing.NamedTuple):
+    """
+    Structure of a finished span.
+
+    Attrs:
+        trace_id: The id shared by the spans of every invocation for a stack.
+        span_id: The id of the span.
+        parent_id: The id of the enclosing span, None for the invocation itself.
+        name: What the span measured, like operations.create.
+        start: The start in seconds since the epoch.
+        duration: The duration in seconds.
+        attributes: Details of the span, like the RequestId of the invocation.
+
+    """
+
+    trace_id: str
+    span_id: str
+    parent_id: typing.Optional[str]
+    name: str
+    start: float
+    duration: float
+    attributes: typing.Dict[str, typing.Any]
+
+
+def to_dict(*, finished: Span) -> typing.Dict[str, typing.Any]:
+    """
+    Calculate the JSON representation of a span.
+
+    Args:
+        finished: The span.
+
+    Returns:
+        The span with camel case keys and the duration in milliseconds.
+
+    """
+    return {
+        "traceId": finished.trace_id,
+        "spanId": finished.span_id,
+        "parentId": finished.parent_id,
+        "name": finished.name,
+        "start": finished.start,
+        "durationMs": finished.duration * 1000,
+        "attributes": finished.attributes,
+    }
+
+
+class JsonFileExporter:
+    """Appends every span as a line of JSON to a file."""
+
+    def __init__(self, *, path: str) -> None:
+        """
+        Construct.
+
+        Args:
+            path: The path of the file.
+
+        """
+        self.path = path
+
+    def __call__(self, spans: typing.List[Span]) -> None:
+        """Append the spans."""
+        with open(self.path, "a", encoding="utf-8") as out_file:
+            for finished in spans:
+                out_file.write(json.dumps(to_dict(finished=finished)) + "\n")
+
+
+def _export_log(spans: typing.List[Span]) -> None:
+    """Print the spans of the invocation as one line."""
+    print(json.dumps({"spans": [to_dict(finished=finished) for finished in spans]}))
+
+
+# The factories of the exporters that can be selected with TRACE_EXPORTER
+_EXPORTERS: typing.Dict[str, typing.Callable[[], Exporter]] = {
+    "json": lambda: JsonFileExporter(
+        path=os.environ.get("TRACE_FILE", "/tmp/traces.jsonl")
+    ),
+    "log": lambda: _export_log,
+}
+
+
+def register_exporter(*, name: str, factory: typing.Callable[[], Exporter]) -> None:
+    """
+    Make an exporter selectable with the TRACE_EXPORTER environment variable.
+
+    Args:
+        name: The value of TRACE_EXPORTER that selects the exporter.
+        factory: Creates the exporter at the start of each traced invocation.
+
+    """
+    _EXPORTERS[name] = factory
+
+
+def get_exporter() -> typing.Optional[Exporter]:
+    """
+    Get the exporter selected by the TRACE_EXPORTER environment variable.
+
+    Returns:
+        The exporter or None if tracing is disabled, which it is by default or if
+        the exporter is unknown.
+
+    """
+    name = os.environ.get("TRACE_EXPORTER", "none")
+    if name == "none":
+        return None
+    factory = _EXPORTERS.get(name)
+    if factory is None:
+        print(f"unknown trace exporter {name}, expected one of {sorted(_EXPORTERS)}")
+        return None
+    return factory()
+
+
+def _new_id() -> str:
+    """Create a random span id."""
+    return os.urandom(8).hex()
+
+
+def calculate_trace_id(*, stack_id: typing.Any) -> str:
+    """
+    Calculate the trace id of an invocation.
+
+    Args:
+        stack_id: The StackId of the event, which may be missing.
+
+    Returns:
+        The same id for every invocation of a stack so that its custom resources
+        line up in one waterfall, a random one without a stack id.
+
+    """
+    if not isinstance(stack_id, str):
+        return os.urandom(16).hex()
+    return hashlib.sha256(stack_id.encode("utf-8")).hexdigest()[:32]
+
+
+class Trace:
+    """The spans of one invocation."""
+
+    def __init__(self, *, trace_id: str) -> None:
+        """
+        Construct.
+
+        Args:
+            trace_id: The id of the trace.
+
+        """
+        self.trace_id = trace_id
+        # The span of the invocation, the first to be opened
+        self.root_id: typing.Optional[str] = None
+        self.spans: typing.List[Span] = []
+        self._lock = threading.Lock()
+        # The open spans of each thread, fan out threads start from the invocation
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def span(
+        self, *, name: str, attributes: typing.Dict[str, typing.Any]
+    ) -> typing.Iterator[None]:
+        """
+        Record a span enclosed by the innermost open span of the thread.
+
+        Args:
+            name: The name of the span.
+            attributes: Details of the span, the error is added if one is raised.
+
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        parent_id = stack[-1] if stack else self.root_id
+        span_id = _new_id()
+        if self.root_id is None:
+            self.root_id = span_id
+        stack.append(span_id)
+        start = time.time()
+        start_counter = time.perf_counter()
+        try:
+            yield
+        except BaseException as exc:
+            attributes = {**attributes, "error": type(exc).__name__}
+            raise
+        finally:
+            duration = time.perf_counter() - start_counter
+            stack.pop()
+            finished = Span(
+                self.trace_id, span_id, parent_id, name, start, duration, attributes
+            )
+            with self._lock:
+                self.spans.append(finished)
+
+
+_TRACE: typing.Optional[Trace] = None
+
+
+@contextlib.contextmanager
+def trace(*, event: typing.Dict[str, typing.Any]) -> typing.Iterator[None]:
+    """
+    Trace an invocation if an exporter is selected, otherwise do nothing.
+
+    The span of the invocation carries the StackId, RequestId and LogicalResourceId
+    of the event and every span is exported when the invocation ends.
+
+    Args:
+        event: The details for the lambda event.
+
+    """
+    global _TRACE  # pylint: disable=global-statement
+
+    exporter = get_exporter()
+    if exporter is None:
+        yield
+        return
+    _TRACE = Trace(trace_id=calculate_trace_id(stack_id=event.get("StackId")))
+    attributes = {
+        "stackId": event.get("StackId"),
+        "requestId": event.get("RequestId"),
+        "logicalResourceId": event.get("LogicalResourceId"),
+        "requestType": event.get("RequestType"),
+    }
+    try:
+        with _TRACE.span(name="lambda_handler", attributes=attributes):
+            yield
+    finally:
+        finished, _TRACE = _TRACE, None
+        exporter(finished.spans)
+
+
+@contextlib.contextmanager
+def span(
+    *, name: str, attributes: typing.Optional[typing.Dict[str, typing.Any]] = None
+) -> typing.Iterator[None]:
+    """
+    Record a span if the invocation is traced, otherwise do nothing.
+
+    Args:
+        name: The name of the span.
+        attributes: Details of the span.
+
+    """
+    current = _TRACE
+    if current is None:
+        yield
+        return
+    with current.span(name=name, attributes=attributes or {}):
+        yield
+
+
+def traced(
+    *, name: str, attributes: typing.Optional[typing.Dict[str, typing.Any]] = None
+) -> typing.Callable[
+    [typing.Callable[..., typing.Any]], typing.Callable[..., typing.Any]
+]:
+    """
+    Create a decorator recording a span around every call of a function.
+
+    Args:
+        name: The name of the span.
+        attributes: Details of the span.
+
+    Returns:
+        The decorator, the wrapped function only checks whether there is a trace
+        when tracing is disabled.
+
+    """
+
+    def decorate(
+        function: typing.Callable[..., typing.Any],
+    ) -> typing.Callable[..., typing.Any]:
+        @functools.wraps(function)
+        def wrapper(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+            if _TRACE is None:
+                return function(*args, **kwargs)
+            with span(name=name, attributes=attributes):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,261 @@
+"""Validate bodies against the schema of their kind before calling the cluster."""
+
+import functools
+import os
+import threading
+import typing
+
+from . import exceptions
+from . import schemas
+
+# The most errors reported for a body
+MAX_ERRORS = 10
+
+# Appends the errors of a value at a path to the list of errors
+Validator = typing.Callable[[typing.Any, str, typing.List[str]], None]
+
+# The Python types and description of each primitive type name, quantity is not a
+# type of the models but of the fields in _QUANTITIES
+_PRIMITIVES: typing.Dict[str, typing.Tuple[typing.Tuple[type, ...], str]] = {
+    "str": ((str,), "a string"),
+    "quantity": ((str, int, float), "a quantity"),
+    "bytes": ((str,), "a base64 string"),
+    "datetime": ((str,), "a date and time string"),
+    "date": ((str,), "a date string"),
+    "int": ((int,), "an integer"),
+    "int-or-string": ((int, str), "an integer or a string"),
+    "float": ((int, float), "a number"),
+    "bool": ((bool,), "a boolean"),
+}
+# The fields of each model that hold quantities, which the client models type as
+# strings but the API server also accepts as numbers, like cpu: 1 in resources.limits
+# IntOrString fields are typed as object by the client models and accept any value
+_QUANTITIES: typing.Dict[str, typing.Tuple[str, ...]] = {
+    "V1ResourceRequirements": ("limits", "requests"),
+    "V1VolumeResourceRequirements": ("limits", "requests"),
+    "V1EmptyDirVolumeSource": ("sizeLimit",),
+    "V1LimitRangeItem": (
+        "default",
+        "defaultRequest",
+        "max",
+        "maxLimitRequestRatio",
+        "min",
+    ),
+    "V1ResourceQuotaSpec": ("hard",),
+    "V1PersistentVolumeSpec": ("capacity",),
+    "V1PodSpec": ("overhead",),
+    "V1Overhead": ("podFixed",),
+}
+
+
+def is_enabled() -> bool:
+    """
+    Check whether bodies are validated before they are created or updated.
+
+    Returns:
+        Whether the VALIDATE_BODIES environment variable is true.
+
+    """
+    return os.environ.get("VALIDATE_BODIES", "false").lower() == "true"
+
+
+def _join(*, path: str, key: str) -> str:
+    """Calculate the path of a field."""
+    return f"{path}.{key}" if path else key
+
+
+def _primitive_validator(
+    *, types: typing.Tuple[type, ...], description: str
+) -> Validator:
+    """Create a validator for a primitive type."""
+
+    def validate_primitive(value: typing.Any, path: str, errors: typing.List[str]):
+        # Booleans are integers in Python but not in the schema
+        if not isinstance(value, types) or (
+            isinstance(value, bool) and bool not in types
+        ):
+            errors.append(f"{path} must be {description}")
+
+    return validate_primitive
+
+
+def _list_validator(item_validator: typing.Optional[Validator]) -> Validator:
+    """Create a validator for a list field from the validator of its items."""
+
+    def validate_list(value: typing.Any, path: str, errors: typing.List[str]):
+        if not isinstance(value, list):
+            errors.append(f"{path} must be a list")
+            return
+        if item_validator is not None:
+            for idx, item in enumerate(value):
+                if item is not None:
+                    item_validator(item, f"{path}[{idx}]", errors)
+
+    return validate_list
+
+
+def _dict_validator(value_validator: typing.Optional[Validator]) -> Validator:
+    """Create a validator for a map field from the validator of its values."""
+
+    def validate_dict(value: typing.Any, path: str, errors: typing.List[str]):
+        if not isinstance(value, dict):
+            errors.append(f"{path} must be a mapping")
+            return
+        if value_validator is not None:
+            for key, item in value.items():
+                if item is not None:
+                    value_validator(item, _join(path=path, key=str(key)), errors)
+
+    return validate_dict
+
+
+def _model_validator(
+    *,
+    name: str,
+    fields: typing.Dict[str, typing.Optional[Validator]],
+    required: typing.Sequence[str],
+) -> Validator:
+    """Create a validator for an object from the validators of its fields."""
+
+    def validate_model(value: typing.Any, path: str, errors: typing.List[str]):
+        if not isinstance(value, dict):
+            errors.append(f"{path or 'the body'} must be an object")
+            return
+        for key in required:
+            if value.get(key) is None:
+                errors.append(f"{_join(path=path, key=key)} is required")
+        for key, item in value.items():
+            if key not in fields:
+                errors.append(f"{_join(path=path, key=key)} is not a field of {name}")
+                continue
+            field_validator = fields[key]
+            if field_validator is not None and item is not None:
+                field_validator(item, _join(path=path, key=key), errors)
+
+    return validate_model
+
+
+class _Compiler:
+    """Compiles the validator of each model once, shared by every kind using it."""
+
+    def __init__(self) -> None:
+        """Construct."""
+        self._validators: typing.Dict[str, Validator] = {}
+        self._lock = threading.RLock()
+
+    def compile_type(self, *, type_name: str) -> typing.Optional[Validator]:
+        """
+        Compile the validator of a type from the client models.
+
+        Args:
+            type_name: The name of the type in the openapi_types of a model.
+
+        Returns:
+            The validator or None if any value is valid, like for object.
+
+        """
+        primitive = _PRIMITIVES.get(type_name)
+        if primitive is not None:
+            return _primitive_validator(types=primitive[0], description=primitive[1])
+        container, name = schemas.split_type(type_name=type_name)
+        if container == "list":
+            return _list_validator(self.compile_type(type_name=name))
+        if container == "dict":
+            return _dict_validator(self.compile_type(type_name=name))
+        model = schemas.get_model(type_name=type_name)
+        if model is None:
+            return None
+        return self.compile_model(model=model)
+
+    def compile_model(self, *, model: typing.Any) -> Validator:
+        """
+        Compile the validator of a model.
+
+        Args:
+            model: The client model class or a model of the schema index.
+
+        Returns:
+            The validator.
+
+        """
+        name = model.__name__
+        with self._lock:
+            validator = self._validators.get(name)
+            if validator is not None:
+                return validator
+            fields: typing.Dict[str, typing.Optional[Validator]] = {}
+            # Registering before compiling the fields so that recursive models end,
+            # the fields are filled in before the validator is ever called
+            # Only the schema index knows which fields are required
+            validator = self._validators[name] = _model_validator(
+                name=name, fields=fields, required=getattr(model, "required", ())
+            )
+            quantities = _QUANTITIES.get(name, ())
+            for attribute, type_name in model.openapi_types.items():
+                key = model.attribute_map[attribute]
+                if key in quantities:
+                    container, _ = schemas.split_type(type_name=type_name)
+                    type_name = (
+                        "Dict[str, quantity]" if container == "dict" else "quantity"
+                    )
+                fields[key] = self.compile_type(type_name=type_name)
+            return validator
+
+
+_COMPILER = _Compiler()
+
+
+@functools.lru_cache(maxsize=None)
+def get_validator(*, api_version: str, kind: str) -> typing.Optional[Validator]:
+    """
+    Get the validator of a kind, compiling it on first use.
+
+    Args:
+        api_version: The Kubernetes API version.
+        kind: The kind of the object.
+
+    Returns:
+        The validator or None if the client has no model of the kind, like for custom
+        resources.
+
+    """
+    model = schemas.get_kind_model(api_version=api_version, kind=kind)
+    if model is None:
+        return None
+    return _COMPILER.compile_model(model=model)
+
+
+def validate(*, body: typing.Dict[str, typing.Any]) -> None:
+    """
+    Check a body against the schema of its kind.
+
+    Fields the schema of the kind does not have and values of the wrong type are
+    reported, so typos fail before any request is sent. Kinds the client has no model
+    of are not checked.
+
+    Raise BodyInvalidError if the body does not match the schema.
+
+    Args:
+        body: The body to check.
+
+    """
+    api_version = body.get("apiVersion")
+    kind = body.get("kind")
+    if not isinstance(api_version, str) or not isinstance(kind, str):
+        return
+    validator = get_validator(api_version=api_version, kind=kind)
+    if validator is None:
+        return
+    errors: typing.List[str] = []
+    validator(body, "", errors)
+    if errors:
+        raise exceptions.BodyInvalidError(errors[:MAX_ERRORS])
+
+
+def reset() -> None:
+    """Forget every compiled validator and coercer and close the schema index."""
+    global _COMPILER  # pylint: disable=global-statement
+
+    schemas.reset()
+    _COMPILER = _Compiler()
+    get_validator.cache_clear()
@@ -0,0 +1,351 @@
+"""Tests for the fake API server of the benchmarks."""
+
+import json
+import urllib.request
+
+import pytest
+
+from benchmarks import fake_api_server
+
+_CONFIG_MAPS = {"name": "configmaps", "kind": "ConfigMap", "namespaced": True}
+_NAMESPACES = {"name": "namespaces", "kind": "Namespace", "namespaced": False}
+_RESOURCES = {"v1": [_CONFIG_MAPS, _NAMESPACES]}
+
+
+def _target(*, name=None, namespace="default"):
+    """Create the target of a ConfigMap or of their collection."""
+    return fake_api_server.Target("v1", _CONFIG_MAPS, namespace, name, {})
+
+
+def _config_map(*, name="name-1", **metadata):
+    """Create a ConfigMap."""
+    return {
+        "apiVersion": "v1",
+        "kind": "ConfigMap",
+        "metadata": {"name": name, **metadata},
+        "data": {"key": "value"},
+    }
+
+
+@pytest.mark.parametrize(
+    "target, patch, expected_patched",
+    [
+        ({"a": 1, "b": {"c": 2}}, {"b": {"d": 3}}, {"a": 1, "b": {"c": 2, "d": 3}}),
+        ({"a": 1, "b": 2}, {"a": None, "c": None}, {"b": 2}),
+        ({"a": {"b": 1}}, {"a": [1]}, {"a": [1]}),
+        ({"a": 1}, {"b": {"c": None}}, {"a": 1, "b": {}}),
+        ({"a": 1}, ["a"], ["a"]),
+    ],
+    ids=["nested merge", "null removes", "list replaces", "new nested", "not object"],
+)
+def test_merge_patch(target, patch, expected_patched):
+    """
+    GIVEN target and merge patch
+    WHEN merge_patch is called with them
+    THEN the patched object is returned and the target is not modified.
+    """
+    original = json.loads(json.dumps(target))
+
+    patched = fake_api_server.merge_patch(target=target, patch=patch)
+
+    assert patched == expected_patched
+    assert target == original
+
+
+@pytest.mark.parametrize(
+    "operations, expected_patched",
+    [
+        (
+            [{"op": "add", "path": "/b", "value": 2}],
+            {"a": {"x/y": 1}, "l": [1], "b": 2},
+        ),
+        (
+            [{"op": "add", "path": "/l/0", "value": 0}],
+            {"a": {"x/y": 1}, "l": [0, 1]},
+        ),
+        (
+            [{"op": "add", "path": "/l/-", "value": 2}],
+            {"a": {"x/y": 1}, "l": [1, 2]},
+        ),
+        (
+            [{"op": "replace", "path": "/a/x~1y", "value": 2}],
+            {"a": {"x/y": 2}, "l": [1]},
+        ),
+        ([{"op": "remove", "path": "/l/0"}], {"a": {"x/y": 1}, "l": []}),
+        (
+            [
+                {"op": "test", "path": "/a/x~1y", "value": 1},
+                {"op": "remove", "path": "/a"},
+            ],
+            {"l": [1]},
+        ),
+    ],
+    ids=["add", "insert", "append", "replace escaped", "remove", "test passes"],
+)
+def test_json_patch(operations, expected_patched):
+    """
+    GIVEN object and JSON patch
+    WHEN json_patch is called with them
+    THEN the operations are applied in order.
+    """
+    target = {"a": {"x/y": 1}, "l": [1]}
+
+    assert fake_api_server.json_patch(target=target, operations=operations) == (
+        expected_patched
+    )
+
+
+@pytest.mark.parametrize(
+    "operation, expected_message",
+    [
+        ({"op": "replace", "path": "/b", "value": 1}, "cannot apply replace at /b"),
+        ({"op": "remove", "path": "/l/5"}, "cannot apply remove at /l/5"),
+        ({"op": "add", "path": "/b/c", "value": 1}, "cannot apply add at /b/c"),
+        ({"op": "test", "path": "/a", "value": 2}, "test failed at /a"),
+        ({"op": "move", "path": "/a", "from": "/b"}, "unsupported op move"),
+    ],
+    ids=["replace missing", "remove out of range", "parent missing", "test", "move"],
+)
+def test_json_patch_fails(operation, expected_message):
+    """
+    GIVEN object and JSON patch operation that cannot be applied
+    WHEN json_patch is called with them
+    THEN StatusError with 422 is raised.
+    """
+    with pytest.raises(fake_api_server.StatusError) as exc_info:
+        fake_api_server.json_patch(target={"a": 1, "l": [1]}, operations=[operation])
+
+    assert exc_info.value.code == 422
+    assert str(exc_info.value) == expected_message
+
+
+@pytest.mark.parametrize(
+    "path, expected_target",
+    [
+        (
+            "/api/v1/namespaces/ns-1/configmaps/name-1",
+            fake_api_server.Target("v1", _CONFIG_MAPS, "ns-1", "name-1", {}),
+        ),
+        (
+            "/api/v1/namespaces/ns-1/configmaps?limit=5",
+            fake_api_server.Target("v1", _CONFIG_MAPS, "ns-1", None, {"limit": "5"}),
+        ),
+        (
+            "/api/v1/configmaps?watch=true",
+            fake_api_server.Target("v1", _CONFIG_MAPS, None, None, {"watch": "true"}),
+        ),
+        (
+            "/api/v1/namespaces/ns-1",
+            fake_api_server.Target("v1", _NAMESPACES, None, "ns-1", {}),
+        ),
+        (
+            "/apis/apps/v1/namespaces/ns-1/deployments/name-1",
+            fake_api_server.Target(
+                "apps/v1",
+                fake_api_server.RESOURCES["apps/v1"][0],
+                "ns-1",
+                "name-1",
+                {},
+            ),
+        ),
+    ],
+    ids=[
+        "namespaced object",
+        "namespaced collection",
+        "all namespaces",
+        "cluster scoped",
+        "group",
+    ],
+)
+def test_parse_path(path, expected_target):
+    """
+    GIVEN path of an object or collection of a served resource
+    WHEN parse_path is called with the path
+    THEN the api version, resource, namespace, name and query are returned.
+    """
+    resources = {**_RESOURCES, "apps/v1": fake_api_server.RESOURCES["apps/v1"]}
+
+    assert fake_api_server.parse_path(path=path, resources=resources) == (
+        expected_target
+    )
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/api/v1/secrets/name-1",
+        "/api/v1/namespaces/ns-1/namespaces/name-1",
+        "/api/v1/configmaps/name-1",
+        "/api/v1/namespaces/ns-1/configmaps/name-1/status",
+        "/api",
+        "/healthz/ready/now",
+    ],
+    ids=[
+        "resource not served",
+        "namespace for cluster scoped",
+        "namespaced without namespace",
+        "subresource",
+        "api version missing",
+        "not api",
+    ],
+)
+def test_parse_path_not_found(path):
+    """
+    GIVEN path that is not of a served object or collection
+    WHEN parse_path is called with the path
+    THEN StatusError with 404 is raised.
+    """
+    with pytest.raises(fake_api_server.StatusError) as exc_info:
+        fake_api_server.parse_path(path=path, resources=_RESOURCES)
+
+    assert exc_info.value.code == 404
+
+
+def test_store_create():
+    """
+    GIVEN store
+    WHEN create is called twice with the same object
+    THEN the object is stored with its identity and the second create is a 409.
+    """
+    store = fake_api_server.Store()
+
+    created = store.create(target=_target(), body=_config_map())
+
+    metadata = created["metadata"]
+    assert metadata["namespace"] == "default"
+    assert metadata["resourceVersion"] == "1"
+    assert metadata["generation"] == 1
+    assert metadata["uid"]
+    assert store.get(target=_target(name="name-1")) == created
+    with pytest.raises(fake_api_server.StatusError) as exc_info:
+        store.create(target=_target(), body=_config_map())
+    assert (exc_info.value.code, exc_info.value.reason) == (409, "AlreadyExists")
+
+
+@pytest.mark.parametrize(
+    "resource_version, expected_version",
+    [(None, "2"), ("1", "2")],
+    ids=["unconditional", "current"],
+)
+def test_store_replace(resource_version, expected_version):
+    """
+    GIVEN store with an object
+    WHEN replace is called without a resource version or with the current one
+    THEN the object is replaced keeping its identity and the generation increases.
+    """
+    store = fake_api_server.Store()
+    created = store.create(target=_target(), body=_config_map())
+    body = _config_map(resourceVersion=resource_version)
+    body["data"] = {"key": "new value"}
+
+    replaced = store.replace(target=_target(name="name-1"), body=body)
+
+    assert replaced["data"] == {"key": "new value"}
+    assert replaced["metadata"]["resourceVersion"] == expected_version
+    assert replaced["metadata"]["uid"] == created["metadata"]["uid"]
+    assert replaced["metadata"]["generation"] == 2
+
+
+def test_store_replace_conflict():
+    """
+    GIVEN store with an object that was modified since a resource version
+    WHEN replace is called with the old resource version
+    THEN StatusError with 409 is raised and the object is unchanged.
+    """
+    store = fake_api_server.Store()
+    store.create(target=_target(), body=_config_map())
+    current = store.replace(target=_target(name="name-1"), body=_config_map())
+
+    with pytest.raises(fake_api_server.StatusError) as exc_info:
+        store.replace(
+            target=_target(name="name-1"), body=_config_map(resourceVersion="1")
+        )
+
+    assert (exc_info.value.code, exc_info.value.reason) == (409, "Conflict")
+    assert store.get(target=_target(name="name-1")) == current
+
+
+@pytest.mark.parametrize(
+    "name, body, expected_code",
+    [
+        ("name-2", _config_map(name="name-2"), 404),
+        ("name-1", _config_map(name="name-2"), 400),
+    ],
+    ids=["not found", "name mismatch"],
+)
+def test_store_replace_fails(name, body, expected_code):
+    """
+    GIVEN store with an object
+    WHEN replace is called for another object or with another name than the path
+    THEN StatusError is raised.
+    """
+    store = fake_api_server.Store()
+    store.create(target=_target(), body=_config_map())
+
+    with pytest.raises(fake_api_server.StatusError) as exc_info:
+        store.replace(target=_target(name=name), body=body)
+
+    assert exc_info.value.code == expected_code
+
+
+def test_store_find_events():
+    """
+    GIVEN store with changes in two namespaces
+    WHEN find_events is called for a namespace since a resource version
+    THEN only the later changes of the namespace are returned in order.
+    """
+    store = fake_api_server.Store()
+    store.create(target=_target(), body=_config_map())
+    store.create(target=_target(namespace="other"), body=_config_map())
+    store.replace(target=_target(name="name-1"), body=_config_map())
+    store.delete(target=_target(name="name-1"))
+
+    events = store.find_events(target=_target(), since=1)
+
+    assert [(version, event_type) for version, event_type, _ in events] == [
+        (3, "MODIFIED"),
+        (4, "DELETED"),
+    ]
+
+
+def test_store_find_events_expired(monkeypatch):
+    """
+    GIVEN store whose history no longer goes back to a resource version
+    WHEN find_events is called since that resource version
+    THEN StatusError with 410 is raised, while the oldest kept change still works.
+    """
+    monkeypatch.setattr(fake_api_server, "HISTORY_SIZE", 2)
+    store = fake_api_server.Store()
+    for idx in range(4):
+        store.create(target=_target(), body=_config_map(name=f"name-{idx}"))
+
+    with pytest.raises(fake_api_server.StatusError) as exc_info:
+        store.find_events(target=_target(), since=1)
+
+    assert (exc_info.value.code, exc_info.value.reason) == (410, "Expired")
+    assert [event[0] for event in store.find_events(target=_target(), since=2)] == [
+        3,
+        4,
+    ]
+
+
+def test_watch():
+    """
+    GIVEN fake API server with changes
+    WHEN a collection is watched from a resource version
+    THEN the later changes are streamed as lines until the timeout.
+    """
+    with fake_api_server.FakeApiServer(resources=_RESOURCES) as server:
+        server.store.create(target=_target(), body=_config_map())
+        server.store.delete(target=_target(name="name-1"))
+        url = (
+            f"{server.host}/api/v1/namespaces/default/configmaps"
+            "?watch=true&resourceVersion=1&timeoutSeconds=0.1"
+        )
+
+        with urllib.request.urlopen(url) as response:
+            lines = [json.loads(line) for line in response]
+
+    assert [(line["type"], line["object"]["metadata"]["name"]) for line in lines] == [
+        ("DELETED", "name-1")
+    ]
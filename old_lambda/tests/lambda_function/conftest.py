@@ -7,6 +7,14 @@ import pytest
 import urllib3
 
 from lambda_function import operations
+from lambda_function import response
+
+
+@pytest.fixture(autouse=True)
+def _metrics_disabled(monkeypatch):
+    """Keep the metrics out of the output of tests that do not check them."""
+    monkeypatch.setenv("PHASE_METRICS", "false")
+    monkeypatch.setenv("LATENCY_HISTOGRAMS", "false")
 
 
 @pytest.fixture
@@ -73,6 +81,8 @@ def mocked_urllib3_pool_manager(monkeypatch):
     """Monkeypatch urllib3.PoolManager."""
     mock_pool_manager = mock.MagicMock()
     monkeypatch.setattr(urllib3, "PoolManager", mock_pool_manager)
+    monkeypatch.setattr(response, "_POOL", None)
+    monkeypatch.setattr(response, "_ENDPOINT", None)
     return mock_pool_manager
 
 
@@ -0,0 +1,217 @@
+"""Tests for bundles."""
+
+# pylint: disable=redefined-outer-name
+
+from unittest import mock
+
+import pytest
+
+from lambda_function import bundles
+from lambda_function import operations
+
+_BODIES = [{"metadata": {"name": "name 1"}}, {"metadata": {"name": "name 2"}}]
+
+
+@pytest.fixture
+def mocked_operations(monkeypatch):
+    """Monkeypatch operations.create, update and delete with per item results."""
+    mock_operations = mock.MagicMock()
+    mock_operations.create.side_effect = lambda body, cluster: (
+        operations.CreateReturn("SUCCESS", None, f"ns/{body['metadata']['name']}")
+    )
+    mock_operations.update.return_value = operations.ExistsReturn("SUCCESS", None)
+    mock_operations.delete.return_value = operations.ExistsReturn("SUCCESS", None)
+    monkeypatch.setattr(operations, "create", mock_operations.create)
+    monkeypatch.setattr(operations, "update", mock_operations.update)
+    monkeypatch.setattr(operations, "delete", mock_operations.delete)
+    return mock_operations
+
+
+def test_create_physical_name_longest(mocked_operations: mock.MagicMock):
+    """
+    GIVEN mocked operations.create that succeeds and as many items as the physical
+        name can record
+    WHEN create is called with the bundle
+    THEN success is returned with the physical name.
+    """
+    bodies = [{"metadata": {"name": f"name-{idx:03d}"}} for idx in range(73)]
+
+    return_value = bundles.create(bodies=bodies)
+
+    assert return_value.status == "SUCCESS"
+    assert len(return_value.physical_name) == 1023
+    mocked_operations.delete.assert_not_called()
+
+
+def test_create_physical_name_too_long(mocked_operations: mock.MagicMock):
+    """
+    GIVEN mocked operations.create that succeeds and more items than the physical
+        name can record along with the cluster
+    WHEN create is called with the bundle and cluster
+    THEN every item is deleted in reverse order and failure is returned with the
+        length of the physical resource id.
+    """
+    bodies = [{"metadata": {"name": f"name-{idx:03d}"}} for idx in range(73)]
+
+    return_value = bundles.create(bodies=bodies, cluster="cluster-1")
+
+    assert return_value == operations.CreateReturn(
+        "FAILURE",
+        "the physical name recording every item is 1043 characters long, "
+        "CloudFormation accepts at most 1024; use fewer items or shorter names.",
+        None,
+    )
+    assert [
+        call[1]["physical_name"] for call in mocked_operations.delete.call_args_list
+    ] == [f"ns/name-{idx:03d}" for idx in reversed(range(73))]
+
+
+def test_create_empty(mocked_operations):
+    """
+    GIVEN empty bundle
+    WHEN create is called with the bundle
+    THEN failure is returned without calling the cluster.
+    """
+    return_value = bundles.create(bodies=[])
+
+    assert return_value == operations.CreateReturn(
+        "FAILURE", "a bundle must not be empty.", None
+    )
+    mocked_operations.create.assert_not_called()
+
+
+def test_create_success(mocked_operations):
+    """
+    GIVEN mocked operations.create that succeeds and bundle
+    WHEN create is called with the bundle and cluster
+    THEN create is called for every item in order and the physical name records
+        every item.
+    """
+    return_value = bundles.create(bodies=_BODIES, cluster="cluster 1")
+
+    assert return_value == operations.CreateReturn(
+        "SUCCESS", None, '["ns/name 1","ns/name 2"]'
+    )
+    assert mocked_operations.create.call_args_list == [
+        mock.call(body=body, cluster="cluster 1") for body in _BODIES
+    ]
+
+
+@pytest.mark.parametrize(
+    "delete_return_value, expected_reason",
+    [
+        (operations.ExistsReturn("SUCCESS", None), "item 2: failed"),
+        (
+            operations.ExistsReturn("FAILURE", "gone"),
+            "item 2: failed; rollback failed for item 1: gone; item 0: gone",
+        ),
+    ],
+    ids=["rollback success", "rollback failure"],
+)
+def test_create_failure_rolls_back(
+    mocked_operations, delete_return_value, expected_reason
+):
+    """
+    GIVEN mocked operations.create that fails for the last item
+    WHEN create is called with the bundle
+    THEN the items created before it are deleted in reverse order and failure is
+        returned.
+    """
+    bodies = [*_BODIES, {"metadata": {"name": "name 3"}}]
+    mocked_operations.create.side_effect = lambda body, cluster: (
+        operations.CreateReturn("FAILURE", "failed", None)
+        if body is bodies[2]
+        else operations.CreateReturn("SUCCESS", None, body["metadata"]["name"])
+    )
+    mocked_operations.delete.return_value = delete_return_value
+
+    return_value = bundles.create(bodies=bodies)
+
+    assert return_value == operations.CreateReturn("FAILURE", expected_reason, None)
+    assert mocked_operations.create.call_count == 3
+    assert mocked_operations.delete.call_args_list == [
+        mock.call(body=bodies[1], physical_name="name 2", cluster=None),
+        mock.call(body=bodies[0], physical_name="name 1", cluster=None),
+    ]
+
+
+@pytest.mark.parametrize("function_name", ["update", "delete"])
+@pytest.mark.parametrize(
+    "physical_name, expected_reason",
+    [
+        ("ns/name 1", "the physical name does not record a bundle."),
+        (
+            '["ns/name 1"]',
+            "the items of a bundle can not be added or removed, replace the resource "
+            "instead.",
+        ),
+    ],
+    ids=["not bundle", "items changed"],
+)
+def test_exists_invalid_physical_name(
+    mocked_operations, function_name, physical_name, expected_reason
+):
+    """
+    GIVEN physical name that does not match the bundle
+    WHEN update or delete is called with the bundle and physical name
+    THEN failure is returned without calling the cluster.
+    """
+    function = getattr(bundles, function_name)
+
+    return_value = function(bodies=_BODIES, physical_name=physical_name)
+
+    assert return_value == operations.ExistsReturn("FAILURE", expected_reason)
+    getattr(mocked_operations, function_name).assert_not_called()
+
+
+def test_update_success(mocked_operations):
+    """
+    GIVEN mocked operations.update that succeeds and bundle
+    WHEN update is called with the bundle and physical name
+    THEN update is called for every item in order and success is returned.
+    """
+    return_value = bundles.update(
+        bodies=_BODIES, physical_name='["ns/name 1","ns/name 2"]', cluster="cluster 1"
+    )
+
+    assert return_value == operations.ExistsReturn("SUCCESS", None)
+    assert mocked_operations.update.call_args_list == [
+        mock.call(body=_BODIES[0], physical_name="ns/name 1", cluster="cluster 1"),
+        mock.call(body=_BODIES[1], physical_name="ns/name 2", cluster="cluster 1"),
+    ]
+
+
+def test_delete_success(mocked_operations):
+    """
+    GIVEN mocked operations.delete that succeeds and bundle
+    WHEN delete is called with the bundle and physical name
+    THEN delete is called for every item in reverse order and success is returned.
+    """
+    return_value = bundles.delete(
+        bodies=_BODIES, physical_name='["ns/name 1","ns/name 2"]'
+    )
+
+    assert return_value == operations.ExistsReturn("SUCCESS", None)
+    assert mocked_operations.delete.call_args_list == [
+        mock.call(body=_BODIES[1], physical_name="ns/name 2", cluster=None),
+        mock.call(body=_BODIES[0], physical_name="ns/name 1", cluster=None),
+    ]
+
+
+@pytest.mark.parametrize("function_name", ["update", "delete"])
+def test_exists_failure(mocked_operations, function_name):
+    """
+    GIVEN mocked operation that fails for every item
+    WHEN update or delete is called with the bundle
+    THEN every item is attempted and the reasons are combined.
+    """
+    getattr(mocked_operations, function_name).return_value = operations.ExistsReturn(
+        "FAILURE", "failed"
+    )
+    function = getattr(bundles, function_name)
+
+    return_value = function(bodies=_BODIES, physical_name='["name 1","name 2"]')
+
+    assert return_value.status == "FAILURE"
+    assert set(return_value.reason.split("; ")) == {"item 0: failed", "item 1: failed"}
+    assert getattr(mocked_operations, function_name).call_count == 2
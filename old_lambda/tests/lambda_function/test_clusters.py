@@ -0,0 +1,197 @@
+"""Tests for clusters."""
+
+# pylint: disable=redefined-outer-name,protected-access
+
+from unittest import mock
+
+import pytest
+from kubernetes import client
+
+from lambda_function import clusters
+from lambda_function import credentials
+
+
+@pytest.fixture
+def mocked_providers_for_cluster(monkeypatch):
+    """Monkeypatch credentials.providers_for_cluster to return a static provider."""
+
+    class _Provider:
+        """Provider with a static token."""
+
+        @staticmethod
+        def load():
+            configuration = client.Configuration()
+            configuration.host = "https://host 1"
+            return credentials.LoadReturn(configuration, None)
+
+    mock_providers_for_cluster = mock.MagicMock(return_value=[_Provider()])
+    monkeypatch.setattr(
+        credentials, "providers_for_cluster", mock_providers_for_cluster
+    )
+    return mock_providers_for_cluster
+
+
+@pytest.mark.parametrize(
+    "cluster, expected_key, expected_name",
+    [
+        ("cluster 1", "cluster 1", "cluster 1"),
+        (
+            {"roleArn": "role 1", "name": "cluster 1"},
+            '{"name":"cluster 1","roleArn":"role 1"}',
+            "cluster 1",
+        ),
+    ],
+    ids=["name", "mapping"],
+)
+def test_calculate_key_name(cluster, expected_key, expected_name):
+    """
+    GIVEN cluster property value
+    WHEN calculate_key and calculate_name are called with the value
+    THEN the expected key and name are returned.
+    """
+    assert clusters.calculate_key(cluster=cluster) == expected_key
+    assert clusters.calculate_name(cluster=cluster) == expected_name
+
+
+@pytest.mark.parametrize(
+    "cluster, physical_name, expected_physical_name",
+    [
+        (None, "namespace 1/name 1", "namespace 1/name 1"),
+        ("cluster-1", "namespace 1/name 1", "cluster://cluster-1/namespace 1/name 1"),
+        ({"name": "a/b:c"}, "system:name", "cluster://a%2Fb%3Ac/system:name"),
+        ("cluster-1", '["name 1"]', 'cluster://cluster-1/["name 1"]'),
+    ],
+    ids=["default", "name", "mapping", "bundle"],
+)
+def test_physical_name(cluster, physical_name, expected_physical_name):
+    """
+    GIVEN cluster property value and physical name on the cluster
+    WHEN calculate_physical_name is called and its result parsed
+    THEN the expected physical name is returned and parses back into the name of the
+        cluster and the physical name.
+    """
+    returned_physical_name = clusters.calculate_physical_name(
+        cluster=cluster, physical_name=physical_name
+    )
+
+    assert returned_physical_name == expected_physical_name
+    assert clusters.parse_physical_name(
+        physical_name=returned_physical_name
+    ) == clusters.PhysicalName(
+        None if cluster is None else clusters.calculate_name(cluster=cluster),
+        physical_name,
+    )
+
+
+def test_registry_get_miss(mocked_providers_for_cluster: mock.MagicMock):
+    """
+    GIVEN empty registry
+    WHEN get is called with a cluster
+    THEN an entry with an api client using the configuration of the cluster is
+        created and counted as a miss.
+    """
+    registry = clusters.Registry(max_size=2)
+
+    entry = registry.get(cluster="cluster 1")
+
+    assert mocked_providers_for_cluster.call_args[1]["cluster"] == "cluster 1"
+    assert entry.name == "cluster 1"
+    assert entry.api_client.configuration.host == "https://host 1"
+    assert registry.metrics() == {"cluster 1": {"hits": 0, "misses": 1, "evictions": 0}}
+    assert len(registry) == 1
+
+
+def test_registry_get_hit(mocked_providers_for_cluster: mock.MagicMock):
+    """
+    GIVEN registry with a cluster
+    WHEN get_api_client is called with the cluster
+    THEN the existing api client is returned and counted as a hit.
+    """
+    registry = clusters.Registry(max_size=2)
+    entry = registry.get(cluster="cluster 1")
+
+    api_client = registry.get_api_client(cluster="cluster 1")
+
+    assert api_client is entry.api_client
+    assert mocked_providers_for_cluster.call_count == 1
+    assert registry.metrics()["cluster 1"] == {"hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_registry_evicts_least_recently_used(
+    mocked_providers_for_cluster: mock.MagicMock,
+):  # pylint: disable=unused-argument
+    """
+    GIVEN registry of size 2 with two clusters where the first was used last
+    WHEN get is called with a third cluster
+    THEN the second cluster is evicted and its pool is cleared.
+    """
+    registry = clusters.Registry(max_size=2)
+    registry.get(cluster="cluster 1")
+    second = registry.get(cluster="cluster 2")
+    registry.get(cluster="cluster 1")
+    second.api_client.rest_client.pool_manager = mock.MagicMock()
+
+    registry.get(cluster="cluster 3")
+
+    assert len(registry) == 2
+    assert set(registry._entries) == {"cluster 1", "cluster 3"}
+    second.api_client.rest_client.pool_manager.clear.assert_called_once_with()
+    assert registry.metrics()["cluster 2"]["evictions"] == 1
+
+
+def test_registry_concurrent_create(
+    mocked_providers_for_cluster: mock.MagicMock, monkeypatch
+):  # pylint: disable=unused-argument
+    """
+    GIVEN registry where another thread adds the cluster while it is being created
+    WHEN get is called with the cluster
+    THEN the entry of the other thread is returned and the new one is closed.
+    """
+    registry = clusters.Registry(max_size=2)
+    existing = clusters.Entry("cluster 1", mock.MagicMock(), mock.MagicMock())
+    mock_close = mock.MagicMock()
+    monkeypatch.setattr(clusters, "_close", mock_close)
+    original_chain = credentials.Chain
+
+    def chain(**kwargs):
+        registry._entries["cluster 1"] = existing
+        return original_chain(**kwargs)
+
+    monkeypatch.setattr(credentials, "Chain", chain)
+
+    entry = registry.get(cluster="cluster 1")
+
+    assert entry is existing
+    assert mock_close.call_args[1]["entry"] is not existing
+
+
+def test_registry_clear(mocked_providers_for_cluster: mock.MagicMock):
+    """
+    GIVEN registry with a cluster
+    WHEN clear is called
+    THEN the registry is empty.
+    """
+    registry = clusters.Registry(max_size=2)
+    registry.get(cluster="cluster 1")
+
+    registry.clear()
+
+    assert len(registry) == 0
+    assert mocked_providers_for_cluster.call_count == 1
+
+
+def test_shared_registry(monkeypatch):
+    """
+    GIVEN CLUSTER_REGISTRY_SIZE environment variable
+    WHEN get_registry is called and the registry reset
+    THEN the registry has the size and a new registry is created after the reset.
+    """
+    monkeypatch.setenv("CLUSTER_REGISTRY_SIZE", "3")
+    clusters.reset()
+    registry = clusters.get_registry()
+
+    assert registry._max_size == 3
+    assert clusters.get_registry() is registry
+    clusters.reset()
+    assert clusters.get_registry() is not registry
+    clusters.reset()
@@ -0,0 +1,186 @@
+"""Tests for connections."""
+
+import http.client
+import http.server
+import io
+import socket
+import threading
+from unittest import mock
+
+import pytest
+import urllib3
+
+from lambda_function import connections
+from lambda_function import metrics
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Answers every request with a small body over keep-alive connections."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_PUT(self):  # pylint: disable=invalid-name
+        """Read the body and answer."""
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = b'{"status": "ok"}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args):  # pylint: disable=arguments-differ
+        """Keep the test output clean."""
+
+
+@pytest.fixture(name="server_url")
+def fixture_server_url():
+    """The url of a local HTTP server."""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(name="recorder")
+def fixture_recorder(monkeypatch):
+    """The recorder of an invocation with metrics enabled."""
+    monkeypatch.setenv("PHASE_METRICS", "true")
+    metrics.start(request_type="Create")
+    # pylint: disable=protected-access
+    recorder = metrics._RECORDER
+    yield recorder
+    metrics.emit()
+
+
+def test_instrument(server_url, recorder, capsys):
+    """
+    GIVEN instrumented pool manager and a local server
+    WHEN two requests are sent
+    THEN one new and one reused connection, the handshake, the waits and the bytes
+        are recorded.
+    """
+    pool_manager = urllib3.PoolManager()
+    connections.instrument(pool_manager=pool_manager, target="response")
+
+    for _ in range(2):
+        response = pool_manager.request("PUT", server_url, body=b"0123456789")
+        assert response.data == b'{"status": "ok"}'
+    pool_manager.clear()
+    metrics.emit()
+    capsys.readouterr()
+
+    counters = {name: value for name, (value, _) in recorder.counters.items()}
+    assert counters["ResponseNewConnections"] == 1
+    assert counters["ResponseReusedConnections"] == 1
+    assert counters["ResponseHandshakeDuration"] > 0
+    assert counters["ResponseTimeToFirstByte"] > 0
+    assert counters["ResponseBytesSent"] > 20
+    assert counters["ResponseBytesReceived"] > 2 * len(b'{"status": "ok"}')
+    assert recorder.counters["ResponseBytesSent"][1] == "Bytes"
+
+
+def test_instrument_file_body(server_url, recorder):
+    """
+    GIVEN instrumented connection and a local server
+    WHEN a body is sent from a file
+    THEN only the headers are counted since http.client sends the file itself.
+    """
+    # pylint: disable=protected-access
+    connection_class = connections._connection_class(
+        base=http.client.HTTPConnection, prefix="Test"
+    )
+    connection = connection_class(*server_url[len("http://") : -1].split(":"))
+    connection.putrequest("PUT", "/")
+    connection.putheader("Content-Length", "10")
+    connection.endheaders()
+
+    connection.send(io.BytesIO(b"0123456789"))
+
+    assert connection.getresponse().status == 200
+    connection.close()
+    headers_size = recorder.counters["TestBytesSent"][0]
+    assert 0 < headers_size < 200
+
+
+def test_instrument_connect_fails(recorder):
+    """
+    GIVEN instrumented pool manager and a port nothing listens on
+    WHEN a request is sent
+    THEN the error is raised and the handshake is still recorded.
+    """
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        port = unused.getsockname()[1]
+    pool_manager = urllib3.PoolManager(retries=False)
+    connections.instrument(pool_manager=pool_manager, target="kubernetes")
+
+    with pytest.raises(urllib3.exceptions.HTTPError):
+        pool_manager.request("GET", f"http://127.0.0.1:{port}/")
+
+    assert "KubernetesHandshakeDuration" in recorder.counters
+    assert "KubernetesNewConnections" not in recorder.counters
+
+
+def test_instrument_classes_shared():
+    """
+    GIVEN two pool managers
+    WHEN both are instrumented for the same target
+    THEN they share the pool classes.
+    """
+    first, second = urllib3.PoolManager(), urllib3.PoolManager()
+
+    connections.instrument(pool_manager=first, target="kubernetes")
+    connections.instrument(pool_manager=second, target="kubernetes")
+
+    assert first.pool_classes_by_scheme == second.pool_classes_by_scheme
+    assert issubclass(
+        first.pool_classes_by_scheme["https"], urllib3.HTTPSConnectionPool
+    )
+
+
+@pytest.mark.parametrize(
+    "method, args, expected_result, expected_bytes",
+    [
+        ("read", (4,), b"line", 4),
+        ("read", (0,), b"", 0),
+        ("read1", (), b"line 1\nline 2\n", 14),
+        ("readline", (), b"line 1\n", 7),
+        ("readinto", (bytearray(3),), 3, 3),
+        ("peek", (), None, 0),
+    ],
+)
+def test_counting_reader(recorder, method, args, expected_result, expected_bytes):
+    """
+    GIVEN reader counting the bytes read through it
+    WHEN the reader is read
+    THEN the bytes are counted and the data is returned.
+    """
+    # pylint: disable=protected-access
+    reader = connections._CountingReader(
+        reader=io.BufferedReader(io.BytesIO(b"line 1\nline 2\n")), name="Bytes"
+    )
+
+    result = getattr(reader, method)(*args)
+
+    if expected_result is not None:
+        assert result == expected_result
+    assert recorder.counters.get("Bytes", (0, "Bytes"))[0] == expected_bytes
+
+
+def test_create_api_client(monkeypatch):
+    """
+    GIVEN configuration
+    WHEN create_api_client is called with the configuration
+    THEN the client is created and its pool manager is instrumented.
+    """
+    mock_api_client = mock.MagicMock()
+    mock_api_client.return_value.rest_client.pool_manager = urllib3.PoolManager()
+    monkeypatch.setattr(connections.client, "ApiClient", mock_api_client)
+
+    api_client = connections.create_api_client(configuration="configuration 1")
+
+    mock_api_client.assert_called_once_with(configuration="configuration 1")
+    pool_class = api_client.rest_client.pool_manager.pool_classes_by_scheme["http"]
+    assert pool_class.ConnectionCls.__name__ == "InstrumentedConnection"
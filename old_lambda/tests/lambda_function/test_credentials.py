@@ -0,0 +1,608 @@
+"""Tests for credentials."""
+
+# pylint: disable=redefined-outer-name,protected-access
+
+import base64
+import os
+import threading
+import time
+import urllib.parse
+from unittest import mock
+
+import boto3
+import pytest
+import yaml
+from botocore import stub
+
+from lambda_function import credentials
+from lambda_function import exceptions
+
+_REGION = "ap-southeast-2"
+_ROLE_ARN = "arn:aws:iam::123456789012:role/role-1"
+_CA_DATA = base64.b64encode(b"ca data 1").decode("utf-8")
+
+
+@pytest.fixture
+def session():
+    """A boto3 session with static credentials so that requests can be signed."""
+    return boto3.Session(
+        aws_access_key_id="access key 1",
+        aws_secret_access_key="secret key 1",
+        region_name=_REGION,
+    )
+
+
+@pytest.fixture
+def kubeconfig_dict():
+    """A kubeconfig with a token user."""
+    return {
+        "apiVersion": "v1",
+        "kind": "Config",
+        "current-context": "context 1",
+        "clusters": [
+            {
+                "name": "cluster 1",
+                "cluster": {
+                    "server": "https://server 1",
+                    "certificate-authority-data": _CA_DATA,
+                },
+            }
+        ],
+        "contexts": [
+            {"name": "context 1", "context": {"cluster": "cluster 1", "user": "user 1"}}
+        ],
+        "users": [{"name": "user 1", "user": {"token": "token 1"}}],
+    }
+
+
+def test_write_ca(tmp_path, monkeypatch):
+    """
+    GIVEN certificate authority data
+    WHEN write_ca is called twice with the data
+    THEN the data is written to the same file in the temporary directory.
+    """
+    monkeypatch.setattr(credentials.tempfile, "gettempdir", lambda: str(tmp_path))
+
+    path = credentials.write_ca(data=b"ca data 1")
+
+    assert os.path.dirname(path) == str(tmp_path)
+    with open(path, "rb") as in_file:
+        assert in_file.read() == b"ca data 1"
+    assert credentials.write_ca(data=b"ca data 1") == path
+
+
+def test_in_cluster_provider(tmp_path):
+    """
+    GIVEN service account directory with a token and host and port
+    WHEN load is called on InClusterProvider
+    THEN the configuration uses the host, port, token and ca certificate.
+    """
+    (tmp_path / "token").write_text("token 1\n")
+
+    configuration, expiry = credentials.InClusterProvider(
+        host="host 1", port="443", path=str(tmp_path)
+    ).load()
+
+    assert configuration.host == "https://host 1:443"
+    assert configuration.ssl_ca_cert == str(tmp_path / "ca.crt")
+    assert configuration.api_key == {"authorization": "token 1"}
+    assert configuration.api_key_prefix == {"authorization": "Bearer"}
+    assert expiry > time.time()
+
+
+def test_kubeconfig_file_provider(tmp_path, kubeconfig_dict):
+    """
+    GIVEN kubeconfig file
+    WHEN load is called on KubeconfigFileProvider with the path
+    THEN the configuration uses the server and token of the current context.
+    """
+    path = tmp_path / "config"
+    path.write_text(yaml.safe_dump(kubeconfig_dict))
+
+    configuration, _ = credentials.KubeconfigFileProvider(path=str(path)).load()
+
+    assert configuration.host == "https://server 1"
+    assert configuration.auth_settings()["BearerToken"]["value"] == "Bearer token 1"
+
+
+def test_eks_token(session):
+    """
+    GIVEN session with credentials and cluster name
+    WHEN get_token is called on EksTokenProvider
+    THEN a token with the presigned GetCallerIdentity url bound to the cluster is
+        returned.
+    """
+    provider = credentials.EksTokenProvider(
+        cluster_name="cluster 1", region=_REGION, session=session
+    )
+
+    token = provider.get_token()
+
+    assert token.startswith("k8s-aws-v1.")
+    encoded = token[len("k8s-aws-v1.") :]
+    url = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode()
+    query = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+    assert query["Action"] == ["GetCallerIdentity"]
+    assert "x-k8s-aws-id" in query["X-Amz-SignedHeaders"][0].split(";")
+
+
+def test_eks_provider_load(session, monkeypatch, tmp_path):
+    """
+    GIVEN stubbed EKS that describes the cluster
+    WHEN load is called on EksTokenProvider
+    THEN the configuration uses the endpoint, certificate authority and a token.
+    """
+    monkeypatch.setattr(credentials.tempfile, "gettempdir", lambda: str(tmp_path))
+    eks = session.client("eks", region_name=_REGION)
+    stubber = stub.Stubber(eks)
+    stubber.add_response(
+        "describe_cluster",
+        {
+            "cluster": {
+                "endpoint": "https://endpoint 1",
+                "certificateAuthority": {"data": _CA_DATA},
+            }
+        },
+        {"name": "cluster 1"},
+    )
+    mock_session = mock.MagicMock()
+    mock_session.client.side_effect = lambda service_name, **_: (
+        eks if service_name == "eks" else session.client(service_name)
+    )
+    provider = credentials.EksTokenProvider(
+        cluster_name="cluster 1",
+        region=_REGION,
+        endpoint_url="http://localhost:1",
+        session=mock_session,
+    )
+
+    with stubber:
+        configuration, expiry = provider.load()
+
+    assert configuration.host == "https://endpoint 1"
+    with open(configuration.ssl_ca_cert, "rb") as in_file:
+        assert in_file.read() == b"ca data 1"
+    assert configuration.api_key["authorization"].startswith("k8s-aws-v1.")
+    assert expiry == pytest.approx(time.time() + credentials.EKS_TOKEN_LIFETIME, 5)
+    mock_session.client.assert_any_call(
+        "eks", region_name=_REGION, endpoint_url="http://localhost:1"
+    )
+
+
+def test_eks_provider_role(session, monkeypatch):
+    """
+    GIVEN stubbed STS that assumes a role and provider with the role
+    WHEN get_token is called on EksTokenProvider
+    THEN the token is presigned with a session using the role credentials.
+    """
+    sts = session.client("sts", region_name=_REGION)
+    stubber = stub.Stubber(sts)
+    stubber.add_response(
+        "assume_role",
+        {
+            "Credentials": {
+                "AccessKeyId": "role access key 1",
+                "SecretAccessKey": "role secret key 1",
+                "SessionToken": "role session token 1",
+                "Expiration": "2030-01-01T00:00:00Z",
+            }
+        },
+        {"RoleArn": _ROLE_ARN, "RoleSessionName": "cloudformation-kubernetes"},
+    )
+    mock_session = mock.MagicMock()
+    mock_session.client.return_value = sts
+    created = []
+
+    def create_session(**kwargs):
+        created.append(kwargs)
+        return session
+
+    monkeypatch.setattr(credentials, "_create_session", create_session)
+    provider = credentials.EksTokenProvider(
+        cluster_name="cluster 1",
+        region=_REGION,
+        role_arn=_ROLE_ARN,
+        session=mock_session,
+    )
+
+    with stubber:
+        provider.get_token()
+
+    assert created == [
+        {
+            "aws_access_key_id": "role access key 1",
+            "aws_secret_access_key": "role secret key 1",
+            "aws_session_token": "role session token 1",
+            "region_name": _REGION,
+        }
+    ]
+
+
+def test_aws_provider_creates_session(monkeypatch):
+    """
+    GIVEN provider without a session
+    WHEN a client is created twice
+    THEN one session is created for the region.
+    """
+    mock_create_session = mock.MagicMock()
+    monkeypatch.setattr(credentials, "_create_session", mock_create_session)
+    provider = credentials.ParameterStoreProvider(name="name 1", region=_REGION)
+
+    provider._client(service_name="ssm")
+    provider._client(service_name="ssm")
+
+    mock_create_session.assert_called_once_with(region_name=_REGION)
+
+
+def test_parameter_store_provider(session, kubeconfig_dict, monkeypatch, tmp_path):
+    """
+    GIVEN stubbed SSM that returns a kubeconfig
+    WHEN load is called on ParameterStoreProvider
+    THEN the configuration uses the server and token of the current context.
+    """
+    monkeypatch.setattr(credentials.tempfile, "gettempdir", lambda: str(tmp_path))
+    ssm = session.client("ssm", region_name=_REGION)
+    stubber = stub.Stubber(ssm)
+    stubber.add_response(
+        "get_parameter",
+        {"Parameter": {"Value": yaml.safe_dump(kubeconfig_dict)}},
+        {"Name": "name 1", "WithDecryption": True},
+    )
+    mock_session = mock.MagicMock()
+    mock_session.client.return_value = ssm
+
+    with stubber:
+        configuration, _ = credentials.ParameterStoreProvider(
+            name="name 1", region=_REGION, session=mock_session
+        ).load()
+
+    assert configuration.host == "https://server 1"
+    assert configuration.auth_settings()["BearerToken"]["value"] == "Bearer token 1"
+
+
+class _Provider:
+    """Provider returning a new token on every load."""
+
+    def __init__(self, *, lifetime=None, error=None):
+        self.loads = 0
+        self._lifetime = lifetime
+        self._error = error
+
+    def load(self):
+        if self._error is not None:
+            raise self._error
+        self.loads += 1
+        configuration = credentials.client.Configuration()
+        configuration.api_key = {"authorization": f"token {self.loads}"}
+        expiry = None if self._lifetime is None else time.time() + self._lifetime
+        return credentials.LoadReturn(configuration, expiry)
+
+
+@pytest.fixture
+def mocked_timer(monkeypatch):
+    """Monkeypatch threading.Timer."""
+    mock_timer = mock.MagicMock()
+    monkeypatch.setattr(threading, "Timer", mock_timer)
+    return mock_timer
+
+
+def test_chain_no_providers():
+    """
+    GIVEN chain without providers
+    WHEN get_configuration is called
+    THEN None is returned.
+    """
+    assert credentials.Chain(providers=[]).get_configuration() is None
+
+
+def test_chain_first_provider(mocked_timer: mock.MagicMock):
+    """
+    GIVEN chain with a failing provider followed by two providers
+    WHEN get_configuration is called twice
+    THEN the configuration of the first successful provider is loaded once.
+    """
+    second, third = _Provider(), _Provider()
+    chain = credentials.Chain(
+        providers=[_Provider(error=Exception("error 1")), second, third]
+    )
+
+    configuration = chain.get_configuration()
+
+    assert chain.get_configuration() is configuration
+    assert configuration.api_key == {"authorization": "token 1"}
+    assert (second.loads, third.loads) == (1, 0)
+    mocked_timer.assert_not_called()
+
+
+def test_chain_all_fail():
+    """
+    GIVEN chain with providers that fail
+    WHEN get_configuration is called
+    THEN CredentialsError is raised with each failure.
+    """
+    chain = credentials.Chain(
+        providers=[_Provider(error=Exception("error 1")), _Provider(error=OSError())]
+    )
+
+    with pytest.raises(exceptions.CredentialsError) as exc_info:
+        chain.get_configuration()
+
+    assert "_Provider: error 1" in str(exc_info.value)
+
+
+def test_chain_schedules_refresh(mocked_timer: mock.MagicMock):
+    """
+    GIVEN chain with a provider whose credentials expire
+    WHEN get_configuration is called
+    THEN a daemon timer is started to refresh shortly before the expiry.
+    """
+    chain = credentials.Chain(providers=[_Provider(lifetime=600.0)])
+
+    chain.get_configuration()
+
+    delay, callback = mocked_timer.call_args[0]
+    assert delay == pytest.approx(600.0 - credentials.REFRESH_MARGIN, abs=5)
+    assert callback == chain._background_refresh
+    assert mocked_timer.return_value.daemon is True
+    mocked_timer.return_value.start.assert_called_once_with()
+
+
+def test_chain_refresh_in_place(mocked_timer: mock.MagicMock):
+    """
+    GIVEN chain with a provider whose credentials expire within the margin
+    WHEN get_configuration is called twice
+    THEN the same configuration is returned with a refreshed token and the previous
+        timer is cancelled.
+    """
+    provider = _Provider(lifetime=credentials.REFRESH_MARGIN / 2)
+    chain = credentials.Chain(providers=[provider])
+    configuration = chain.get_configuration()
+
+    assert chain.get_configuration() is configuration
+    assert configuration.api_key == {"authorization": "token 2"}
+    assert provider.loads == 2
+    mocked_timer.return_value.cancel.assert_called_once_with()
+
+
+@pytest.mark.parametrize(
+    "lifetime, expected_raises",
+    [(credentials.REFRESH_MARGIN / 2, False), (-1.0, True)],
+    ids=["unexpired", "expired"],
+)
+def test_chain_refresh_failure(
+    mocked_timer: mock.MagicMock, lifetime, expected_raises
+):  # pylint: disable=unused-argument
+    """
+    GIVEN chain that has loaded credentials due for a refresh and whose provider then
+        fails
+    WHEN get_configuration is called
+    THEN the cached configuration is returned if its token has not expired and
+        otherwise CredentialsError is raised.
+    """
+    provider = _Provider(lifetime=lifetime)
+    chain = credentials.Chain(providers=[provider])
+    configuration = chain.get_configuration()
+    provider._error = Exception("error 1")
+
+    if expected_raises:
+        with pytest.raises(exceptions.CredentialsError) as exc_info:
+            chain.get_configuration()
+        assert "_Provider: error 1" in str(exc_info.value)
+    else:
+        assert chain.get_configuration() is configuration
+        assert configuration.api_key == {"authorization": "token 1"}
+
+
+def test_chain_refresh_before_load():
+    """
+    GIVEN chain that has not loaded
+    WHEN refresh is called
+    THEN nothing is loaded.
+    """
+    provider = _Provider()
+    chain = credentials.Chain(providers=[provider])
+
+    chain.refresh()
+
+    assert provider.loads == 0
+
+
+def test_chain_background_refresh(mocked_timer: mock.MagicMock):
+    """
+    GIVEN chain that has loaded and whose provider then fails
+    WHEN the background refresh runs
+    THEN the failure is swallowed.
+    """
+    provider = _Provider(lifetime=600.0)
+    chain = credentials.Chain(providers=[provider])
+    chain.get_configuration()
+    chain._background_refresh()
+    assert provider.loads == 2
+
+    provider._error = Exception("error 1")
+    chain._background_refresh()
+
+    assert mocked_timer.call_count == 2
+
+
+def test_chain_close(mocked_timer: mock.MagicMock):
+    """
+    GIVEN chain with a scheduled refresh
+    WHEN close is called twice
+    THEN the timer is cancelled once.
+    """
+    chain = credentials.Chain(providers=[_Provider(lifetime=600.0)])
+    chain.get_configuration()
+
+    chain.close()
+    chain.close()
+
+    mocked_timer.return_value.cancel.assert_called_once_with()
+
+
+def test_providers_from_environ_empty(tmp_path):
+    """
+    GIVEN environment without any configuration
+    WHEN providers_from_environ is called
+    THEN no providers are returned.
+    """
+    environ = {"KUBECONFIG": str(tmp_path / "missing")}
+
+    assert credentials.providers_from_environ(environ=environ) == []
+
+
+def test_providers_from_environ_all(tmp_path):
+    """
+    GIVEN environment configuring every provider
+    WHEN providers_from_environ is called
+    THEN the providers are returned in chain order.
+    """
+    kubeconfig = tmp_path / "config"
+    kubeconfig.write_text("")
+    environ = {
+        "AWS_REGION": _REGION,
+        "AWS_ENDPOINT_URL": "http://localhost:1",
+        "KUBERNETES_SERVICE_HOST": "host 1",
+        "KUBECONFIG": str(kubeconfig),
+        "EKS_CLUSTER_NAME": "cluster 1",
+        "EKS_ROLE_ARN": "role arn 1",
+        "KUBECONFIG_PARAMETER": "name 1",
+    }
+
+    providers = credentials.providers_from_environ(environ=environ)
+
+    assert [type(provider) for provider in providers] == [
+        credentials.InClusterProvider,
+        credentials.KubeconfigFileProvider,
+        credentials.EksTokenProvider,
+        credentials.ParameterStoreProvider,
+    ]
+    assert providers[0]._port == "443"
+    assert providers[2]._role_arn == "role arn 1"
+    assert providers[3]._endpoint_url == "http://localhost:1"
+
+
+def test_shared_chain(monkeypatch):
+    """
+    GIVEN environment without any configuration
+    WHEN get_configuration is called and the chain reset
+    THEN None is returned and a new chain is created after the reset.
+    """
+    monkeypatch.setattr(os, "environ", {"KUBECONFIG": "/missing"})
+    credentials.reset()
+    chain = credentials.get_chain()
+
+    assert credentials.get_configuration() is None
+    assert credentials.get_chain() is chain
+    credentials.reset()
+    assert credentials.get_chain() is not chain
+    credentials.reset()
+
+
+def test_create_session():
+    """
+    GIVEN region
+    WHEN _create_session is called with the region
+    THEN a boto3 session for the region is returned.
+    """
+    session = credentials._create_session(region_name=_REGION)
+
+    assert isinstance(session, boto3.Session)
+    assert session.region_name == _REGION
+
+
+def test_eks_handlers_other_requests():
+    """
+    GIVEN parameters, context and request without the cluster name
+    WHEN the EKS event handlers are called
+    THEN nothing is changed.
+    """
+    params, context = {"key": "value"}, {}
+    request = mock.MagicMock(context={}, headers={})
+
+    credentials._retrieve_cluster_name(params, context)
+    credentials._inject_cluster_name(request)
+
+    assert (params, context, request.headers) == ({"key": "value"}, {}, {})
+
+
+def test_eks_provider_load_known_cluster(monkeypatch, tmp_path):
+    """
+    GIVEN EksTokenProvider with the endpoint and certificate authority
+    WHEN load is called
+    THEN the cluster is not described.
+    """
+    monkeypatch.setattr(credentials.tempfile, "gettempdir", lambda: str(tmp_path))
+    provider = credentials.EksTokenProvider(
+        cluster_name="cluster 1", endpoint="https://endpoint 1", ca_data=_CA_DATA
+    )
+    monkeypatch.setattr(provider, "get_token", mock.MagicMock(return_value="token 1"))
+    monkeypatch.setattr(provider, "_describe_cluster", mock.MagicMock())
+
+    configuration, _ = provider.load()
+
+    provider._describe_cluster.assert_not_called()
+    assert configuration.host == "https://endpoint 1"
+    assert configuration.api_key == {"authorization": "token 1"}
+
+
+@pytest.mark.parametrize(
+    "cluster, expected_type, expected_attrs",
+    [
+        (
+            "cluster 1",
+            credentials.EksTokenProvider,
+            {"_cluster_name": "cluster 1", "_region": _REGION, "_role_arn": None},
+        ),
+        (
+            {
+                "name": "cluster 1",
+                "region": "us-east-1",
+                "roleArn": _ROLE_ARN,
+                "endpoint": "https://endpoint 1",
+                "certificateAuthority": _CA_DATA,
+            },
+            credentials.EksTokenProvider,
+            {
+                "_cluster_name": "cluster 1",
+                "_region": "us-east-1",
+                "_role_arn": _ROLE_ARN,
+                "_endpoint": "https://endpoint 1",
+                "_ca_data": _CA_DATA,
+            },
+        ),
+        (
+            {"name": "cluster 1", "kubeconfigParameter": "name 1"},
+            credentials.ParameterStoreProvider,
+            {"_name": "name 1", "_region": _REGION},
+        ),
+    ],
+    ids=["name", "eks mapping", "parameter mapping"],
+)
+def test_providers_for_cluster(cluster, expected_type, expected_attrs):
+    """
+    GIVEN cluster property value
+    WHEN providers_for_cluster is called with the value
+    THEN a provider of the expected type and configuration is returned.
+    """
+    environ = {"AWS_REGION": _REGION, "AWS_ENDPOINT_URL": "http://localhost:1"}
+
+    (provider,) = credentials.providers_for_cluster(cluster=cluster, environ=environ)
+
+    assert isinstance(provider, expected_type)
+    for key, value in expected_attrs.items():
+        assert getattr(provider, key) == value
+    assert provider._endpoint_url == "http://localhost:1"
+
+
+@pytest.mark.parametrize(
+    "cluster", [1, {}, {"name": 1}, ["cluster 1"]], ids=["int", "empty", "name", "list"]
+)
+def test_providers_for_cluster_malformed(cluster):
+    """
+    GIVEN cluster property value that is not a name or mapping with a name
+    WHEN providers_for_cluster is called with the value
+    THEN ClusterMalformedError is raised.
+    """
+    with pytest.raises(exceptions.ClusterMalformedError):
+        credentials.providers_for_cluster(cluster=cluster, environ={})
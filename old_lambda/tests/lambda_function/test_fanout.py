@@ -0,0 +1,221 @@
+"""Tests for fanout."""
+
+# pylint: disable=redefined-outer-name
+
+import threading
+from unittest import mock
+
+import pytest
+
+from lambda_function import fanout
+from lambda_function import operations
+
+
+@pytest.fixture
+def mocked_operations(monkeypatch):
+    """Monkeypatch operations.create, update and delete with per cluster results."""
+    mock_operations = mock.MagicMock()
+    mock_operations.create.side_effect = lambda body, cluster: (
+        operations.CreateReturn("SUCCESS", None, f"ns/{cluster}")
+    )
+    mock_operations.update.return_value = operations.ExistsReturn("SUCCESS", None)
+    mock_operations.delete.return_value = operations.ExistsReturn("SUCCESS", None)
+    monkeypatch.setattr(operations, "create", mock_operations.create)
+    monkeypatch.setattr(operations, "update", mock_operations.update)
+    monkeypatch.setattr(operations, "delete", mock_operations.delete)
+    return mock_operations
+
+
+@pytest.mark.parametrize(
+    "clusters, expected_reason",
+    [
+        ("cluster 1", "clusters must be a non-empty list."),
+        ([], "clusters must be a non-empty list."),
+        (["cluster 1", {"name": "cluster 1"}], "clusters must have unique names."),
+    ],
+    ids=["not list", "empty", "duplicate"],
+)
+def test_create_invalid_clusters(mocked_operations, clusters, expected_reason):
+    """
+    GIVEN invalid clusters
+    WHEN create is called with the clusters
+    THEN failure is returned without calling any cluster.
+    """
+    return_value = fanout.create(body={}, clusters=clusters)
+
+    assert return_value == operations.CreateReturn("FAILURE", expected_reason, None)
+    mocked_operations.create.assert_not_called()
+
+
+def test_create_success(mocked_operations: mock.MagicMock, monkeypatch):
+    """
+    GIVEN mocked operations.create that succeeds and clusters
+    WHEN create is called with the body and clusters
+    THEN create is called for every cluster in parallel and the physical name records
+        every cluster.
+    """
+    monkeypatch.setenv("FANOUT_CONCURRENCY", "2")
+    barrier = threading.Barrier(2, timeout=5)
+
+    def create(body, cluster):
+        barrier.wait()
+        return operations.CreateReturn("SUCCESS", None, f"ns/{cluster}")
+
+    mocked_operations.create.side_effect = create
+    body = {"key": "value"}
+
+    return_value = fanout.create(body=body, clusters=["c1", {"name": "c2"}])
+
+    mocked_operations.create.assert_any_call(body=body, cluster="c1")
+    mocked_operations.create.assert_any_call(body=body, cluster={"name": "c2"})
+    assert return_value == operations.CreateReturn(
+        "SUCCESS", None, '{"c1":"ns/c1","c2":"ns/{\'name\': \'c2\'}"}'
+    )
+
+
+def test_create_partial_failure(mocked_operations: mock.MagicMock):
+    """
+    GIVEN mocked operations.create that fails for one cluster
+    WHEN create is called with the clusters
+    THEN the clusters that succeeded are deleted and failure is returned with the
+        reason of the failed cluster.
+    """
+    mocked_operations.create.side_effect = lambda body, cluster: (
+        operations.CreateReturn("FAILURE", "reason 1", None)
+        if cluster == "c2"
+        else operations.CreateReturn("SUCCESS", None, f"ns/{cluster}")
+    )
+
+    return_value = fanout.create(body={}, clusters=["c1", "c2", "c3"])
+
+    assert return_value == operations.CreateReturn("FAILURE", "c2: reason 1", None)
+    assert sorted(
+        call[1]["cluster"] for call in mocked_operations.delete.call_args_list
+    ) == ["c1", "c3"]
+    mocked_operations.delete.assert_any_call(
+        body={}, physical_name="ns/c1", cluster="c1"
+    )
+
+
+def test_create_rollback_failure(mocked_operations: mock.MagicMock):
+    """
+    GIVEN mocked operations.create that fails for one cluster and mocked
+        operations.delete that fails
+    WHEN create is called with the clusters
+    THEN failure is returned with the reasons of the create and rollback.
+    """
+    mocked_operations.create.side_effect = lambda body, cluster: (
+        operations.CreateReturn("FAILURE", "reason 1", None)
+        if cluster == "c2"
+        else operations.CreateReturn("SUCCESS", None, f"ns/{cluster}")
+    )
+    mocked_operations.delete.return_value = operations.ExistsReturn(
+        "FAILURE", "reason 2"
+    )
+
+    return_value = fanout.create(body={}, clusters=["c1", "c2"])
+
+    assert return_value == operations.CreateReturn(
+        "FAILURE", "c2: reason 1; rollback failed for c1: reason 2", None
+    )
+
+
+def test_create_physical_name_too_long(mocked_operations: mock.MagicMock):
+    """
+    GIVEN mocked operations.create that succeeds and more clusters than the physical
+        name can record
+    WHEN create is called with the clusters
+    THEN every cluster is deleted and failure is returned with the length.
+    """
+    clusters = [f"cluster-{idx:03d}" for idx in range(50)]
+
+    return_value = fanout.create(body={}, clusters=clusters)
+
+    assert return_value.status == "FAILURE"
+    assert return_value.reason.startswith(
+        "the physical name recording every cluster is 1551 characters long, "
+        "CloudFormation accepts at most 1024"
+    )
+    assert (
+        sorted(call[1]["cluster"] for call in mocked_operations.delete.call_args_list)
+        == clusters
+    )
+
+
+@pytest.mark.parametrize("operation", ["update", "delete"])
+def test_exists_success(mocked_operations: mock.MagicMock, operation):
+    """
+    GIVEN mocked operation that succeeds, clusters and fan-out physical name
+    WHEN the operation is called on fanout
+    THEN the operation is called for every cluster with its physical name and
+        success is returned.
+    """
+    body = {"key": "value"}
+
+    return_value = getattr(fanout, operation)(
+        body=body,
+        physical_name='{"c1":"ns/n1","c2":"ns/n2"}',
+        clusters=[{"name": "c1", "roleArn": "r"}, "c2"],
+    )
+
+    assert return_value == operations.ExistsReturn("SUCCESS", None)
+    mock_operation = getattr(mocked_operations, operation)
+    mock_operation.assert_any_call(
+        body=body, physical_name="ns/n1", cluster={"name": "c1", "roleArn": "r"}
+    )
+    mock_operation.assert_any_call(body=body, physical_name="ns/n2", cluster="c2")
+
+
+@pytest.mark.parametrize("operation", ["update", "delete"])
+def test_exists_partial_failure(mocked_operations: mock.MagicMock, operation):
+    """
+    GIVEN mocked operation that fails for one cluster
+    WHEN the operation is called on fanout
+    THEN failure is returned with the reason of the cluster.
+    """
+    getattr(mocked_operations, operation).side_effect = lambda **kwargs: (
+        operations.ExistsReturn("FAILURE", "reason 1")
+        if kwargs["cluster"] == "c1"
+        else operations.ExistsReturn("SUCCESS", None)
+    )
+
+    return_value = getattr(fanout, operation)(
+        body={}, physical_name='{"c1":"ns/n1","c2":"ns/n2"}', clusters=["c1", "c2"]
+    )
+
+    assert return_value == operations.ExistsReturn("FAILURE", "c1: reason 1")
+
+
+@pytest.mark.parametrize(
+    "physical_name, clusters, expected_reason",
+    [
+        ('{"c1":"n1"}', [], "clusters must be a non-empty list."),
+        ("n1", ["c1"], "the physical name does not record the clusters."),
+        (
+            '{"c1":"n1"}',
+            ["c1", "c2"],
+            "the clusters of a fan-out resource can not be changed, replace the "
+            "resource instead.",
+        ),
+    ],
+    ids=["invalid clusters", "not fan-out", "changed clusters"],
+)
+@pytest.mark.parametrize("operation", ["update", "delete"])
+def test_exists_invalid(
+    mocked_operations: mock.MagicMock,
+    operation,
+    physical_name,
+    clusters,
+    expected_reason,
+):
+    """
+    GIVEN physical name and clusters that do not match
+    WHEN the operation is called on fanout
+    THEN failure is returned without calling any cluster.
+    """
+    return_value = getattr(fanout, operation)(
+        body={}, physical_name=physical_name, clusters=clusters
+    )
+
+    assert return_value == operations.ExistsReturn("FAILURE", expected_reason)
+    getattr(mocked_operations, operation).assert_not_called()
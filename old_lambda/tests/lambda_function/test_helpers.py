@@ -1,10 +1,15 @@
 """Tests for helpers."""
 
+from unittest import mock
+
 import pytest
 from kubernetes import client
 
+from lambda_function import clusters
+from lambda_function import credentials
 from lambda_function import exceptions
 from lambda_function import helpers
+from lambda_function import rest
 
 from . import fixtures
 
@@ -151,3 +156,293 @@ def test_get_kind():
     kind = helpers.get_kind(body=body)
 
     assert kind == "kind 1"
+
+
+@pytest.fixture
+def _cleared_apis():
+    """Clear the shared apis before and after the test."""
+    helpers.clear_apis()
+    yield
+    helpers.clear_apis()
+
+
+@pytest.mark.helper
+def test_get_api_client_shared(_cleared_apis):
+    """
+    GIVEN no shared api client
+    WHEN get_api_client is called twice
+    THEN the same api client is returned.
+    """
+    api_client = helpers.get_api_client()
+
+    assert isinstance(api_client, client.ApiClient)
+    assert helpers.get_api_client() is api_client
+
+
+@pytest.mark.helper
+def test_get_api_client_configuration(_cleared_apis, monkeypatch):
+    """
+    GIVEN mocked credentials.get_configuration that returns a configuration
+    WHEN get_api_client is called twice
+    THEN the api client uses the configuration and the credentials are checked on
+        every call.
+    """
+    configuration = client.Configuration()
+    mock_get_configuration = mock.MagicMock(return_value=configuration)
+    monkeypatch.setattr(credentials, "get_configuration", mock_get_configuration)
+
+    api_client = helpers.get_api_client()
+    helpers.get_api_client()
+
+    assert api_client.configuration is configuration
+    assert mock_get_configuration.call_count == 2
+
+
+@pytest.mark.helper
+def test_get_api_shared(_cleared_apis):
+    """
+    GIVEN no shared apis
+    WHEN get_api is called twice with the same module name
+    THEN the same api is returned which uses the shared api client.
+    """
+    api = helpers.get_api(module_name="AppsV1Api")
+
+    assert isinstance(api, client.AppsV1Api)
+    assert api.api_client is helpers.get_api_client()
+    assert helpers.get_api(module_name="AppsV1Api") is api
+
+
+@pytest.mark.helper
+def test_clear_apis(_cleared_apis):
+    """
+    GIVEN shared api client and api
+    WHEN clear_apis is called
+    THEN new api client and api are created on the next call.
+    """
+    api_client = helpers.get_api_client()
+    api = helpers.get_api(module_name="AppsV1Api")
+
+    helpers.clear_apis()
+
+    assert helpers.get_api_client() is not api_client
+    assert helpers.get_api(module_name="AppsV1Api") is not api
+
+
+@pytest.mark.helper
+def test_resolve_function():
+    """
+    GIVEN api version, kind and operation
+    WHEN resolve_function is called twice
+    THEN the module and function name is returned and the result is memoized.
+    """
+    resolved = helpers.resolve_function(
+        api_version="apps/v1", kind="Deployment", operation="update"
+    )
+
+    assert resolved == helpers.ResolveFunctionReturn(
+        "AppsV1Api", "replace_namespaced_deployment"
+    )
+    assert (
+        helpers.resolve_function(
+            api_version="apps/v1", kind="Deployment", operation="update"
+        )
+        is resolved
+    )
+
+
+@pytest.mark.helper
+def test_build_dispatch_table(_cleared_apis):
+    """
+    GIVEN api version and kind combinations
+    WHEN build_dispatch_table is called with the combinations
+    THEN every operation is resolved and the apis are created.
+    """
+    helpers.resolve_function.cache_clear()
+
+    helpers.build_dispatch_table(
+        group_version_kinds=[("apps/v1", "Deployment"), ("v1", "Namespace")]
+    )
+
+    assert helpers.resolve_function.cache_info().currsize == 6
+    assert set(helpers._APIS) == {  # pylint: disable=protected-access
+        "AppsV1Api",
+        "CoreV1Api",
+    }
+
+
+@pytest.mark.helper
+def test_get_function_cluster(monkeypatch):
+    """
+    GIVEN mocked cluster registry and cluster
+    WHEN get_function is called with the cluster
+    THEN the function uses the api client of the cluster.
+    """
+    api_client = client.ApiClient()
+    mock_registry = mock.MagicMock()
+    mock_registry.get_api_client.return_value = api_client
+    monkeypatch.setattr(clusters, "get_registry", lambda: mock_registry)
+
+    client_function, namespaced = helpers.get_function(
+        api_version="apps/v1", kind="Deployment", operation="create", cluster="c 1"
+    )
+
+    mock_registry.get_api_client.assert_called_once_with(cluster="c 1")
+    assert client_function.__self__.api_client is api_client
+    assert namespaced
+
+
+@pytest.mark.helper
+def test_read():
+    """
+    GIVEN mocked raw response
+    WHEN read is called with the response
+    THEN the data is returned and the connection released.
+    """
+    mock_response = mock.MagicMock()
+    mock_response.data = b"data 1"
+
+    assert helpers.read(response=mock_response) == b"data 1"
+    mock_response.release_conn.assert_called_once_with()
+
+
+@pytest.mark.parametrize(
+    "data, expected_metadata",
+    [
+        (b"{}", helpers.MetadataReturn(None, None)),
+        (
+            b'{"kind": "ConfigMap", "metadata": {"name": "name 1"}, "data": {}}',
+            helpers.MetadataReturn("name 1", None),
+        ),
+        (
+            b'{"metadata": {"name": "name 1", "namespace": "namespace 1"}}',
+            helpers.MetadataReturn("name 1", "namespace 1"),
+        ),
+    ],
+    ids=["metadata missing", "not namespaced", "namespaced"],
+)
+@pytest.mark.helper
+def test_read_metadata(data, expected_metadata):
+    """
+    GIVEN mocked raw response with data
+    WHEN read_metadata is called with the response
+    THEN the expected metadata is returned and the connection released.
+    """
+    mock_response = mock.MagicMock()
+    mock_response.data = data
+    mock_response.headers = {"Content-Type": "application/json"}
+
+    assert helpers.read_metadata(response=mock_response) == expected_metadata
+    mock_response.release_conn.assert_called_once_with()
+
+
+@pytest.mark.parametrize(
+    "data, content_type, expected_exception",
+    [
+        (b"<html>bad gateway</html>", "text/html", exceptions.ResponseDecodeError),
+        (b"\xff", "application/json", exceptions.ResponseDecodeError),
+        (b"[]", "application/json", exceptions.ResponseDecodeError),
+        (
+            b"k8s\x00\x12\x05\n\x03\n\x01\xff",
+            "application/vnd.kubernetes.protobuf",
+            exceptions.ProtobufDecodeError,
+        ),
+    ],
+    ids=["not json", "not utf-8", "not object", "protobuf not utf-8"],
+)
+@pytest.mark.helper
+def test_read_metadata_invalid(data, content_type, expected_exception):
+    """
+    GIVEN mocked raw response with data that can not be decoded
+    WHEN read_metadata is called with the response
+    THEN the expected error is raised and the connection released.
+    """
+    mock_response = mock.MagicMock()
+    mock_response.data = data
+    mock_response.headers = {"Content-Type": content_type}
+
+    with pytest.raises(expected_exception):
+        helpers.read_metadata(response=mock_response)
+    mock_response.release_conn.assert_called_once_with()
+
+
+@pytest.mark.helper
+def test_read_metadata_protobuf():
+    """
+    GIVEN mocked raw response with protobuf data
+    WHEN read_metadata is called with the response
+    THEN the metadata is decoded from the protobuf.
+    """
+    mock_response = mock.MagicMock()
+    # runtime.Unknown with raw holding an object with the name and namespace
+    mock_response.data = b"k8s\x00\x12\x0f\n\r\n\x04name\x1a\x05space"
+    mock_response.headers = {"Content-Type": "application/vnd.kubernetes.protobuf"}
+
+    metadata = helpers.read_metadata(response=mock_response)
+
+    assert metadata == helpers.MetadataReturn("name", "space")
+
+
+@pytest.mark.parametrize(
+    "backend, expected_name",
+    [(None, "client"), ("client", "client"), ("rest", "rest")],
+    ids=["default", "client", "rest"],
+)
+@pytest.mark.helper
+def test_get_backend_name(monkeypatch, backend, expected_name):
+    """
+    GIVEN KUBERNETES_BACKEND environment variable
+    WHEN get_backend_name is called
+    THEN the expected backend is returned.
+    """
+    if backend is None:
+        monkeypatch.delenv("KUBERNETES_BACKEND", raising=False)
+    else:
+        monkeypatch.setenv("KUBERNETES_BACKEND", backend)
+
+    assert helpers.get_backend_name() == expected_name
+
+
+@pytest.mark.helper
+def test_get_backend_name_unknown(monkeypatch):
+    """
+    GIVEN KUBERNETES_BACKEND environment variable with an unknown backend
+    WHEN get_backend_name is called
+    THEN BackendUnknownError is raised.
+    """
+    monkeypatch.setenv("KUBERNETES_BACKEND", "unknown")
+
+    with pytest.raises(exceptions.BackendUnknownError):
+        helpers.get_backend_name()
+
+
+@pytest.mark.parametrize("cluster", [None, "c 1"], ids=["default", "cluster"])
+@pytest.mark.helper
+def test_get_function_rest(monkeypatch, cluster):
+    """
+    GIVEN rest backend selected and mocked api clients and backend
+    WHEN get_function is called
+    THEN the function of the backend for the api client of the cluster is returned.
+    """
+    monkeypatch.setenv("KUBERNETES_BACKEND", "rest")
+    default_api_client = mock.MagicMock()
+    monkeypatch.setattr(helpers, "get_api_client", lambda: default_api_client)
+    mock_registry = mock.MagicMock()
+    monkeypatch.setattr(clusters, "get_registry", lambda: mock_registry)
+    mock_get_backend = mock.MagicMock()
+    mock_get_backend.return_value.get_function.return_value = ("function 1", True)
+    monkeypatch.setattr(rest, "get_backend", mock_get_backend)
+
+    return_value = helpers.get_function(
+        api_version="apps/v1", kind="Deployment", operation="create", cluster=cluster
+    )
+
+    expected_api_client = (
+        default_api_client
+        if cluster is None
+        else mock_registry.get_api_client.return_value
+    )
+    mock_get_backend.assert_called_once_with(api_client=expected_api_client)
+    mock_get_backend.return_value.get_function.assert_called_once_with(
+        api_version="apps/v1", kind="Deployment", operation="create"
+    )
+    assert return_value == helpers.GetFunctionReturn("function 1", True)
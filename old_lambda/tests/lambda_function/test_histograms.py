@@ -0,0 +1,254 @@
+"""Tests for histograms."""
+
+import json
+import math
+from unittest import mock
+
+import pytest
+
+from lambda_function import histograms
+
+_LABELS = histograms.Labels("kubernetes_ms", "apps/v1", "Deployment", "create")
+
+
+@pytest.fixture(name="registry")
+def fixture_registry(monkeypatch):
+    """Enable histograms on an empty registry."""
+    monkeypatch.setenv("LATENCY_HISTOGRAMS", "true")
+    registry = histograms.Registry()
+    monkeypatch.setattr(histograms, "_REGISTRY", registry)
+    return registry
+
+
+@pytest.mark.parametrize(
+    "value, expected_enabled",
+    [(None, True), ("true", True), ("false", False), ("FALSE", False)],
+)
+def test_is_enabled(monkeypatch, value, expected_enabled):
+    """
+    GIVEN LATENCY_HISTOGRAMS environment variable
+    WHEN is_enabled is called
+    THEN whether it is not false is returned.
+    """
+    if value is None:
+        monkeypatch.delenv("LATENCY_HISTOGRAMS", raising=False)
+    else:
+        monkeypatch.setenv("LATENCY_HISTOGRAMS", value)
+
+    assert histograms.is_enabled() == expected_enabled
+
+
+@pytest.mark.parametrize("value, expected_interval", [(None, 60.0), ("5", 5.0)])
+def test_get_flush_interval(monkeypatch, value, expected_interval):
+    """
+    GIVEN HISTOGRAM_FLUSH_INTERVAL environment variable
+    WHEN get_flush_interval is called
+    THEN the interval is returned.
+    """
+    if value is None:
+        monkeypatch.delenv("HISTOGRAM_FLUSH_INTERVAL", raising=False)
+    else:
+        monkeypatch.setenv("HISTOGRAM_FLUSH_INTERVAL", value)
+
+    assert histograms.get_flush_interval() == expected_interval
+
+
+@pytest.mark.parametrize(
+    "value, expected_bucket",
+    [(0, 0), (0.2, 1), (1, 1), (1.5, 2), (2, 2), (3, 3), (1000, 11), (1e9, 19)],
+)
+def test_calculate_bucket(value, expected_bucket):
+    """
+    GIVEN value
+    WHEN calculate_bucket is called with the value
+    THEN the bucket whose upper bound is at least the value is returned.
+    """
+    bucket = histograms.calculate_bucket(value=value)
+
+    assert bucket == expected_bucket
+    assert histograms.calculate_upper_bound(bucket=bucket) >= value
+
+
+@pytest.mark.parametrize(
+    "bucket, expected_bound", [(0, 0.0), (1, 1.0), (11, 1024.0), (19, math.inf)]
+)
+def test_calculate_upper_bound(bucket, expected_bound):
+    """
+    GIVEN bucket
+    WHEN calculate_upper_bound is called with the bucket
+    THEN the largest value of the bucket is returned.
+    """
+    assert histograms.calculate_upper_bound(bucket=bucket) == expected_bound
+
+
+def test_histogram_summarize():
+    """
+    GIVEN histogram with a slow tail
+    WHEN summarize is called
+    THEN the quantiles are estimated from the buckets and capped by the maximum.
+    """
+    histogram = histograms.Histogram()
+    for _ in range(98):
+        histogram.add(value=3)
+    histogram.add(value=100)
+    histogram.add(value=300)
+
+    assert histogram.summarize() == {
+        "count": 100,
+        "sum": 694,
+        "max": 300,
+        "p50": 4.0,
+        "p90": 4.0,
+        "p99": 128.0,
+        "buckets": [0, 0, 0, 98, 0, 0, 0, 0, 1, 0, 1],
+    }
+
+
+def test_histogram_empty():
+    """
+    GIVEN empty histogram
+    WHEN summarize is called
+    THEN everything is zero.
+    """
+    summary = histograms.Histogram().summarize()
+
+    assert summary["p99"] == 0
+    assert summary["buckets"] == [0]
+
+
+def test_registry_flush(registry):
+    """
+    GIVEN registry with values of two label combinations
+    WHEN flush is called twice
+    THEN the first returns a summary of each and the second returns None.
+    """
+    other = _LABELS._replace(name="kubernetes_retries")
+    registry.record(labels=_LABELS, value=5)
+    registry.record(labels=_LABELS, value=7)
+    registry.record(labels=other, value=0)
+
+    record = registry.flush(now=registry.last_flush + 30)
+
+    assert record["interval"] == 30
+    assert [
+        (item["name"], item["apiVersion"], item["kind"], item["operation"])
+        for item in record["histograms"]
+    ] == [
+        ("kubernetes_ms", "apps/v1", "Deployment", "create"),
+        ("kubernetes_retries", "apps/v1", "Deployment", "create"),
+    ]
+    assert record["histograms"][0]["count"] == 2
+    assert registry.flush(now=registry.last_flush) is None
+
+
+@pytest.mark.parametrize(
+    "response, expected_retries",
+    [
+        (mock.MagicMock(retries=mock.MagicMock(history=("a", "b"))), 2),
+        (mock.MagicMock(retries=None), 0),
+        (mock.MagicMock(), 0),
+        (None, 0),
+    ],
+    ids=["retried", "retries missing", "history not tuple", "no response"],
+)
+def test_count_retries(response, expected_retries):
+    """
+    GIVEN response
+    WHEN count_retries is called with the response
+    THEN the number of retries in its history is returned.
+    """
+    assert histograms.count_retries(response=response) == expected_retries
+
+
+def test_instrument(registry):
+    """
+    GIVEN histograms enabled
+    WHEN a function is instrumented and called
+    THEN its result is returned and the latency and retries are recorded.
+    """
+    response = mock.MagicMock(retries=mock.MagicMock(history=("a",)))
+    function = mock.MagicMock(return_value=response)
+
+    instrumented = histograms.instrument(
+        function=function,
+        name="kubernetes",
+        api_version="apps/v1",
+        kind="Deployment",
+        operation="create",
+    )
+
+    assert instrumented("a", b=1) is response
+    function.assert_called_once_with("a", b=1)
+    summaries = registry.flush(now=registry.last_flush)["histograms"]
+    assert [summary["name"] for summary in summaries] == [
+        "kubernetes_ms",
+        "kubernetes_retries",
+    ]
+    assert summaries[1]["sum"] == 1
+
+
+def test_instrument_raises(registry):
+    """
+    GIVEN histograms enabled
+    WHEN an instrumented function raises
+    THEN the error is raised and the latency is still recorded.
+    """
+    function = mock.MagicMock(side_effect=ValueError)
+    instrumented = histograms.instrument(
+        function=function,
+        name="response",
+        api_version="v1",
+        kind="ConfigMap",
+        operation="delete",
+    )
+
+    with pytest.raises(ValueError):
+        instrumented()
+
+    assert registry.flush(now=registry.last_flush)["histograms"][0]["count"] == 1
+
+
+def test_instrument_disabled():
+    """
+    GIVEN histograms disabled
+    WHEN a function is instrumented
+    THEN the function itself is returned.
+    """
+    function = mock.MagicMock()
+
+    assert (
+        histograms.instrument(
+            function=function,
+            name="kubernetes",
+            api_version="v1",
+            kind="ConfigMap",
+            operation="create",
+        )
+        is function
+    )
+
+
+@pytest.mark.parametrize(
+    "interval, recorded, expected_printed",
+    [("0", True, True), ("3600", True, False), ("0", False, False)],
+    ids=["due", "not due", "nothing recorded"],
+)
+def test_flush_if_due(
+    monkeypatch, capsys, registry, interval, recorded, expected_printed
+):
+    """
+    GIVEN registry and flush interval
+    WHEN flush_if_due is called
+    THEN the summary is printed as one line if it is due and not empty.
+    """
+    monkeypatch.setenv("HISTOGRAM_FLUSH_INTERVAL", interval)
+    if recorded:
+        registry.record(labels=_LABELS, value=5)
+
+    histograms.flush_if_due()
+
+    out = capsys.readouterr().out
+    if expected_printed:
+        assert json.loads(out)["histograms"][0]["name"] == "kubernetes_ms"
+    else:
+        assert not out
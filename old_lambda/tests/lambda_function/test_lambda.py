@@ -1,13 +1,22 @@
 """Tests for the lambda function."""
 
+# pylint: disable=too-many-lines
+
+import importlib
 import json
+import pstats
 from unittest import mock
 
 import pytest
 
+from lambda_function import bundles
 from lambda_function import exceptions
+from lambda_function import fanout
+from lambda_function import helpers
 from lambda_function import index
+from lambda_function import manifests
 from lambda_function import operations
+from lambda_function import prewarm
 
 
 @pytest.mark.parametrize(
@@ -104,7 +113,9 @@ def test_create_create_call(
 
     index.lambda_handler(event, mock.MagicMock())
 
-    mocked_operations_create.assert_called_once_with(body={"key": "value"})
+    mocked_operations_create.assert_called_once_with(
+        body={"key": "value"}, cluster=None
+    )
 
 
 @pytest.mark.lambda_function
@@ -196,6 +207,462 @@ def test_create_put_failure(
     )
 
 
+@pytest.mark.lambda_function
+def test_create_cluster_call(
+    mocked_operations_create: mock.MagicMock,
+    create_lambda_event,
+    _mocked_urllib3_pool_manager,
+    mocked_json_dumps: mock.MagicMock,
+):
+    """
+    GIVEN mocked operations.create and create Cloudformation request with cluster
+        property
+    WHEN lambda_handler is called with the request
+    THEN create is called with the body without the cluster and the cluster and the
+        physical resource id records the cluster.
+    """
+    mocked_operations_create.return_value = operations.CreateReturn(
+        "SUCCESS", None, "namespace 1/name 1"
+    )
+    event = {
+        **create_lambda_event,
+        **{
+            "RequestType": "Create",
+            "ResourceProperties": {"key": "value", "cluster": "cluster 1"},
+        },
+    }
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    mocked_operations_create.assert_called_once_with(
+        body={"key": "value"}, cluster="cluster 1"
+    )
+    assert event["ResourceProperties"] == {"key": "value", "cluster": "cluster 1"}
+    sent = mocked_json_dumps.call_args[0][0]
+    assert sent["PhysicalResourceId"] == "cluster://cluster%201/namespace 1/name 1"
+
+
+@pytest.mark.parametrize(
+    "request_type, function_name, return_value, expected_kwargs",
+    [
+        (
+            "Create",
+            "create",
+            operations.CreateReturn("SUCCESS", None, '{"c1":"name 1"}'),
+            {},
+        ),
+        (
+            "Update",
+            "update",
+            operations.ExistsReturn("SUCCESS", None),
+            {"physical_name": "physical resource id 1"},
+        ),
+        (
+            "Delete",
+            "delete",
+            operations.ExistsReturn("SUCCESS", None),
+            {"physical_name": "physical resource id 1"},
+        ),
+    ],
+    ids=["create", "update", "delete"],
+)
+@pytest.mark.lambda_function
+def test_clusters_call(
+    monkeypatch,
+    create_lambda_event,
+    _mocked_urllib3_pool_manager,
+    mocked_json_dumps: mock.MagicMock,
+    request_type,
+    function_name,
+    return_value,
+    expected_kwargs,
+):  # pylint: disable=too-many-arguments
+    """
+    GIVEN mocked fanout function and Cloudformation request with clusters property
+    WHEN lambda_handler is called with the request
+    THEN the fanout function is called with the body without the clusters and the
+        clusters and its status is sent.
+    """
+    mock_function = mock.MagicMock(return_value=return_value)
+    monkeypatch.setattr(fanout, function_name, mock_function)
+    event = {
+        **create_lambda_event,
+        **{
+            "RequestType": request_type,
+            "PhysicalResourceId": "physical resource id 1",
+            "ResourceProperties": {"key": "value", "clusters": ["c1"]},
+        },
+    }
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    mock_function.assert_called_once_with(
+        body={"key": "value"}, clusters=["c1"], **expected_kwargs
+    )
+    assert mocked_json_dumps.call_args[0][0]["Status"] == "SUCCESS"
+
+
+@pytest.mark.parametrize(
+    "request_type, function_name, return_value, expected_kwargs",
+    [
+        ("Create", "create", operations.CreateReturn("SUCCESS", None, "name 1"), {}),
+        (
+            "Update",
+            "update",
+            operations.ExistsReturn("SUCCESS", None),
+            {"physical_name": "physical resource id 1"},
+        ),
+        (
+            "Delete",
+            "delete",
+            operations.ExistsReturn("SUCCESS", None),
+            {"physical_name": "physical resource id 1"},
+        ),
+    ],
+    ids=["create", "update", "delete"],
+)
+@pytest.mark.lambda_function
+def test_manifest_call(
+    monkeypatch,
+    create_lambda_event,
+    _mocked_urllib3_pool_manager,
+    mocked_json_dumps: mock.MagicMock,
+    request_type,
+    function_name,
+    return_value,
+    expected_kwargs,
+):  # pylint: disable=too-many-arguments
+    """
+    GIVEN mocked manifests.fetch, mocked operations function and Cloudformation
+        request with manifest property
+    WHEN lambda_handler is called with the request
+    THEN the operations function is called with the manifest as the body.
+    """
+    mock_fetch = mock.MagicMock(return_value={"kind": "ConfigMap"})
+    monkeypatch.setattr(manifests, "fetch", mock_fetch)
+    mock_function = mock.MagicMock(return_value=return_value)
+    monkeypatch.setattr(operations, function_name, mock_function)
+    event = {
+        **create_lambda_event,
+        **{
+            "RequestType": request_type,
+            "PhysicalResourceId": "physical resource id 1",
+            "ResourceProperties": {"manifest": "s3://bucket-1/key-1"},
+        },
+    }
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    mock_fetch.assert_called_once_with(value="s3://bucket-1/key-1")
+    mock_function.assert_called_once_with(
+        body={"kind": "ConfigMap"}, cluster=None, **expected_kwargs
+    )
+    assert mocked_json_dumps.call_args[0][0]["Status"] == "SUCCESS"
+
+
+@pytest.mark.parametrize("request_type", ["Create", "Update", "Delete"])
+@pytest.mark.lambda_function
+def test_manifest_fetch_failure(
+    monkeypatch,
+    create_lambda_event,
+    _mocked_urllib3_pool_manager,
+    mocked_json_dumps: mock.MagicMock,
+    request_type,
+):
+    """
+    GIVEN manifests.fetch that raises and Cloudformation request with manifest
+        property
+    WHEN lambda_handler is called with the request
+    THEN a failure with the error as the reason is sent.
+    """
+    monkeypatch.setattr(
+        manifests,
+        "fetch",
+        mock.MagicMock(side_effect=exceptions.ManifestMalformedError),
+    )
+    event = {
+        **create_lambda_event,
+        **{
+            "RequestType": request_type,
+            "PhysicalResourceId": "physical resource id 1",
+            "ResourceProperties": {"manifest": "not a reference"},
+        },
+    }
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    sent = mocked_json_dumps.call_args[0][0]
+    assert sent["Status"] == "FAILURE"
+    assert sent["Reason"] == str(exceptions.ManifestMalformedError())
+
+
+@pytest.mark.parametrize(
+    "module, data, expected_kwargs",
+    [
+        (operations, b"kind: ConfigMap\n", {"body": {"kind": "ConfigMap"}}),
+        (
+            bundles,
+            b"- kind: Namespace\n- kind: ConfigMap\n",
+            {"bodies": [{"kind": "Namespace"}, {"kind": "ConfigMap"}]},
+        ),
+    ],
+    ids=["manifest", "bundle"],
+)
+@pytest.mark.parametrize(
+    "request_type, function_name, return_value, expected_physical_name",
+    [
+        ("Create", "create", operations.CreateReturn("SUCCESS", None, "name 1"), {}),
+        (
+            "Update",
+            "update",
+            operations.ExistsReturn("SUCCESS", None),
+            {"physical_name": "physical resource id 1"},
+        ),
+        (
+            "Delete",
+            "delete",
+            operations.ExistsReturn("SUCCESS", None),
+            {"physical_name": "physical resource id 1"},
+        ),
+    ],
+    ids=["create", "update", "delete"],
+)
+@pytest.mark.lambda_function
+def test_compressed_manifest_call(
+    monkeypatch,
+    create_lambda_event,
+    _mocked_urllib3_pool_manager,
+    mocked_json_dumps: mock.MagicMock,
+    module,
+    data,
+    expected_kwargs,
+    request_type,
+    function_name,
+    return_value,
+    expected_physical_name,
+):  # pylint: disable=too-many-arguments
+    """
+    GIVEN mocked operations and bundles function and Cloudformation request with
+        compressed manifest or bundle
+    WHEN lambda_handler is called with the request
+    THEN the function of the operations or bundles is called with the decompressed
+        body or bodies.
+    """
+    mock_function = mock.MagicMock(return_value=return_value)
+    monkeypatch.setattr(module, function_name, mock_function)
+    event = {
+        **create_lambda_event,
+        **{
+            "RequestType": request_type,
+            "PhysicalResourceId": "cluster://cluster%201/physical resource id 1",
+            "ResourceProperties": {
+                "compressedManifest": manifests.compress(data=data),
+                "cluster": "cluster 1",
+            },
+        },
+    }
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    mock_function.assert_called_once_with(
+        cluster="cluster 1", **expected_kwargs, **expected_physical_name
+    )
+    assert mocked_json_dumps.call_args[0][0]["Status"] == "SUCCESS"
+
+
+@pytest.mark.parametrize(
+    "properties, expected_reason",
+    [
+        (
+            {
+                "manifest": "s3://bucket-1/key-1",
+                "compressedManifest": manifests.compress(data=b"kind: ConfigMap\n"),
+            },
+            str(exceptions.ManifestConflictError()),
+        ),
+        (
+            {
+                "compressedManifest": manifests.compress(data=b"- kind: Namespace\n"),
+                "clusters": ["cluster 1"],
+            },
+            str(exceptions.BundleClustersError()),
+        ),
+    ],
+    ids=["conflict", "bundle with clusters"],
+)
+@pytest.mark.lambda_function
+def test_compressed_manifest_invalid(
+    create_lambda_event,
+    _mocked_urllib3_pool_manager,
+    mocked_json_dumps: mock.MagicMock,
+    properties,
+    expected_reason,
+):
+    """
+    GIVEN Cloudformation create request with compressed manifest that can not be
+        used with the other properties
+    WHEN lambda_handler is called with the request
+    THEN a failure with the reason is sent.
+    """
+    event = {**create_lambda_event, "ResourceProperties": properties}
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    sent = mocked_json_dumps.call_args[0][0]
+    assert sent["Status"] == "FAILURE"
+    assert sent["Reason"] == expected_reason
+
+
+@pytest.mark.parametrize(
+    "module, value, expected_kwargs",
+    [
+        (operations, "kind: ConfigMap\n", {"body": {"kind": "ConfigMap"}}),
+        (
+            bundles,
+            "kind: Namespace\n---\nkind: ConfigMap\n",
+            {"bodies": [{"kind": "Namespace"}, {"kind": "ConfigMap"}]},
+        ),
+    ],
+    ids=["manifest", "bundle"],
+)
+@pytest.mark.lambda_function
+def test_yaml_manifest_call(
+    monkeypatch,
+    create_lambda_event,
+    _mocked_urllib3_pool_manager,
+    mocked_json_dumps: mock.MagicMock,
+    module,
+    value,
+    expected_kwargs,
+):  # pylint: disable=too-many-arguments
+    """
+    GIVEN mocked operations and bundles create and Cloudformation create request with
+        YAML manifest or bundle
+    WHEN lambda_handler is called with the request
+    THEN create of the operations or bundles is called with the parsed body or
+        bodies.
+    """
+    manifests.reset()
+    mock_function = mock.MagicMock(
+        return_value=operations.CreateReturn("SUCCESS", None, "name 1")
+    )
+    monkeypatch.setattr(module, "create", mock_function)
+    event = {**create_lambda_event, "ResourceProperties": {"yamlManifest": value}}
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    mock_function.assert_called_once_with(cluster=None, **expected_kwargs)
+    assert mocked_json_dumps.call_args[0][0]["Status"] == "SUCCESS"
+
+
+@pytest.mark.lambda_function
+def test_create_coerces(
+    mocked_operations_create: mock.MagicMock,
+    create_lambda_event,
+    _mocked_urllib3_pool_manager,
+    _mocked_json_dumps,
+):
+    """
+    GIVEN mocked operations.create and Cloudformation create request with numbers as
+        strings
+    WHEN lambda_handler is called with the request
+    THEN create is called with the numbers coerced.
+    """
+    event = {
+        **create_lambda_event,
+        "ResourceProperties": {
+            "apiVersion": "apps/v1",
+            "kind": "Deployment",
+            "spec": {"replicas": "3"},
+        },
+    }
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    mocked_operations_create.assert_called_once_with(
+        body={"apiVersion": "apps/v1", "kind": "Deployment", "spec": {"replicas": 3}},
+        cluster=None,
+    )
+
+
+@pytest.mark.parametrize(
+    "request_type, properties",
+    [
+        ("Create", {"apiVersion": "v1", "kind": "ConfigMap", "dta": {}}),
+        ("Update", {"apiVersion": "v1", "kind": "ConfigMap", "dta": {}}),
+        (
+            "Create",
+            {
+                "yamlManifest": (
+                    "kind: Namespace\napiVersion: v1\n---\n"
+                    "kind: ConfigMap\napiVersion: v1\ndta: 1\n"
+                )
+            },
+        ),
+    ],
+    ids=["create", "update", "bundle"],
+)
+@pytest.mark.lambda_function
+def test_validation_failure(
+    monkeypatch,
+    create_lambda_event,
+    _mocked_urllib3_pool_manager,
+    mocked_json_dumps: mock.MagicMock,
+    request_type,
+    properties,
+):  # pylint: disable=too-many-arguments
+    """
+    GIVEN VALIDATE_BODIES enabled and Cloudformation request with an invalid body
+    WHEN lambda_handler is called with the request
+    THEN a failure is sent without calling the cluster.
+    """
+    monkeypatch.setenv("VALIDATE_BODIES", "true")
+    manifests.reset()
+    mock_operations = mock.MagicMock()
+    monkeypatch.setattr(operations, "create", mock_operations.create)
+    monkeypatch.setattr(operations, "update", mock_operations.update)
+    monkeypatch.setattr(bundles, "create", mock_operations.create)
+    event = {
+        **create_lambda_event,
+        "RequestType": request_type,
+        "PhysicalResourceId": "physical resource id 1",
+        "ResourceProperties": properties,
+    }
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    sent = mocked_json_dumps.call_args[0][0]
+    assert sent["Status"] == "FAILURE"
+    assert sent["Reason"].startswith("the body is invalid: ")
+    assert not mock_operations.method_calls
+
+
+@pytest.mark.lambda_function
+def test_validation_success(
+    monkeypatch,
+    mocked_operations_create: mock.MagicMock,
+    create_lambda_event,
+    _mocked_urllib3_pool_manager,
+    _mocked_json_dumps,
+):
+    """
+    GIVEN VALIDATE_BODIES enabled and Cloudformation create request with a valid body
+        and the ServiceToken
+    WHEN lambda_handler is called with the request
+    THEN create is called with the body without the ServiceToken.
+    """
+    monkeypatch.setenv("VALIDATE_BODIES", "true")
+    properties = {"apiVersion": "v1", "kind": "ConfigMap", "data": {"key": "value"}}
+    event = {
+        **create_lambda_event,
+        "ResourceProperties": {**properties, "ServiceToken": "service token 1"},
+    }
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    mocked_operations_create.assert_called_once_with(body=properties, cluster=None)
+
+
 @pytest.mark.lambda_function
 def test_update_physical_resource_id_missing(create_lambda_event):
     """
@@ -233,7 +700,7 @@ def test_update_update_call(
     index.lambda_handler(event, mock.MagicMock())
 
     mocked_operations_update.assert_called_once_with(
-        body={"key": "value"}, physical_name="physical resource id 1"
+        body={"key": "value"}, physical_name="physical resource id 1", cluster=None
     )
 
 
@@ -326,6 +793,282 @@ def test_update_put_failure(
     )
 
 
+@pytest.mark.lambda_function
+@pytest.mark.parametrize(
+    "cluster, physical_resource_id",
+    [
+        ("cluster-1", "cluster://cluster-1/namespace 1/name 1"),
+        (
+            {"name": "cluster-1", "roleArn": "role 1"},
+            "cluster://cluster-1/namespace 1/name 1",
+        ),
+        (None, "namespace 1/name 1"),
+    ],
+    ids=["name", "mapping", "default"],
+)
+def test_update_cluster_unchanged(
+    mocked_operations_update: mock.MagicMock,
+    mocked_operations_create: mock.MagicMock,
+    exists_lambda_event,
+    _mocked_urllib3_pool_manager,
+    mocked_json_dumps: mock.MagicMock,
+    cluster,
+    physical_resource_id,
+):  # pylint: disable=too-many-arguments
+    """
+    GIVEN mocked operations and update Cloudformation request whose cluster is the
+        one recorded in the physical resource id
+    WHEN lambda_handler is called with the request
+    THEN update is called with the physical name on the cluster and the physical
+        resource id is kept.
+    """
+    mocked_operations_update.return_value = operations.ExistsReturn("SUCCESS", None)
+    properties = {"key": "value"}
+    if cluster is not None:
+        properties["cluster"] = cluster
+    event = {
+        **exists_lambda_event,
+        **{
+            "RequestType": "Update",
+            "ResourceProperties": properties,
+            "PhysicalResourceId": physical_resource_id,
+        },
+    }
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    mocked_operations_create.assert_not_called()
+    mocked_operations_update.assert_called_once_with(
+        body={"key": "value"}, physical_name="namespace 1/name 1", cluster=cluster
+    )
+    sent = mocked_json_dumps.call_args[0][0]
+    assert sent["Status"] == "SUCCESS"
+    assert sent["PhysicalResourceId"] == physical_resource_id
+
+
+@pytest.mark.lambda_function
+@pytest.mark.parametrize(
+    "cluster, physical_resource_id, expected_physical_resource_id",
+    [
+        (
+            "cluster-2",
+            "cluster://cluster-1/namespace 1/name 1",
+            "cluster://cluster-2/namespace 1/name 2",
+        ),
+        (None, "cluster://cluster-1/namespace 1/name 1", "namespace 1/name 2"),
+        (
+            "cluster-2",
+            "namespace 1/name 1",
+            "cluster://cluster-2/namespace 1/name 2",
+        ),
+    ],
+    ids=["changed", "removed", "added"],
+)
+def test_update_cluster_changed(
+    mocked_operations_update: mock.MagicMock,
+    mocked_operations_create: mock.MagicMock,
+    exists_lambda_event,
+    _mocked_urllib3_pool_manager,
+    mocked_json_dumps: mock.MagicMock,
+    cluster,
+    physical_resource_id,
+    expected_physical_resource_id,
+):  # pylint: disable=too-many-arguments
+    """
+    GIVEN mocked operations and update Cloudformation request whose cluster is not
+        the one recorded in the physical resource id
+    WHEN lambda_handler is called with the request
+    THEN the body is created on the cluster and the physical resource id of the new
+        object is sent, so that CloudFormation deletes the old one.
+    """
+    mocked_operations_create.return_value = operations.CreateReturn(
+        "SUCCESS", None, "namespace 1/name 2"
+    )
+    properties = {"key": "value"}
+    if cluster is not None:
+        properties["cluster"] = cluster
+    event = {
+        **exists_lambda_event,
+        **{
+            "RequestType": "Update",
+            "ResourceProperties": properties,
+            "OldResourceProperties": {"key": "value", "cluster": "cluster-1"},
+            "PhysicalResourceId": physical_resource_id,
+        },
+    }
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    mocked_operations_update.assert_not_called()
+    mocked_operations_create.assert_called_once_with(
+        body={"key": "value"}, cluster=cluster
+    )
+    sent = mocked_json_dumps.call_args[0][0]
+    assert sent["Status"] == "SUCCESS"
+    assert sent["PhysicalResourceId"] == expected_physical_resource_id
+
+
+@pytest.mark.lambda_function
+@pytest.mark.parametrize(
+    "update_status, expected_status, expected_physical_resource_id",
+    [
+        ("SUCCESS", "SUCCESS", "cluster://cluster-1/namespace 1/name 1"),
+        ("FAILURE", "FAILURE", "cluster://cluster-2/namespace 1/name 1"),
+    ],
+    ids=["rollback", "failure"],
+)
+def test_update_cluster_changed_create_failure(
+    mocked_operations_update: mock.MagicMock,
+    mocked_operations_create: mock.MagicMock,
+    exists_lambda_event,
+    _mocked_urllib3_pool_manager,
+    mocked_json_dumps: mock.MagicMock,
+    update_status,
+    expected_status,
+    expected_physical_resource_id,
+):  # pylint: disable=too-many-arguments
+    """
+    GIVEN mocked operations and update Cloudformation request that moves the
+        resource back to a cluster the object is still on, so the create fails
+    WHEN lambda_handler is called with the request
+    THEN the object on the cluster is updated instead and its physical resource id is
+        sent, or the create failure is sent if the update fails too.
+    """
+    mocked_operations_create.return_value = operations.CreateReturn(
+        "FAILURE", "reason 1", None
+    )
+    mocked_operations_update.return_value = operations.ExistsReturn(
+        update_status, "reason 2"
+    )
+    event = {
+        **exists_lambda_event,
+        **{
+            "RequestType": "Update",
+            "ResourceProperties": {"key": "value", "cluster": "cluster-1"},
+            "OldResourceProperties": {"key": "value", "cluster": "cluster-2"},
+            "PhysicalResourceId": "cluster://cluster-2/namespace 1/name 1",
+        },
+    }
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    mocked_operations_update.assert_called_once_with(
+        body={"key": "value"}, physical_name="namespace 1/name 1", cluster="cluster-1"
+    )
+    sent = mocked_json_dumps.call_args[0][0]
+    assert sent["Status"] == expected_status
+    assert sent["PhysicalResourceId"] == expected_physical_resource_id
+    assert sent.get("Reason") == (None if expected_status == "SUCCESS" else "reason 1")
+
+
+@pytest.mark.lambda_function
+@pytest.mark.parametrize(
+    "properties, physical_resource_id",
+    [
+        ({"key": "value", "cluster": "cluster-1"}, '{"c1":"namespace 1/name 1"}'),
+        ({"key": "value", "cluster": "cluster-1"}, '["namespace 1/name 1"]'),
+        (
+            {
+                "yamlManifest": (
+                    "kind: Namespace\napiVersion: v1\n---\n"
+                    "kind: Namespace\napiVersion: v1\n"
+                ),
+                "cluster": "cluster-1",
+            },
+            "namespace 1/name 1",
+        ),
+    ],
+    ids=["fan-out", "bundle", "bundle body"],
+)
+def test_update_cluster_changed_shape(
+    monkeypatch,
+    mocked_operations_create: mock.MagicMock,
+    exists_lambda_event,
+    _mocked_urllib3_pool_manager,
+    mocked_json_dumps: mock.MagicMock,
+    properties,
+    physical_resource_id,
+):  # pylint: disable=too-many-arguments
+    """
+    GIVEN mocked operations and update Cloudformation request that moves the
+        resource to a cluster where the create fails and whose physical resource id
+        records an object of another shape than the body
+    WHEN lambda_handler is called with the request
+    THEN nothing is updated and the create failure is sent.
+    """
+    mocked_operations_create.return_value = operations.CreateReturn(
+        "FAILURE", "reason 1", None
+    )
+    mock_operations = mock.MagicMock()
+    monkeypatch.setattr(operations, "update", mock_operations.update)
+    monkeypatch.setattr(bundles, "update", mock_operations.update)
+    event = {
+        **exists_lambda_event,
+        **{
+            "RequestType": "Update",
+            "ResourceProperties": properties,
+            "PhysicalResourceId": physical_resource_id,
+        },
+    }
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    mock_operations.update.assert_not_called()
+    sent = mocked_json_dumps.call_args[0][0]
+    assert sent["Status"] == "FAILURE"
+    assert sent["PhysicalResourceId"] == physical_resource_id
+
+
+@pytest.mark.lambda_function
+def test_update_bundle_cluster_changed(
+    monkeypatch,
+    exists_lambda_event,
+    _mocked_urllib3_pool_manager,
+    mocked_json_dumps: mock.MagicMock,
+):
+    """
+    GIVEN mocked bundle functions and update Cloudformation request with a bundle
+        that moves the resource back to a cluster the objects are still on
+    WHEN lambda_handler is called with the request
+    THEN the bundle is created, then updated on the cluster and its physical
+        resource id is sent.
+    """
+    mock_bundles = mock.MagicMock()
+    mock_bundles.create.return_value = operations.CreateReturn(
+        "FAILURE", "reason 1", None
+    )
+    mock_bundles.update.return_value = operations.ExistsReturn("SUCCESS", None)
+    monkeypatch.setattr(bundles, "create", mock_bundles.create)
+    monkeypatch.setattr(bundles, "update", mock_bundles.update)
+    bodies = [{"kind": "Namespace", "apiVersion": "v1"}] * 2
+    event = {
+        **exists_lambda_event,
+        **{
+            "RequestType": "Update",
+            "ResourceProperties": {
+                "yamlManifest": (
+                    "kind: Namespace\napiVersion: v1\n---\n"
+                    "kind: Namespace\napiVersion: v1\n"
+                ),
+                "cluster": "cluster-1",
+            },
+            "PhysicalResourceId": 'cluster://cluster-2/["name 1","name 2"]',
+        },
+    }
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    assert mock_bundles.method_calls == [
+        mock.call.create(bodies=bodies, cluster="cluster-1"),
+        mock.call.update(
+            bodies=bodies, physical_name='["name 1","name 2"]', cluster="cluster-1"
+        ),
+    ]
+    sent = mocked_json_dumps.call_args[0][0]
+    assert sent["Status"] == "SUCCESS"
+    assert sent["PhysicalResourceId"] == 'cluster://cluster-1/["name 1","name 2"]'
+
+
 @pytest.mark.lambda_function
 def test_delete_physical_resource_id_missing(create_lambda_event):
     """
@@ -363,7 +1106,7 @@ def test_delete_delete_call(
     index.lambda_handler(event, mock.MagicMock())
 
     mocked_operations_delete.assert_called_once_with(
-        body={"key": "value"}, physical_name="physical resource id 1"
+        body={"key": "value"}, physical_name="physical resource id 1", cluster=None
     )
 
 
@@ -522,3 +1265,186 @@ def test_delete_fail_put(
             }
         ).encode("utf-8"),
     )
+
+
+@pytest.mark.parametrize(
+    "enabled, expected_call_count", [(True, 1), (False, 0)], ids=["enabled", "disabled"]
+)
+@pytest.mark.lambda_function
+def test_import_prewarm(monkeypatch, enabled, expected_call_count):
+    """
+    GIVEN mocked prewarm.is_enabled that returns enabled and mocked prewarm.prewarm
+    WHEN index is imported
+    THEN prewarm is called if enabled.
+    """
+    monkeypatch.setattr(prewarm, "is_enabled", mock.MagicMock(return_value=enabled))
+    mock_prewarm = mock.MagicMock()
+    monkeypatch.setattr(prewarm, "prewarm", mock_prewarm)
+
+    importlib.reload(index)
+
+    assert mock_prewarm.call_count == expected_call_count
+
+
+@pytest.mark.lambda_function
+def test_warm_up(
+    mocked_operations_create: mock.MagicMock,
+    mocked_urllib3_pool_manager: mock.MagicMock,
+):
+    """
+    GIVEN mocked operations.create and urllib3.PoolManager and warm-up event
+    WHEN lambda_handler is called with the event
+    THEN OK is returned without any operation or response being sent.
+    """
+    return_value = index.lambda_handler({"WarmUp": True}, mock.MagicMock())
+
+    assert return_value == {"WarmUp": "OK"}
+    mocked_operations_create.assert_not_called()
+    mocked_urllib3_pool_manager.assert_not_called()
+
+
+@pytest.mark.lambda_function
+def test_phase_metrics(
+    monkeypatch,
+    capsys,
+    mocked_operations_create: mock.MagicMock,
+    create_lambda_event,
+    _mocked_urllib3_pool_manager,
+):
+    """
+    GIVEN PHASE_METRICS enabled and CloudFormation create request
+    WHEN lambda_handler is called with the request
+    THEN one embedded metric format line with the phases and the kind is printed.
+    """
+    monkeypatch.setenv("PHASE_METRICS", "true")
+    mocked_operations_create.return_value = operations.CreateReturn(
+        "SUCCESS", None, "name 1"
+    )
+    properties = {"apiVersion": "apps/v1", "kind": "Deployment"}
+    event = {**create_lambda_event, "ResourceProperties": properties}
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    (line,) = capsys.readouterr().out.splitlines()
+    record = json.loads(line)
+    assert record["RequestType"] == "Create"
+    assert record["ApiVersion"] == "apps/v1"
+    assert record["Kind"] == "Deployment"
+    assert record["ParseDuration"] >= 0
+    assert record["ResponseDuration"] >= 0
+    assert "KubernetesDuration" not in record
+
+
+@pytest.mark.lambda_function
+def test_phase_metrics_malformed(monkeypatch, capsys):
+    """
+    GIVEN PHASE_METRICS enabled and malformed CloudFormation request
+    WHEN lambda_handler is called with the request
+    THEN MalformedEventError is raised and the metrics are still printed.
+    """
+    monkeypatch.setenv("PHASE_METRICS", "true")
+
+    with pytest.raises(exceptions.MalformedEventError):
+        index.lambda_handler({"RequestType": "Create"}, mock.MagicMock())
+
+    record = json.loads(capsys.readouterr().out)
+    assert record["RequestType"] == "Create"
+    assert record["Kind"] == "unknown"
+
+
+@pytest.mark.lambda_function
+def test_latency_histograms(
+    monkeypatch,
+    capsys,
+    create_lambda_event,
+    mocked_urllib3_pool_manager: mock.MagicMock,
+):
+    """
+    GIVEN LATENCY_HISTOGRAMS enabled with a flush on every invocation
+    WHEN lambda_handler is called with a create request for a Deployment
+    THEN the summary of the Kubernetes call and the response is printed.
+    """
+    monkeypatch.setenv("LATENCY_HISTOGRAMS", "true")
+    monkeypatch.setenv("HISTOGRAM_FLUSH_INTERVAL", "0")
+    mock_function = mock.MagicMock()
+    mock_function.return_value.data = b'{"metadata": {"name": "name 1"}}'
+    mock_function.return_value.headers = {}
+    monkeypatch.setattr(
+        helpers, "get_function", mock.MagicMock(return_value=(mock_function, False))
+    )
+    properties = {"apiVersion": "apps/v1", "kind": "Deployment"}
+    event = {**create_lambda_event, "ResourceProperties": properties}
+
+    index.lambda_handler(event, mock.MagicMock())
+
+    mocked_urllib3_pool_manager.return_value.request.assert_called_once()
+    record = json.loads(capsys.readouterr().out)
+    assert {
+        (item["name"], item["apiVersion"], item["kind"], item["operation"])
+        for item in record["histograms"]
+    } >= {
+        ("kubernetes_ms", "apps/v1", "Deployment", "create"),
+        ("kubernetes_retries", "apps/v1", "Deployment", "create"),
+        ("response_ms", "apps/v1", "Deployment", "create"),
+        ("response_retries", "apps/v1", "Deployment", "create"),
+    }
+
+
+@pytest.mark.lambda_function
+def test_profile(
+    monkeypatch,
+    tmp_path,
+    capsys,
+    mocked_operations_create: mock.MagicMock,
+    create_lambda_event,
+    _mocked_urllib3_pool_manager,
+):
+    """
+    GIVEN PROFILE_REQUEST_IDS with the request id of a create request
+    WHEN lambda_handler is called with the request
+    THEN the profile of the handler is written.
+    """
+    monkeypatch.setenv("PROFILE_REQUEST_IDS", create_lambda_event["RequestId"])
+    monkeypatch.setenv("PROFILE_DIRECTORY", str(tmp_path))
+    mocked_operations_create.return_value = operations.CreateReturn(
+        "SUCCESS", None, "name 1"
+    )
+
+    index.lambda_handler(create_lambda_event, mock.MagicMock())
+
+    path = json.loads(capsys.readouterr().out)["profile"]
+    assert path.startswith(str(tmp_path))
+    stats = getattr(pstats.Stats(path), "stats")
+    assert any(function == "_handle_create" for _, _, function in stats)
+
+
+def test_trace(
+    monkeypatch,
+    tmp_path,
+    mocked_operations_create: mock.MagicMock,
+    create_lambda_event,
+    _mocked_urllib3_pool_manager,
+):
+    """
+    GIVEN TRACE_EXPORTER of json and a create request
+    WHEN lambda_handler is called with the request
+    THEN the spans of the handler and the response are written to the TRACE_FILE.
+    """
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setenv("TRACE_EXPORTER", "json")
+    monkeypatch.setenv("TRACE_FILE", str(path))
+    mocked_operations_create.return_value = operations.CreateReturn(
+        "SUCCESS", None, "name 1"
+    )
+
+    index.lambda_handler(create_lambda_event, mock.MagicMock())
+
+    spans = {
+        span["name"]: span for span in map(json.loads, path.read_text().splitlines())
+    }
+    assert set(spans) == {"lambda_handler", "response.send"}
+    root = spans["lambda_handler"]
+    assert root["attributes"]["requestId"] == create_lambda_event["RequestId"]
+    assert root["attributes"]["stackId"] == create_lambda_event["StackId"]
+    assert spans["response.send"]["parentId"] == root["spanId"]
+    assert spans["response.send"]["traceId"] == root["traceId"]
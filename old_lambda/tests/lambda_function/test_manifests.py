@@ -0,0 +1,559 @@
+"""Tests for manifests."""
+# pylint: disable=redefined-outer-name,protected-access
+
+import io
+from unittest import mock
+
+import boto3
+import pytest
+import yaml
+from botocore import exceptions as botocore_exceptions
+from botocore import response as botocore_response
+from botocore import stub
+
+from lambda_function import exceptions
+from lambda_function import manifests
+
+_BUCKET = "bucket-1"
+_KEY = "manifests/config-map.yaml"
+_MANIFEST = b"apiVersion: v1\nkind: ConfigMap\nmetadata:\n  name: name-1\n"
+_BODY = {"apiVersion": "v1", "kind": "ConfigMap", "metadata": {"name": "name-1"}}
+
+
+@pytest.fixture
+def cache_directory(tmp_path, monkeypatch):
+    """Reset the shared client and cache and cache under a temporary directory."""
+    monkeypatch.setenv("MANIFEST_CACHE_DIRECTORY", str(tmp_path))
+    manifests.reset()
+    yield tmp_path
+    manifests.reset()
+
+
+@pytest.fixture
+def stubber(monkeypatch, cache_directory):  # pylint: disable=unused-argument
+    """Stub the S3 client used by manifests."""
+    s3_client = boto3.Session(
+        aws_access_key_id="access key 1",
+        aws_secret_access_key="secret key 1",
+        region_name="ap-southeast-2",
+    ).client("s3")
+    monkeypatch.setattr(manifests, "_create_client", lambda: s3_client)
+    with stub.Stubber(s3_client) as s3_stubber:
+        yield s3_stubber
+        s3_stubber.assert_no_pending_responses()
+
+
+def _get_object_response(*, data, etag):
+    """Create a get_object response."""
+    return {
+        "Body": botocore_response.StreamingBody(io.BytesIO(data), len(data)),
+        "ETag": etag,
+    }
+
+
+@pytest.mark.parametrize(
+    "value, expected_reference",
+    [
+        (f"s3://{_BUCKET}/{_KEY}", manifests.Reference(_BUCKET, _KEY, None)),
+        ({"bucket": _BUCKET, "key": _KEY}, manifests.Reference(_BUCKET, _KEY, None)),
+        (
+            {"bucket": _BUCKET, "key": _KEY, "versionId": "version 1"},
+            manifests.Reference(_BUCKET, _KEY, "version 1"),
+        ),
+    ],
+    ids=["url", "mapping", "version"],
+)
+def test_reference_from_property(value, expected_reference):
+    """
+    GIVEN manifest property value
+    WHEN reference_from_property is called with the value
+    THEN the expected reference is returned.
+    """
+    assert manifests.reference_from_property(value=value) == expected_reference
+
+
+@pytest.mark.parametrize(
+    "value",
+    [f"s3://{_BUCKET}", "https://bucket-1/key", 1, {"bucket": _BUCKET}],
+    ids=["key missing", "not s3", "not mapping", "mapping key missing"],
+)
+def test_reference_from_property_malformed(value):
+    """
+    GIVEN manifest property value that is not a reference
+    WHEN reference_from_property is called with the value
+    THEN ManifestMalformedError is raised.
+    """
+    with pytest.raises(exceptions.ManifestMalformedError):
+        manifests.reference_from_property(value=value)
+
+
+@pytest.mark.parametrize(
+    "data", [b'{"kind": "ConfigMap"}', b"kind: ConfigMap\n"], ids=["json", "yaml"]
+)
+def test_parse(data):
+    """
+    GIVEN JSON or YAML manifest
+    WHEN parse is called with the manifest
+    THEN the body is returned.
+    """
+    assert manifests.parse(data=data) == {"kind": "ConfigMap"}
+
+
+@pytest.mark.parametrize(
+    "data", [b"kind: [ConfigMap\n", b"- kind\n"], ids=["invalid", "not mapping"]
+)
+def test_parse_malformed(data):
+    """
+    GIVEN manifest that is not a mapping
+    WHEN parse is called with the manifest
+    THEN ManifestMalformedError is raised.
+    """
+    with pytest.raises(exceptions.ManifestMalformedError):
+        manifests.parse(data=data)
+
+
+def test_fetch_downloads(stubber, cache_directory):
+    """
+    GIVEN empty cache and stubbed S3 with the manifest
+    WHEN fetch is called with a reference to the manifest
+    THEN the manifest is downloaded, stored on disk by ETag and returned.
+    """
+    stubber.add_response(
+        "get_object",
+        _get_object_response(data=_MANIFEST, etag='"etag-1"'),
+        {"Bucket": _BUCKET, "Key": _KEY},
+    )
+
+    body = manifests.fetch(value=f"s3://{_BUCKET}/{_KEY}")
+
+    assert body == _BODY
+    key = manifests.calculate_cache_key(
+        reference=manifests.Reference(_BUCKET, _KEY, None)
+    )
+    assert (cache_directory / key / "%22etag-1%22").read_bytes() == _MANIFEST
+
+
+def test_fetch_not_modified(stubber):
+    """
+    GIVEN cached manifest and stubbed S3 that answers not modified
+    WHEN fetch is called with a reference to the manifest
+    THEN a conditional GET is sent and the parsed manifest is reused.
+    """
+    stubber.add_response(
+        "get_object",
+        _get_object_response(data=_MANIFEST, etag='"etag-1"'),
+        {"Bucket": _BUCKET, "Key": _KEY},
+    )
+    first = manifests.fetch(value=f"s3://{_BUCKET}/{_KEY}")
+    stubber.add_client_error(
+        "get_object",
+        service_error_code="304",
+        http_status_code=304,
+        expected_params={"Bucket": _BUCKET, "Key": _KEY, "IfNoneMatch": '"etag-1"'},
+    )
+
+    second = manifests.fetch(value=f"s3://{_BUCKET}/{_KEY}")
+
+    assert second is first
+
+
+def test_fetch_not_modified_from_disk(stubber):
+    """
+    GIVEN manifest cached on disk by an earlier process and stubbed S3 that answers
+        not modified
+    WHEN fetch is called with a reference to the manifest
+    THEN the conditional GET uses the ETag on disk and the manifest is read from disk.
+    """
+    stubber.add_response(
+        "get_object",
+        _get_object_response(data=_MANIFEST, etag='"etag-1"'),
+        {"Bucket": _BUCKET, "Key": _KEY},
+    )
+    manifests.fetch(value=f"s3://{_BUCKET}/{_KEY}")
+    manifests.get_cache()._entries.clear()
+    stubber.add_client_error(
+        "get_object",
+        service_error_code="304",
+        http_status_code=304,
+        expected_params={"Bucket": _BUCKET, "Key": _KEY, "IfNoneMatch": '"etag-1"'},
+    )
+
+    body = manifests.fetch(value=f"s3://{_BUCKET}/{_KEY}")
+
+    assert body == _BODY
+
+
+def test_fetch_modified(stubber, cache_directory):
+    """
+    GIVEN cached manifest and stubbed S3 with a changed manifest
+    WHEN fetch is called with a reference to the manifest
+    THEN the changed manifest is returned and replaces the old one on disk.
+    """
+    stubber.add_response(
+        "get_object",
+        _get_object_response(data=_MANIFEST, etag='"etag-1"'),
+        {"Bucket": _BUCKET, "Key": _KEY},
+    )
+    manifests.fetch(value=f"s3://{_BUCKET}/{_KEY}")
+    stubber.add_response(
+        "get_object",
+        _get_object_response(data=b'{"kind": "Secret"}', etag='"etag-2"'),
+        {"Bucket": _BUCKET, "Key": _KEY, "IfNoneMatch": '"etag-1"'},
+    )
+
+    body = manifests.fetch(value=f"s3://{_BUCKET}/{_KEY}")
+
+    assert body == {"kind": "Secret"}
+    key = manifests.calculate_cache_key(
+        reference=manifests.Reference(_BUCKET, _KEY, None)
+    )
+    assert [path.name for path in (cache_directory / key).iterdir()] == ["%22etag-2%22"]
+
+
+def test_fetch_version_cached(stubber):
+    """
+    GIVEN cached manifest with a version
+    WHEN fetch is called with a reference to the version
+    THEN the manifest is returned without a request.
+    """
+    value = {"bucket": _BUCKET, "key": _KEY, "versionId": "version 1"}
+    stubber.add_response(
+        "get_object",
+        _get_object_response(data=_MANIFEST, etag='"etag-1"'),
+        {"Bucket": _BUCKET, "Key": _KEY, "VersionId": "version 1"},
+    )
+    manifests.fetch(value=value)
+
+    assert manifests.fetch(value=value) == _BODY
+
+
+def test_fetch_missing(stubber):
+    """
+    GIVEN stubbed S3 without the manifest
+    WHEN fetch is called with a reference to the manifest
+    THEN ManifestFetchError is raised.
+    """
+    stubber.add_client_error(
+        "get_object", service_error_code="NoSuchKey", http_status_code=404
+    )
+
+    with pytest.raises(exceptions.ManifestFetchError) as exc_info:
+        manifests.fetch(value=f"s3://{_BUCKET}/{_KEY}")
+
+    assert str(exc_info.value).startswith(
+        f"could not fetch the manifest s3://{_BUCKET}/{_KEY}: "
+    )
+
+
+def test_fetch_connection_error(monkeypatch, cache_directory):
+    """
+    GIVEN S3 client that can not connect
+    WHEN fetch is called
+    THEN ManifestFetchError is raised.
+    """
+    # pylint: disable=unused-argument
+    mock_client = mock.MagicMock()
+    mock_client.get_object.side_effect = botocore_exceptions.EndpointConnectionError(
+        endpoint_url="https://s3"
+    )
+    monkeypatch.setattr(manifests, "_create_client", lambda: mock_client)
+
+    with pytest.raises(exceptions.ManifestFetchError):
+        manifests.fetch(value=f"s3://{_BUCKET}/{_KEY}")
+
+
+@pytest.mark.parametrize(
+    "files",
+    [{}, {"etag-1": _MANIFEST, "etag-2": _MANIFEST}, {"etag-1": b"- not mapping\n"}],
+    ids=["empty", "several", "malformed"],
+)
+def test_cache_get_disk_unusable(tmp_path, files):
+    """
+    GIVEN cache directory with an unusable download of a manifest
+    WHEN get is called for the manifest
+    THEN None is returned.
+    """
+    (tmp_path / "key-1").mkdir()
+    for name, data in files.items():
+        (tmp_path / "key-1" / name).write_bytes(data)
+    cache = manifests.Cache(directory=str(tmp_path))
+
+    assert cache.get(key="key-1") is None
+
+
+def test_cache_get_skips_temporary(tmp_path):
+    """
+    GIVEN cache directory with a download and a temporary file
+    WHEN get is called for the manifest
+    THEN the download is returned.
+    """
+    (tmp_path / "key-1").mkdir()
+    (tmp_path / "key-1" / "%22etag-1%22").write_bytes(_MANIFEST)
+    (tmp_path / "key-1" / ".%22etag-2%22.tmp").write_bytes(b"partial")
+    cache = manifests.Cache(directory=str(tmp_path))
+
+    assert cache.get(key="key-1") == manifests.CacheEntry('"etag-1"', _BODY)
+
+
+@pytest.mark.parametrize(
+    "endpoint_url, expected_style",
+    [(None, "auto"), ("http://localhost:9000", "path")],
+    ids=["aws", "stand-in"],
+)
+def test_create_client(monkeypatch, endpoint_url, expected_style):
+    """
+    GIVEN AWS_ENDPOINT_URL environment variable
+    WHEN _create_client is called
+    THEN an S3 client with the endpoint and addressing style is returned.
+    """
+    monkeypatch.setenv("AWS_REGION", "ap-southeast-2")
+    if endpoint_url is None:
+        monkeypatch.delenv("AWS_ENDPOINT_URL", raising=False)
+    else:
+        monkeypatch.setenv("AWS_ENDPOINT_URL", endpoint_url)
+
+    s3_client = manifests._create_client()
+
+    assert s3_client.meta.config.s3["addressing_style"] == expected_style
+    if endpoint_url is not None:
+        assert s3_client.meta.endpoint_url == endpoint_url
+
+
+def test_shared_cache(cache_directory):
+    """
+    GIVEN MANIFEST_CACHE_DIRECTORY environment variable
+    WHEN get_cache is called
+    THEN a shared cache in the directory is returned.
+    """
+    cache = manifests.get_cache()
+
+    assert cache._directory == str(cache_directory)
+    assert manifests.get_cache() is cache
+
+
+@pytest.mark.parametrize(
+    "data, expected_body",
+    [
+        (b"kind: ConfigMap\n", {"kind": "ConfigMap"}),
+        (
+            b'[{"kind": "Namespace"}, {"kind": "ConfigMap"}]',
+            [
+                {"kind": "Namespace"},
+                {"kind": "ConfigMap"},
+            ],
+        ),
+        (
+            b"kind: List\nitems:\n- kind: Namespace\n- kind: ConfigMap\n",
+            [{"kind": "Namespace"}, {"kind": "ConfigMap"}],
+        ),
+    ],
+    ids=["manifest", "list", "kind List"],
+)
+def test_parse_bundle(data, expected_body):
+    """
+    GIVEN manifest or bundle
+    WHEN parse_bundle is called with it
+    THEN the body of the manifest or the bodies of the bundle are returned.
+    """
+    assert manifests.parse_bundle(data=data) == expected_body
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"kind\n", b"- kind: Namespace\n- kind\n", b"kind: List\n"],
+    ids=["scalar", "item not mapping", "items missing"],
+)
+def test_parse_bundle_malformed(data):
+    """
+    GIVEN content that is neither a manifest nor a bundle
+    WHEN parse_bundle is called with it
+    THEN ManifestMalformedError is raised.
+    """
+    with pytest.raises(exceptions.ManifestMalformedError):
+        manifests.parse_bundle(data=data)
+
+
+@pytest.mark.parametrize("size", [0, 10, 1 << 18], ids=["empty", "small", "chunks"])
+def test_compress_round_trip(size):
+    """
+    GIVEN content larger than a decode chunk
+    WHEN compress is called and the result decompressed
+    THEN the content is returned and the compressed value is stable.
+    """
+    data = bytes(range(256)) * (size // 256) + b"a" * (size % 256)
+
+    value = manifests.compress(data=data)
+
+    assert manifests.decompress(value=value) == data
+    assert manifests.compress(data=data) == value
+
+
+def test_decompress_line_breaks():
+    """
+    GIVEN compressed value wrapped over several lines
+    WHEN decompress is called with it
+    THEN the content is returned.
+    """
+    value = manifests.compress(data=_MANIFEST)
+    wrapped = "\n".join(value[idx : idx + 7] for idx in range(0, len(value), 7))
+
+    assert manifests.decompress(value=wrapped) == _MANIFEST
+
+
+@pytest.mark.parametrize(
+    "value, expected_reason",
+    [
+        (1, "it must be a base64 string"),
+        ("not base64!", "could not decode the compressed manifest: "),
+        ("aGVsbG8=", "could not decode the compressed manifest: "),
+        (manifests.compress(data=_MANIFEST)[:-12], "the gzip stream is incomplete"),
+        (manifests.compress(data=b"a" * 101), "it expands to more than 100 bytes"),
+    ],
+    ids=["not string", "not base64", "not gzip", "truncated", "too large"],
+)
+def test_decompress_malformed(monkeypatch, value, expected_reason):
+    """
+    GIVEN value that is not a compressed manifest within the size limit
+    WHEN decompress is called with it
+    THEN ManifestDecodeError is raised.
+    """
+    monkeypatch.setenv("MAX_MANIFEST_SIZE", "100")
+
+    with pytest.raises(exceptions.ManifestDecodeError) as exc_info:
+        manifests.decompress(value=value)
+
+    assert expected_reason in str(exc_info.value)
+
+
+def test_decompress_at_limit(monkeypatch):
+    """
+    GIVEN value that expands to exactly the size limit
+    WHEN decompress is called with it
+    THEN the content is returned.
+    """
+    monkeypatch.setenv("MAX_MANIFEST_SIZE", "100")
+
+    assert manifests.decompress(value=manifests.compress(data=b"a" * 100)) == b"a" * 100
+
+
+def _read_fixture(name):
+    """Read a kubectl manifest from the fixtures."""
+    with open(f"tests/lambda_function/kubernetes_fixtures/{name}") as in_file:
+        return in_file.read()
+
+
+@pytest.fixture
+def parsed_cache():
+    """Empty the cache of parsed YAML manifests."""
+    manifests.reset()
+    yield
+    manifests.reset()
+
+
+def test_loader():
+    """
+    GIVEN PyYAML built with libyaml
+    WHEN the loader is inspected
+    THEN the C loader is used.
+    """
+    assert manifests.LOADER is yaml.CSafeLoader
+
+
+@pytest.mark.usefixtures("parsed_cache")
+def test_parse_yaml_single():
+    """
+    GIVEN YAML string with a single kubectl manifest
+    WHEN parse_yaml is called with it
+    THEN the body is returned.
+    """
+    value = _read_fixture("nginx-deployment.yaml")
+
+    assert manifests.parse_yaml(value=value) == yaml.safe_load(value)
+
+
+@pytest.mark.usefixtures("parsed_cache")
+def test_parse_yaml_stream():
+    """
+    GIVEN YAML string with several kubectl manifests and empty documents
+    WHEN parse_yaml is called with it
+    THEN the bodies are returned in order as a bundle.
+    """
+    names = ("namespace.yaml", "cluster-role.yaml", "nginx-deployment.yaml")
+    value = "---\n" + "\n---\n".join(_read_fixture(name) for name in names) + "---\n"
+
+    bundle = manifests.parse_yaml(value=value)
+
+    assert bundle == [yaml.safe_load(_read_fixture(name)) for name in names]
+
+
+@pytest.mark.parametrize(
+    "value, expected_bundle",
+    [
+        (
+            "kind: List\nitems:\n- kind: Namespace\n---\nkind: ConfigMap\n",
+            [{"kind": "Namespace"}, {"kind": "ConfigMap"}],
+        ),
+        ("- kind: Namespace\n", [{"kind": "Namespace"}]),
+        ("kind: List\nitems:\n- kind: Namespace\n", [{"kind": "Namespace"}]),
+    ],
+    ids=["list and manifest", "sequence", "single list"],
+)
+@pytest.mark.usefixtures("parsed_cache")
+def test_parse_yaml_lists(value, expected_bundle):
+    """
+    GIVEN YAML string with lists of manifests
+    WHEN parse_yaml is called with it
+    THEN the items are returned as a bundle.
+    """
+    assert manifests.parse_yaml(value=value) == expected_bundle
+
+
+@pytest.mark.parametrize(
+    "value",
+    [1, "", "---\n---\n", "kind: [Namespace\n", "kind: Namespace\n---\n- 1\n"],
+    ids=["not string", "empty", "only empty documents", "invalid", "not mapping"],
+)
+@pytest.mark.usefixtures("parsed_cache")
+def test_parse_yaml_malformed(value):
+    """
+    GIVEN value that is not a YAML string of manifests
+    WHEN parse_yaml is called with it
+    THEN YamlManifestMalformedError is raised.
+    """
+    with pytest.raises(exceptions.YamlManifestMalformedError):
+        manifests.parse_yaml(value=value)
+
+
+@pytest.mark.usefixtures("parsed_cache")
+def test_parse_yaml_memoized(monkeypatch):
+    """
+    GIVEN YAML string that was parsed before
+    WHEN parse_yaml is called with an equal string
+    THEN the earlier result is returned without parsing.
+    """
+    value = _read_fixture("nginx-deployment.yaml")
+    first = manifests.parse_yaml(value=value)
+    mock_load_all = mock.MagicMock()
+    monkeypatch.setattr(yaml, "load_all", mock_load_all)
+
+    second = manifests.parse_yaml(value="".join(list(value)))
+
+    assert second is first
+    mock_load_all.assert_not_called()
+
+
+@pytest.mark.usefixtures("parsed_cache")
+def test_parse_yaml_evicts(monkeypatch):
+    """
+    GIVEN YAML_CACHE_SIZE of 2 and three parsed YAML strings
+    WHEN parse_yaml is called with the least recently used string again
+    THEN it is parsed again while the others are kept.
+    """
+    monkeypatch.setenv("YAML_CACHE_SIZE", "2")
+    values = [f"kind: Kind{idx}\n" for idx in range(3)]
+    first = [manifests.parse_yaml(value=value) for value in values[:2]]
+    manifests.parse_yaml(value=values[0])
+    manifests.parse_yaml(value=values[2])
+
+    assert manifests.parse_yaml(value=values[0]) is first[0]
+    assert manifests.parse_yaml(value=values[1]) is not first[1]
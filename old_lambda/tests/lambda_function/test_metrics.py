@@ -0,0 +1,235 @@
+"""Tests for metrics."""
+
+import json
+import threading
+
+import pytest
+
+from lambda_function import metrics
+
+
+@pytest.fixture(name="recording")
+def fixture_recording(monkeypatch):
+    """Record the phases of an invocation."""
+    monkeypatch.setenv("PHASE_METRICS", "true")
+    metrics.start(request_type="Create")
+    yield
+    metrics.emit()
+
+
+@pytest.mark.parametrize(
+    "value, expected_enabled",
+    [(None, True), ("true", True), ("false", False), ("FALSE", False)],
+)
+def test_is_enabled(monkeypatch, value, expected_enabled):
+    """
+    GIVEN PHASE_METRICS environment variable
+    WHEN is_enabled is called
+    THEN whether it is not false is returned.
+    """
+    if value is None:
+        monkeypatch.delenv("PHASE_METRICS", raising=False)
+    else:
+        monkeypatch.setenv("PHASE_METRICS", value)
+
+    assert metrics.is_enabled() == expected_enabled
+
+
+@pytest.mark.parametrize(
+    "value, expected_namespace",
+    [(None, "CloudFormationKubernetes"), ("Custom", "Custom")],
+)
+def test_get_namespace(monkeypatch, value, expected_namespace):
+    """
+    GIVEN METRICS_NAMESPACE environment variable
+    WHEN get_namespace is called
+    THEN the namespace is returned.
+    """
+    if value is None:
+        monkeypatch.delenv("METRICS_NAMESPACE", raising=False)
+    else:
+        monkeypatch.setenv("METRICS_NAMESPACE", value)
+
+    assert metrics.get_namespace() == expected_namespace
+
+
+def test_calculate_record_counters():
+    """
+    GIVEN recorder with a phase and counters
+    WHEN calculate_record is called
+    THEN the counters follow the phases with their units.
+    """
+    recorder = metrics.Recorder(request_type="Create")
+    recorder.add(name="response", seconds=0.002)
+    recorder.count(name="ResponseNewConnections", value=1, unit="Count")
+    recorder.count(name="ResponseBytesSent", value=10, unit="Bytes")
+    recorder.count(name="ResponseBytesSent", value=5, unit="Bytes")
+
+    record = recorder.calculate_record(timestamp=0)
+
+    assert record["_aws"]["CloudWatchMetrics"][0]["Metrics"] == [
+        {"Name": "ResponseDuration", "Unit": "Milliseconds"},
+        {"Name": "ResponseBytesSent", "Unit": "Bytes"},
+        {"Name": "ResponseNewConnections", "Unit": "Count"},
+    ]
+    assert record["ResponseBytesSent"] == 15
+    assert record["ResponseNewConnections"] == 1
+
+
+@pytest.mark.usefixtures("recording")
+def test_count(capsys):
+    """
+    GIVEN recording
+    WHEN count is called
+    THEN the metric is printed by emit with the count unit by default.
+    """
+    metrics.count(name="KubernetesNewConnections", value=2)
+    metrics.emit()
+
+    record = json.loads(capsys.readouterr().out)
+    assert record["KubernetesNewConnections"] == 2
+    assert {"Name": "KubernetesNewConnections", "Unit": "Count"} in record["_aws"][
+        "CloudWatchMetrics"
+    ][0]["Metrics"]
+
+
+def test_calculate_record(monkeypatch):
+    """
+    GIVEN recorder with durations of some phases
+    WHEN calculate_record is called
+    THEN the embedded metric format record of the phases in order is returned.
+    """
+    monkeypatch.delenv("METRICS_NAMESPACE", raising=False)
+    recorder = metrics.Recorder(request_type="Update")
+    recorder.add(name="kubernetes", seconds=0.25)
+    recorder.add(name="parse", seconds=0.001)
+    recorder.add(name="kubernetes", seconds=0.25)
+
+    record = recorder.calculate_record(timestamp=1.5)
+
+    assert record == {
+        "_aws": {
+            "Timestamp": 1500,
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": "CloudFormationKubernetes",
+                    "Dimensions": [["RequestType", "ApiVersion", "Kind"]],
+                    "Metrics": [
+                        {"Name": "ParseDuration", "Unit": "Milliseconds"},
+                        {"Name": "KubernetesDuration", "Unit": "Milliseconds"},
+                    ],
+                }
+            ],
+        },
+        "RequestType": "Update",
+        "ApiVersion": "unknown",
+        "Kind": "unknown",
+        "ParseDuration": 1.0,
+        "KubernetesDuration": 500.0,
+    }
+
+
+def test_enter_leave_concurrent():
+    """
+    GIVEN recorder
+    WHEN a phase is entered by overlapping threads, then again after they all left
+    THEN the wall time the phase was entered for is recorded, not the sum per thread.
+    """
+    recorder = metrics.Recorder(request_type="Create")
+
+    recorder.enter(name="kubernetes", now=1.0)
+    recorder.enter(name="kubernetes", now=1.5)
+    recorder.leave(name="kubernetes", now=2.5)
+    recorder.enter(name="kubernetes", now=2.6)
+    recorder.leave(name="kubernetes", now=3.0)
+    recorder.leave(name="kubernetes", now=3.25)
+    recorder.enter(name="kubernetes", now=4.0)
+    recorder.leave(name="kubernetes", now=4.5)
+
+    assert recorder.durations == {"kubernetes": 2.75}
+
+
+@pytest.mark.usefixtures("recording")
+def test_phase(capsys):
+    """
+    GIVEN recording
+    WHEN phases are entered from several threads and one raises
+    THEN the durations are recorded and the record is printed by emit.
+    """
+    with pytest.raises(ValueError):
+        with metrics.phase(name="resolve"):
+            raise ValueError
+
+    def call() -> None:
+        with metrics.phase(name="kubernetes"):
+            pass
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics.emit()
+
+    record = json.loads(capsys.readouterr().out)
+    assert record["ResolveDuration"] >= 0
+    assert record["KubernetesDuration"] >= 0
+
+
+@pytest.mark.parametrize(
+    "body, expected_api_version, expected_kind",
+    [
+        ({"apiVersion": "apps/v1", "kind": "Deployment"}, "apps/v1", "Deployment"),
+        ({"kind": "Deployment"}, "unknown", "Deployment"),
+        ([{"apiVersion": "apps/v1", "kind": "Deployment"}], "v1", "List"),
+    ],
+    ids=["body", "api version missing", "bundle"],
+)
+@pytest.mark.usefixtures("recording")
+def test_set_kind(capsys, body, expected_api_version, expected_kind):
+    """
+    GIVEN recording
+    WHEN set_kind is called with the body
+    THEN the record has the api version and kind.
+    """
+    metrics.set_kind(body=body)
+    metrics.emit()
+
+    record = json.loads(capsys.readouterr().out)
+    assert record["ApiVersion"] == expected_api_version
+    assert record["Kind"] == expected_kind
+
+
+def test_not_recording(capsys):
+    """
+    GIVEN PHASE_METRICS disabled
+    WHEN an invocation is recorded
+    THEN the kind is kept for the invocation and nothing is printed.
+    """
+    metrics.start(request_type="Create")
+
+    with metrics.phase(name="parse"):
+        metrics.set_kind(body={"kind": "Deployment"})
+    metrics.count(name="KubernetesNewConnections", value=1)
+    dimensions = metrics.get_dimensions()
+    metrics.emit()
+
+    assert dimensions == {
+        "RequestType": "Create",
+        "ApiVersion": "unknown",
+        "Kind": "Deployment",
+    }
+    assert not capsys.readouterr().out
+    assert metrics.get_dimensions()["Kind"] == "unknown"
+
+
+def test_not_started():
+    """
+    GIVEN no invocation being recorded
+    WHEN a phase is entered and the kind set
+    THEN nothing is recorded.
+    """
+    with metrics.phase(name="parse"):
+        metrics.set_kind(body={"kind": "Deployment"})
+
+    assert metrics.get_dimensions()["Kind"] == "unknown"
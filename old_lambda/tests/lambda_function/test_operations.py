@@ -1,4 +1,5 @@
 """Tests for operations."""
+
 # pylint: disable=redefined-outer-name
 
 from unittest import mock
@@ -36,6 +37,22 @@ def mocked_get_function(monkeypatch):
     return mock_get_function
 
 
+@pytest.fixture(scope="function", autouse=True)
+def mocked_read_metadata(monkeypatch):
+    """Monkeypatch helpers.read_metadata."""
+    mock_read_metadata = mock.MagicMock()
+    monkeypatch.setattr(helpers, "read_metadata", mock_read_metadata)
+    return mock_read_metadata
+
+
+@pytest.fixture(scope="function", autouse=True)
+def mocked_read(monkeypatch):
+    """Monkeypatch helpers.read."""
+    mock_read = mock.MagicMock()
+    monkeypatch.setattr(helpers, "read", mock_read)
+    return mock_read
+
+
 @pytest.fixture(scope="function", autouse=True)
 def mocked_calculate_namespace(monkeypatch):
     """Monkeypatch helpers.calculate_namespace."""
@@ -115,6 +132,33 @@ def test_create_get_function_call(
         api_version=mocked_get_api_version.return_value,
         kind=mocked_get_kind.return_value,
         operation="create",
+        cluster=None,
+    )
+
+
+def test_create_get_function_cluster(mocked_get_function: mock.MagicMock):
+    """
+    GIVEN mocked get_function and cluster
+    WHEN create is called with the cluster
+    THEN get_function is called with the cluster.
+    """
+    operations.create(body=mock.MagicMock(), cluster="cluster 1")
+
+    assert mocked_get_function.call_args[1]["cluster"] == "cluster 1"
+
+
+def test_create_get_function_raises(mocked_get_function: mock.MagicMock):
+    """
+    GIVEN mocked get_function that raises CredentialsError
+    WHEN create is called
+    THEN failure response is returned.
+    """
+    mocked_get_function.side_effect = exceptions.CredentialsError(["failure 1"])
+
+    return_value = operations.create(body=mock.MagicMock())
+
+    assert return_value == operations.CreateReturn(
+        "FAILURE", "could not load credentials: failure 1", None
     )
 
 
@@ -133,26 +177,29 @@ def test_create_client_function_call(mocked_get_function: mock.MagicMock):
 
     operations.create(body=mock_body)
 
-    mock_client_function.assert_called_once_with(body=mock_body)
+    mock_client_function.assert_called_once_with(body=mock_body, _preload_content=False)
 
 
-def test_create_client_function_return(mocked_get_function: mock.MagicMock):
+def test_create_client_function_return(
+    mocked_get_function: mock.MagicMock, mocked_read_metadata: mock.MagicMock
+):
     """
-    GIVEN  mocked get_function that returns a client function that returns the
-        metadata with a name and False for namespaced
+    GIVEN  mocked get_function that returns a client function and False for
+        namespaced and mocked read_metadata that returns the metadata with a name
     WHEN create is called
-    THEN success response is returned.
+    THEN read_metadata is called with the response and success response is returned.
     """
     mock_client_function = mock.MagicMock()
-    mock_return = mock.MagicMock()
-    mock_return.metadata.name = "name 1"
-    mock_client_function.return_value = mock_return
+    mocked_read_metadata.return_value = helpers.MetadataReturn("name 1", None)
     mocked_get_function.return_value = helpers.GetFunctionReturn(
         mock_client_function, False
     )
 
     return_value = operations.create(body=mock.MagicMock())
 
+    mocked_read_metadata.assert_called_once_with(
+        response=mock_client_function.return_value
+    )
     assert return_value == operations.CreateReturn("SUCCESS", None, "name 1")
 
 
@@ -178,6 +225,27 @@ def test_create_client_function_raises(mocked_get_function: mock.MagicMock):
     )
 
 
+def test_create_read_metadata_raises(
+    mocked_get_function: mock.MagicMock, mocked_read_metadata: mock.MagicMock
+):
+    """
+    GIVEN mocked get_function that returns a client function and mocked
+        read_metadata that raises ProtobufDecodeError
+    WHEN create is called
+    THEN failure response is returned.
+    """
+    mocked_get_function.return_value = helpers.GetFunctionReturn(
+        mock.MagicMock(), False
+    )
+    mocked_read_metadata.side_effect = exceptions.ProtobufDecodeError("reason 1")
+
+    return_value = operations.create(body=mock.MagicMock())
+
+    assert return_value == operations.CreateReturn(
+        "FAILURE", "could not decode the protobuf response: reason 1", None
+    )
+
+
 def test_create_calculate_namespace_call(
     mocked_get_function: mock.MagicMock, mocked_calculate_namespace: mock.MagicMock
 ):
@@ -216,22 +284,23 @@ def test_create_client_function_namespace_call(
     operations.create(body=mock_body)
 
     mock_client_function.assert_called_once_with(
-        namespace=mocked_calculate_namespace.return_value, body=mock_body
+        namespace=mocked_calculate_namespace.return_value,
+        body=mock_body,
+        _preload_content=False,
     )
 
 
-def test_create_client_function_namespace_return(mocked_get_function: mock.MagicMock):
+def test_create_client_function_namespace_return(
+    mocked_get_function: mock.MagicMock, mocked_read_metadata: mock.MagicMock
+):
     """
-    GIVEN mocked get_function that returns a client function that returns the metadata
-        with a name and True for namespaced
+    GIVEN mocked get_function that returns a client function and True for namespaced
+        and mocked read_metadata that returns the metadata with a name and namespace
     WHEN create is called
     THEN success response is returned.
     """
     mock_client_function = mock.MagicMock()
-    mock_return = mock.MagicMock()
-    mock_return.metadata.namespace = "namespace 1"
-    mock_return.metadata.name = "name 1"
-    mock_client_function.return_value = mock_return
+    mocked_read_metadata.return_value = helpers.MetadataReturn("name 1", "namespace 1")
     mocked_get_function.return_value = helpers.GetFunctionReturn(
         mock_client_function, True
     )
@@ -338,6 +407,37 @@ def test_update_get_function_call(
         api_version=mocked_get_api_version.return_value,
         kind=mocked_get_kind.return_value,
         operation="update",
+        cluster=None,
+    )
+
+
+def test_update_get_function_cluster(mocked_get_function: mock.MagicMock):
+    """
+    GIVEN mocked get_function and cluster
+    WHEN update is called with the cluster
+    THEN get_function is called with the cluster.
+    """
+    operations.update(
+        body=mock.MagicMock(), physical_name="physical name 1", cluster="cluster 1"
+    )
+
+    assert mocked_get_function.call_args[1]["cluster"] == "cluster 1"
+
+
+def test_update_get_function_raises(mocked_get_function: mock.MagicMock):
+    """
+    GIVEN mocked get_function that raises ClusterMalformedError
+    WHEN update is called
+    THEN failure response is returned.
+    """
+    mocked_get_function.side_effect = exceptions.ClusterMalformedError
+
+    return_value = operations.update(
+        body=mock.MagicMock(), physical_name="physical name 1"
+    )
+
+    assert return_value == operations.ExistsReturn(
+        "FAILURE", str(exceptions.ClusterMalformedError())
     )
 
 
@@ -357,15 +457,19 @@ def test_update_client_function_call(mocked_get_function: mock.MagicMock):
 
     operations.update(body=mock_body, physical_name=physical_name)
 
-    mock_client_function.assert_called_once_with(body=mock_body, name=physical_name)
+    mock_client_function.assert_called_once_with(
+        body=mock_body, name=physical_name, _preload_content=False
+    )
 
 
-def test_update_client_function_return(mocked_get_function: mock.MagicMock):
+def test_update_client_function_return(
+    mocked_get_function: mock.MagicMock, mocked_read: mock.MagicMock
+):
     """
     GIVEN mocked body and mocked get_function that returns a client function that
         returns the metadata with a name and False for namespaced
     WHEN update is called
-    THEN success response is returned.
+    THEN the response is read and success response is returned.
     """
     mock_client_function = mock.MagicMock()
     mock_return = mock.MagicMock()
@@ -377,6 +481,7 @@ def test_update_client_function_return(mocked_get_function: mock.MagicMock):
 
     return_value = operations.update(body=mock.MagicMock(), physical_name="name 1")
 
+    mocked_read.assert_called_once_with(response=mock_return)
     assert return_value == operations.ExistsReturn("SUCCESS", None)
 
 
@@ -420,16 +525,18 @@ def test_update_client_function_namespace_call(mocked_get_function: mock.MagicMo
     operations.update(body=mock_body, physical_name=f"{namespace}/{name}")
 
     mock_client_function.assert_called_once_with(
-        namespace=namespace, name=name, body=mock_body
+        namespace=namespace, name=name, body=mock_body, _preload_content=False
     )
 
 
-def test_update_client_function_namespace_return(mocked_get_function: mock.MagicMock):
+def test_update_client_function_namespace_return(
+    mocked_get_function: mock.MagicMock, mocked_read: mock.MagicMock
+):
     """
     GIVEN mocked get_function that returns a client function that returns the metadata
         with a name and True for namespaced
     WHEN update is called
-    THEN success response is returned.
+    THEN the response is read and success response is returned.
     """
     mock_client_function = mock.MagicMock()
     mock_return = mock.MagicMock()
@@ -444,6 +551,7 @@ def test_update_client_function_namespace_return(mocked_get_function: mock.Magic
         body=mock.MagicMock(), physical_name="namespace 1/name 1"
     )
 
+    mocked_read.assert_called_once_with(response=mock_return)
     assert return_value == operations.ExistsReturn("SUCCESS", None)
 
 
@@ -544,6 +652,37 @@ def test_delete_get_function_call(
         api_version=mocked_get_api_version.return_value,
         kind=mocked_get_kind.return_value,
         operation="delete",
+        cluster=None,
+    )
+
+
+def test_delete_get_function_cluster(mocked_get_function: mock.MagicMock):
+    """
+    GIVEN mocked get_function and cluster
+    WHEN delete is called with the cluster
+    THEN get_function is called with the cluster.
+    """
+    operations.delete(
+        body=mock.MagicMock(), physical_name="physical name 1", cluster="cluster 1"
+    )
+
+    assert mocked_get_function.call_args[1]["cluster"] == "cluster 1"
+
+
+def test_delete_get_function_raises(mocked_get_function: mock.MagicMock):
+    """
+    GIVEN mocked get_function that raises ClusterMalformedError
+    WHEN delete is called
+    THEN failure response is returned.
+    """
+    mocked_get_function.side_effect = exceptions.ClusterMalformedError
+
+    return_value = operations.delete(
+        body=mock.MagicMock(), physical_name="physical name 1"
+    )
+
+    assert return_value == operations.ExistsReturn(
+        "FAILURE", str(exceptions.ClusterMalformedError())
     )
 
 
@@ -562,15 +701,19 @@ def test_delete_client_function_call(mocked_get_function: mock.MagicMock):
 
     operations.delete(body=mock.MagicMock(), physical_name=physical_name)
 
-    mock_client_function.assert_called_once_with(name=physical_name)
+    mock_client_function.assert_called_once_with(
+        name=physical_name, _preload_content=False
+    )
 
 
-def test_delete_client_function_return(mocked_get_function: mock.MagicMock):
+def test_delete_client_function_return(
+    mocked_get_function: mock.MagicMock, mocked_read: mock.MagicMock
+):
     """
     GIVEN mocked body and mocked get_function that returns a client function that
         returns the metadata with a name and False for namespaced
     WHEN delete is called
-    THEN success response is returned.
+    THEN the response is read and success response is returned.
     """
     mock_client_function = mock.MagicMock()
     mock_return = mock.MagicMock()
@@ -582,6 +725,7 @@ def test_delete_client_function_return(mocked_get_function: mock.MagicMock):
 
     return_value = operations.delete(body=mock.MagicMock(), physical_name="name 1")
 
+    mocked_read.assert_called_once_with(response=mock_return)
     assert return_value == operations.ExistsReturn("SUCCESS", None)
 
 
@@ -623,15 +767,19 @@ def test_delete_client_function_namespace_call(mocked_get_function: mock.MagicMo
 
     operations.delete(body=mock.MagicMock(), physical_name=f"{namespace}/{name}")
 
-    mock_client_function.assert_called_once_with(namespace=namespace, name=name)
+    mock_client_function.assert_called_once_with(
+        namespace=namespace, name=name, _preload_content=False
+    )
 
 
-def test_delete_client_function_namespace_return(mocked_get_function: mock.MagicMock):
+def test_delete_client_function_namespace_return(
+    mocked_get_function: mock.MagicMock, mocked_read: mock.MagicMock
+):
     """
     GIVEN mocked get_function that returns a client function that returns the metadata
         with a name and True for namespaced
     WHEN delete is called
-    THEN success response is returned.
+    THEN the response is read and success response is returned.
     """
     mock_client_function = mock.MagicMock()
     mock_return = mock.MagicMock()
@@ -646,6 +794,7 @@ def test_delete_client_function_namespace_return(mocked_get_function: mock.Magic
         body=mock.MagicMock(), physical_name="namespace 1/name 1"
     )
 
+    mocked_read.assert_called_once_with(response=mock_return)
     assert return_value == operations.ExistsReturn("SUCCESS", None)
 
 
@@ -671,3 +820,35 @@ def test_delete_client_function_namespace_raises(mocked_get_function: mock.Magic
     assert return_value == operations.ExistsReturn(
         "FAILURE", "(400)\nReason: reason 1\n"
     )
+
+
+@pytest.mark.parametrize(
+    "operation, namespaced, physical_name",
+    [
+        (operations.update, False, "name 1"),
+        (operations.update, True, "namespace 1/name 1"),
+        (operations.delete, False, "name 1"),
+        (operations.delete, True, "namespace 1/name 1"),
+    ],
+    ids=["update", "update namespaced", "delete", "delete namespaced"],
+)
+def test_exists_client_function_protobuf_raises(
+    mocked_get_function: mock.MagicMock, operation, namespaced, physical_name
+):
+    """
+    GIVEN mocked get_function that returns a client function that raises
+        ProtobufDecodeError for a truncated protobuf Status
+    WHEN update or delete is called
+    THEN failure response is returned.
+    """
+    mock_client_function = mock.MagicMock()
+    mock_client_function.side_effect = exceptions.ProtobufDecodeError("truncated field")
+    mocked_get_function.return_value = helpers.GetFunctionReturn(
+        mock_client_function, namespaced
+    )
+
+    return_value = operation(body=mock.MagicMock(), physical_name=physical_name)
+
+    assert return_value == operations.ExistsReturn(
+        "FAILURE", "could not decode the protobuf response: truncated field"
+    )
@@ -0,0 +1,90 @@
+"""Tests for physical names."""
+
+import pytest
+
+from lambda_function import operations
+from lambda_function import physical_names
+
+
+@pytest.mark.parametrize(
+    "value, container, expected_physical_name",
+    [
+        (
+            {"cluster 1": "ns/name 1", "cluster 2": "name 2"},
+            dict,
+            '{"cluster 1":"ns/name 1","cluster 2":"name 2"}',
+        ),
+        (["ns/name 1", "name 2"], list, '["ns/name 1","name 2"]'),
+    ],
+    ids=["fan-out", "bundle"],
+)
+def test_round_trip(value, container, expected_physical_name):
+    """
+    GIVEN physical name of each object by cluster or in the order of a bundle
+    WHEN calculate is called and the result parsed
+    THEN the physical name of each object is returned.
+    """
+    physical_name = physical_names.calculate(physical_names=value)
+
+    assert physical_name == expected_physical_name
+    assert physical_names.parse(physical_name=physical_name, container=container) == (
+        value
+    )
+
+
+@pytest.mark.parametrize(
+    "physical_name, container",
+    [("ns/name 1", dict), ('["name 1"]', dict), ('{"c1":"name 1"}', list)],
+    ids=["not json", "not object", "not array"],
+)
+def test_parse_other(physical_name, container):
+    """
+    GIVEN physical name that does not record the objects in the container
+    WHEN parse is called with it
+    THEN None is returned.
+    """
+    assert physical_names.parse(physical_name=physical_name, container=container) is (
+        None
+    )
+
+
+@pytest.mark.parametrize(
+    "length, expected_reason",
+    [
+        (physical_names.MAX_LENGTH, None),
+        (
+            physical_names.MAX_LENGTH + 1,
+            "the physical name recording every cluster is 1025 characters long, "
+            "CloudFormation accepts at most 1024; use fewer clusters or shorter "
+            "names.",
+        ),
+    ],
+    ids=["longest", "too long"],
+)
+def test_check(length, expected_reason):
+    """
+    GIVEN physical name of a length
+    WHEN check is called with it
+    THEN the reason is returned if CloudFormation does not accept it.
+    """
+    assert (
+        physical_names.check(physical_name="a" * length, recorded="cluster")
+        == expected_reason
+    )
+
+
+def test_calculate_reason():
+    """
+    GIVEN results of objects some of which failed
+    WHEN calculate_reason is called with the results
+    THEN the reasons of the failures are combined with their labels.
+    """
+    results = [
+        ("c1", operations.ExistsReturn("FAILURE", "reason 1")),
+        ("c2", operations.ExistsReturn("SUCCESS", None)),
+        ("c3", operations.ExistsReturn("FAILURE", "reason 3")),
+    ]
+
+    assert physical_names.calculate_reason(results=results) == (
+        "c1: reason 1; c3: reason 3"
+    )
@@ -0,0 +1,249 @@
+"""Tests for prewarm."""
+
+# pylint: disable=redefined-outer-name
+
+from unittest import mock
+
+import pytest
+
+from lambda_function import credentials
+from lambda_function import helpers
+from lambda_function import prewarm
+from lambda_function import response
+
+
+@pytest.mark.parametrize(
+    "environ, expected_enabled",
+    [
+        ({}, False),
+        ({"PREWARM": "true"}, False),
+        ({"AWS_LAMBDA_FUNCTION_NAME": "function 1"}, True),
+        ({"AWS_LAMBDA_FUNCTION_NAME": "function 1", "PREWARM": "true"}, True),
+        ({"AWS_LAMBDA_FUNCTION_NAME": "function 1", "PREWARM": "False"}, False),
+    ],
+    ids=[
+        "outside lambda",
+        "outside lambda enabled",
+        "inside lambda",
+        "inside lambda enabled",
+        "inside lambda disabled",
+    ],
+)
+def test_is_enabled(monkeypatch, environ, expected_enabled):
+    """
+    GIVEN environment variables
+    WHEN is_enabled is called
+    THEN the expected value is returned.
+    """
+    monkeypatch.delenv("AWS_LAMBDA_FUNCTION_NAME", raising=False)
+    monkeypatch.delenv("PREWARM", raising=False)
+    for key, value in environ.items():
+        monkeypatch.setenv(key, value)
+
+    assert prewarm.is_enabled() == expected_enabled
+
+
+def test_load_configuration(monkeypatch):
+    """
+    GIVEN mocked credentials and helpers.clear_apis
+    WHEN load_configuration is called
+    THEN the chain is reset and loaded before the shared apis are cleared.
+    """
+    mock_calls = mock.MagicMock()
+    monkeypatch.setattr(credentials, "reset", mock_calls.reset)
+    monkeypatch.setattr(credentials, "get_configuration", mock_calls.get_configuration)
+    monkeypatch.setattr(helpers, "clear_apis", mock_calls.clear_apis)
+
+    prewarm.load_configuration()
+
+    assert mock_calls.mock_calls == [
+        mock.call.reset(),
+        mock.call.get_configuration(),
+        mock.call.clear_apis(),
+    ]
+
+
+def test_connect_api_server(monkeypatch):
+    """
+    GIVEN mocked helpers.get_api
+    WHEN connect_api_server is called with a timeout
+    THEN the raw version is requested with the timeout and the connection released.
+    """
+    mock_get_api = mock.MagicMock()
+    monkeypatch.setattr(helpers, "get_api", mock_get_api)
+
+    prewarm.connect_api_server(timeout=1.5)
+
+    mock_get_api.assert_called_once_with(module_name="VersionApi")
+    get_code = mock_get_api.return_value.get_code
+    get_code.assert_called_once_with(_preload_content=False, _request_timeout=1.5)
+    get_code.return_value.release_conn.assert_called_once_with()
+
+
+@pytest.mark.parametrize(
+    "environ, endpoint, expected_endpoint",
+    [
+        ({}, None, None),
+        ({"RESPONSE_ENDPOINT": "https://host 1"}, None, "https://host 1"),
+        ({}, "https://host 2", "https://host 2"),
+        ({"RESPONSE_ENDPOINT": "https://host 1"}, "https://host 2", "https://host 1"),
+    ],
+    ids=["not known", "environment", "last response", "environment and response"],
+)
+def test_calculate_response_endpoint(monkeypatch, environ, endpoint, expected_endpoint):
+    """
+    GIVEN environment variables and endpoint of the last response
+    WHEN calculate_response_endpoint is called
+    THEN the expected endpoint is returned.
+    """
+    monkeypatch.delenv("RESPONSE_ENDPOINT", raising=False)
+    for key, value in environ.items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setattr(response, "_ENDPOINT", endpoint)
+
+    assert prewarm.calculate_response_endpoint() == expected_endpoint
+
+
+def test_response_endpoint_pool(monkeypatch):
+    """
+    GIVEN response sent to a ResponseURL
+    WHEN the connection pool of the response endpoint is taken from the shared pool
+    THEN it is the pool that sending to the ResponseURL uses.
+    """
+    monkeypatch.delenv("RESPONSE_ENDPOINT", raising=False)
+    monkeypatch.setattr(response, "_POOL", None)
+    monkeypatch.setattr(response, "_ENDPOINT", None)
+    response_url = (
+        "https://cloudformation-custom-resource-response-apsoutheast2.s3"
+        ".ap-southeast-2.amazonaws.com/arn%3Aaws%3Acloudformation/request-1?sig=1"
+    )
+    pool = response.get_pool()
+    monkeypatch.setattr(pool, "request", mock.MagicMock())
+    response.send(url=response_url, body={})
+
+    endpoint = prewarm.calculate_response_endpoint()
+
+    assert pool.connection_from_url(endpoint) is pool.connection_from_url(response_url)
+
+
+@pytest.fixture
+def mocked_steps(monkeypatch):
+    """Monkeypatch all the steps of prewarm."""
+    mock_steps = mock.MagicMock()
+    mock_steps.calculate_response_endpoint.return_value = "https://host 1"
+    monkeypatch.setattr(prewarm, "load_configuration", mock_steps.load_configuration)
+    monkeypatch.setattr(
+        helpers, "build_dispatch_table", mock_steps.build_dispatch_table
+    )
+    monkeypatch.setattr(prewarm, "connect_api_server", mock_steps.connect_api_server)
+    monkeypatch.setattr(
+        prewarm,
+        "calculate_response_endpoint",
+        mock_steps.calculate_response_endpoint,
+    )
+    monkeypatch.setattr(response, "connect", mock_steps.connect)
+    return mock_steps
+
+
+def test_prewarm(mocked_steps: mock.MagicMock):
+    """
+    GIVEN mocked steps
+    WHEN prewarm is called
+    THEN configuration is loaded, the dispatch table built and connections opened in
+        order with no failures returned.
+    """
+    return_value = prewarm.prewarm()
+
+    assert mocked_steps.mock_calls == [
+        mock.call.load_configuration(),
+        mock.call.build_dispatch_table(group_version_kinds=prewarm.GROUP_VERSION_KINDS),
+        mock.call.connect_api_server(timeout=prewarm.CONNECT_TIMEOUT),
+        mock.call.calculate_response_endpoint(),
+        mock.call.connect(url="https://host 1", timeout=prewarm.CONNECT_TIMEOUT),
+    ]
+    assert return_value == prewarm.PrewarmReturn([])
+
+
+def test_prewarm_no_response_endpoint(mocked_steps: mock.MagicMock):
+    """
+    GIVEN mocked steps where the response endpoint can not be calculated
+    WHEN prewarm is called
+    THEN no connection to the response endpoint is opened.
+    """
+    mocked_steps.calculate_response_endpoint.return_value = None
+
+    prewarm.prewarm()
+
+    mocked_steps.connect.assert_not_called()
+
+
+def test_prewarm_failures(mocked_steps: mock.MagicMock):
+    """
+    GIVEN mocked steps that all raise
+    WHEN prewarm is called
+    THEN every step is attempted and each failure is returned.
+    """
+    mocked_steps.load_configuration.side_effect = Exception("error 1")
+    mocked_steps.build_dispatch_table.side_effect = Exception("error 2")
+    mocked_steps.connect_api_server.side_effect = Exception("error 3")
+    mocked_steps.connect.side_effect = Exception("error 4")
+
+    return_value = prewarm.prewarm()
+
+    assert return_value == prewarm.PrewarmReturn(
+        [
+            "load configuration: error 1",
+            "build dispatch table: error 2",
+            "connect api server: error 3",
+            "connect response endpoint: error 4",
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "event, expected_result",
+    [
+        ({}, False),
+        ({"RequestType": "Create"}, False),
+        ({"WarmUp": True}, True),
+        ({"WarmUp": True, "Refresh": True}, True),
+    ],
+    ids=["empty", "cloudformation", "warm up", "warm up refresh"],
+)
+def test_is_warm_up_event(event, expected_result):
+    """
+    GIVEN event
+    WHEN is_warm_up_event is called with the event
+    THEN the expected result is returned.
+    """
+    assert prewarm.is_warm_up_event(event=event) == expected_result
+
+
+def test_handle_warm_up(monkeypatch):
+    """
+    GIVEN mocked prewarm and warm-up event without refresh
+    WHEN handle_warm_up is called with the event
+    THEN prewarm is not called and OK is returned.
+    """
+    mock_prewarm = mock.MagicMock()
+    monkeypatch.setattr(prewarm, "prewarm", mock_prewarm)
+
+    return_value = prewarm.handle_warm_up(event={"WarmUp": True})
+
+    mock_prewarm.assert_not_called()
+    assert return_value == {"WarmUp": "OK"}
+
+
+def test_handle_warm_up_refresh(monkeypatch):
+    """
+    GIVEN mocked prewarm that returns failures and warm-up event with refresh
+    WHEN handle_warm_up is called with the event
+    THEN prewarm is called and OK is returned with the failures.
+    """
+    mock_prewarm = mock.MagicMock(return_value=prewarm.PrewarmReturn(["failure 1"]))
+    monkeypatch.setattr(prewarm, "prewarm", mock_prewarm)
+
+    return_value = prewarm.handle_warm_up(event={"WarmUp": True, "Refresh": True})
+
+    mock_prewarm.assert_called_once_with()
+    assert return_value == {"WarmUp": "OK", "Failures": ["failure 1"]}
@@ -0,0 +1,163 @@
+"""Tests for profiler."""
+
+import contextlib
+import json
+import os
+import pstats
+from unittest import mock
+
+import pytest
+
+from lambda_function import profiler
+
+
+@pytest.mark.parametrize(
+    "request_ids, sample_rate, random_value, expected_selected",
+    [
+        (None, None, 0.0, False),
+        ("request id 1", None, 0.0, True),
+        ("other, request id 1", None, 0.0, True),
+        ("other", None, 0.0, False),
+        (None, "0.5", 0.4, True),
+        (None, "0.5", 0.6, False),
+        (None, "0", 0.0, False),
+    ],
+    ids=[
+        "default",
+        "request id",
+        "one of request ids",
+        "other request id",
+        "sampled",
+        "not sampled",
+        "sample rate zero",
+    ],
+)
+def test_is_selected(
+    monkeypatch, request_ids, sample_rate, random_value, expected_selected
+):
+    """
+    GIVEN PROFILE_REQUEST_IDS and PROFILE_SAMPLE_RATE environment variables
+    WHEN is_selected is called with a request id
+    THEN whether the invocation is profiled is returned.
+    """
+    for name, value in (
+        ("PROFILE_REQUEST_IDS", request_ids),
+        ("PROFILE_SAMPLE_RATE", sample_rate),
+    ):
+        if value is None:
+            monkeypatch.delenv(name, raising=False)
+        else:
+            monkeypatch.setenv(name, value)
+    monkeypatch.setattr(
+        profiler.random, "random", mock.MagicMock(return_value=random_value)
+    )
+
+    assert profiler.is_selected(request_id="request id 1") == expected_selected
+
+
+@pytest.mark.parametrize(
+    "directory, request_id, expected_path",
+    [
+        (None, "a1-b2", "/tmp/profile-a1-b2.pstats"),
+        ("/var/profiles", "../a b", "/var/profiles/profile-___a_b.pstats"),
+        (None, None, "/tmp/profile-None.pstats"),
+    ],
+    ids=["default", "directory and unsafe", "missing"],
+)
+def test_calculate_path(monkeypatch, directory, request_id, expected_path):
+    """
+    GIVEN PROFILE_DIRECTORY environment variable and request id
+    WHEN calculate_path is called with the request id
+    THEN the path in the directory with a safe name is returned.
+    """
+    if directory is None:
+        monkeypatch.delenv("PROFILE_DIRECTORY", raising=False)
+    else:
+        monkeypatch.setenv("PROFILE_DIRECTORY", directory)
+
+    assert profiler.calculate_path(request_id=request_id) == expected_path
+
+
+def _work():
+    """Do something to profile."""
+    return sum(idx * idx for idx in range(1000))
+
+
+def test_profile(monkeypatch, tmp_path, capsys):
+    """
+    GIVEN selected request id
+    WHEN code runs in profile
+    THEN the pstats file is written and the top functions are printed.
+    """
+    monkeypatch.setenv("PROFILE_REQUEST_IDS", "request id 1")
+    monkeypatch.setenv("PROFILE_DIRECTORY", str(tmp_path))
+    monkeypatch.setenv("PROFILE_TOP", "3")
+
+    with profiler.profile(request_id="request id 1"):
+        _work()
+
+    record = json.loads(capsys.readouterr().out)
+    assert record["profile"] == str(tmp_path / "profile-request_id_1.pstats")
+    assert record["requestId"] == "request id 1"
+    assert len(record["top"]) == 3
+    cumulative = [entry["cumulative_ms"] for entry in record["top"]]
+    assert cumulative == sorted(cumulative, reverse=True)
+    assert any("_work" in entry["function"] for entry in record["top"])
+    assert pstats.Stats(record["profile"]).total_calls > 0
+
+
+def test_profile_raises(monkeypatch, tmp_path, capsys):
+    """
+    GIVEN selected request id
+    WHEN code that raises runs in profile
+    THEN the error is raised and the profile is still written.
+    """
+    monkeypatch.setenv("PROFILE_REQUEST_IDS", "request id 1")
+    monkeypatch.setenv("PROFILE_DIRECTORY", str(tmp_path))
+
+    with pytest.raises(ValueError):
+        with profiler.profile(request_id="request id 1"):
+            raise ValueError
+
+    assert os.path.exists(json.loads(capsys.readouterr().out)["profile"])
+
+
+@pytest.mark.parametrize("raises", [False, True], ids=["returns", "raises"])
+def test_profile_directory_missing(monkeypatch, tmp_path, capsys, raises):
+    """
+    GIVEN selected request id and PROFILE_DIRECTORY that does not exist
+    WHEN code that returns or raises runs in profile
+    THEN the outcome of the code is kept and the error is printed with the top
+        functions.
+    """
+    monkeypatch.setenv("PROFILE_REQUEST_IDS", "request id 1")
+    monkeypatch.setenv("PROFILE_DIRECTORY", str(tmp_path / "missing"))
+
+    with pytest.raises(ValueError) if raises else contextlib.nullcontext():
+        with profiler.profile(request_id="request id 1"):
+            _work()
+            if raises:
+                raise ValueError
+
+    record = json.loads(capsys.readouterr().out)
+    assert record["profile"] is None
+    assert record["error"].startswith("could not write the profile: ")
+    assert record["top"]
+
+
+def test_profile_not_selected(monkeypatch, capsys):
+    """
+    GIVEN request id that is not selected
+    WHEN code runs in profile
+    THEN nothing is profiled or printed.
+    """
+    monkeypatch.delenv("PROFILE_REQUEST_IDS", raising=False)
+    monkeypatch.delenv("PROFILE_SAMPLE_RATE", raising=False)
+    mock_profile = mock.MagicMock()
+    monkeypatch.setattr(profiler.cProfile, "Profile", mock_profile)
+
+    with profiler.profile(request_id="request id 1"):
+        _work()
+
+    mock_profile.assert_not_called()
+    assert not capsys.readouterr().out
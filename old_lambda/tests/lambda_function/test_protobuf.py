@@ -0,0 +1,185 @@
+"""Tests for protobuf."""
+
+import pytest
+
+from lambda_function import exceptions
+from lambda_function import protobuf
+
+
+def _varint(value):
+    """Encode a varint."""
+    encoded = b""
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            encoded += bytes([byte | 0x80])
+        else:
+            return encoded + bytes([byte])
+
+
+def _field(number, value):
+    """Encode a length delimited field."""
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def _envelope(raw):
+    """Wrap an encoded object in the runtime.Unknown envelope."""
+    type_meta = _field(1, "apps/v1") + _field(2, "Deployment")
+    return protobuf.MAGIC + _field(1, type_meta) + _field(2, raw)
+
+
+@pytest.mark.parametrize(
+    "encoding, api_version, expected_enabled",
+    [
+        (None, "v1", False),
+        ("json", "v1", False),
+        ("protobuf", "v1", True),
+        ("protobuf", "apps/v1", True),
+        ("protobuf", "batch/v1", False),
+        ("protobuf", "example.com/v1", False),
+    ],
+    ids=["default", "json", "core", "apps", "other group", "custom resource"],
+)
+def test_is_enabled(monkeypatch, encoding, api_version, expected_enabled):
+    """
+    GIVEN KUBERNETES_ENCODING environment variable and api version
+    WHEN is_enabled is called with the api version
+    THEN the expected value is returned.
+    """
+    if encoding is None:
+        monkeypatch.delenv("KUBERNETES_ENCODING", raising=False)
+    else:
+        monkeypatch.setenv("KUBERNETES_ENCODING", encoding)
+
+    assert protobuf.is_enabled(api_version=api_version) == expected_enabled
+
+
+@pytest.mark.parametrize(
+    "content_type, expected_protobuf",
+    [
+        (None, False),
+        ("application/json", False),
+        ("application/vnd.kubernetes.protobuf", True),
+    ],
+    ids=["missing", "json", "protobuf"],
+)
+def test_is_protobuf(content_type, expected_protobuf):
+    """
+    GIVEN Content-Type header value
+    WHEN is_protobuf is called with the value
+    THEN the expected value is returned.
+    """
+    assert protobuf.is_protobuf(content_type=content_type) == expected_protobuf
+
+
+def test_iterate_fields():
+    """
+    GIVEN message with a field of each supported wire type
+    WHEN iterate_fields is called with the message
+    THEN each field number and value is returned.
+    """
+    data = (
+        _varint(1 << 3 | 0)
+        + _varint(300)
+        + _varint(2 << 3 | 1)
+        + b"12345678"
+        + _field(3, "value 1")
+        + _varint(4 << 3 | 5)
+        + b"1234"
+    )
+
+    assert list(protobuf.iterate_fields(data=data)) == [
+        (1, 300),
+        (2, b"12345678"),
+        (3, b"value 1"),
+        (4, b"1234"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"\x08\x80", _varint(1 << 3 | 2) + _varint(10) + b"short", _varint(1 << 3 | 3)],
+    ids=["truncated varint", "truncated field", "unsupported wire type"],
+)
+def test_iterate_fields_invalid(data):
+    """
+    GIVEN message that is not valid
+    WHEN iterate_fields is called with the message
+    THEN ProtobufDecodeError is raised.
+    """
+    with pytest.raises(exceptions.ProtobufDecodeError):
+        list(protobuf.iterate_fields(data=data))
+
+
+@pytest.mark.parametrize(
+    "raw, expected_metadata",
+    [
+        (
+            _field(1, _field(1, "name 1") + _field(3, "namespace 1"))
+            + _field(2, _field(1, "spec")),
+            ("name 1", "namespace 1"),
+        ),
+        (_field(1, _field(1, "name 1") + _field(2, "generate-")), ("name 1", None)),
+        (_field(2, _field(1, "spec")), (None, None)),
+    ],
+    ids=["namespaced", "not namespaced", "metadata missing"],
+)
+def test_decode_metadata(raw, expected_metadata):
+    """
+    GIVEN protobuf encoded object
+    WHEN decode_metadata is called with the object
+    THEN the name and namespace are returned.
+    """
+    assert protobuf.decode_metadata(data=_envelope(raw)) == expected_metadata
+
+
+def test_decode_metadata_not_utf_8():
+    """
+    GIVEN protobuf encoded object whose name is not UTF-8
+    WHEN decode_metadata is called with the object
+    THEN ProtobufDecodeError is raised.
+    """
+    with pytest.raises(exceptions.ProtobufDecodeError):
+        protobuf.decode_metadata(data=_envelope(_field(1, _field(1, b"\xff"))))
+
+
+def test_decode_metadata_raw_missing():
+    """
+    GIVEN envelope without an object
+    WHEN decode_metadata is called with the envelope
+    THEN no name and namespace are returned.
+    """
+    assert protobuf.decode_metadata(data=protobuf.MAGIC) == (None, None)
+
+
+def test_decode_metadata_magic_missing():
+    """
+    GIVEN data without the magic prefix
+    WHEN decode_metadata is called with the data
+    THEN ProtobufDecodeError is raised.
+    """
+    with pytest.raises(exceptions.ProtobufDecodeError):
+        protobuf.decode_metadata(data=b'{"metadata": {}}')
+
+
+@pytest.mark.parametrize(
+    "raw, expected_message",
+    [
+        (
+            _field(2, "Failure") + _field(3, "message 1") + _field(4, "AlreadyExists"),
+            "message 1",
+        ),
+        (_field(2, "Failure"), ""),
+    ],
+    ids=["message", "message missing"],
+)
+def test_decode_status_message(raw, expected_message):
+    """
+    GIVEN protobuf encoded Status
+    WHEN decode_status_message is called with the Status
+    THEN the message is returned.
+    """
+    assert protobuf.decode_status_message(data=_envelope(raw)) == expected_message
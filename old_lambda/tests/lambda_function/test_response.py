@@ -0,0 +1,78 @@
+"""Tests for response."""
+
+import json
+from unittest import mock
+
+import pytest
+
+from lambda_function import response
+
+
+def test_get_pool_shared(mocked_urllib3_pool_manager: mock.MagicMock):
+    """
+    GIVEN mocked urllib3.PoolManager
+    WHEN get_pool is called twice
+    THEN one pool is created with certificates required and returned both times.
+    """
+    first_pool = response.get_pool()
+    second_pool = response.get_pool()
+
+    mocked_urllib3_pool_manager.assert_called_once_with(cert_reqs="CERT_REQUIRED")
+    assert first_pool is mocked_urllib3_pool_manager.return_value
+    assert second_pool is first_pool
+
+
+def test_connect(mocked_urllib3_pool_manager: mock.MagicMock):
+    """
+    GIVEN mocked urllib3.PoolManager and url
+    WHEN connect is called with the url and a timeout
+    THEN a connection is taken from the pool for the url, connected and returned to
+        the pool.
+    """
+    connection_from_url = mocked_urllib3_pool_manager.return_value.connection_from_url
+    connection_pool = connection_from_url.return_value
+    connection = connection_pool._get_conn.return_value
+
+    response.connect(url="https://host 1", timeout=1.5)
+
+    connection_from_url.assert_called_once_with("https://host 1")
+    connection_pool._get_conn.assert_called_once_with(timeout=1.5)
+    assert connection.timeout == 1.5
+    connection.connect.assert_called_once_with()
+    connection_pool._put_conn.assert_called_once_with(connection)
+
+
+def test_send(mocked_urllib3_pool_manager: mock.MagicMock):
+    """
+    GIVEN mocked urllib3.PoolManager, url and body
+    WHEN send is called with the url and body
+    THEN the body is PUT to the url as JSON.
+    """
+    body = {"key": "value"}
+
+    response.send(url="response url 1", body=body)
+
+    mocked_urllib3_pool_manager.return_value.request.assert_called_once_with(
+        "PUT", "response url 1", body=json.dumps(body).encode("utf-8")
+    )
+
+
+@pytest.mark.parametrize(
+    "url, expected_endpoint",
+    [
+        ("https://host-1:8443/path?query=1", "https://host-1:8443"),
+        ("response url 1", None),
+    ],
+    ids=["url", "not url"],
+)
+def test_send_endpoint(
+    _mocked_urllib3_pool_manager: mock.MagicMock, url, expected_endpoint
+):
+    """
+    GIVEN mocked urllib3.PoolManager and url
+    WHEN send is called with the url
+    THEN the scheme, host and port of the url are kept as the endpoint.
+    """
+    response.send(url=url, body={})
+
+    assert response.get_endpoint() == expected_endpoint
@@ -0,0 +1,417 @@
+"""Tests for rest."""
+
+# pylint: disable=redefined-outer-name
+
+import gzip
+import io
+import json
+from unittest import mock
+
+import pytest
+import urllib3
+from kubernetes import client
+
+from lambda_function import exceptions
+from lambda_function import rest
+
+_DISCOVERY = {
+    "kind": "APIResourceList",
+    "groupVersion": "apps/v1",
+    "resources": [
+        {"name": "deployments", "kind": "Deployment", "namespaced": True},
+        {"name": "deployments/status", "kind": "Deployment", "namespaced": True},
+        {"name": "clusterthings", "kind": "ClusterThing", "namespaced": False},
+    ],
+}
+
+
+def _response(*, status=200, data=b"{}"):
+    """Create a mocked raw response."""
+    response = mock.MagicMock()
+    response.status = status
+    response.reason = "reason 1"
+    response.data = data
+    response.headers = {"header 1": "value 1"}
+    return response
+
+
+@pytest.fixture
+def api_client():
+    """Create an api client with a token and a mocked pool manager."""
+    configuration = client.Configuration()
+    configuration.host = "https://host 1"
+    configuration.api_key = {"authorization": "token 1"}
+    configuration.api_key_prefix = {"authorization": "Bearer"}
+    api_client = client.ApiClient(configuration=configuration)
+    api_client.rest_client.pool_manager = mock.MagicMock()
+    return api_client
+
+
+@pytest.mark.parametrize(
+    "api_version, expected_prefix",
+    [("v1", "/api/v1"), ("apps/v1", "/apis/apps/v1")],
+    ids=["core", "group"],
+)
+def test_calculate_prefix(api_version, expected_prefix):
+    """
+    GIVEN api version
+    WHEN calculate_prefix is called with the api version
+    THEN the expected prefix is returned.
+    """
+    assert rest.calculate_prefix(api_version=api_version) == expected_prefix
+
+
+@pytest.mark.parametrize(
+    "namespace, name, expected_path",
+    [
+        (None, None, "/api/v1/things"),
+        (None, "name 1", "/api/v1/things/name 1"),
+        ("ns 1", None, "/api/v1/namespaces/ns 1/things"),
+        ("ns 1", "name 1", "/api/v1/namespaces/ns 1/things/name 1"),
+    ],
+    ids=["collection", "object", "namespaced collection", "namespaced object"],
+)
+def test_calculate_path(namespace, name, expected_path):
+    """
+    GIVEN prefix, plural, namespace and name
+    WHEN calculate_path is called with them
+    THEN the expected path is returned.
+    """
+    path = rest.calculate_path(
+        prefix="/api/v1", plural="things", namespace=namespace, name=name
+    )
+
+    assert path == expected_path
+
+
+def test_get_function_create(api_client):
+    """
+    GIVEN api client whose pool returns the discovery and then a created object
+    WHEN get_function is called for a namespaced kind and the function called
+    THEN the resources are discovered and the serialized body is posted to the
+        namespaced collection with the token and gzip accepted.
+    """
+    pool_manager = api_client.rest_client.pool_manager
+    created = _response(status=201)
+    pool_manager.request.side_effect = [
+        _response(data=json.dumps(_DISCOVERY).encode()),
+        created,
+    ]
+    backend = rest.Backend(api_client=api_client)
+
+    function, namespaced = backend.get_function(
+        api_version="apps/v1", kind="Deployment", operation="create"
+    )
+    response = function(
+        body={"kind": "Deployment"}, namespace="ns 1", _preload_content=False
+    )
+
+    assert namespaced
+    assert response is created
+    discovery_call, create_call = pool_manager.request.call_args_list
+    assert discovery_call[0] == ("GET", "https://host 1/apis/apps/v1")
+    assert create_call[0] == (
+        "POST",
+        "https://host 1/apis/apps/v1/namespaces/ns 1/deployments",
+    )
+    assert create_call[1]["body"] == b'{"kind":"Deployment"}'
+    assert create_call[1]["preload_content"] is False
+    headers = create_call[1]["headers"]
+    assert headers["Accept-Encoding"] == "gzip"
+    assert headers["authorization"] == "Bearer token 1"
+
+
+@pytest.mark.parametrize(
+    "operation, expected_method, expected_body",
+    [("update", "PUT", b'{"kind":"ClusterThing"}'), ("delete", "DELETE", None)],
+)
+def test_get_function_cached_discovery(
+    api_client, operation, expected_method, expected_body
+):
+    """
+    GIVEN backend that discovered an api version
+    WHEN get_function is called for a cluster scoped kind and the function called
+    THEN the discovery is not repeated and the object is requested.
+    """
+    pool_manager = api_client.rest_client.pool_manager
+    pool_manager.request.return_value = _response(data=json.dumps(_DISCOVERY).encode())
+    backend = rest.Backend(api_client=api_client)
+    backend.get_resource(api_version="apps/v1", kind="Deployment")
+    pool_manager.request.reset_mock()
+
+    function, namespaced = backend.get_function(
+        api_version="apps/v1", kind="ClusterThing", operation=operation
+    )
+    body = {"kind": "ClusterThing"} if expected_body else None
+    function(body=body, name="name 1", _preload_content=False)
+
+    assert not namespaced
+    pool_manager.request.assert_called_once()
+    call = pool_manager.request.call_args
+    assert call[0] == (
+        expected_method,
+        "https://host 1/apis/apps/v1/clusterthings/name 1",
+    )
+    assert call[1]["body"] == expected_body
+
+
+def test_get_resource_kind_unknown(api_client):
+    """
+    GIVEN api client whose pool returns the discovery
+    WHEN get_resource is called with a kind the api version does not serve
+    THEN KindUnknownError is raised.
+    """
+    api_client.rest_client.pool_manager.request.return_value = _response(
+        data=json.dumps(_DISCOVERY).encode()
+    )
+    backend = rest.Backend(api_client=api_client)
+
+    with pytest.raises(exceptions.KindUnknownError):
+        backend.get_resource(api_version="apps/v1", kind="Unknown")
+
+
+@pytest.mark.parametrize(
+    "request_kwargs",
+    [
+        {"return_value": _response(status=403)},
+        {"side_effect": urllib3.exceptions.HTTPError("error 1")},
+        {"return_value": _response(data=b"not json")},
+    ],
+    ids=["status", "connection", "not json"],
+)
+def test_get_resource_discovery_fails(api_client, request_kwargs):
+    """
+    GIVEN api client whose pool fails the discovery
+    WHEN get_resource is called
+    THEN DiscoveryError is raised.
+    """
+    api_client.rest_client.pool_manager.request.configure_mock(**request_kwargs)
+    backend = rest.Backend(api_client=api_client)
+
+    with pytest.raises(exceptions.DiscoveryError):
+        backend.get_resource(api_version="apps/v1", kind="Deployment")
+
+
+def test_request_fails(api_client):
+    """
+    GIVEN api client whose pool returns a failed response
+    WHEN request is called
+    THEN ApiException is raised with the status and body and the connection is
+        released.
+    """
+    response = _response(status=409, data=b"conflict 1")
+    api_client.rest_client.pool_manager.request.return_value = response
+    backend = rest.Backend(api_client=api_client)
+
+    with pytest.raises(client.rest.ApiException) as exc_info:
+        backend.request(
+            method="POST", path="/api/v1/configmaps", body=rest.Body(b"{}", 2, None)
+        )
+
+    assert exc_info.value.status == 409
+    assert exc_info.value.body == "conflict 1"
+    assert str(exc_info.value).startswith("(409)\nReason: reason 1\n")
+    response.release_conn.assert_called_once_with()
+
+
+def test_get_backend_shared(api_client):
+    """
+    GIVEN api clients
+    WHEN get_backend is called with them
+    THEN the backend is shared for the same api client.
+    """
+    backend = rest.get_backend(api_client=api_client)
+
+    assert rest.get_backend(api_client=api_client) is backend
+    assert rest.get_backend(api_client=client.ApiClient()) is not backend
+
+
+def test_request_without_token(api_client):
+    """
+    GIVEN api client without a token, which older clients report with an empty value
+    WHEN request is called
+    THEN no authorization header is sent.
+    """
+    api_client.configuration.auth_settings = lambda: {
+        "BearerToken": {"in": "header", "key": "authorization", "value": None}
+    }
+    api_client.rest_client.pool_manager.request.return_value = _response()
+    backend = rest.Backend(api_client=api_client)
+
+    backend.request(method="GET", path="/api/v1")
+
+    headers = api_client.rest_client.pool_manager.request.call_args[1]["headers"]
+    assert "authorization" not in headers
+
+
+@pytest.mark.parametrize(
+    "api_version, kind, expected_accept",
+    [
+        ("apps/v1", "Deployment", rest.PROTOBUF_ACCEPT),
+        ("example.com/v1", "Thing", "application/json"),
+    ],
+    ids=["built in", "custom resource"],
+)
+def test_get_function_protobuf(
+    monkeypatch, api_client, api_version, kind, expected_accept
+):
+    """
+    GIVEN protobuf encoding enabled and backend that discovered an api version
+    WHEN get_function is called and the function called
+    THEN protobuf is accepted for built in kinds and JSON for custom resources while
+        the body is sent as JSON.
+    """
+    monkeypatch.setenv("KUBERNETES_ENCODING", "protobuf")
+    pool_manager = api_client.rest_client.pool_manager
+    pool_manager.request.return_value = _response(
+        data=json.dumps(
+            {"resources": [{"name": "things", "kind": kind, "namespaced": False}]}
+        ).encode()
+    )
+    backend = rest.Backend(api_client=api_client)
+
+    function, _ = backend.get_function(
+        api_version=api_version, kind=kind, operation="create"
+    )
+    function(body={"kind": kind}, _preload_content=False)
+
+    headers = pool_manager.request.call_args[1]["headers"]
+    assert headers["Accept"] == expected_accept
+    assert headers["Content-Type"] == "application/json"
+    discovery_headers = pool_manager.request.call_args_list[0][1]["headers"]
+    assert discovery_headers["Accept"] == "application/json"
+
+
+def test_request_fails_protobuf(api_client):
+    """
+    GIVEN api client whose pool returns a failed response with a protobuf Status
+    WHEN request is called
+    THEN ApiException is raised with the message of the Status as the body.
+    """
+    # runtime.Unknown with raw holding a Status with a status and message
+    response = _response(status=409, data=b"k8s\x00\x12\x0d\x12\x07Failure\x1a\x02hi")
+    response.headers = {"Content-Type": "application/vnd.kubernetes.protobuf"}
+    api_client.rest_client.pool_manager.request.return_value = response
+    backend = rest.Backend(api_client=api_client)
+
+    with pytest.raises(client.rest.ApiException) as exc_info:
+        backend.request(
+            method="POST", path="/api/v1/configmaps", body=rest.Body(b"{}", 2, None)
+        )
+
+    assert exc_info.value.body == "hi"
+
+
+@pytest.mark.parametrize(
+    "data, expected_body",
+    [
+        (b"k8s\x00\x12\x0d\x12\x07Fai", "k8s\x00\x12\r\x12\x07Fai"),
+        (b"", "reason 1"),
+    ],
+    ids=["truncated", "empty"],
+)
+def test_request_fails_protobuf_invalid(api_client, data, expected_body):
+    """
+    GIVEN api client whose pool returns a failed response with a protobuf Status that
+        cannot be decoded
+    WHEN request is called
+    THEN ApiException is raised with the raw body or else the reason as the body.
+    """
+    response = _response(status=409, data=data)
+    response.headers = {"Content-Type": "application/vnd.kubernetes.protobuf"}
+    api_client.rest_client.pool_manager.request.return_value = response
+    backend = rest.Backend(api_client=api_client)
+
+    with pytest.raises(client.rest.ApiException) as exc_info:
+        backend.request(
+            method="POST", path="/api/v1/configmaps", body=rest.Body(b"{}", 2, None)
+        )
+
+    assert exc_info.value.body == expected_body
+    assert exc_info.value.status == 409
+
+
+@pytest.mark.parametrize(
+    "body, expected_size",
+    [
+        ({"kind": "Deployment", "spec": {}}, 0),
+        ({"data": None}, 0),
+        ({"data": {"a": "12", "b": "345"}, "binaryData": {"c": "6789"}}, 9),
+        ({"stringData": {"a": "12"}}, 2),
+    ],
+    ids=["other kind", "data empty", "config map", "secret"],
+)
+def test_calculate_data_size(body, expected_size):
+    """
+    GIVEN body
+    WHEN calculate_data_size is called with the body
+    THEN the expected size is returned.
+    """
+    assert rest.calculate_data_size(body=body) == expected_size
+
+
+def test_serialize_small(monkeypatch):
+    """
+    GIVEN body with data smaller than the threshold
+    WHEN serialize is called with the body
+    THEN the compact JSON is returned as bytes.
+    """
+    monkeypatch.delenv("KUBERNETES_REQUEST_GZIP", raising=False)
+    monkeypatch.setenv("LARGE_OBJECT_THRESHOLD", "10")
+
+    body = rest.serialize(body={"data": {"key": "123456789"}})
+
+    assert body == rest.Body(b'{"data":{"key":"123456789"}}', 28, None)
+
+
+def test_serialize_large(monkeypatch):
+    """
+    GIVEN body with data at the threshold
+    WHEN serialize is called with the body
+    THEN a buffer at the start with the compact JSON is returned.
+    """
+    monkeypatch.delenv("KUBERNETES_REQUEST_GZIP", raising=False)
+    monkeypatch.setenv("LARGE_OBJECT_THRESHOLD", "10")
+
+    body = rest.serialize(body={"data": {"key": "1234567890"}, "items": [1, None]})
+
+    expected = b'{"data":{"key":"1234567890"},"items":[1,null]}'
+    assert body.length == len(expected)
+    assert body.encoding is None
+    assert body.content.read() == expected
+
+
+@pytest.mark.parametrize("value", ["true", "True"])
+def test_serialize_gzip(monkeypatch, value):
+    """
+    GIVEN KUBERNETES_REQUEST_GZIP environment variable set to true in any case and
+        small body
+    WHEN serialize is called with the body
+    THEN a buffer with the compressed JSON is returned.
+    """
+    monkeypatch.setenv("KUBERNETES_REQUEST_GZIP", value)
+
+    body = rest.serialize(body={"data": {"key": "value " * 100}})
+
+    content = body.content.read()
+    assert body.encoding == "gzip"
+    assert body.length == len(content) < 100
+    assert json.loads(gzip.decompress(content)) == {"data": {"key": "value " * 100}}
+
+
+def test_request_body_headers(api_client):
+    """
+    GIVEN compressed body
+    WHEN request is called with the body
+    THEN the content is sent with its length and encoding.
+    """
+    api_client.rest_client.pool_manager.request.return_value = _response()
+    backend = rest.Backend(api_client=api_client)
+    body = rest.Body(io.BytesIO(b"123"), 3, "gzip")
+
+    backend.request(method="POST", path="/api/v1/configmaps", body=body)
+
+    call = api_client.rest_client.pool_manager.request.call_args
+    assert call[1]["body"] is body.content
+    assert call[1]["headers"]["Content-Length"] == "3"
+    assert call[1]["headers"]["Content-Encoding"] == "gzip"
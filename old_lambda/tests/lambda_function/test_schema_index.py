@@ -0,0 +1,348 @@
+"""Tests for schema_index."""
+
+import json
+import sys
+
+import pytest
+
+from lambda_function import exceptions
+from lambda_function import schema_index
+from lambda_function import schemas
+from lambda_function import validation
+
+_REF = "#/definitions/"
+_SPEC = {
+    "definitions": {
+        "io.k8s.api.apps.v1.Deployment": {
+            "properties": {
+                "apiVersion": {"type": "string"},
+                "kind": {"type": "string"},
+                "metadata": {
+                    "$ref": f"{_REF}io.k8s.apimachinery.pkg.apis.meta.v1.ObjectMeta"
+                },
+                "spec": {"$ref": f"{_REF}io.k8s.api.apps.v1.DeploymentSpec"},
+            },
+            "x-kubernetes-group-version-kind": [
+                {"group": "apps", "kind": "Deployment", "version": "v1"}
+            ],
+        },
+        "io.k8s.api.apps.v1.DeploymentSpec": {
+            "properties": {
+                "paused": {"type": "boolean"},
+                "replicas": {"type": "integer", "format": "int32"},
+                "template": {"$ref": f"{_REF}io.k8s.api.core.v1.PodTemplateSpec"},
+            },
+            "required": ["template"],
+        },
+        "io.k8s.api.core.v1.PodTemplateSpec": {
+            "properties": {
+                "spec": {"$ref": f"{_REF}io.k8s.api.core.v1.PodSpec"},
+            },
+        },
+        "io.k8s.api.core.v1.PodSpec": {
+            "properties": {
+                "containers": {
+                    "type": "array",
+                    "items": {"$ref": f"{_REF}io.k8s.api.core.v1.Container"},
+                },
+                "nodeSelector": {
+                    "type": "object",
+                    "additionalProperties": {"type": "string"},
+                },
+            },
+        },
+        "io.k8s.api.core.v1.Container": {
+            "properties": {
+                "args": {"type": "array", "items": {"type": "string"}},
+                "name": {"type": "string"},
+                "ratio": {"type": "number"},
+                "maxSurge": {
+                    "$ref": f"{_REF}io.k8s.apimachinery.pkg.util.intstr.IntOrString"
+                },
+                "started": {"type": "string", "format": "date-time"},
+                "data": {"type": "string", "format": "byte"},
+                "extra": {},
+            },
+            "required": ["name"],
+        },
+        "io.k8s.api.core.v1.ConfigMap": {
+            "properties": {
+                "data": {"type": "object", "additionalProperties": {"type": "string"}},
+            },
+            "x-kubernetes-group-version-kind": [
+                {"group": "", "kind": "ConfigMap", "version": "v1"}
+            ],
+        },
+        "io.k8s.apimachinery.pkg.apis.meta.v1.ObjectMeta": {
+            "properties": {
+                "labels": {
+                    "type": "object",
+                    "additionalProperties": {"type": "string"},
+                },
+                "name": {"type": "string"},
+            },
+        },
+        "io.k8s.apimachinery.pkg.util.intstr.IntOrString": {
+            "type": "string",
+            "format": "int-or-string",
+        },
+    },
+}
+
+
+@pytest.fixture(name="index_path")
+def fixture_index_path(tmp_path):
+    """The path of the index built from the spec."""
+    path = tmp_path / "schema.idx"
+    path.write_bytes(schema_index.build(spec=_SPEC))
+    return str(path)
+
+
+@pytest.fixture(name="index")
+def fixture_index(index_path):
+    """The index built from the spec."""
+    index = schema_index.SchemaIndex(path=index_path)
+    yield index
+    index.close()
+
+
+@pytest.fixture(name="index_enabled")
+def fixture_index_enabled(monkeypatch, index_path):
+    """Use the index for coercion and validation."""
+    validation.reset()
+    monkeypatch.setenv("SCHEMA_INDEX_PATH", index_path)
+    yield
+    validation.reset()
+
+
+def test_find_kind(index):
+    """
+    GIVEN index
+    WHEN find_kind is called with kinds in the core and a named group
+    THEN the definitions of the kinds are returned.
+    """
+    deployment = index.find_kind(api_version="apps/v1", kind="Deployment")
+    config_map = index.find_kind(api_version="v1", kind="ConfigMap")
+
+    assert index.get_name(definition=deployment) == "io.k8s.api.apps.v1.Deployment"
+    assert index.get_name(definition=config_map) == "io.k8s.api.core.v1.ConfigMap"
+
+
+@pytest.mark.parametrize(
+    "api_version, kind",
+    [("apps/v1", "Widget"), ("example.com/v1", "Deployment"), ("a", "0")],
+)
+def test_find_kind_missing(index, api_version, kind):
+    """
+    GIVEN index
+    WHEN find_kind is called with a kind that is not in the spec
+    THEN None is returned.
+    """
+    assert index.find_kind(api_version=api_version, kind=kind) is None
+
+
+def test_find_definition(index):
+    """
+    GIVEN index
+    WHEN find_definition is called with names that are and are not in the spec
+    THEN the definition or None is returned.
+    """
+    definition = index.find_definition(name="io.k8s.api.core.v1.PodSpec")
+
+    assert index.get_name(definition=definition) == "io.k8s.api.core.v1.PodSpec"
+    assert index.find_definition(name="io.k8s.api.core.v1.Pod") is None
+
+
+def test_get_fields(index):
+    """
+    GIVEN index
+    WHEN get_fields is called with a definition
+    THEN the fields with their types are returned sorted by name.
+    """
+    definition = index.find_definition(name="io.k8s.api.core.v1.Container")
+
+    assert index.get_fields(definition=definition) == [
+        schema_index.Field("args", "List[str]", False),
+        schema_index.Field("data", "bytes", False),
+        schema_index.Field("extra", "object", False),
+        schema_index.Field("maxSurge", "int-or-string", False),
+        schema_index.Field("name", "str", True),
+        schema_index.Field("ratio", "float", False),
+        schema_index.Field("started", "datetime", False),
+    ]
+
+
+def test_find_field(index):
+    """
+    GIVEN index
+    WHEN find_field is called with a definition and names
+    THEN the field or None is returned.
+    """
+    definition = index.find_definition(name="io.k8s.api.apps.v1.DeploymentSpec")
+
+    assert index.find_field(definition=definition, name="replicas") == (
+        schema_index.Field("replicas", "int", False)
+    )
+    assert index.find_field(definition=definition, name="replicaz") is None
+
+
+@pytest.mark.parametrize(
+    "path, expected_field",
+    [
+        (
+            ["spec", "template", "spec", "containers", "0", "name"],
+            schema_index.Field("name", "str", True),
+        ),
+        (
+            ["spec", "template", "spec", "nodeSelector", "disk"],
+            schema_index.Field("nodeSelector", "Dict[str, str]", False),
+        ),
+        (["spec", "paused"], schema_index.Field("paused", "bool", False)),
+        (["spec", "replicaz"], None),
+        (["spec", "paused", "value"], None),
+    ],
+    ids=["list", "map", "field", "missing", "past primitive"],
+)
+def test_resolve(index, path, expected_field):
+    """
+    GIVEN index
+    WHEN resolve is called with a path of Deployment
+    THEN the field at the path is returned.
+    """
+    assert (
+        index.resolve(api_version="apps/v1", kind="Deployment", path=path)
+        == expected_field
+    )
+
+
+def test_resolve_kind_missing(index):
+    """
+    GIVEN index
+    WHEN resolve is called with a kind that is not in the spec
+    THEN None is returned.
+    """
+    assert index.resolve(api_version="v1", kind="Pod", path=["spec"]) is None
+
+
+def test_get_model(index):
+    """
+    GIVEN index
+    WHEN get_model is called with a definition twice
+    THEN the same model in the shape of a client model is returned.
+    """
+    definition = index.find_definition(name="io.k8s.api.apps.v1.DeploymentSpec")
+
+    model = index.get_model(definition=definition)
+
+    assert model is index.get_model(definition=definition)
+    assert model.__name__ == "io.k8s.api.apps.v1.DeploymentSpec"
+    assert model.openapi_types == {
+        "paused": "bool",
+        "replicas": "int",
+        "template": "io.k8s.api.core.v1.PodTemplateSpec",
+    }
+    assert model.attribute_map["replicas"] == "replicas"
+    assert model.required == ("template",)
+
+
+@pytest.mark.parametrize(
+    "contents, expected_message",
+    [
+        (None, "could not open the schema index {path}: "),
+        (b"", "could not open the schema index {path}: "),
+        (b"K8SIDX01", "could not open the schema index {path}: the file is too short"),
+        (
+            b"{}" * 32,
+            "could not open the schema index {path}: the file is not a schema index",
+        ),
+    ],
+    ids=["missing", "empty", "short", "not index"],
+)
+def test_open_invalid(tmp_path, contents, expected_message):
+    """
+    GIVEN path that is not an index
+    WHEN SchemaIndex is constructed with the path
+    THEN SchemaIndexError is raised.
+    """
+    path = tmp_path / "schema.idx"
+    if contents is not None:
+        path.write_bytes(contents)
+
+    with pytest.raises(exceptions.SchemaIndexError) as exc_info:
+        schema_index.SchemaIndex(path=str(path))
+
+    assert str(exc_info.value).startswith(expected_message.format(path=path))
+
+
+@pytest.mark.usefixtures("index_enabled")
+def test_coerce_with_index():
+    """
+    GIVEN SCHEMA_INDEX_PATH environment variable
+    WHEN coerce is called with a Deployment with numbers and booleans as strings
+    THEN they are coerced using the index.
+    """
+    containers = [{"maxSurge": "1"}, {"maxSurge": "25%"}]
+    body = {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "spec": {
+            "replicas": "2",
+            "paused": "true",
+            "template": {"spec": {"containers": containers}},
+        },
+    }
+
+    coerced = schemas.coerce(body=body)
+
+    assert coerced["spec"] == {
+        "replicas": 2,
+        "paused": True,
+        "template": {"spec": {"containers": [{"maxSurge": 1}, {"maxSurge": "25%"}]}},
+    }
+    assert schemas.get_schema_index() is schemas.get_schema_index()
+    assert schemas.get_kind_model(api_version="v1", kind="Pod") is None
+
+
+@pytest.mark.usefixtures("index_enabled")
+def test_validate_with_index():
+    """
+    GIVEN SCHEMA_INDEX_PATH environment variable
+    WHEN validate is called with a Deployment missing required fields
+    THEN the missing, unknown and invalid fields are reported using the index.
+    """
+    body = {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "spec": {
+            "replicas": 1,
+            "template": {
+                "spec": {"containers": [{"args": ["a"], "nmae": "c", "maxSurge": []}]}
+            },
+        },
+    }
+
+    with pytest.raises(exceptions.BodyInvalidError) as exc_info:
+        validation.validate(body=body)
+
+    assert str(exc_info.value) == (
+        "the body is invalid: spec.template.spec.containers[0].name is required; "
+        "spec.template.spec.containers[0].nmae is not a field of "
+        "io.k8s.api.core.v1.Container; "
+        "spec.template.spec.containers[0].maxSurge must be an integer or a string"
+    )
+
+
+def test_main(monkeypatch, tmp_path):
+    """
+    GIVEN spec in a file
+    WHEN main is called with the spec and index paths
+    THEN the index is written.
+    """
+    spec_path = tmp_path / "openapi.json"
+    spec_path.write_text(json.dumps(_SPEC))
+    index_path = tmp_path / "schema.idx"
+    monkeypatch.setattr(sys, "argv", ["schema_index", str(spec_path), str(index_path)])
+
+    schema_index.main()
+
+    assert index_path.read_bytes() == schema_index.build(spec=_SPEC)
@@ -0,0 +1,297 @@
+"""Tests for schemas."""
+
+import copy
+
+import pytest
+
+from lambda_function import schemas
+
+_DEPLOYMENT = {
+    "apiVersion": "apps/v1",
+    "kind": "Deployment",
+    "metadata": {"name": "web-deployment", "labels": {"app": "web", "tier": "1"}},
+    "spec": {
+        "replicas": "2",
+        "selector": {"matchLabels": {"app": "web"}},
+        "template": {
+            "metadata": {"labels": {"app": "web"}},
+            "spec": {
+                "containers": [
+                    {
+                        "name": "web-container",
+                        "image": "nginx:latest",
+                        "ports": [{"containerPort": "80"}, {"containerPort": 443}],
+                        "stdin": "true",
+                        "tty": "False",
+                    }
+                ]
+            },
+        },
+    },
+}
+
+
+def test_coerce_deployment():
+    """
+    GIVEN Deployment with numbers and booleans as strings like CloudFormation sends
+    WHEN coerce is called with the body
+    THEN the numbers and booleans are coerced, strings are kept and the body is not
+        modified.
+    """
+    body = copy.deepcopy(_DEPLOYMENT)
+
+    coerced = schemas.coerce(body=body)
+
+    assert body == _DEPLOYMENT
+    assert coerced["spec"]["replicas"] == 2
+    container = coerced["spec"]["template"]["spec"]["containers"][0]
+    assert container["ports"] == [{"containerPort": 80}, {"containerPort": 443}]
+    assert container["stdin"] is True
+    assert container["tty"] is False
+    assert container["image"] == "nginx:latest"
+    assert coerced["metadata"] is body["metadata"]
+    assert coerced["spec"]["selector"] is body["spec"]["selector"]
+
+
+def test_coerce_unchanged():
+    """
+    GIVEN Deployment that has the types of the schema
+    WHEN coerce is called with the body
+    THEN the body itself is returned.
+    """
+    body = schemas.coerce(body=copy.deepcopy(_DEPLOYMENT))
+
+    assert schemas.coerce(body=body) is body
+
+
+def test_coerce_service():
+    """
+    GIVEN Service with ports as strings like CloudFormation sends
+    WHEN coerce is called with the body
+    THEN the ports and the target ports holding only digits are coerced and the
+        target ports holding names are kept.
+    """
+    body = {
+        "apiVersion": "v1",
+        "kind": "Service",
+        "spec": {
+            "ports": [
+                {"port": "80", "targetPort": "8080"},
+                {"port": "443", "targetPort": "https"},
+                {"port": 8443, "targetPort": 8443},
+            ]
+        },
+    }
+
+    coerced = schemas.coerce(body=body)
+
+    assert coerced["spec"]["ports"] == [
+        {"port": 80, "targetPort": 8080},
+        {"port": 443, "targetPort": "https"},
+        {"port": 8443, "targetPort": 8443},
+    ]
+
+
+@pytest.mark.parametrize(
+    "value, expected_value",
+    [("1", 1), ("25%", "25%"), ("-1", "-1"), (" 1", " 1"), (1, 1)],
+    ids=["digits", "percentage", "sign", "space", "int"],
+)
+def test_coerce_deployment_int_or_string(value, expected_value):
+    """
+    GIVEN Deployment with an IntOrString field
+    WHEN coerce is called with the body
+    THEN only a string holding only digits is coerced to an integer.
+    """
+    body = {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "spec": {"strategy": {"rollingUpdate": {"maxSurge": value}}},
+    }
+
+    coerced = schemas.coerce(body=body)
+
+    assert coerced["spec"]["strategy"]["rollingUpdate"]["maxSurge"] == expected_value
+
+
+@pytest.mark.parametrize(
+    "replicas, stdin", [("two", "yes"), (None, 1)], ids=["not coercible", "not str"]
+)
+def test_coerce_leaves_invalid(replicas, stdin):
+    """
+    GIVEN Deployment with values that can not be coerced
+    WHEN coerce is called with the body
+    THEN the values are left for the API server to reject.
+    """
+    body = {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "spec": {
+            "replicas": replicas,
+            "template": {"spec": {"containers": [{"stdin": stdin}]}},
+        },
+    }
+
+    assert schemas.coerce(body=body) is body
+
+
+@pytest.mark.parametrize(
+    "spec",
+    ["spec", {"template": {"spec": {"containers": {"stdin": "true"}}}}],
+    ids=["object not mapping", "list not list"],
+)
+def test_coerce_wrong_shape(spec):
+    """
+    GIVEN Deployment with fields that do not have the shape of the schema
+    WHEN coerce is called with the body
+    THEN the body itself is returned.
+    """
+    body = {"apiVersion": "apps/v1", "kind": "Deployment", "spec": spec}
+
+    assert schemas.coerce(body=body) is body
+
+
+def test_coerce_recursive():
+    """
+    GIVEN CustomResourceDefinition with a nested recursive schema
+    WHEN coerce is called with the body
+    THEN numbers at every level are coerced.
+    """
+    body = {
+        "apiVersion": "apiextensions.k8s.io/v1",
+        "kind": "CustomResourceDefinition",
+        "spec": {
+            "versions": [
+                {
+                    "schema": {
+                        "openAPIV3Schema": {
+                            "properties": {
+                                "size": {
+                                    "maximum": "1.5",
+                                    "minimum": "small",
+                                    "multipleOf": 2,
+                                },
+                                "items": {"properties": {"count": {"maxItems": "3"}}},
+                            },
+                            "x-kubernetes-preserve-unknown-fields": "true",
+                        }
+                    }
+                }
+            ]
+        },
+    }
+
+    schema = schemas.coerce(body=body)["spec"]["versions"][0]["schema"]
+
+    properties = schema["openAPIV3Schema"]["properties"]
+    assert properties["size"] == {
+        "maximum": 1.5,
+        "minimum": "small",
+        "multipleOf": 2,
+    }
+    assert properties["items"]["properties"]["count"]["maxItems"] == 3
+    assert schema["openAPIV3Schema"]["x-kubernetes-preserve-unknown-fields"] is True
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"kind": "Deployment", "spec": {"replicas": "1"}},
+        {"apiVersion": "example.com/v1", "kind": "Widget", "spec": {"size": "1"}},
+        {
+            "apiVersion": "example.com/v1",
+            "kind": "Deployment",
+            "spec": {"replicas": "1"},
+        },
+    ],
+    ids=["api version missing", "custom resource", "custom resource built-in kind"],
+)
+def test_coerce_unknown(body):
+    """
+    GIVEN body without a kind the client has a model of
+    WHEN coerce is called with the body
+    THEN the body itself is returned.
+    """
+    assert schemas.coerce(body=body) is body
+
+
+@pytest.mark.parametrize(
+    "api_version, kind, expected_names",
+    [
+        ("v1", "ConfigMap", ["V1ConfigMap"]),
+        ("apps/v1", "Deployment", ["AppsV1Deployment", "V1Deployment"]),
+        (
+            "rbac.authorization.k8s.io/v1",
+            "ClusterRole",
+            ["RbacAuthorizationV1ClusterRole", "V1ClusterRole"],
+        ),
+        ("example.com/v1", "Deployment", []),
+    ],
+    ids=["core", "group", "dotted group", "custom resource"],
+)
+def test_calculate_model_names(api_version, kind, expected_names):
+    """
+    GIVEN api version and kind
+    WHEN calculate_model_names is called with them
+    THEN the names of the model with and without the group are returned, none for
+        groups the client has no API of.
+    """
+    assert (
+        schemas.calculate_model_names(api_version=api_version, kind=kind)
+        == expected_names
+    )
+
+
+@pytest.mark.parametrize(
+    "type_name, value, expected_value",
+    [
+        ("list[V1ContainerPort]", [{"containerPort": "80"}], [{"containerPort": 80}]),
+        ("dict(str, int)", {"a": "1", "b": 2}, {"a": 1, "b": 2}),
+        ("Dict[str, bool]", {"a": "true"}, {"a": True}),
+        ("dict(str, int)", [], []),
+    ],
+    ids=["old list", "old dict", "new dict", "dict not mapping"],
+)
+def test_compile_type(type_name, value, expected_value):
+    """
+    GIVEN type name as spelled by the old or new client
+    WHEN the coercer of the type is compiled and called with a value
+    THEN the coerced value is returned.
+    """
+    # pylint: disable=protected-access
+    coercer = schemas._COMPILER.compile_type(type_name=type_name)
+
+    assert coercer(value) == expected_value
+
+
+@pytest.mark.parametrize(
+    "type_name", ["str", "object", "datetime", "List[str]", "Dict[str, str]"]
+)
+def test_compile_type_nothing_to_coerce(type_name):
+    """
+    GIVEN type whose values never need coercing
+    WHEN the coercer of the type is compiled
+    THEN None is returned.
+    """
+    # pylint: disable=protected-access
+    assert schemas._COMPILER.compile_type(type_name=type_name) is None
+
+
+def test_compile_model_nothing_to_coerce():
+    """
+    GIVEN model with only string fields
+    WHEN the coercer of the model is compiled twice
+    THEN None is returned both times.
+    """
+
+    class V1Strings:  # pylint: disable=too-few-public-methods
+        """Model with only string fields."""
+
+        openapi_types = {"name": "str", "values": "List[str]"}
+        attribute_map = {"name": "name", "values": "values"}
+
+    # pylint: disable=protected-access
+    compiler = schemas._Compiler()
+
+    assert compiler.compile_model(model=V1Strings) is None
+    assert compiler.compile_model(model=V1Strings) is None
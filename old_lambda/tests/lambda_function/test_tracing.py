@@ -0,0 +1,272 @@
+"""Tests for tracing."""
+
+import hashlib
+import json
+import threading
+from unittest import mock
+
+import pytest
+
+from lambda_function import tracing
+
+
+@pytest.fixture(name="exported")
+def fixture_exported(monkeypatch):
+    """Select an exporter that collects the spans of every trace."""
+    # pylint: disable=protected-access
+    spans = []
+    monkeypatch.setitem(tracing._EXPORTERS, "test", lambda: spans.extend)
+    monkeypatch.setenv("TRACE_EXPORTER", "test")
+    return spans
+
+
+def test_to_dict():
+    """
+    GIVEN span
+    WHEN to_dict is called with the span
+    THEN the JSON representation is returned.
+    """
+    span = tracing.Span("trace 1", "span 1", None, "name 1", 1.0, 0.5, {"key": 1})
+
+    assert tracing.to_dict(finished=span) == {
+        "traceId": "trace 1",
+        "spanId": "span 1",
+        "parentId": None,
+        "name": "name 1",
+        "start": 1.0,
+        "durationMs": 500.0,
+        "attributes": {"key": 1},
+    }
+
+
+def test_json_file_exporter(tmp_path):
+    """
+    GIVEN JsonFileExporter with a path
+    WHEN it is called twice with spans
+    THEN a line per span is appended to the file.
+    """
+    path = tmp_path / "traces.jsonl"
+    exporter = tracing.JsonFileExporter(path=str(path))
+    span = tracing.Span("trace 1", "span 1", None, "name 1", 1.0, 0.5, {})
+
+    exporter([span])
+    exporter([span, span._replace(span_id="span 2")])
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["spanId"] for line in lines] == ["span 1", "span 1", "span 2"]
+
+
+@pytest.mark.parametrize(
+    "name, expected_exporter",
+    [
+        (None, None),
+        ("none", None),
+        ("unknown", None),
+        ("log", tracing._export_log),  # pylint: disable=protected-access
+    ],
+    ids=["default", "none", "unknown", "log"],
+)
+def test_get_exporter(monkeypatch, name, expected_exporter):
+    """
+    GIVEN TRACE_EXPORTER environment variable
+    WHEN get_exporter is called
+    THEN the selected exporter is returned.
+    """
+    if name is None:
+        monkeypatch.delenv("TRACE_EXPORTER", raising=False)
+    else:
+        monkeypatch.setenv("TRACE_EXPORTER", name)
+
+    assert tracing.get_exporter() == expected_exporter
+
+
+def test_get_exporter_json(monkeypatch, tmp_path):
+    """
+    GIVEN TRACE_EXPORTER of json and TRACE_FILE
+    WHEN get_exporter is called
+    THEN a JSON file exporter writing to the file is returned.
+    """
+    monkeypatch.setenv("TRACE_EXPORTER", "json")
+    monkeypatch.setenv("TRACE_FILE", str(tmp_path / "traces.jsonl"))
+
+    exporter = tracing.get_exporter()
+
+    assert isinstance(exporter, tracing.JsonFileExporter)
+    assert exporter.path == str(tmp_path / "traces.jsonl")
+
+
+def test_register_exporter(monkeypatch):
+    """
+    GIVEN exporter registered with a name
+    WHEN get_exporter is called with the name in TRACE_EXPORTER
+    THEN the exporter is returned.
+    """
+    monkeypatch.setattr(tracing, "_EXPORTERS", {})
+    exporter = mock.MagicMock()
+    tracing.register_exporter(name="name 1", factory=lambda: exporter)
+    monkeypatch.setenv("TRACE_EXPORTER", "name 1")
+
+    assert tracing.get_exporter() is exporter
+
+
+def test_export_log(capsys):
+    """
+    GIVEN span
+    WHEN _export_log is called with the span
+    THEN the spans are printed as one line.
+    """
+    # pylint: disable=protected-access
+    span = tracing.Span("trace 1", "span 1", None, "name 1", 1.0, 0.5, {})
+
+    tracing._export_log([span])
+
+    assert json.loads(capsys.readouterr().out) == {
+        "spans": [tracing.to_dict(finished=span)]
+    }
+
+
+def test_calculate_trace_id():
+    """
+    GIVEN stack ids
+    WHEN calculate_trace_id is called
+    THEN the same id is returned for the same stack and a random one without it.
+    """
+    expected_trace_id = hashlib.sha256(b"stack id 1").hexdigest()[:32]
+
+    assert tracing.calculate_trace_id(stack_id="stack id 1") == expected_trace_id
+    assert tracing.calculate_trace_id(stack_id=None) != tracing.calculate_trace_id(
+        stack_id=None
+    )
+    assert len(tracing.calculate_trace_id(stack_id=None)) == 32
+
+
+def test_trace_span_nesting():
+    """
+    GIVEN trace
+    WHEN spans are nested
+    THEN each span has the innermost open span as parent.
+    """
+    trace = tracing.Trace(trace_id="trace 1")
+
+    with trace.span(name="root", attributes={}):
+        with trace.span(name="child", attributes={"key": 1}):
+            with trace.span(name="grandchild", attributes={}):
+                pass
+
+    spans = {span.name: span for span in trace.spans}
+    assert spans["root"].parent_id is None
+    assert spans["root"].span_id == trace.root_id
+    assert spans["child"].parent_id == trace.root_id
+    assert spans["child"].attributes == {"key": 1}
+    assert spans["grandchild"].parent_id == spans["child"].span_id
+    assert all(span.trace_id == "trace 1" for span in trace.spans)
+    assert all(span.duration >= 0 for span in trace.spans)
+
+
+def test_trace_span_thread():
+    """
+    GIVEN trace with an open span
+    WHEN a span is recorded in another thread
+    THEN its parent is the root span.
+    """
+    trace = tracing.Trace(trace_id="trace 1")
+
+    def record():
+        with trace.span(name="thread", attributes={}):
+            pass
+
+    with trace.span(name="root", attributes={}):
+        with trace.span(name="child", attributes={}):
+            thread = threading.Thread(target=record)
+            thread.start()
+            thread.join()
+
+    spans = {span.name: span for span in trace.spans}
+    assert spans["thread"].parent_id == spans["root"].span_id
+
+
+def test_trace_span_error():
+    """
+    GIVEN trace
+    WHEN an exception is raised in a span
+    THEN the span records the error and the exception is raised.
+    """
+    trace = tracing.Trace(trace_id="trace 1")
+
+    with pytest.raises(ValueError):
+        with trace.span(name="name 1", attributes={"key": 1}):
+            raise ValueError("failure")
+
+    assert trace.spans[0].attributes == {"key": 1, "error": "ValueError"}
+
+
+def test_trace_disabled(monkeypatch):
+    """
+    GIVEN tracing is disabled
+    WHEN trace is entered and a traced function is called
+    THEN nothing is recorded.
+    """
+    # pylint: disable=protected-access
+    monkeypatch.delenv("TRACE_EXPORTER", raising=False)
+    function = tracing.traced(name="name 1")(mock.MagicMock(return_value=1))
+
+    with tracing.trace(event={"StackId": "stack id 1"}):
+        assert tracing._TRACE is None
+        assert function() == 1
+        with tracing.span(name="name 2"):
+            pass
+
+
+def test_trace(exported):
+    """
+    GIVEN an exporter is selected
+    WHEN trace is entered with an event and traced functions are called
+    THEN the spans of the invocation are exported under the root span.
+    """
+    # pylint: disable=protected-access
+    event = {
+        "StackId": "stack id 1",
+        "RequestId": "request id 1",
+        "LogicalResourceId": "resource 1",
+        "RequestType": "Create",
+    }
+    function = tracing.traced(name="function", attributes={"key": 1})(
+        mock.MagicMock(return_value=1)
+    )
+
+    with tracing.trace(event=event):
+        assert function(2, key=3) == 1
+        with tracing.span(name="span"):
+            pass
+
+    function.__wrapped__.assert_called_once_with(2, key=3)
+    assert tracing._TRACE is None
+    spans = {span.name: span for span in exported}
+    assert set(spans) == {"lambda_handler", "function", "span"}
+    root = spans["lambda_handler"]
+    assert root.parent_id is None
+    assert root.trace_id == tracing.calculate_trace_id(stack_id="stack id 1")
+    assert root.attributes == {
+        "stackId": "stack id 1",
+        "requestId": "request id 1",
+        "logicalResourceId": "resource 1",
+        "requestType": "Create",
+    }
+    assert spans["function"].parent_id == root.span_id
+    assert spans["function"].attributes == {"key": 1}
+    assert spans["span"].attributes == {}
+
+
+def test_trace_error(exported):
+    """
+    GIVEN an exporter is selected
+    WHEN an exception is raised in the trace
+    THEN the spans are still exported.
+    """
+    # pylint: disable=protected-access
+    with pytest.raises(ValueError):
+        with tracing.trace(event={}):
+            raise ValueError("failure")
+
+    assert tracing._TRACE is None
+    assert [span.attributes["error"] for span in exported] == ["ValueError"]
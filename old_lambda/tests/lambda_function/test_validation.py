@@ -0,0 +1,269 @@
+"""Tests for validation."""
+
+import pytest
+
+from lambda_function import exceptions
+from lambda_function import validation
+
+_DEPLOYMENT = {
+    "apiVersion": "apps/v1",
+    "kind": "Deployment",
+    "metadata": {"name": "web-deployment", "labels": {"app": "web"}},
+    "spec": {
+        "replicas": 1,
+        "selector": {"matchLabels": {"app": "web"}},
+        "template": {
+            "metadata": {"labels": {"app": "web"}},
+            "spec": {
+                "containers": [
+                    {
+                        "name": "web-container",
+                        "image": "nginx:latest",
+                        "ports": [{"containerPort": 80}],
+                        "resources": {"limits": {"cpu": 1, "memory": "1Gi"}},
+                        "stdin": True,
+                        "tty": None,
+                    }
+                ]
+            },
+        },
+        "strategy": {"rollingUpdate": {"maxSurge": "25%", "maxUnavailable": 1}},
+    },
+}
+
+
+@pytest.mark.parametrize(
+    "value, expected_enabled",
+    [(None, False), ("false", False), ("true", True), ("TRUE", True)],
+)
+def test_is_enabled(monkeypatch, value, expected_enabled):
+    """
+    GIVEN VALIDATE_BODIES environment variable
+    WHEN is_enabled is called
+    THEN whether it is true is returned.
+    """
+    if value is None:
+        monkeypatch.delenv("VALIDATE_BODIES", raising=False)
+    else:
+        monkeypatch.setenv("VALIDATE_BODIES", value)
+
+    assert validation.is_enabled() == expected_enabled
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        _DEPLOYMENT,
+        {"kind": "Deployment", "spce": {}},
+        {"apiVersion": "example.com/v1", "kind": "Widget", "spce": {}},
+        {
+            "apiVersion": "example.com/v1",
+            "kind": "Deployment",
+            "spec": {"customField": 1},
+        },
+    ],
+    ids=[
+        "valid",
+        "api version missing",
+        "custom resource",
+        "custom resource built-in kind",
+    ],
+)
+def test_validate_passes(body):
+    """
+    GIVEN body that is valid or whose kind has no schema
+    WHEN validate is called with the body
+    THEN no error is raised.
+    """
+    validation.validate(body=body)
+
+
+@pytest.mark.parametrize(
+    "spec, expected_errors",
+    [
+        (
+            {"replicaz": 1},
+            ["spec.replicaz is not a field of V1DeploymentSpec"],
+        ),
+        (
+            {"replicas": "1", "paused": 1},
+            [
+                "spec.replicas must be an integer",
+                "spec.paused must be a boolean",
+            ],
+        ),
+        ({"replicas": True}, ["spec.replicas must be an integer"]),
+        ({"selector": "app=web"}, ["spec.selector must be an object"]),
+        (
+            {"selector": {"matchLabels": ["app"]}},
+            ["spec.selector.matchLabels must be a mapping"],
+        ),
+        (
+            {"selector": {"matchLabels": {"app": 1}}},
+            ["spec.selector.matchLabels.app must be a string"],
+        ),
+        (
+            {"template": {"spec": {"containers": {"name": "c"}}}},
+            ["spec.template.spec.containers must be a list"],
+        ),
+        (
+            {"template": {"spec": {"containers": [None, {"nmae": "c"}]}}},
+            ["spec.template.spec.containers[1].nmae is not a field of V1Container"],
+        ),
+    ],
+    ids=[
+        "unknown field",
+        "wrong types",
+        "boolean for integer",
+        "not object",
+        "not mapping",
+        "mapping value",
+        "not list",
+        "list item",
+    ],
+)
+def test_validate_fails(spec, expected_errors):
+    """
+    GIVEN Deployment with mistakes
+    WHEN validate is called with the body
+    THEN BodyInvalidError with the path of each mistake is raised.
+    """
+    body = {"apiVersion": "apps/v1", "kind": "Deployment", "spec": spec}
+
+    with pytest.raises(exceptions.BodyInvalidError) as exc_info:
+        validation.validate(body=body)
+
+    assert str(exc_info.value) == f"the body is invalid: {'; '.join(expected_errors)}"
+
+
+@pytest.mark.parametrize(
+    "body, expected_errors",
+    [
+        (
+            {
+                "apiVersion": "v1",
+                "kind": "ConfigMap",
+                "metadata": {"labels": {"app": 1}},
+                "data": {"k": 1.5},
+            },
+            ["metadata.labels.app must be a string", "data.k must be a string"],
+        ),
+        (
+            {
+                "apiVersion": "v1",
+                "kind": "Pod",
+                "spec": {
+                    "containers": [{"resources": {"requests": {"cpu": True}}}],
+                    "volumes": [{"emptyDir": {"sizeLimit": 1024}}],
+                },
+            },
+            ["spec.containers[0].resources.requests.cpu must be a quantity"],
+        ),
+    ],
+    ids=["numbers for strings", "boolean for quantity"],
+)
+def test_validate_quantities(body, expected_errors):
+    """
+    GIVEN body with numbers for plain strings or quantities
+    WHEN validate is called with the body
+    THEN only the values that are neither strings nor numbers where quantities are
+        expected are reported.
+    """
+    with pytest.raises(exceptions.BodyInvalidError) as exc_info:
+        validation.validate(body=body)
+
+    assert str(exc_info.value) == f"the body is invalid: {'; '.join(expected_errors)}"
+
+
+def test_validate_body_not_object():
+    """
+    GIVEN body that is a list field of a kind
+    WHEN the validator of the kind is called with a list
+    THEN the body is reported.
+    """
+    validator = validation.get_validator(api_version="v1", kind="ConfigMap")
+    errors = []
+
+    validator([], "", errors)
+
+    assert errors == ["the body must be an object"]
+
+
+def test_validate_caps_errors():
+    """
+    GIVEN body with more mistakes than are reported
+    WHEN validate is called with the body
+    THEN only the first mistakes are reported.
+    """
+    body = {"apiVersion": "v1", "kind": "ConfigMap", "data": {}}
+    body["data"] = {f"key-{idx}": idx for idx in range(validation.MAX_ERRORS + 5)}
+
+    with pytest.raises(exceptions.BodyInvalidError) as exc_info:
+        validation.validate(body=body)
+
+    assert str(exc_info.value).count("must be a string") == validation.MAX_ERRORS
+
+
+def test_validate_recursive():
+    """
+    GIVEN CustomResourceDefinition with a mistake in a nested recursive schema
+    WHEN validate is called with the body
+    THEN the mistake is reported.
+    """
+    body = {
+        "apiVersion": "apiextensions.k8s.io/v1",
+        "kind": "CustomResourceDefinition",
+        "spec": {
+            "versions": [
+                {
+                    "schema": {
+                        "openAPIV3Schema": {
+                            "properties": {"size": {"properties": {"a": {"typ": 1}}}}
+                        }
+                    }
+                }
+            ]
+        },
+    }
+
+    with pytest.raises(exceptions.BodyInvalidError) as exc_info:
+        validation.validate(body=body)
+
+    assert "openAPIV3Schema.properties.size.properties.a.typ is not a field" in str(
+        exc_info.value
+    )
+
+
+def test_get_validator_cached():
+    """
+    GIVEN kind whose validator was compiled
+    WHEN get_validator is called again for the kind
+    THEN the same validator is returned.
+    """
+    first = validation.get_validator(api_version="apps/v1", kind="Deployment")
+
+    assert validation.get_validator(api_version="apps/v1", kind="Deployment") is first
+
+
+@pytest.mark.parametrize(
+    "type_name, value",
+    [
+        ("List[object]", [1, "a"]),
+        ("Dict[str, object]", {"a": 1}),
+        ("Dict[str, str]", {"a": None}),
+    ],
+    ids=["list of any", "mapping of any", "null value"],
+)
+def test_validate_containers_of_any(type_name, value):
+    """
+    GIVEN container type whose contents are not checked
+    WHEN the validator of the type is called with values
+    THEN there are no errors.
+    """
+    # pylint: disable=protected-access
+    validator = validation._COMPILER.compile_type(type_name=type_name)
+    errors = []
+
+    validator(value, "field", errors)
+
+    assert not errors